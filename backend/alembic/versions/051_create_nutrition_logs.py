@@ -0,0 +1,147 @@
+"""Create nutrition_logs and backfill from meal_plans.adherence.
+
+Revision ID: 051
+Revises: 050
+Create Date: 2026-10-16
+
+Cada ``POST /my/nutrition/logs`` reescribía el array completo
+``meal_plans.adherence -> 'logs'``. Los registros pasan a una tabla propia
+con clave única (client_id, log_date, meal_name), de modo que las lecturas
+por rango de fechas usan índice y cada comida es un INSERT de una fila.
+
+El backfill copia los logs existentes. Si un mismo cliente tiene la misma
+comida del mismo día en varios planes, se conserva la del plan más reciente
+(el endpoint antiguo sólo deduplicaba dentro de un plan). La columna
+``adherence`` se deja intacta para poder hacer downgrade; los logs creados
+después de esta migración no se copian de vuelta al JSONB.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "051"
+down_revision = "050"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "nutrition_logs",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "workspace_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workspaces.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "client_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("clients.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "meal_plan_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("meal_plans.id", ondelete="SET NULL"),
+            nullable=True,
+        ),
+        sa.Column("log_date", sa.Date(), nullable=False),
+        sa.Column("meal_name", sa.Text(), nullable=False),
+        sa.Column(
+            "foods",
+            postgresql.JSONB(astext_type=sa.Text()),
+            nullable=False,
+            server_default=sa.text("'[]'::jsonb"),
+        ),
+        sa.Column("total_calories", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_protein", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("total_carbs", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("total_fat", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("notes", sa.Text(), nullable=True),
+        sa.Column("satisfaction_rating", sa.Integer(), nullable=True),
+        sa.Column("logged_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.UniqueConstraint(
+            "client_id", "log_date", "meal_name",
+            name="uq_nutrition_logs_client_date_meal",
+        ),
+    )
+    op.create_index("ix_nutrition_logs_workspace_id", "nutrition_logs", ["workspace_id"])
+    op.create_index("ix_nutrition_logs_meal_plan_id", "nutrition_logs", ["meal_plan_id"])
+    op.create_index(
+        "ix_nutrition_logs_client_logged_at", "nutrition_logs", ["client_id", "logged_at"]
+    )
+
+    # Backfill. Entries with a malformed date or no meal name are skipped;
+    # the old endpoints could not display them either. Numeric fields are
+    # parsed defensively because early clients sent strings.
+    op.execute(
+        r"""
+        INSERT INTO nutrition_logs (
+            workspace_id, client_id, meal_plan_id, log_date, meal_name, foods,
+            total_calories, total_protein, total_carbs, total_fat,
+            notes, satisfaction_rating, logged_at
+        )
+        SELECT DISTINCT ON (mp.client_id, (e.value->>'date')::date, e.value->>'meal_name')
+            mp.workspace_id,
+            mp.client_id,
+            mp.id,
+            (e.value->>'date')::date,
+            e.value->>'meal_name',
+            CASE WHEN jsonb_typeof(e.value->'foods') = 'array'
+                 THEN e.value->'foods' ELSE '[]'::jsonb END,
+            CASE WHEN e.value->>'total_calories' ~ '^-?\d+(\.\d+)?$'
+                 THEN round((e.value->>'total_calories')::numeric)::int ELSE 0 END,
+            CASE WHEN e.value->>'total_protein' ~ '^-?\d+(\.\d+)?$'
+                 THEN (e.value->>'total_protein')::float ELSE 0 END,
+            CASE WHEN e.value->>'total_carbs' ~ '^-?\d+(\.\d+)?$'
+                 THEN (e.value->>'total_carbs')::float ELSE 0 END,
+            CASE WHEN e.value->>'total_fat' ~ '^-?\d+(\.\d+)?$'
+                 THEN (e.value->>'total_fat')::float ELSE 0 END,
+            e.value->>'notes',
+            CASE WHEN e.value->>'satisfaction_rating' ~ '^\d+$'
+                 THEN (e.value->>'satisfaction_rating')::int END,
+            COALESCE(
+                CASE WHEN e.value->>'logged_at' ~ '^\d{4}-\d{2}-\d{2}T'
+                     THEN (e.value->>'logged_at')::timestamptz END,
+                (e.value->>'date')::date::timestamptz
+            )
+        FROM meal_plans mp
+        CROSS JOIN LATERAL jsonb_array_elements(
+            CASE WHEN jsonb_typeof(mp.adherence->'logs') = 'array'
+                 THEN mp.adherence->'logs' ELSE '[]'::jsonb END
+        ) WITH ORDINALITY AS e(value, ord)
+        WHERE mp.client_id IS NOT NULL
+          AND e.value->>'date' ~ '^\d{4}-\d{2}-\d{2}$'
+          AND COALESCE(e.value->>'meal_name', '') <> ''
+        ORDER BY mp.client_id, (e.value->>'date')::date, e.value->>'meal_name',
+                 mp.created_at DESC, e.ord DESC
+        ON CONFLICT ON CONSTRAINT uq_nutrition_logs_client_date_meal DO NOTHING
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_nutrition_logs_client_logged_at", table_name="nutrition_logs")
+    op.drop_index("ix_nutrition_logs_meal_plan_id", table_name="nutrition_logs")
+    op.drop_index("ix_nutrition_logs_workspace_id", table_name="nutrition_logs")
+    op.drop_table("nutrition_logs")
@@ -0,0 +1,222 @@
+"""Store plan references on nutrition_logs and add nutrition_day_rollups.
+
+Revision ID: 052
+Revises: 051
+Create Date: 2026-10-16
+
+El historial de nutrición recalculaba, en cada petición, los macros
+planificados de cada comida registrada recorriendo la plantilla del plan.
+La referencia del plan se guarda ahora en cada log (se resuelve al escribir
+y al modificar el plan) y los totales diarios por cliente/plan se mantienen
+en ``nutrition_day_rollups``.
+"""
+import re
+from datetime import date
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "052"
+down_revision = "051"
+branch_labels = None
+depends_on = None
+
+
+# Copia congelada de app.services.meal_plan_macros / nutrition_calc tal como
+# estaban en esta revisión: la migración no debe cambiar si cambian ellos.
+
+_NUMBER_RE = re.compile(r"[\d.]+")
+
+
+def _safe_float(val, default=0.0):
+    if val is None:
+        return default
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        m = _NUMBER_RE.search(str(val))
+        try:
+            return float(m.group()) if m else default
+        except ValueError:
+            return default
+
+
+def _scale(food, grams):
+    factor = grams / (_safe_float(food.get("serving_size"), 100) or 100)
+    return [_safe_float(food.get(key)) * factor for key in ("calories", "protein", "carbs", "fat")]
+
+
+def _meal_reference(meal):
+    cal = prot = carb = fat = 0.0
+    plan_foods = []
+    for item in meal.get("items", []):
+        fd = item.get("food") or item.get("supplement") or {}
+        qty = _safe_float(item.get("quantity_grams"), 0)
+        c, p, cb, f = _scale(fd, qty)
+        c100, p100, cb100, f100 = _scale(fd, 100)
+        ic, ip, icb, ift = round(c), round(p, 1), round(cb, 1), round(f, 1)
+        cal += ic; prot += ip; carb += icb; fat += ift
+        plan_foods.append({
+            "name": fd.get("name", ""),
+            "calories": ic, "protein": ip, "carbs": icb, "fat": ift,
+            "quantity": qty,
+            "recipe_group": item.get("recipe_group"),
+            "calories_per_100g": round(c100),
+            "protein_per_100g": round(p100, 1),
+            "carbs_per_100g": round(cb100, 1),
+            "fat_per_100g": round(f100, 1),
+        })
+    return {
+        "calories": int(cal),
+        "protein": round(prot, 1),
+        "carbs": round(carb, 1),
+        "fat": round(fat, 1),
+        "foods": plan_foods,
+    }
+
+
+def plan_meal_reference(plan, meal_name, log_date, plan_start, duration_weeks):
+    """Macros y alimentos planificados de ``meal_name`` en ``log_date`` (o None)."""
+    if not isinstance(plan, dict) or not plan:
+        return None
+    if "weeks" in plan:
+        week = 1
+        if plan_start and duration_weeks and duration_weeks > 1:
+            week = (log_date - plan_start).days // 7 % duration_weeks + 1
+        days = next((wk.get("days", []) for wk in plan["weeks"] or [] if wk.get("week") == week), [])
+    else:
+        days = plan.get("days", [])
+    day = next((d for d in days if d.get("day") == log_date.isoweekday()), None)
+    if day is None:
+        return None
+    meal = next((m for m in day.get("meals", []) if m.get("name") == meal_name), None)
+    return _meal_reference(meal) if meal is not None else None
+
+
+def has_modifications(logged_foods, plan_ref):
+    if not plan_ref:
+        return False
+    logged = sorted(f.get("name", "") for f in logged_foods or [])
+    planned = sorted(f.get("name", "") for f in plan_ref.get("foods", []))
+    return logged != planned
+
+
+def upgrade() -> None:
+    op.add_column(
+        "nutrition_logs",
+        sa.Column("plan_reference", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+    op.add_column(
+        "nutrition_logs",
+        sa.Column("has_modifications", sa.Boolean(), nullable=False, server_default=sa.false()),
+    )
+
+    op.create_table(
+        "nutrition_day_rollups",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "workspace_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workspaces.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "client_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("clients.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "meal_plan_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("meal_plans.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("log_date", sa.Date(), nullable=False),
+        sa.Column("meals_logged", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("logged_calories", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("logged_protein", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("logged_carbs", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("logged_fat", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("planned_calories", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("planned_protein", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("planned_carbs", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("planned_fat", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("has_modifications", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint(
+            "client_id", "log_date", "meal_plan_id",
+            name="uq_nutrition_day_rollups_client_date_plan",
+        ),
+    )
+    op.create_index("ix_nutrition_day_rollups_workspace_id", "nutrition_day_rollups", ["workspace_id"])
+    op.create_index("ix_nutrition_day_rollups_meal_plan_id", "nutrition_day_rollups", ["meal_plan_id"])
+
+    # Backfill de referencias: una pasada por plan con logs.
+    conn = op.get_bind()
+    plans = conn.execute(sa.text(
+        "SELECT mp.id, mp.plan, mp.created_at, mp.duration_weeks FROM meal_plans mp "
+        "WHERE EXISTS (SELECT 1 FROM nutrition_logs nl WHERE nl.meal_plan_id = mp.id)"
+    )).fetchall()
+    for plan_id, plan, created_at, duration_weeks in plans:
+        logs = conn.execute(
+            sa.text("SELECT id, log_date, meal_name, foods FROM nutrition_logs WHERE meal_plan_id = :pid"),
+            {"pid": plan_id},
+        ).fetchall()
+        start: date = created_at.date() if created_at else None
+        for log_id, log_date, meal_name, foods in logs:
+            plan_ref = plan_meal_reference(plan, meal_name, log_date, start, duration_weeks or 1)
+            if plan_ref is None:
+                continue
+            conn.execute(
+                sa.text(
+                    "UPDATE nutrition_logs SET plan_reference = :ref, has_modifications = :mods "
+                    "WHERE id = :id"
+                ),
+                {
+                    "ref": sa.type_coerce(plan_ref, postgresql.JSONB),
+                    "mods": has_modifications(foods or [], plan_ref),
+                    "id": log_id,
+                },
+            )
+
+    op.execute(
+        """
+        INSERT INTO nutrition_day_rollups (
+            workspace_id, client_id, meal_plan_id, log_date, meals_logged,
+            logged_calories, logged_protein, logged_carbs, logged_fat,
+            planned_calories, planned_protein, planned_carbs, planned_fat,
+            has_modifications
+        )
+        SELECT
+            workspace_id, client_id, meal_plan_id, log_date, count(*),
+            coalesce(sum(total_calories), 0),
+            round(coalesce(sum(total_protein), 0)::numeric, 1)::float,
+            round(coalesce(sum(total_carbs), 0)::numeric, 1)::float,
+            round(coalesce(sum(total_fat), 0)::numeric, 1)::float,
+            round(coalesce(sum((plan_reference->>'calories')::float), 0))::int,
+            round(coalesce(sum((plan_reference->>'protein')::float), 0)::numeric, 1)::float,
+            round(coalesce(sum((plan_reference->>'carbs')::float), 0)::numeric, 1)::float,
+            round(coalesce(sum((plan_reference->>'fat')::float), 0)::numeric, 1)::float,
+            bool_or(has_modifications)
+        FROM nutrition_logs
+        WHERE meal_plan_id IS NOT NULL
+        GROUP BY workspace_id, client_id, meal_plan_id, log_date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_nutrition_day_rollups_meal_plan_id", table_name="nutrition_day_rollups")
+    op.drop_index("ix_nutrition_day_rollups_workspace_id", table_name="nutrition_day_rollups")
+    op.drop_table("nutrition_day_rollups")
+    op.drop_column("nutrition_logs", "has_modifications")
+    op.drop_column("nutrition_logs", "plan_reference")
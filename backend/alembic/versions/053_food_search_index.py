@@ -0,0 +1,72 @@
+"""Trigram search index on foods.
+
+Revision ID: 053
+Revises: 052
+Create Date: 2026-10-16
+
+El buscador de alimentos hacía ``unaccent(name) ILIKE '%term%'`` más un
+``count(*)`` aparte: un seq scan de ~70k filas en cada pulsación. Ahora
+Postgres mantiene ``foods.search_text`` (nombre + marca + nombre genérico,
+en minúsculas y sin tildes) como columna generada, con un índice GIN
+``gin_trgm_ops`` que sirve tanto el ``LIKE`` por subcadena como la búsqueda
+tolerante a erratas de pg_trgm. ``unaccent()`` no es IMMUTABLE, así que se
+envuelve en ``public.f_unaccent``.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "053"
+down_revision = "052"
+branch_labels = None
+depends_on = None
+
+
+# Copias congeladas de app.models.nutrition en esta revisión.
+F_UNACCENT_DDL = """
+DO $do$
+DECLARE ext_schema text;
+BEGIN
+    SELECT n.nspname INTO ext_schema
+    FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace
+    WHERE e.extname = 'unaccent';
+    EXECUTE format(
+        $f$CREATE OR REPLACE FUNCTION public.f_unaccent(text) RETURNS text
+           LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+           AS $body$ SELECT %I.unaccent(%L::regdictionary, $1) $body$$f$,
+        ext_schema, ext_schema || '.unaccent'
+    );
+END
+$do$
+"""
+
+FOOD_SEARCH_TEXT_SQL = (
+    "lower(public.f_unaccent("
+    "coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(generic_name, '')"
+    "))"
+)
+
+
+def upgrade() -> None:
+    op.execute('CREATE EXTENSION IF NOT EXISTS "pg_trgm"')
+    op.execute(F_UNACCENT_DDL)
+    op.add_column(
+        "foods",
+        sa.Column("search_text", sa.Text(), sa.Computed(FOOD_SEARCH_TEXT_SQL, persisted=True)),
+    )
+    op.create_index(
+        "ix_foods_search_text_trgm",
+        "foods",
+        ["search_text"],
+        postgresql_using="gin",
+        postgresql_ops={"search_text": "gin_trgm_ops"},
+    )
+    op.create_index("ix_foods_name_id", "foods", ["name", "id"])
+    op.execute("ANALYZE foods")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_foods_name_id", table_name="foods")
+    op.drop_index("ix_foods_search_text_trgm", table_name="foods")
+    op.drop_column("foods", "search_text")
+    op.execute("DROP FUNCTION IF EXISTS public.f_unaccent(text)")
@@ -0,0 +1,40 @@
+"""Indexes for the catalog snapshot change probe.
+
+Revision ID: 054
+Revises: 053
+Create Date: 2026-10-17
+
+Cada worker guarda en memoria los alimentos y ejercicios globales
+(``app.services.catalog_snapshot``) y cada minuto pregunta
+``count(*), max(updated_at) WHERE is_global`` para traer sólo lo que ha
+cambiado. Con un índice parcial sobre ``updated_at`` esa consulta y la de
+deltas son index-only y no recorren la tabla.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "054"
+down_revision = "053"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_foods_global_updated_at",
+        "foods",
+        ["updated_at"],
+        postgresql_where=sa.text("is_global IS TRUE"),
+    )
+    op.create_index(
+        "ix_exercises_global_updated_at",
+        "exercises",
+        ["updated_at"],
+        postgresql_where=sa.text("is_global IS TRUE"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exercises_global_updated_at", table_name="exercises")
+    op.drop_index("ix_foods_global_updated_at", table_name="foods")
@@ -0,0 +1,94 @@
+"""Create calendar_sync_outbox.
+
+Revision ID: 055
+Revises: 054
+Create Date: 2026-10-17
+
+Crear, editar o cancelar un booking esperaba hasta dos round-trips a la API
+de Google Calendar antes de responder. Ahora la petición sólo escribe una
+fila en esta tabla (en la misma transacción que el booking) y un worker de
+Celery las procesa por usuario, agrupadas en peticiones batch de Google, con
+reintentos y backoff (``app.services.calendar_sync``).
+
+El índice único parcial sobre (booking_id, user_id) de las filas
+``pending`` es el que fusiona las ediciones seguidas de un mismo booking.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "055"
+down_revision = "054"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "calendar_sync_outbox",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "workspace_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workspaces.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "user_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("users.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("booking_id", postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column("action", sa.String(10), nullable=False),
+        sa.Column("google_event_id", sa.String(255), nullable=True),
+        sa.Column("google_calendar_id", sa.String(255), nullable=True),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index(
+        "uq_calendar_sync_outbox_pending",
+        "calendar_sync_outbox",
+        ["booking_id", "user_id"],
+        unique=True,
+        postgresql_where=sa.text("status = 'pending'"),
+    )
+    op.create_index(
+        "ix_calendar_sync_outbox_due", "calendar_sync_outbox", ["status", "next_attempt_at"]
+    )
+    op.create_index(
+        "ix_calendar_sync_outbox_user_status", "calendar_sync_outbox", ["user_id", "status"]
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_calendar_sync_outbox_user_status", table_name="calendar_sync_outbox")
+    op.drop_index("ix_calendar_sync_outbox_due", table_name="calendar_sync_outbox")
+    op.drop_index("uq_calendar_sync_outbox_pending", table_name="calendar_sync_outbox")
+    op.drop_table("calendar_sync_outbox")
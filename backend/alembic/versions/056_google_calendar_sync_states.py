@@ -0,0 +1,68 @@
+"""Create google_calendar_sync_states.
+
+Revision ID: 056
+Revises: 055
+Create Date: 2026-10-17
+
+La vista de eventos de Google descargaba entera, calendario a calendario,
+la ventana pedida en cada consulta. Esta tabla guarda por calendario el
+``nextSyncToken`` de Google y la copia local de sus eventos, para pedir
+sólo los cambios (``GoogleCalendarService.get_all_user_events``).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "056"
+down_revision = "055"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "google_calendar_sync_states",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "token_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("google_calendar_tokens.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("calendar_id", sa.String(255), nullable=False),
+        sa.Column("calendar_name", sa.String(255), nullable=True),
+        sa.Column("sync_token", sa.Text(), nullable=True),
+        sa.Column("window_start", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("window_end", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "events",
+            postgresql.JSONB(),
+            nullable=False,
+            server_default=sa.text("'{}'::jsonb"),
+        ),
+        sa.Column("checked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("full_synced_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.UniqueConstraint("token_id", "calendar_id", name="uq_google_calendar_sync_states_calendar"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("google_calendar_sync_states")
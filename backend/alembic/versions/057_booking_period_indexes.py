@@ -0,0 +1,83 @@
+"""GiST period indexes and overlap exclusion for bookings/appointments.
+
+Revision ID: 057
+Revises: 056
+Create Date: 2026-10-17
+
+Las comprobaciones de solape (crear reserva, huecos libres del portal,
+disponibilidad de citas) filtraban con ``start_time < x AND end_time > y``,
+que un B-tree sólo puede resolver por uno de los dos extremos. Con
+``btree_gist`` se indexa ``(workspace_id, tstzrange(start_time, end_time))``
+y el motor de disponibilidad (``app.services.availability``) consulta con
+``&&``.
+
+Además, una restricción de exclusión impide en Postgres que un mismo
+organizador tenga dos reservas activas solapadas (antes sólo lo comprobaba
+la API, con carrera entre peticiones simultáneas).
+
+La migración no modifica datos: si hay reservas o citas con fin anterior al
+inicio, o reservas activas solapadas del mismo organizador, falla listando
+las filas afectadas. Hay que corregirlas y volver a lanzarla.
+"""
+import sqlalchemy as sa
+from alembic import op
+
+
+revision = "057"
+down_revision = "056"
+branch_labels = None
+depends_on = None
+
+
+PERIOD = "tstzrange(start_time, end_time)"
+
+
+_SAMPLE = 20
+
+
+def _check(sql: str, problem: str) -> None:
+    rows = op.get_bind().execute(sa.text(sql)).fetchall()
+    if rows:
+        listed = "\n".join("  " + ", ".join(str(v) for v in row) for row in rows[:_SAMPLE])
+        more = f"\n  ... y {len(rows) - _SAMPLE} más" if len(rows) > _SAMPLE else ""
+        raise RuntimeError(f"057: {problem} ({len(rows)}). Corrígelas y vuelve a lanzar la migración:\n{listed}{more}")
+
+
+def upgrade() -> None:
+    # tstzrange() falla con fin < inicio y la restricción no se puede crear
+    # con solapes: se comprueban antes, sin tocar los datos.
+    for table in ("bookings", "appointments"):
+        _check(
+            f"SELECT id, start_time, end_time FROM {table} WHERE end_time < start_time ORDER BY start_time",
+            f"hay filas de {table} con end_time anterior a start_time",
+        )
+    _check(
+        """
+        SELECT a.organizer_id, a.id, b.id, a.start_time
+        FROM bookings a
+        JOIN bookings b ON b.organizer_id = a.organizer_id AND b.id > a.id
+        WHERE a.status IN ('pending', 'confirmed')
+          AND b.status IN ('pending', 'confirmed')
+          AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time)
+        ORDER BY a.organizer_id, a.start_time
+        """,
+        "hay reservas activas solapadas del mismo organizador (organizer_id, reserva, reserva, inicio)",
+    )
+
+    op.execute('CREATE EXTENSION IF NOT EXISTS "btree_gist"')
+    for table in ("bookings", "appointments"):
+        op.create_check_constraint(f"ck_{table}_period", table, "end_time >= start_time")
+        op.execute(f"CREATE INDEX ix_{table}_workspace_period ON {table} USING gist (workspace_id, {PERIOD})")
+
+    op.execute(f"""
+        ALTER TABLE bookings ADD CONSTRAINT ex_bookings_organizer_overlap
+            EXCLUDE USING gist (organizer_id WITH =, {PERIOD} WITH &&)
+            WHERE (organizer_id IS NOT NULL AND status IN ('pending', 'confirmed'))
+    """)
+
+
+def downgrade() -> None:
+    op.execute("ALTER TABLE bookings DROP CONSTRAINT IF EXISTS ex_bookings_organizer_overlap")
+    for table in ("appointments", "bookings"):
+        op.drop_index(f"ix_{table}_workspace_period", table_name=table)
+        op.drop_constraint(f"ck_{table}_period", table, type_="check")
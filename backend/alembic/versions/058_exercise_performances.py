@@ -0,0 +1,169 @@
+"""Create exercise_performances and backfill it from workout_logs.
+
+Revision ID: 058
+Revises: 057
+Create Date: 2026-10-17
+
+El historial de un ejercicio cargaba los últimos 50 ``workout_logs`` del
+cliente y buscaba el ejercicio dentro del JSONB en Python (y se quedaba
+corto con quien entrena mucho). Cada log escribe ahora una fila por
+ejercicio en ``exercise_performances`` con sus series y cifras de la sesión,
+indexada por (client_id, exercise_id, performed_at).
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "058"
+down_revision = "057"
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+
+
+# Copia congelada de app.services.exercise_performance en esta revisión: la
+# migración no debe cambiar si cambia el servicio.
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _summarize(entry):
+    set_count = total_reps = 0
+    volume = 0.0
+    top_weight = best_e1rm = None
+    for s in entry.get("sets") or []:
+        if not isinstance(s, dict) or s.get("completed") is False:
+            continue
+        set_count += 1
+        weight = _number(s.get("weight_kg", s.get("weight")))
+        reps = _number(s.get("reps_completed", s.get("reps")))
+        reps = int(reps) if reps and reps > 0 else 0
+        total_reps += reps
+        if weight is None or weight <= 0:
+            continue
+        volume += weight * reps
+        top_weight = weight if top_weight is None else max(top_weight, weight)
+        if reps:
+            # Epley; una serie de 1 es su propio 1RM
+            e1rm = weight if reps == 1 else weight * (1 + reps / 30)
+            best_e1rm = e1rm if best_e1rm is None else max(best_e1rm, e1rm)
+    return {
+        "set_count": set_count,
+        "total_reps": total_reps,
+        "total_volume_kg": round(volume, 2),
+        "top_weight_kg": top_weight,
+        "best_e1rm_kg": round(best_e1rm, 2) if best_e1rm is not None else None,
+    }
+
+
+def rows_for(log_id, client_id, performed_at, log):
+    rows = []
+    exercises = (log or {}).get("exercises") or []
+    for position, entry in enumerate(exercises):
+        if not isinstance(entry, dict) or not entry.get("exercise_id"):
+            continue
+        rows.append({
+            "workout_log_id": log_id,
+            "client_id": client_id,
+            "exercise_id": str(entry["exercise_id"])[:64],
+            "exercise_name": (entry.get("exercise_name") or entry.get("name") or None),
+            "performed_at": performed_at,
+            "position": position,
+            "entry": entry,
+            **_summarize(entry),
+        })
+    return rows
+
+
+def upgrade() -> None:
+    op.create_table(
+        "exercise_performances",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "workout_log_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workout_logs.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "client_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("clients.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("exercise_id", sa.String(64), nullable=False),
+        sa.Column("exercise_name", sa.String(255), nullable=True),
+        sa.Column("performed_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("position", sa.Integer(), nullable=False),
+        sa.Column("entry", postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column("set_count", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_reps", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("total_volume_kg", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("top_weight_kg", sa.Float(), nullable=True),
+        sa.Column("best_e1rm_kg", sa.Float(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint("workout_log_id", "position", name="uq_exercise_performances_log_position"),
+    )
+    op.create_index("ix_exercise_performances_workout_log_id", "exercise_performances", ["workout_log_id"])
+    op.create_index(
+        "ix_exercise_performances_client_exercise_performed",
+        "exercise_performances",
+        ["client_id", "exercise_id", sa.text("performed_at DESC")],
+    )
+
+    # Backfill por lotes recorriendo workout_logs por id
+    performances = sa.table(
+        "exercise_performances",
+        sa.column("workout_log_id", postgresql.UUID(as_uuid=True)),
+        sa.column("client_id", postgresql.UUID(as_uuid=True)),
+        sa.column("exercise_id", sa.String),
+        sa.column("exercise_name", sa.String),
+        sa.column("performed_at", sa.DateTime(timezone=True)),
+        sa.column("position", sa.Integer),
+        sa.column("entry", postgresql.JSONB),
+        sa.column("set_count", sa.Integer),
+        sa.column("total_reps", sa.Integer),
+        sa.column("total_volume_kg", sa.Float),
+        sa.column("top_weight_kg", sa.Float),
+        sa.column("best_e1rm_kg", sa.Float),
+    )
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = (
+            "SELECT id, client_id, created_at, log FROM workout_logs "
+            "WHERE jsonb_typeof(log -> 'exercises') = 'array' "
+        )
+        params = {"batch": _BATCH}
+        if last_id is not None:
+            query += "AND id > :last_id "
+            params["last_id"] = last_id
+        logs = conn.execute(sa.text(query + "ORDER BY id LIMIT :batch"), params).fetchall()
+        if not logs:
+            break
+        rows = []
+        for log_id, client_id, created_at, log in logs:
+            rows.extend(rows_for(log_id, client_id, created_at, log))
+        if rows:
+            conn.execute(performances.insert(), rows)
+        last_id = logs[-1][0]
+
+
+def downgrade() -> None:
+    op.drop_index("ix_exercise_performances_client_exercise_performed", table_name="exercise_performances")
+    op.drop_index("ix_exercise_performances_workout_log_id", table_name="exercise_performances")
+    op.drop_table("exercise_performances")
@@ -0,0 +1,144 @@
+"""Add best-set columns to exercise_performances and create exercise_weekly_stats.
+
+Revision ID: 059
+Revises: 058
+Create Date: 2026-10-17
+
+Récords personales y progresión por ejercicio para la vista del entrenador.
+Cada fila de ``exercise_performances`` guarda ahora la serie con mejor 1RM
+estimado y ``exercise_weekly_stats`` agrega por cliente, ejercicio y semana
+(sesiones, series, repeticiones, tonelaje, peso máximo, mejor serie); se
+recalcula sólo la semana que toca cada registro de entrenamiento.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "059"
+down_revision = "058"
+branch_labels = None
+depends_on = None
+
+_BATCH = 1000
+
+
+# Copia congelada de app.services.exercise_performance.summarize (sólo la
+# mejor serie) en esta revisión.
+
+def _number(value):
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def best_set(entry):
+    """(peso, repeticiones) de la serie con mejor 1RM estimado, o (None, None)."""
+    best_e1rm, best = None, (None, None)
+    for s in entry.get("sets") or []:
+        if not isinstance(s, dict) or s.get("completed") is False:
+            continue
+        weight = _number(s.get("weight_kg", s.get("weight")))
+        reps = _number(s.get("reps_completed", s.get("reps")))
+        reps = int(reps) if reps and reps > 0 else 0
+        if weight is None or weight <= 0 or not reps:
+            continue
+        # Epley; una serie de 1 es su propio 1RM
+        e1rm = weight if reps == 1 else weight * (1 + reps / 30)
+        if best_e1rm is None or e1rm > best_e1rm:
+            best_e1rm, best = e1rm, (weight, reps)
+    return best
+
+
+def upgrade() -> None:
+    op.add_column("exercise_performances", sa.Column("best_set_weight_kg", sa.Float(), nullable=True))
+    op.add_column("exercise_performances", sa.Column("best_set_reps", sa.Integer(), nullable=True))
+
+    # Mejor serie de las filas existentes (sólo las que tienen 1RM estimado)
+    conn = op.get_bind()
+    last_id = None
+    while True:
+        query = "SELECT id, entry FROM exercise_performances WHERE best_e1rm_kg IS NOT NULL "
+        params = {"batch": _BATCH}
+        if last_id is not None:
+            query += "AND id > :last_id "
+            params["last_id"] = last_id
+        rows = conn.execute(sa.text(query + "ORDER BY id LIMIT :batch"), params).fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, entry in rows:
+            weight, reps = best_set(entry or {})
+            updates.append({"row_id": row_id, "weight": weight, "reps": reps})
+        conn.execute(
+            sa.text(
+                "UPDATE exercise_performances SET best_set_weight_kg = :weight, best_set_reps = :reps "
+                "WHERE id = :row_id"
+            ),
+            updates,
+        )
+        last_id = rows[-1][0]
+
+    op.create_table(
+        "exercise_weekly_stats",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "client_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("clients.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("exercise_id", sa.String(64), nullable=False),
+        sa.Column("week_start", sa.Date(), nullable=False),
+        sa.Column("exercise_name", sa.String(255), nullable=True),
+        sa.Column("sessions", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("sets", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("reps", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("volume_kg", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("top_weight_kg", sa.Float(), nullable=True),
+        sa.Column("best_e1rm_kg", sa.Float(), nullable=True),
+        sa.Column("best_set_weight_kg", sa.Float(), nullable=True),
+        sa.Column("best_set_reps", sa.Integer(), nullable=True),
+        sa.Column("best_set_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint(
+            "client_id", "exercise_id", "week_start",
+            name="uq_exercise_weekly_stats_client_exercise_week",
+        ),
+    )
+
+    op.execute(
+        """
+        INSERT INTO exercise_weekly_stats (
+            client_id, exercise_id, week_start, exercise_name,
+            sessions, sets, reps, volume_kg, top_weight_kg, best_e1rm_kg,
+            best_set_weight_kg, best_set_reps, best_set_at
+        )
+        SELECT
+            client_id, exercise_id,
+            date_trunc('week', timezone('UTC', performed_at))::date,
+            max(exercise_name),
+            count(DISTINCT workout_log_id), sum(set_count), sum(total_reps),
+            sum(total_volume_kg), max(top_weight_kg), max(best_e1rm_kg),
+            (array_agg(best_set_weight_kg ORDER BY best_e1rm_kg DESC NULLS LAST, performed_at))[1],
+            (array_agg(best_set_reps ORDER BY best_e1rm_kg DESC NULLS LAST, performed_at))[1],
+            (array_agg(performed_at ORDER BY best_e1rm_kg DESC NULLS LAST, performed_at))[1]
+        FROM exercise_performances
+        GROUP BY client_id, exercise_id, date_trunc('week', timezone('UTC', performed_at))::date
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("exercise_weekly_stats")
+    op.drop_column("exercise_performances", "best_set_reps")
+    op.drop_column("exercise_performances", "best_set_weight_kg")
@@ -0,0 +1,147 @@
+"""Create verifactu_submissions and invoice_settings.verifactu_next_send_at.
+
+Revision ID: 060
+Revises: 059
+Create Date: 2026-10-17
+
+Finalizar una factura esperaba una llamada SOAP bloqueante a AEAT (hasta
+30 s, dentro del event loop) con un registro por envío. Ahora la petición
+sólo escribe una fila en esta tabla y un worker de Celery envía los
+registros de cada workspace y serie en orden, hasta 1000 por
+RegFactuSistemaFacturacion, respetando el TiempoEsperaEnvio que devuelve
+AEAT (``invoice_settings.verifactu_next_send_at``) y guardando el resultado
+de cada RespuestaLinea en su factura (``app.services.verifactu_queue``).
+
+Las facturas que quedaron ``pending`` con el envío en línea (p. ej. por un
+error de red) se encolan aquí, en orden de registro.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "060"
+down_revision = "059"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "invoice_settings",
+        sa.Column("verifactu_next_send_at", sa.DateTime(timezone=True), nullable=True),
+    )
+    op.create_table(
+        "verifactu_submissions",
+        sa.Column(
+            "id",
+            postgresql.UUID(as_uuid=True),
+            primary_key=True,
+            server_default=sa.text("gen_random_uuid()"),
+        ),
+        sa.Column(
+            "workspace_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workspaces.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column(
+            "invoice_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("invoices.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("series", sa.String(), nullable=False),
+        sa.Column("chain_position", sa.BigInteger(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False, server_default="pending"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "next_attempt_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column("last_error", sa.Text(), nullable=True),
+        sa.Column("processed_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+    op.create_index(
+        "uq_verifactu_submissions_open",
+        "verifactu_submissions",
+        ["invoice_id"],
+        unique=True,
+        postgresql_where=sa.text("status IN ('pending', 'processing')"),
+    )
+    op.create_index(
+        "ix_verifactu_submissions_queue",
+        "verifactu_submissions",
+        ["workspace_id", "series", "status", "chain_position"],
+    )
+    op.create_index(
+        "ix_verifactu_submissions_due", "verifactu_submissions", ["status", "next_attempt_at"]
+    )
+
+    # Orden de encadenamiento: fecha de registro (truncada a segundos) y,
+    # en caso de empate, la profundidad en la cadena de las pendientes
+    # (una factura va después de aquella cuya huella encadena). Las
+    # posiciones quedan en (-n, 0], antes de cualquier registro encolado
+    # después (InvoiceChainHead.records, desde 1).
+    op.execute(
+        """
+        WITH RECURSIVE pending AS (
+            SELECT i.id, i.workspace_id, COALESCE(i.invoice_series, 'F') AS series,
+                   i.verifactu_hash, i.verifactu_prev_hash,
+                   COALESCE(i.verifactu_registration_datetime, i.created_at, now()) AS registered_at
+            FROM invoices i
+            JOIN invoice_settings s ON s.workspace_id = i.workspace_id
+            WHERE i.verifactu_status = 'pending'
+              AND i.verifactu_hash IS NOT NULL
+              AND s.verifactu_enabled
+              AND s.verifactu_mode IN ('direct_aeat_test', 'direct_aeat_prod')
+        ),
+        depth AS (
+            SELECT p.id, p.workspace_id, p.series, p.verifactu_hash, 0 AS depth
+            FROM pending p
+            WHERE NOT EXISTS (
+                SELECT 1 FROM pending q
+                WHERE q.workspace_id = p.workspace_id
+                  AND q.series = p.series
+                  AND q.verifactu_hash = p.verifactu_prev_hash
+            )
+            UNION ALL
+            SELECT p.id, p.workspace_id, p.series, p.verifactu_hash, d.depth + 1
+            FROM depth d
+            JOIN pending p ON p.workspace_id = d.workspace_id
+                          AND p.series = d.series
+                          AND p.verifactu_prev_hash = d.verifactu_hash
+        )
+        INSERT INTO verifactu_submissions (workspace_id, invoice_id, series, chain_position, created_at)
+        SELECT p.workspace_id, p.id, p.series,
+               row_number() OVER (
+                   PARTITION BY p.workspace_id, p.series
+                   ORDER BY p.registered_at, d.depth, p.id
+               ) - count(*) OVER (PARTITION BY p.workspace_id, p.series),
+               p.registered_at
+        FROM pending p
+        JOIN (SELECT id, max(depth) AS depth FROM depth GROUP BY id) d ON d.id = p.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_verifactu_submissions_due", table_name="verifactu_submissions")
+    op.drop_index("ix_verifactu_submissions_queue", table_name="verifactu_submissions")
+    op.drop_index("uq_verifactu_submissions_open", table_name="verifactu_submissions")
+    op.drop_table("verifactu_submissions")
+    op.drop_column("invoice_settings", "verifactu_next_send_at")
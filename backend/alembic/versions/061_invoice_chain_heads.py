@@ -0,0 +1,67 @@
+"""Create invoice_chain_heads.
+
+Revision ID: 061
+Revises: 060
+Create Date: 2026-10-17
+
+La huella anterior de VeriFactu se leía con un ORDER BY ... LIMIT 1 sobre
+todas las facturas de la serie en cada finalización, y dos finalizaciones
+simultáneas podían encadenar con el mismo registro anterior. Ahora cada
+(workspace, serie) tiene una fila con la última huella que finalizar
+bloquea hasta el commit (``app.services.invoice_chain``).
+
+Se rellena con la última factura encadenada de cada serie, con el mismo
+orden que usaba la consulta anterior.
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision = "061"
+down_revision = "060"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "invoice_chain_heads",
+        sa.Column(
+            "workspace_id",
+            postgresql.UUID(as_uuid=True),
+            sa.ForeignKey("workspaces.id", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("series", sa.String(), primary_key=True),
+        sa.Column("last_hash", sa.String(), nullable=True),
+        sa.Column("last_invoice_number", sa.String(), nullable=True),
+        sa.Column("last_registered_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("records", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column(
+            "updated_at",
+            sa.DateTime(timezone=True),
+            nullable=False,
+            server_default=sa.func.now(),
+        ),
+    )
+
+    op.execute(
+        """
+        INSERT INTO invoice_chain_heads
+            (workspace_id, series, last_hash, last_invoice_number, last_registered_at, records)
+        SELECT DISTINCT ON (i.workspace_id, i.invoice_series)
+               i.workspace_id, i.invoice_series, i.verifactu_hash, i.invoice_number,
+               i.verifactu_registration_datetime,
+               COUNT(*) OVER (PARTITION BY i.workspace_id, i.invoice_series)
+        FROM invoices i
+        WHERE i.verifactu_hash IS NOT NULL
+          AND i.invoice_series IS NOT NULL
+        ORDER BY i.workspace_id, i.invoice_series,
+                 i.verifactu_registration_datetime DESC NULLS FIRST, i.created_at DESC NULLS FIRST
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("invoice_chain_heads")
@@ -10,7 +10,7 @@ from sqlalchemy import select, delete, and_, text
 import logging
 
 from app.core.database import get_db
-from app.core.security import verify_password
+from app.core import password_hashing
 from app.core.config import settings
 from app.models.user import User, UserRole, RoleType
 from app.models.client import Client
@@ -73,7 +73,7 @@ async def request_account_deletion(
     user = current_user.user
     
     # Verify password
-    if not user.password_hash or not verify_password(data.password, user.password_hash):
+    if not user.password_hash or not await password_hashing.verify_password(data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Contraseña incorrecta"
@@ -155,7 +155,7 @@ async def cancel_account_deletion(
     user = current_user.user
     
     # Verify password
-    if not user.password_hash or not verify_password(data.password, user.password_hash):
+    if not user.password_hash or not await password_hashing.verify_password(data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Contraseña incorrecta"
@@ -18,6 +18,7 @@ from app.models.resource import (
 )
 from app.models.stock import StockItem, StockMovement
 from app.models.client import Client
+from app.services import availability
 from app.middleware.auth import require_staff, CurrentUser
 
 logger = logging.getLogger(__name__)
@@ -112,64 +113,9 @@ async def _check_overlap(db: AsyncSession, workspace_id: UUID, start: datetime,
                           staff_id: UUID | None, box_id: UUID | None, machine_ids: list[UUID],
                           exclude_id: UUID | None = None):
     """Triple-lock: check staff, box, and machine availability."""
-    conflicts = []
-    time_filter = and_(
-        Appointment.workspace_id == workspace_id,
-        Appointment.status.notin_(["cancelled"]),
-        Appointment.start_time < end,
-        Appointment.end_time > start,
+    return await availability.appointment_conflicts(
+        db, workspace_id, start, end, staff_id, box_id, machine_ids, exclude_id
     )
-    if exclude_id:
-        time_filter = and_(time_filter, Appointment.id != exclude_id)
-
-    if staff_id:
-        count = await db.scalar(
-            select(func.count(Appointment.id)).where(time_filter, Appointment.staff_id == staff_id)
-        )
-        if count and count > 0:
-            conflicts.append({"type": "staff", "id": str(staff_id), "message": "El profesional ya tiene una cita en ese horario"})
-
-    if box_id:
-        count = await db.scalar(
-            select(func.count(Appointment.id)).where(time_filter, Appointment.box_id == box_id)
-        )
-        if count and count > 0:
-            conflicts.append({"type": "box", "id": str(box_id), "message": "El box/consulta ya está ocupado en ese horario"})
-
-    for mid in machine_ids:
-        count = await db.scalar(
-            select(func.count(Appointment.id))
-            .select_from(Appointment)
-            .join(appointment_machines, appointment_machines.c.appointment_id == Appointment.id)
-            .where(time_filter, appointment_machines.c.machine_id == mid)
-        )
-        if count and count > 0:
-            conflicts.append({"type": "machine", "id": str(mid), "message": f"La máquina está ocupada en ese horario"})
-
-    # Anchor rule: if a machine has fixed_box_id, that box is also blocked.
-    # Scope the lookup by workspace to avoid returning anchors from other tenants.
-    if machine_ids:
-        machines = (
-            await db.execute(
-                select(Machine).where(
-                    Machine.id.in_(machine_ids),
-                    Machine.workspace_id == workspace_id,
-                )
-            )
-        ).scalars().all()
-        for m in machines:
-            if m.fixed_box_id and m.fixed_box_id != box_id:
-                count = await db.scalar(
-                    select(func.count(Appointment.id)).where(time_filter, Appointment.box_id == m.fixed_box_id)
-                )
-                if count and count > 0:
-                    conflicts.append({
-                        "type": "box_anchor",
-                        "id": str(m.fixed_box_id),
-                        "message": f"El box asociado a la máquina '{m.name}' está ocupado",
-                    })
-
-    return conflicts
 
 
 @router.post("/check-availability")
@@ -15,12 +15,10 @@ from app.core.limiter import limiter
 
 from app.core.config import settings
 from app.core.cookies import set_refresh_cookie, clear_refresh_cookie, read_refresh_cookie
-from app.core import ttl_cache
+from app.core import password_hashing, ttl_cache
 from app.core.database import get_db
 from app.core.storage import resolve_url
 from app.core.security import (
-    get_password_hash,
-    verify_password,
     create_tokens,
     create_access_token,
     decode_refresh_token,
@@ -90,7 +88,7 @@ async def register(
         user = User(
             email=data.email.lower(),
             full_name=data.full_name,
-            password_hash=get_password_hash(data.password),
+            password_hash=await password_hashing.hash_password(data.password),
             email_verified=False,
             email_verification_token=verification_token,
             email_verification_sent_at=datetime.now(timezone.utc),
@@ -207,8 +205,9 @@ async def login(
         if not user:
             raise credentials_exception
         
-        # Verify password
-        if not user.password_hash or not verify_password(data.password, user.password_hash):
+        # Verify password (and upgrade hashes made with another work factor)
+        valid, new_hash = await password_hashing.verify_and_upgrade(data.password, user.password_hash)
+        if not valid:
             raise credentials_exception
         
         # Check if user is active
@@ -252,6 +251,10 @@ async def login(
                 workspace_id = str(first_role.workspace_id)
                 role = first_role.role.value
         
+        if new_hash is not None:
+            user.password_hash = new_hash
+            await db.commit()
+        
         # Create tokens
         access_token, refresh_token, expires_in = create_tokens(
             user_id=str(user.id),
@@ -325,7 +328,7 @@ async def get_me(
     """
     user = current_user.user
     cache_key = f"auth:me:{user.id}:{current_user.workspace_id}"
-    cached = ttl_cache.get(cache_key)
+    cached = await ttl_cache.aget(cache_key)
     if cached is not None:
         return cached
 
@@ -818,7 +821,7 @@ async def reset_password(
                 )
 
         try:
-            new_hash = get_password_hash(data.new_password)
+            new_hash = await password_hashing.hash_password(data.new_password)
         except ValueError as ve:
             logger.warning("reset_password: contraseña inválida para bcrypt: %s", ve)
             raise HTTPException(
@@ -908,7 +911,7 @@ async def change_email(
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
     # Verify password
-    if not verify_password(data.password, user.password_hash):
+    if not await password_hashing.verify_password(data.password, user.password_hash):
         raise HTTPException(status_code=400, detail="Contraseña incorrecta")
     
     # Check if new email is already in use
@@ -950,14 +953,14 @@ async def change_password(
         user = current_user.user
         
         # Verify current password
-        if not user.password_hash or not verify_password(data.current_password, user.password_hash):
+        if not user.password_hash or not await password_hashing.verify_password(data.current_password, user.password_hash):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="La contraseña actual es incorrecta"
             )
         
         # Update password
-        user.password_hash = get_password_hash(data.new_password)
+        user.password_hash = await password_hashing.hash_password(data.new_password)
         
         await db.commit()
         
@@ -1053,7 +1056,7 @@ async def register_client(
                     detail="Esta cuenta no está disponible. Contacta con soporte.",
                 )
 
-            if not existing_user.password_hash or not verify_password(
+            if not existing_user.password_hash or not await password_hashing.verify_password(
                 data.password, existing_user.password_hash
             ):
                 # Email correcto pero password incorrecto -> el usuario está
@@ -1200,7 +1203,7 @@ async def register_client(
             email=email_lc,
             full_name=full_name,
             phone=data.phone,
-            password_hash=get_password_hash(data.password),
+            password_hash=await password_hashing.hash_password(data.password),
             email_verified=False,
             email_verification_token=verification_token,
             email_verification_sent_at=datetime.now(timezone.utc),
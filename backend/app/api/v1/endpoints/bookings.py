@@ -3,7 +3,8 @@ from uuid import UUID
 from datetime import datetime, timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Query, BackgroundTasks
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_, or_, delete as sql_delete
+from sqlalchemy import select, and_, delete as sql_delete
+from sqlalchemy.exc import IntegrityError
 from pydantic import BaseModel
 
 from app.core.database import get_db
@@ -11,7 +12,7 @@ from app.models.booking import Booking, BookingStatus, SessionType, SessionModal
 from app.models.client import Client
 from app.models.google_calendar import CalendarSyncMapping
 from app.middleware.auth import require_workspace, require_staff, require_any_role, CurrentUser
-from app.services.google_calendar import google_calendar_service
+from app.services import availability, calendar_sync
 from app.services.notification_service import notify
 import logging
 
@@ -20,88 +21,6 @@ logger = logging.getLogger(__name__)
 router = APIRouter()
 
 
-# ============ GOOGLE CALENDAR SYNC HELPERS ============
-
-async def sync_booking_to_calendars(
-    booking: Booking,
-    db: AsyncSession,
-    organizer_id: Optional[UUID] = None,
-    client_id: Optional[UUID] = None
-):
-    """
-    Sincroniza un booking con Google Calendar de organizador y cliente.
-    Se ejecuta en background para no bloquear la respuesta.
-    """
-    # Obtener cliente si existe
-    client = None
-    if booking.client_id:
-        result = await db.execute(
-            select(Client).where(
-                Client.id == booking.client_id,
-                Client.workspace_id == booking.workspace_id,
-            )
-        )
-        client = result.scalar_one_or_none()
-    
-    # Sincronizar al calendario del organizador
-    if organizer_id:
-        try:
-            await google_calendar_service.sync_booking_to_google(
-                booking=booking,
-                user_id=organizer_id,
-                db=db,
-                client=client
-            )
-        except Exception as e:
-            logger.warning("Error sincronizando a Google Calendar del organizador: %s", e)
-    
-    # Sincronizar al calendario del cliente (si tiene cuenta conectada)
-    if client_id and client:
-        try:
-            await google_calendar_service.sync_booking_to_google(
-                booking=booking,
-                user_id=client_id,
-                db=db,
-                client=None  # No incluir al cliente como asistente en su propio calendario
-            )
-        except Exception as e:
-            logger.warning("Error sincronizando a Google Calendar del cliente: %s", e)
-
-
-async def delete_booking_from_calendars(
-    booking_id: UUID,
-    db: AsyncSession,
-    organizer_id: Optional[UUID] = None,
-    client_id: Optional[UUID] = None
-):
-    """
-    Elimina un booking de Google Calendar del organizador y cliente.
-    """
-    # Eliminar del calendario del organizador
-    if organizer_id:
-        try:
-            await google_calendar_service.delete_booking_from_google(
-                booking_id=booking_id,
-                user_id=organizer_id,
-                db=db
-            )
-            logger.info("Booking %s eliminado de Google Calendar del organizador", booking_id)
-        except Exception as e:
-            logger.warning("Error eliminando de Google Calendar del organizador: %s", e)
-    
-    # Eliminar del calendario del cliente
-    if client_id:
-        try:
-            await google_calendar_service.delete_booking_from_google(
-                booking_id=booking_id,
-                user_id=client_id,
-                db=db
-            )
-            logger.info("Booking %s eliminado de Google Calendar del cliente", booking_id)
-        except Exception as e:
-            logger.warning("Error eliminando de Google Calendar del cliente: %s", e)
-
-
 # ============ SCHEMAS ============
 
 class LocationSchema(BaseModel):
@@ -211,6 +130,24 @@ async def _notify_booking_parties(
         )
 
 
+async def _flush_or_conflict(db: AsyncSession) -> None:
+    """Flush, turning an organizer overlap (``ex_bookings_organizer_overlap``) into a 409.
+
+    The constraint closes the race between two requests that pass the
+    conflict check at the same time.
+    """
+    try:
+        await db.flush()
+    except IntegrityError as exc:
+        await db.rollback()
+        if availability.is_overlap_violation(exc):
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail="Ya existe una reserva en ese horario"
+            )
+        raise
+
+
 # ============ ENDPOINTS ============
 
 @router.get("", response_model=List[BookingResponse])
@@ -266,17 +203,10 @@ async def list_bookings(
     result = await db.execute(query)
     bookings = result.scalars().all()
     
-    # Sincronizar con Google Calendar si se solicita
+    # Sincronizar con Google Calendar si se solicita (en la cola del worker)
     if sync_calendar and bookings:
-        for booking in bookings:
-            try:
-                await sync_booking_to_calendars(
-                    booking=booking,
-                    db=db,
-                    organizer_id=booking.organizer_id
-                )
-            except Exception as e:
-                logger.warning("Error sincronizando booking %s: %s", booking.id, e)
+        await calendar_sync.enqueue_booking_sync(db, bookings)
+        await db.commit()
     
     return bookings
 
@@ -298,31 +228,10 @@ async def create_booking(
             detail="La hora de fin debe ser posterior a la hora de inicio"
         )
     
-    # Check for conflicts
-    result = await db.execute(
-        select(Booking).where(
-            and_(
-                Booking.workspace_id == current_user.workspace_id,
-                Booking.organizer_id == current_user.id,
-                Booking.status.in_([BookingStatus.pending, BookingStatus.confirmed]),
-                or_(
-                    and_(
-                        Booking.start_time <= data.start_time,
-                        Booking.end_time > data.start_time
-                    ),
-                    and_(
-                        Booking.start_time < data.end_time,
-                        Booking.end_time >= data.end_time
-                    ),
-                    and_(
-                        Booking.start_time >= data.start_time,
-                        Booking.end_time <= data.end_time
-                    )
-                )
-            )
-        )
-    )
-    if result.scalar_one_or_none():
+    # Check for conflicts (índice GiST sobre tstzrange(start_time, end_time))
+    if await availability.organizer_has_overlap(
+        db, current_user.workspace_id, current_user.id, data.start_time, data.end_time
+    ):
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Ya existe una reserva en ese horario"
@@ -360,16 +269,11 @@ async def create_booking(
         status=BookingStatus.confirmed
     )
     db.add(booking)
+    await _flush_or_conflict(db)
+    # Google Calendar se sincroniza en el worker, tras el commit
+    await calendar_sync.enqueue_booking_sync(db, [booking])
     await db.commit()
     await db.refresh(booking)
-    
-    # Sincronizar con Google Calendar en background
-    await sync_booking_to_calendars(
-        booking=booking,
-        db=db,
-        organizer_id=current_user.id,
-        client_id=data.client_id
-    )
 
     await _notify_booking_parties(
         db, booking,
@@ -457,16 +361,11 @@ async def update_booking(
             else:
                 setattr(booking, field, value)
     
+    await _flush_or_conflict(db)
+    # Sincronizar cambios con Google Calendar
+    await calendar_sync.enqueue_booking_sync(db, [booking])
     await db.commit()
     await db.refresh(booking)
-    
-    # Sincronizar cambios con Google Calendar
-    await sync_booking_to_calendars(
-        booking=booking,
-        db=db,
-        organizer_id=booking.organizer_id,
-        client_id=booking.client_id
-    )
 
     if data.status and data.status == BookingStatus.confirmed:
         await _notify_booking_parties(
@@ -515,17 +414,8 @@ async def delete_booking(
             detail="Reserva no encontrada"
         )
     
-    # Guardar IDs antes de eliminar
-    organizer_id = booking.organizer_id
-    client_id = booking.client_id
-    
-    # Eliminar de Google Calendar primero (esto también elimina los mappings)
-    await delete_booking_from_calendars(
-        booking_id=booking_id,
-        db=db,
-        organizer_id=organizer_id,
-        client_id=client_id
-    )
+    # Encolar el borrado en Google Calendar (la fila guarda el id del evento)
+    await calendar_sync.enqueue_booking_sync(db, [booking], action=calendar_sync.DELETE)
     
     # Eliminar cualquier mapping restante manualmente (por si quedaron sin eliminar)
     await db.execute(
@@ -582,16 +472,10 @@ async def cancel_booking(
             )
     
     booking.status = BookingStatus.cancelled
+    # Sincronizar cancelación con Google Calendar (actualiza el evento como cancelado)
+    await calendar_sync.enqueue_booking_sync(db, [booking])
     await db.commit()
     await db.refresh(booking)
-    
-    # Sincronizar cancelación con Google Calendar (actualiza el evento como cancelado)
-    await sync_booking_to_calendars(
-        booking=booking,
-        db=db,
-        organizer_id=booking.organizer_id,
-        client_id=booking.client_id
-    )
 
     await _notify_booking_parties(
         db, booking,
@@ -630,16 +514,10 @@ async def complete_booking(
         )
     
     booking.status = BookingStatus.completed
+    # Sincronizar estado con Google Calendar
+    await calendar_sync.enqueue_booking_sync(db, [booking])
     await db.commit()
     await db.refresh(booking)
-    
-    # Sincronizar estado con Google Calendar
-    await sync_booking_to_calendars(
-        booking=booking,
-        db=db,
-        organizer_id=booking.organizer_id,
-        client_id=booking.client_id
-    )
 
     await _notify_booking_parties(
         db, booking,
@@ -5,21 +5,21 @@ All data is filtered to only show what belongs to the authenticated client.
 """
 import copy
 import logging
-import re as _re
 from collections import defaultdict
 from datetime import date, datetime, timedelta
-from typing import List, Optional
+from typing import List, Literal, Optional
 from uuid import UUID
 
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from pydantic import BaseModel
 from sqlalchemy import and_, desc, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only
 from sqlalchemy.orm.attributes import flag_modified
 
 from app.core.database import get_db
 from app.core.parallel_db import parallel_queries
-from app.core import ttl_cache
+from app.core import realtime, ttl_cache
 from app.core.storage import (
     delete_workspace_file,
     generate_filename,
@@ -33,13 +33,15 @@ from app.models.booking import Booking
 from app.models.client import Client
 from app.models.exercise import ClientMeasurement, Exercise, ExerciseAlternative
 from app.models.message import Message
-from app.models.nutrition import Food, MealPlan, Recipe
+from app.models.nutrition import Food, MealPlan, NutritionLog, Recipe
 from app.models.user import RoleType, User, UserRole
 from app.models.workout import WorkoutLog, WorkoutProgram
 from app.models.workspace import Workspace
 from app.models.feedback import ClientDietFeedback, ClientEmotion, ClientFeedback, ClientWorkoutFeedback
 from app.models.payment import Payment, Subscription, SubscriptionStatus
 from app.models.document import Document
+from app.services import availability, catalog_snapshot, dashboard_snapshot, exercise_performance, meal_plan_macros, nutrition_logs, unread_counts
+from app.services.food_search import catalog_food_page, search_foods
 from app.services.notification_service import notify
 
 logger = logging.getLogger(__name__)
@@ -216,8 +218,8 @@ class NutritionLogCreate(BaseModel):
 
 
 class NutritionLogResponse(BaseModel):
-    """Nutrition log response (stored in MealPlan.adherence)."""
-    log_index: Optional[int] = None
+    """Nutrition log response (one row of ``nutrition_logs``)."""
+    id: Optional[UUID] = None
     date: str
     meal_name: str
     foods: List[dict]
@@ -401,65 +403,6 @@ async def _hydrate_workout_program(db: AsyncSession, program: WorkoutProgram) ->
     return program
 
 
-def _iter_meal_food_items(plan: dict | None):
-    """Yield every ``items[i]`` dict that represents a food entry in a meal
-    plan/executed_plan, regardless of weeks-vs-days layout."""
-    if not isinstance(plan, dict):
-        return
-    layouts: list[list] = []
-    weeks = plan.get("weeks")
-    if isinstance(weeks, list):
-        for week in weeks:
-            if isinstance(week, dict) and isinstance(week.get("days"), list):
-                layouts.append(week["days"])
-    days = plan.get("days")
-    if isinstance(days, list):
-        layouts.append(days)
-    for day_list in layouts:
-        for day in day_list:
-            if not isinstance(day, dict):
-                continue
-            for meal in day.get("meals") or []:
-                if not isinstance(meal, dict):
-                    continue
-                for item in meal.get("items") or []:
-                    if isinstance(item, dict):
-                        yield item
-
-
-def _collect_food_ids(*plans) -> set[str]:
-    """Collect every food_id referenced by the given meal plan blobs."""
-    ids: set[str] = set()
-    for plan in plans:
-        for item in _iter_meal_food_items(plan):
-            if item.get("type") and item.get("type") != "food":
-                continue
-            fid = item.get("food_id") or (item.get("food") or {}).get("id")
-            if fid:
-                ids.add(str(fid))
-    return ids
-
-
-def _apply_food_media(plan: dict | None, media: dict[str, str]) -> None:
-    """Mutate a meal plan in place adding image_url to each food item."""
-    if not isinstance(plan, dict) or not media:
-        return
-    for item in _iter_meal_food_items(plan):
-        if item.get("type") and item.get("type") != "food":
-            continue
-        fid = item.get("food_id") or (item.get("food") or {}).get("id")
-        if not fid:
-            continue
-        url = media.get(str(fid))
-        if not url:
-            continue
-        food = item.get("food")
-        if not isinstance(food, dict):
-            food = {"id": str(fid)}
-            item["food"] = food
-        food["image_url"] = url
-
-
 async def _fetch_food_media(db: AsyncSession, food_ids: set[str]) -> dict[str, str]:
     """Return ``{food_id: image_url}`` for the given ids."""
     if not food_ids:
@@ -482,18 +425,18 @@ async def _fetch_food_media(db: AsyncSession, food_ids: set[str]) -> dict[str, s
 
 async def _hydrate_meal_plan(db: AsyncSession, plan: MealPlan) -> MealPlan:
     """Refresh image_url for every food embedded in a meal plan."""
-    ids = _collect_food_ids(plan.plan, plan.executed_plan)
-    if not ids:
+    compiled = meal_plan_macros.get_compiled(plan)
+    if not compiled.food_ids:
         return plan
-    media = await _fetch_food_media(db, ids)
+    media = await _fetch_food_media(db, compiled.food_ids)
     if not media:
         return plan
     if plan.plan:
         plan.plan = copy.deepcopy(plan.plan)
-        _apply_food_media(plan.plan, media)
+        compiled.apply_food_media(plan.plan, media, "plan")
     if plan.executed_plan:
         plan.executed_plan = copy.deepcopy(plan.executed_plan)
-        _apply_food_media(plan.executed_plan, media)
+        compiled.apply_food_media(plan.executed_plan, media, "executed_plan")
     return plan
 
 
@@ -580,15 +523,35 @@ def _build_recent_activity(week_logs, latest_measurement=None) -> list[dict]:
 
 @router.get("/dashboard", response_model=ClientDashboardResponse)
 async def get_client_dashboard(
+    consistency: Literal["snapshot", "strong"] = Query(
+        "snapshot",
+        description="snapshot: serve the cached dashboard when it is current; strong: always rebuild",
+    ),
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
     """
     Get dashboard data for the authenticated client.
+
+    Served from the per-client snapshot (see ``app.services.dashboard_snapshot``);
+    a missing or stale snapshot, or ``consistency=strong``, rebuilds it with
+    the live fan-out.
     """
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
-    # These four SELECTs only depend on client.id and are independent from each
+    if consistency == "snapshot":
+        cached = await dashboard_snapshot.get(client.id)
+        if cached is not None:
+            return cached
+
+    response = await _build_client_dashboard(client)
+    dashboard_snapshot.store(client.id, response.model_dump(mode="json"))
+    return response
+
+
+async def _build_client_dashboard(client: Client) -> ClientDashboardResponse:
+    """Live dashboard: independent SELECTs fanned out over the pool."""
+    # These SELECTs only depend on client.id and are independent from each
     # other. Running them in parallel against the pool cuts the dashboard RT
     # from ~5 network round-trips to ~1.
     week_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
@@ -611,8 +574,13 @@ async def get_client_dashboard(
         WorkoutProgram.client_id == client_id,
         WorkoutProgram.is_template.is_(False),
     )
+    # Only the targets are shown; skip the plan templates.
     meal_plan_q = (
         select(MealPlan)
+        .options(load_only(
+            MealPlan.id, MealPlan.target_calories, MealPlan.target_protein,
+            MealPlan.target_carbs, MealPlan.target_fat,
+        ))
         .where(MealPlan.client_id == client_id)
         .order_by(desc(MealPlan.created_at))
         .limit(1)
@@ -632,12 +600,26 @@ async def get_client_dashboard(
         .limit(1)
     )
 
+    # Today's logged macros, summed in SQL over the indexed nutrition_logs.
+    nutrition_today_q = select(
+        func.coalesce(func.sum(NutritionLog.total_calories), 0),
+        func.coalesce(func.sum(NutritionLog.total_protein), 0),
+        func.coalesce(func.sum(NutritionLog.total_carbs), 0),
+        func.coalesce(func.sum(NutritionLog.total_fat), 0),
+    ).where(
+        NutritionLog.client_id == client_id,
+        NutritionLog.log_date == date.today(),
+    )
+
     async def _scalars(session, q):
         return (await session.execute(q)).scalars().all()
 
     async def _one(session, q):
         return (await session.execute(q)).scalar_one_or_none()
 
+    async def _row(session, q):
+        return (await session.execute(q)).one()
+
     (
         upcoming_bookings,
         week_logs,
@@ -645,6 +627,7 @@ async def get_client_dashboard(
         active_meal_plan,
         latest_measurement,
         first_measurement,
+        today_totals,
     ) = await parallel_queries(
         lambda s: _scalars(s, bookings_q),
         lambda s: _scalars(s, logs_q),
@@ -652,10 +635,10 @@ async def get_client_dashboard(
         lambda s: _one(s, meal_plan_q),
         lambda s: _one(s, latest_meas_q),
         lambda s: _one(s, first_meas_q),
+        lambda s: _row(s, nutrition_today_q),
     )
     
-    # Calculate nutrition totals from adherence logs
-    today = date.today().isoformat()
+    # Calculate nutrition totals from today's logs
     nutrition_totals = {
         "calories": {"current": 0, "target": float(active_meal_plan.target_calories or 2000) if active_meal_plan else 2000},
         "protein": {"current": 0, "target": float(active_meal_plan.target_protein or 140) if active_meal_plan else 140},
@@ -663,15 +646,11 @@ async def get_client_dashboard(
         "fats": {"current": 0, "target": float(active_meal_plan.target_fat or 70) if active_meal_plan else 70},
     }
     
-    # Get today's logs from adherence
-    if active_meal_plan and active_meal_plan.adherence:
-        logs = active_meal_plan.adherence.get("logs", [])
-        for log in logs:
-            if log.get("date") == today:
-                nutrition_totals["calories"]["current"] += log.get("total_calories", 0)
-                nutrition_totals["protein"]["current"] += log.get("total_protein", 0)
-                nutrition_totals["carbs"]["current"] += log.get("total_carbs", 0)
-                nutrition_totals["fats"]["current"] += log.get("total_fat", 0)
+    cal_today, protein_today, carbs_today, fat_today = today_totals
+    nutrition_totals["calories"]["current"] = int(cal_today)
+    nutrition_totals["protein"]["current"] = round(float(protein_today), 1)
+    nutrition_totals["carbs"]["current"] = round(float(carbs_today), 1)
+    nutrition_totals["fats"]["current"] = round(float(fat_today), 1)
     
     # Format next session
     next_session = None
@@ -823,20 +802,10 @@ async def get_my_exercises(
     """List exercises available for the client's workspace (for swap modal)."""
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
-    query = select(Exercise).where(
-        or_(
-            Exercise.workspace_id == client.workspace_id,
-            Exercise.is_global.is_(True)
-        )
+    exercises = await catalog_snapshot.list_exercises(
+        db, client.workspace_id, search=search, name_only=True, category=category,
     )
-    if search:
-        query = query.where(Exercise.name.ilike(f"%{search}%"))
-    if category:
-        query = query.where(Exercise.category == category)
-
-    result = await db.execute(query.order_by(Exercise.name).limit(limit))
-    exercises = result.scalars().all()
-    return [ExerciseListClientResponse.model_validate(e) for e in exercises]
+    return [ExerciseListClientResponse.model_validate(e) for e in exercises[:limit]]
 
 
 @router.get("/exercises/{exercise_id}/alternatives")
@@ -1329,6 +1298,8 @@ async def log_workout(
         log=data.log
     )
     db.add(log)
+    await db.flush()
+    await exercise_performance.record(db, log)
     await db.commit()
     await db.refresh(log)
     return log
@@ -1403,6 +1374,8 @@ async def create_detailed_workout_log(
         }
     )
     db.add(log)
+    await db.flush()
+    await exercise_performance.record(db, log)
     await db.commit()
     await db.refresh(log)
     return {"message": "Entrenamiento registrado correctamente", "id": str(log.id)}
@@ -1417,31 +1390,7 @@ async def get_exercise_history(
 ):
     """Get the last N workout logs containing a specific exercise."""
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
-
-    result = await db.execute(
-        select(WorkoutLog)
-        .where(WorkoutLog.client_id == client.id)
-        .order_by(desc(WorkoutLog.created_at))
-        .limit(50)
-    )
-    logs = result.scalars().all()
-
-    matching_logs = []
-    for log in logs:
-        log_data = log.log or {}
-        exercises = log_data.get("exercises", [])
-        for ex in exercises:
-            if ex.get("exercise_id") == exercise_id:
-                matching_logs.append({
-                    "date": log_data.get("date"),
-                    "exercise": ex,
-                    "log_id": str(log.id),
-                })
-                break
-        if len(matching_logs) >= limit:
-            break
-
-    return matching_logs
+    return await exercise_performance.history(db, client.id, exercise_id, limit)
 
 
 @router.get("/workouts/logs/today")
@@ -1553,18 +1502,19 @@ async def get_all_meal_plans(
     plans = result.scalars().all()
 
     if plans:
+        compiled = [meal_plan_macros.get_compiled(p) for p in plans]
         ids: set[str] = set()
-        for p in plans:
-            ids.update(_collect_food_ids(p.plan, p.executed_plan))
+        for c in compiled:
+            ids.update(c.food_ids)
         media = await _fetch_food_media(db, ids)
         if media:
-            for p in plans:
+            for p, c in zip(plans, compiled):
                 if p.plan:
                     p.plan = copy.deepcopy(p.plan)
-                    _apply_food_media(p.plan, media)
+                    c.apply_food_media(p.plan, media, "plan")
                 if p.executed_plan:
                     p.executed_plan = copy.deepcopy(p.executed_plan)
-                    _apply_food_media(p.executed_plan, media)
+                    c.apply_food_media(p.executed_plan, media, "executed_plan")
     return plans
 
 
@@ -1819,81 +1769,53 @@ async def log_nutrition(
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Log food intake. Stores in the active meal plan's adherence field.
+    """Log food intake as one ``nutrition_logs`` row linked to the latest plan.
     If replace=true, overwrites existing log for the same date+meal_name."""
 
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
     
-    result = await db.execute(
+    meal_plan = await db.scalar(
         select(MealPlan)
         .where(MealPlan.client_id == client.id)
         .order_by(desc(MealPlan.created_at))
         .limit(1)
     )
-    meal_plan = result.scalar_one_or_none()
     
     if not meal_plan:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="No tienes un plan nutricional asignado"
         )
-    
-    current_adherence = dict(meal_plan.adherence) if meal_plan.adherence else {"logs": []}
-    if "logs" not in current_adherence:
-        current_adherence["logs"] = []
-    
-    total_calories = sum(f.get("calories", 0) for f in data.foods)
-    total_protein = sum(f.get("protein", 0) for f in data.foods)
-    total_carbs = sum(f.get("carbs", 0) for f in data.foods)
-    total_fat = sum(f.get("fat", 0) for f in data.foods)
-    
-    log_entry = {
-        "date": data.date,
-        "meal_name": data.meal_name,
-        "foods": data.foods,
-        "total_calories": int(total_calories),
-        "total_protein": round(total_protein, 1),
-        "total_carbs": round(total_carbs, 1),
-        "total_fat": round(total_fat, 1),
-        "notes": data.notes,
-        "satisfaction_rating": data.satisfaction_rating,
-        "logged_at": datetime.now().isoformat()
-    }
-    
-    existing_idx = next(
-        (i for i, log in enumerate(current_adherence["logs"])
-         if log.get("date") == data.date and log.get("meal_name") == data.meal_name),
-        None
-    )
-    
-    if existing_idx is not None:
-        if replace:
-            current_adherence["logs"][existing_idx] = log_entry
-        else:
-            raise HTTPException(
-                status_code=status.HTTP_409_CONFLICT,
-                detail=f"Ya has registrado {data.meal_name} para el día {data.date}"
-            )
-    else:
-        current_adherence["logs"].append(log_entry)
-    
-    meal_plan.adherence = current_adherence
-    flag_modified(meal_plan, "adherence")
-    
-    await db.commit()
-    await db.refresh(meal_plan)
-    
-    return NutritionLogResponse(
-        date=data.date,
+
+    try:
+        log_date = date.fromisoformat(data.date)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Fecha inválida, usa el formato YYYY-MM-DD"
+        )
+
+    log = await nutrition_logs.save_log(
+        db,
+        workspace_id=client.workspace_id,
+        client_id=client.id,
+        meal_plan=meal_plan,
+        log_date=log_date,
         meal_name=data.meal_name,
         foods=data.foods,
-        total_calories=int(total_calories),
-        total_protein=round(total_protein, 1),
-        total_carbs=round(total_carbs, 1),
-        total_fat=round(total_fat, 1),
         notes=data.notes,
-        satisfaction_rating=data.satisfaction_rating
+        satisfaction_rating=data.satisfaction_rating,
+        replace=replace,
     )
+    if log is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Ya has registrado {data.meal_name} para el día {data.date}"
+        )
+    
+    await db.commit()
+    
+    return NutritionLogResponse(**nutrition_logs.log_to_dict(log))
 
 
 @router.get("/nutrition/logs", response_model=List[NutritionLogResponse])
@@ -1903,50 +1825,18 @@ async def get_nutrition_logs(
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get nutrition logs from ALL client meal plans (active + inactive)."""
+    """Get the client's latest nutrition logs across all meal plans."""
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
-    
-    result = await db.execute(
-        select(MealPlan)
-        .where(MealPlan.client_id == client.id)
-        .order_by(desc(MealPlan.created_at))
-    )
-    meal_plans = result.scalars().all()
-    
-    if not meal_plans:
-        return []
-    
-    all_indexed: list = []
-    for mp in meal_plans:
-        if not mp.adherence:
-            continue
-        logs = mp.adherence.get("logs", [])
-        for i, l in enumerate(logs):
-            all_indexed.append((str(mp.id), i, l))
-    
+
+    on_date = None
     if date_filter:
-        all_indexed = [x for x in all_indexed if x[2].get("date") == date_filter]
-    
-    all_indexed = sorted(all_indexed, key=lambda x: x[2].get("logged_at", ""), reverse=True)[:limit]
-    
-    active_plan = next((mp for mp in meal_plans if mp.is_active), meal_plans[0] if meal_plans else None)
-    active_plan_id = str(active_plan.id) if active_plan else None
-    
-    return [
-        NutritionLogResponse(
-            log_index=idx if plan_id == active_plan_id else None,
-            date=log.get("date", ""),
-            meal_name=log.get("meal_name", ""),
-            foods=log.get("foods", []),
-            total_calories=log.get("total_calories", 0),
-            total_protein=log.get("total_protein", 0),
-            total_carbs=log.get("total_carbs", 0),
-            total_fat=log.get("total_fat", 0),
-            notes=log.get("notes"),
-            satisfaction_rating=log.get("satisfaction_rating")
-        )
-        for plan_id, idx, log in all_indexed
-    ]
+        try:
+            on_date = date.fromisoformat(date_filter)
+        except ValueError:
+            return []
+
+    logs = await nutrition_logs.fetch_logs(db, client.id, start=on_date, end=on_date, limit=limit)
+    return [NutritionLogResponse(**nutrition_logs.log_to_dict(log)) for log in logs]
 
 
 @router.get("/nutrition/history")
@@ -1955,166 +1845,58 @@ async def get_nutrition_history(
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get nutrition history for the last N days from ALL plans, grouped by plan then date."""
+    """Get nutrition history for the last N days from ALL plans, grouped by plan then date.
+
+    Reads the precomputed ``nutrition_day_rollups`` and the logs (with their
+    stored plan references) for the range; plan templates are not loaded.
+    """
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
     
     result = await db.execute(
-        select(MealPlan)
+        select(MealPlan.id, MealPlan.name, MealPlan.is_active, MealPlan.target_calories)
         .where(MealPlan.client_id == client.id)
         .order_by(desc(MealPlan.created_at))
     )
-    meal_plans = result.scalars().all()
+    meal_plans = result.all()
     
     if not meal_plans:
         return {"days": [], "plan_groups": [], "summary": {"total_days": 0, "avg_calories": 0}}
     
     end_date = date.today()
     start_date = end_date - timedelta(days=days)
-    
 
-    
-    def _safe_float(val, default=0.0):
-        if val is None:
-            return default
-        try:
-            return float(val)
-        except (ValueError, TypeError):
+    rollups_by_plan: dict = defaultdict(list)
+    for rollup in await nutrition_logs.fetch_day_rollups(db, client.id, start=start_date, end=end_date):
+        rollups_by_plan[rollup.meal_plan_id].append(rollup)
 
-            m = _re.search(r"[\d.]+", str(val))
-            return float(m.group()) if m else default
-
-    def _get_plan_days(mp_plan, week_num=None):
-        """Extract the days array from plan, supporting both old {days} and new {weeks} formats."""
-        if not mp_plan:
-            return []
-        if "weeks" in mp_plan:
-            weeks = mp_plan["weeks"]
-            if not weeks:
-                return []
-            if week_num is not None:
-                wk = next((w for w in weeks if w.get("week") == week_num), None)
-                return wk.get("days", []) if wk else []
-            return weeks[0].get("days", [])
-        return mp_plan.get("days", [])
-
-    def _calc_plan_meal_macros(mp_plan, meal_name, log_date_str, plan_start_date=None, duration_weeks=1):
-        """Calculate the planned macros for a given meal from the plan template."""
-        if not mp_plan:
-            return None
-        try:
-            d = date.fromisoformat(log_date_str)
-            plan_day_num = d.isoweekday()
-        except Exception:
-            return None
-
-        week_num = 1
-        if plan_start_date and duration_weeks and duration_weeks > 1:
-            try:
-                start = plan_start_date if isinstance(plan_start_date, date) else date.fromisoformat(str(plan_start_date))
-                delta_days = (d - start).days
-                week_num = (delta_days // 7) % duration_weeks + 1
-            except Exception:
-                week_num = 1
-
-        plan_days_list = _get_plan_days(mp_plan, week_num)
-        day_data = next((dd for dd in plan_days_list if dd.get("day") == plan_day_num), None)
-        if not day_data:
-            return None
-        meal_data = next((m for m in day_data.get("meals", []) if m.get("name") == meal_name), None)
-        if not meal_data:
-            return None
-        cal = prot = carb = fat = 0.0
-        plan_foods = []
-        for item in meal_data.get("items", []):
-            fd = item.get("food") or item.get("supplement") or {}
-            ss = _safe_float(fd.get("serving_size"), 100) or 100
-            qty = _safe_float(item.get("quantity_grams"), 0)
-            factor = qty / ss
-            ic = round(_safe_float(fd.get("calories")) * factor)
-            ip = round(_safe_float(fd.get("protein")) * factor, 1)
-            icb = round(_safe_float(fd.get("carbs")) * factor, 1)
-            ift = round(_safe_float(fd.get("fat")) * factor, 1)
-            cal += ic; prot += ip; carb += icb; fat += ift
-            plan_foods.append({
-                "name": fd.get("name", ""),
-                "calories": ic, "protein": ip, "carbs": icb, "fat": ift,
-                "quantity": qty,
-                "recipe_group": item.get("recipe_group"),
-            })
-        return {"calories": int(cal), "protein": round(prot, 1), "carbs": round(carb, 1), "fat": round(fat, 1), "foods": plan_foods}
+    meals_by_plan_day: dict = defaultdict(list)
+    if rollups_by_plan:
+        for row in await nutrition_logs.fetch_logs(db, client.id, start=start_date, end=end_date):
+            meals_by_plan_day[(row.meal_plan_id, row.log_date)].append(nutrition_logs.meal_entry(row))
 
     plan_groups = []
     all_days_data = defaultdict(lambda: {"meals": [], "totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "plan_totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "has_modifications": False})
     
     for mp in meal_plans:
-        if not mp.adherence:
-            continue
-        logs = mp.adherence.get("logs", [])
-        filtered = [
-            l for l in logs
-            if start_date.isoformat() <= l.get("date", "") <= end_date.isoformat()
-        ]
-        if not filtered:
+        rollups = rollups_by_plan.get(mp.id)
+        if not rollups:
             continue
         
-        mp_plan = mp.plan if mp.plan else {}
-        mp_start = mp.created_at.date() if mp.created_at else None
-        mp_dur_weeks = mp.duration_weeks if hasattr(mp, 'duration_weeks') and mp.duration_weeks else 1
-        plan_days = defaultdict(lambda: {"meals": [], "totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "plan_totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "has_modifications": False})
-        for log in filtered:
-            log_date = log.get("date", "")
-            meal_name = log.get("meal_name")
-            plan_ref = _calc_plan_meal_macros(mp_plan, meal_name, log_date, mp_start, mp_dur_weeks)
-
-            has_mods = False
-            if plan_ref:
-                logged_names = sorted([f.get("name", "") for f in log.get("foods", [])])
-                plan_names = sorted([f.get("name", "") for f in plan_ref.get("foods", [])])
-                has_mods = logged_names != plan_names
-
-            entry = {
-                "meal_name": meal_name,
-                "total_calories": log.get("total_calories", 0),
-                "total_protein": log.get("total_protein", 0),
-                "total_carbs": log.get("total_carbs", 0),
-                "total_fat": log.get("total_fat", 0),
-                "foods": log.get("foods", []),
-                "logged_at": log.get("logged_at"),
-                "notes": log.get("notes"),
-                "satisfaction_rating": log.get("satisfaction_rating"),
-                "plan_reference": plan_ref,
-                "has_modifications": has_mods,
-            }
-            plan_days[log_date]["meals"].append(entry)
-            plan_days[log_date]["totals"]["calories"] += entry["total_calories"]
-            plan_days[log_date]["totals"]["protein"] += entry["total_protein"]
-            plan_days[log_date]["totals"]["carbs"] += entry["total_carbs"]
-            plan_days[log_date]["totals"]["fat"] += entry["total_fat"]
-            if plan_ref:
-                plan_days[log_date]["plan_totals"]["calories"] += plan_ref["calories"]
-                plan_days[log_date]["plan_totals"]["protein"] += plan_ref["protein"]
-                plan_days[log_date]["plan_totals"]["carbs"] += plan_ref["carbs"]
-                plan_days[log_date]["plan_totals"]["fat"] += plan_ref["fat"]
-            if has_mods:
-                plan_days[log_date]["has_modifications"] = True
-            
-            all_days_data[log_date]["meals"].append(entry)
-            all_days_data[log_date]["totals"]["calories"] += entry["total_calories"]
-            all_days_data[log_date]["totals"]["protein"] += entry["total_protein"]
-            all_days_data[log_date]["totals"]["carbs"] += entry["total_carbs"]
-            all_days_data[log_date]["totals"]["fat"] += entry["total_fat"]
-            if plan_ref:
-                all_days_data[log_date]["plan_totals"]["calories"] += plan_ref["calories"]
-                all_days_data[log_date]["plan_totals"]["protein"] += plan_ref["protein"]
-                all_days_data[log_date]["plan_totals"]["carbs"] += plan_ref["carbs"]
-                all_days_data[log_date]["plan_totals"]["fat"] += plan_ref["fat"]
-            if has_mods:
-                all_days_data[log_date]["has_modifications"] = True
+        plan_days_list = []
+        for rollup in rollups:
+            log_date = rollup.log_date.isoformat()
+            meals = meals_by_plan_day.get((mp.id, rollup.log_date), [])
+            day = {"date": log_date, "meals": meals, **nutrition_logs.rollup_totals(rollup)}
+            plan_days_list.append(day)
+
+            agg = all_days_data[log_date]
+            agg["meals"].extend(meals)
+            for key in ("totals", "plan_totals"):
+                for macro, value in day[key].items():
+                    agg[key][macro] += value
+            if rollup.has_modifications:
+                agg["has_modifications"] = True
         
-        plan_days_list = [
-            {"date": d, **data}
-            for d, data in sorted(plan_days.items(), key=lambda x: x[0], reverse=True)
-        ]
         plan_groups.append({
             "plan_id": str(mp.id),
             "plan_name": mp.name,
@@ -2143,41 +1925,20 @@ async def get_nutrition_history(
     }
 
 
-@router.delete("/nutrition/logs/{log_index}", status_code=status.HTTP_204_NO_CONTENT)
+@router.delete("/nutrition/logs/{log_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_nutrition_log(
-    log_index: int,
+    log_id: UUID,
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Delete a nutrition log by index."""
+    """Delete one of the client's nutrition logs."""
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
     
-    result = await db.execute(
-        select(MealPlan)
-        .where(MealPlan.client_id == client.id)
-        .order_by(desc(MealPlan.created_at))
-        .limit(1)
-    )
-    meal_plan = result.scalar_one_or_none()
-    
-    if not meal_plan or not meal_plan.adherence:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No se encontró el registro"
-        )
-    
-    logs = meal_plan.adherence.get("logs", [])
-    
-    if log_index < 0 or log_index >= len(logs):
+    if not await nutrition_logs.delete_log(db, client.id, log_id):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Registro no encontrado"
         )
-    
-
-    logs.pop(log_index)
-    meal_plan.adherence = {"logs": logs}
-    flag_modified(meal_plan, "adherence")
     await db.commit()
 
 
@@ -2189,10 +1950,11 @@ async def search_foods_for_client(
     category: Optional[str] = None,
     page: int = Query(1, ge=1),
     page_size: int = Query(30, ge=1, le=100),
+    cursor: Optional[str] = None,
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Search foods available to the client (global + workspace foods)."""
+    """Search foods available to the client (global + workspace foods), best match first."""
     client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
     query = select(Food).where(
@@ -2202,22 +1964,21 @@ async def search_foods_for_client(
         )
     )
 
-    if search:
-        query = query.where(
-            func.unaccent(Food.name).ilike(func.unaccent(f"%{search}%"))
-        )
-
     if category:
         query = query.where(Food.category == category)
 
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query) or 0
-
-    offset = (page - 1) * page_size
-    query = query.order_by(Food.name).offset(offset).limit(page_size)
-
-    result = await db.execute(query)
-    foods = result.scalars().all()
+    result = None
+    if not (search or "").strip():
+        result = await catalog_food_page(
+            db, workspace_id=client.workspace_id, category=category,
+            page=page, page_size=page_size, cursor=cursor,
+        )
+    if result is None:
+        result = await search_foods(
+            db, query, search=search, page=page, page_size=page_size, cursor=cursor,
+        )
+    foods = result.items
+    total = result.total
 
     return {
         "items": [
@@ -2238,6 +1999,8 @@ async def search_foods_for_client(
             for f in foods
         ],
         "total": total,
+        "total_is_estimate": result.total_is_estimate,
+        "next_cursor": result.next_cursor,
         "page": page,
         "page_size": page_size,
     }
@@ -2687,6 +2450,16 @@ class ClientBookingCreate(BaseModel):
     notes: Optional[str] = None
 
 
+MAX_SLOT_RANGE_DAYS = 62
+
+
+def _parse_day(value: str):
+    try:
+        return datetime.strptime(value, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa YYYY-MM-DD")
+
+
 @router.get("/calendar/available-slots")
 async def get_available_slots(
     date: str = Query(..., description="Date in YYYY-MM-DD format"),
@@ -2694,68 +2467,40 @@ async def get_available_slots(
     db: AsyncSession = Depends(get_db)
 ):
     """Get available booking slots for a given date based on trainer weekly schedule."""
+    await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
+    target_date = _parse_day(date)
+    # Horario semanal menos festivos y reservas activas (que bloquean todo el
+    # intervalo que ocupan, no solo el hueco que empieza a la misma hora)
+    days = await availability.workspace_slots(db, current_user.workspace_id, target_date, target_date)
+    return days.get(target_date, [])
 
-    client = await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
-    ws_result = await db.execute(
-        select(Workspace).where(Workspace.id == current_user.workspace_id)
-    )
-    workspace = ws_result.scalar_one_or_none()
-    if not workspace:
-        return []
-
-    ws_settings = workspace.settings or {}
-    weekly_schedule = ws_settings.get("weekly_schedule", {})
-    booking_policies = ws_settings.get("booking_policies", {})
-    default_duration = booking_policies.get("default_duration", 60)
-
-    try:
-        target_date = datetime.strptime(date, "%Y-%m-%d").date()
-    except ValueError:
-        raise HTTPException(status_code=400, detail="Formato de fecha inválido. Usa YYYY-MM-DD")
-
-    day_names = ["monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday"]
-    day_name = day_names[target_date.weekday()]
-    day_slots = weekly_schedule.get(day_name, [])
+@router.get("/calendar/available-slots/range")
+async def get_available_slots_range(
+    start: str = Query(..., description="First day, YYYY-MM-DD"),
+    end: str = Query(..., description="Last day (inclusive), YYYY-MM-DD"),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db)
+):
+    """Available slots for every day of a week or month view in one request.
 
-    if not day_slots:
-        return []
+    Returns ``[{"date": "YYYY-MM-DD", "slots": [{"start", "end"}, ...]}, ...]``
+    with one entry per day, in order.
+    """
+    await get_client_for_user(current_user.id, db, current_user.workspace_id)
 
-    existing_result = await db.execute(
-        select(Booking).where(
-            Booking.workspace_id == current_user.workspace_id,
-            Booking.start_time >= datetime.combine(target_date, datetime.min.time()),
-            Booking.start_time <= datetime.combine(target_date, datetime.max.time()),
-            Booking.status.in_(["pending", "confirmed"])
-        )
-    )
-    existing_bookings = existing_result.scalars().all()
-    booked_times = set()
-    for b in existing_bookings:
-        booked_times.add(b.start_time.strftime("%H:%M"))
-
-    available = []
-    for slot_range in day_slots:
-        start_h, start_m = map(int, slot_range.get("start", "09:00").split(":"))
-        end_h, end_m = map(int, slot_range.get("end", "17:00").split(":"))
-        current_minutes = start_h * 60 + start_m
-        end_minutes = end_h * 60 + end_m
-
-        while current_minutes + default_duration <= end_minutes:
-            slot_start = datetime.combine(target_date, datetime.min.time()).replace(
-                hour=current_minutes // 60, minute=current_minutes % 60
-            )
-            time_str = f"{current_minutes // 60:02d}:{current_minutes % 60:02d}"
-            if time_str not in booked_times:
-                slot_end = slot_start + timedelta(minutes=default_duration)
-                available.append({
-                    "start": slot_start.isoformat(),
-                    "end": slot_end.isoformat(),
-                })
-            current_minutes += default_duration
+    first_day, last_day = _parse_day(start), _parse_day(end)
+    if last_day < first_day:
+        raise HTTPException(status_code=400, detail="La fecha final debe ser posterior a la inicial")
+    if (last_day - first_day).days >= MAX_SLOT_RANGE_DAYS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"El rango no puede superar {MAX_SLOT_RANGE_DAYS} días",
+        )
 
-    return available
+    days = await availability.workspace_slots(db, current_user.workspace_id, first_day, last_day)
+    return [{"date": day.isoformat(), "slots": slots} for day, slots in days.items()]
 
 
 @router.post("/calendar/bookings", status_code=status.HTTP_201_CREATED)
@@ -2784,15 +2529,10 @@ async def create_client_booking(
 
     end_time = start_time + timedelta(minutes=default_duration)
 
-    conflict_result = await db.execute(
-        select(Booking).where(
-            Booking.workspace_id == current_user.workspace_id,
-            Booking.start_time == start_time,
-            Booking.status.in_(["pending", "confirmed"])
-        )
-    )
-    if conflict_result.scalar_one_or_none():
-        raise HTTPException(status_code=409, detail="Este horario ya no está disponible")
+    if workspace:
+        engine = await availability.load_workspace(db, workspace, start_time.date(), end_time.date())
+        if not engine.is_free(start_time, end_time):
+            raise HTTPException(status_code=409, detail="Este horario ya no está disponible")
 
     booking = Booking(
         workspace_id=current_user.workspace_id,
@@ -2920,16 +2660,12 @@ async def update_client_booking(
     default_duration = ws_settings.get("booking_policies", {}).get("default_duration", 60)
     new_end = new_start + timedelta(minutes=default_duration)
 
-    conflict = await db.execute(
-        select(Booking).where(
-            Booking.workspace_id == current_user.workspace_id,
-            Booking.start_time == new_start,
-            Booking.status.in_(["pending", "confirmed"]),
-            Booking.id != booking_id,
+    if workspace:
+        engine = await availability.load_workspace(
+            db, workspace, new_start.date(), new_end.date(), exclude_booking_id=booking_id
         )
-    )
-    if conflict.scalar_one_or_none():
-        raise HTTPException(status_code=409, detail="Este horario ya no está disponible")
+        if not engine.is_free(new_start, new_end):
+            raise HTTPException(status_code=409, detail="Este horario ya no está disponible")
 
     booking.start_time = new_start
     booking.end_time = new_end
@@ -3176,6 +2912,13 @@ async def send_client_message(
     
     await db.commit()
     await db.refresh(message)
+
+    realtime.publish(
+        realtime.staff_topic(client.workspace_id),
+        "message",
+        unread_counts.message_event(message, conversation),
+    )
+    await unread_counts.push_staff_messages(db, client.workspace_id)
     
     return ClientMessageResponse(
         id=message.id,
@@ -3235,6 +2978,8 @@ async def mark_client_messages_read(
             marked += 1
 
     await db.commit()
+    await unread_counts.push_client_messages(db, uid, current_user.workspace_id)
+    await unread_counts.push_staff_messages(db, client.workspace_id)
 
     return {"success": True, "marked_count": marked}
 
@@ -3244,29 +2989,8 @@ async def get_client_unread_count(
     current_user: CurrentUser = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ):
-    """Get unread message count for the client (cached 5s to tame polling)."""
-    cache_key = f"msg:unread:client:{current_user.id}"
-    cached = ttl_cache.get(cache_key)
-    if cached is not None:
-        return {"unread_count": cached}
-
-    # Single round-trip: JOIN messages -> conversations -> clients so we don't
-    # pay 3 sequential SELECTs on every cache miss.
-    result = await db.execute(
-        select(func.count(Message.id))
-        .select_from(Message)
-        .join(Conversation, Conversation.id == Message.conversation_id)
-        .join(Client, Client.id == Conversation.client_id)
-        .where(
-            Client.user_id == current_user.id,
-            Client.workspace_id == current_user.workspace_id,
-            Message.direction == MessageDirection.OUTBOUND,
-            Message.is_deleted.is_(False),
-            ~Message.read_by.contains([current_user.id]),
-        )
-    )
-    count = int(result.scalar() or 0)
-    ttl_cache.set(cache_key, count, ttl=20.0)
+    """Get unread message count for the client (initial load / fallback poll)."""
+    count = await unread_counts.client_messages(db, current_user.id, current_user.workspace_id)
     return {"unread_count": count}
 
 
@@ -31,8 +31,8 @@ from app.models.erp import (
     QuoteItem,
 )
 from app.models.client import Client
+from app.services import aeat_pool, invoice_chain, invoice_export, pdf_render, verifactu_queue
 from app.services.verifactu import VeriFactuService
-from app.services.invoice_pdf import InvoicePDFGenerator
 
 import io
 
@@ -389,19 +389,24 @@ def _settings_cache_key(workspace_id: UUID) -> str:
     return f"erp:settings:{workspace_id}"
 
 
+def _iso_or_none(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value else None
+
+
 def _invalidate_settings_cache(workspace_id: UUID) -> None:
     ttl_cache.invalidate(_settings_cache_key(workspace_id))
 
 
 async def _get_settings_cached(db: AsyncSession, workspace_id: UUID) -> Optional[dict]:
-    """Return InvoiceSettings as a dict, cached 60s in-process.
+    """Return InvoiceSettings as a dict, cached 60s and shared across workers.
 
     InvoiceSettings change very rarely (once per tax period); caching avoids
     a Supabase round-trip on every /invoices, /certificate/status and
-    /invoice-stats call.
+    /invoice-stats call. The snapshot goes through Redis, so timestamps are
+    stored as ISO strings.
     """
     cache_key = _settings_cache_key(workspace_id)
-    cached = ttl_cache.get(cache_key)
+    cached = await ttl_cache.aget(cache_key)
     if cached is not None:
         return cached
     settings = await _get_settings(db, workspace_id)
@@ -417,8 +422,8 @@ async def _get_settings_cached(db: AsyncSession, workspace_id: UUID) -> Optional
         "certificate_subject": settings.certificate_subject,
         "certificate_serial_number": settings.certificate_serial_number,
         "certificate_nif": settings.certificate_nif,
-        "certificate_expires_at": settings.certificate_expires_at,
-        "certificate_uploaded_at": settings.certificate_uploaded_at,
+        "certificate_expires_at": _iso_or_none(settings.certificate_expires_at),
+        "certificate_uploaded_at": _iso_or_none(settings.certificate_uploaded_at),
     }
     ttl_cache.set(cache_key, snapshot, ttl=60.0)
     return snapshot
@@ -582,6 +587,54 @@ async def get_next_invoice_number(
     return {"next_number": generate_invoice_number(prefix, year, next_num), "series": series}
 
 
+@router.get("/invoices/export")
+async def export_invoices_zip(
+    from_date: Optional[date] = Query(None),
+    to_date: Optional[date] = Query(None),
+    series: Optional[str] = Query(None),
+    include_drafts: bool = Query(False),
+    current_user: Any = Depends(require_workspace),
+    db: AsyncSession = Depends(get_db),
+):
+    """Download the PDFs of a period and/or series as a ZIP, streamed as they render."""
+    if not from_date and not to_date and not series:
+        raise HTTPException(status_code=400, detail="Indica un periodo o una serie para exportar")
+    if from_date and to_date and from_date > to_date:
+        raise HTTPException(status_code=400, detail="La fecha inicial es posterior a la final")
+
+    filter_args = {
+        "from_date": from_date, "to_date": to_date, "series": series, "include_drafts": include_drafts,
+    }
+    total = await db.scalar(
+        select(func.count(Invoice.id)).where(*invoice_export.filters(current_user.workspace_id, **filter_args))
+    )
+    if not total:
+        raise HTTPException(status_code=404, detail="No hay facturas para exportar")
+
+    settings_dict = _settings_to_dict(await _get_settings(db, current_user.workspace_id))
+    # The export can take minutes: give the request's connection back now,
+    # the pages are read in short sessions of their own.
+    await db.close()
+
+    def pdf_args(invoice: Invoice) -> dict:
+        return {
+            "invoice": _invoice_to_dict(invoice),
+            "items": _items_to_dicts(invoice.items),
+            "qr_data": invoice.verifactu_qr_data,
+        }
+
+    label = "_".join(str(part) for part in (series, from_date, to_date) if part)
+    label = "".join(c for c in label if c.isalnum() or c in "-_")
+    return StreamingResponse(
+        invoice_export.stream_zip(current_user.workspace_id, settings_dict, pdf_args, **filter_args),
+        media_type="application/zip",
+        headers={
+            "Content-Disposition": f'attachment; filename="Facturas_{label}.zip"',
+            "X-Invoice-Count": str(total),
+        },
+    )
+
+
 @router.get("/invoice-stats", response_model=InvoiceStatsResponse)
 async def get_invoice_stats(
     current_user: Any = Depends(require_workspace),
@@ -708,10 +761,9 @@ async def create_invoice(
     series = invoice_data.invoice_series or "F"
     if series == "R":
         prefix = settings.rectificative_prefix if settings else "R"
-        next_number = settings.rectificative_next_number if settings else 1
     else:
         prefix = settings.invoice_prefix if settings else "F"
-        next_number = settings.invoice_next_number if settings else 1
+    next_number = await invoice_chain.allocate_number(db, current_user.workspace_id, series)
 
     year = date.today().year
     invoice_number = generate_invoice_number(prefix, year, next_number)
@@ -759,12 +811,6 @@ async def create_invoice(
     invoice.discount_amount = round(discount_amount, 2)
     invoice.total = round(subtotal + tax_amount - discount_amount, 2)
 
-    if settings:
-        if series == "R":
-            settings.rectificative_next_number = (settings.rectificative_next_number or 1) + 1
-        else:
-            settings.invoice_next_number = (settings.invoice_next_number or 1) + 1
-
     await _log_audit(db, invoice.id, current_user.workspace_id, "created", current_user, request=request,
                      new_values={"invoice_number": invoice_number, "total": invoice.total})
 
@@ -922,19 +968,13 @@ async def finalize_invoice(
 
     verifactu_send_result = None
     if settings and settings.verifactu_enabled:
-        resp = await VeriFactuService.send_to_provider(invoice, settings, db_session=db)
-        invoice.verifactu_response = resp
-        verifactu_send_result = resp
-
-        if resp.get("status") == "accepted":
-            invoice.verifactu_status = "accepted"
-            invoice.verifactu_sent_at = datetime.now(timezone.utc)
-            if resp.get("csv"):
-                invoice.verifactu_response = resp
-        elif resp.get("status") == "error":
-            invoice.verifactu_status = "error"
-        elif resp.get("status") == "skipped":
-            pass
+        # El envío a AEAT lo hace el worker de la cola (app.services.verifactu_queue)
+        if settings.verifactu_mode in verifactu_queue.DIRECT_MODES:
+            await verifactu_queue.enqueue_invoice(db, invoice)
+            verifactu_send_result = {"status": "queued", "message": "Registro encolado para envío a AEAT"}
+        else:
+            verifactu_send_result = {"status": "skipped", "message": "VeriFactu no habilitado"}
+            invoice.verifactu_response = verifactu_send_result
 
     await _log_audit(db, invoice.id, current_user.workspace_id, "finalized", current_user,
                      new_values={
@@ -1032,7 +1072,7 @@ async def rectify_invoice(
 
     settings = await _get_settings(db, current_user.workspace_id)
     prefix = settings.rectificative_prefix if settings else "R"
-    next_number = settings.rectificative_next_number if settings else 1
+    next_number = await invoice_chain.allocate_number(db, current_user.workspace_id, "R")
     year = date.today().year
     rect_number = generate_invoice_number(prefix, year, next_number)
 
@@ -1083,9 +1123,6 @@ async def rectify_invoice(
 
     original.status = "rectified"
 
-    if settings:
-        settings.rectificative_next_number = (settings.rectificative_next_number or 1) + 1
-
     await _log_audit(db, original.id, current_user.workspace_id, "rectified", current_user,
                      new_values={"rectificative_number": rect_number}, request=request)
     await _log_audit(db, rectificative.id, current_user.workspace_id, "created", current_user,
@@ -1120,10 +1157,9 @@ async def duplicate_invoice(
     series = original.invoice_series or "F"
     if series == "R":
         prefix = settings.rectificative_prefix if settings else "R"
-        next_number = settings.rectificative_next_number if settings else 1
     else:
         prefix = settings.invoice_prefix if settings else "F"
-        next_number = settings.invoice_next_number if settings else 1
+    next_number = await invoice_chain.allocate_number(db, current_user.workspace_id, series)
 
     year = date.today().year
     new_number = generate_invoice_number(prefix, year, next_number)
@@ -1174,12 +1210,6 @@ async def duplicate_invoice(
         )
         new_invoice.items.append(new_item)
 
-    if settings:
-        if series == "R":
-            settings.rectificative_next_number = (settings.rectificative_next_number or 1) + 1
-        else:
-            settings.invoice_next_number = (settings.invoice_next_number or 1) + 1
-
     await _log_audit(db, new_invoice.id, current_user.workspace_id, "created", current_user,
                      new_values={"invoice_number": new_number, "duplicated_from": original.invoice_number},
                      request=request)
@@ -1209,12 +1239,12 @@ async def get_invoice_pdf(
 
     settings = await _get_settings(db, current_user.workspace_id)
 
-    generator = InvoicePDFGenerator()
-    pdf_bytes = generator.generate(
+    pdf_bytes = await pdf_render.render_invoice(
         invoice=_invoice_to_dict(invoice),
         items=_items_to_dicts(invoice.items),
         settings=_settings_to_dict(settings),
         qr_data=invoice.verifactu_qr_data,
+        workspace_id=current_user.workspace_id,
     )
 
     filename = f"Factura_{invoice.invoice_number.replace('/', '-')}.pdf"
@@ -1249,12 +1279,12 @@ async def send_invoice_email(
 
     settings = await _get_settings(db, current_user.workspace_id)
 
-    generator = InvoicePDFGenerator()
-    pdf_bytes = generator.generate(
+    pdf_bytes = await pdf_render.render_invoice(
         invoice=_invoice_to_dict(invoice),
         items=_items_to_dicts(invoice.items),
         settings=_settings_to_dict(settings),
         qr_data=invoice.verifactu_qr_data,
+        workspace_id=current_user.workspace_id,
     )
 
     try:
@@ -1427,7 +1457,7 @@ async def test_verifactu(
     )
 
     try:
-        await VeriFactuService.compute_and_set_hash(db, test_invoice, settings)
+        await VeriFactuService.compute_and_set_hash(db, test_invoice, settings, preview=True)
         checks.append({"check": "hash_computation", "ok": True, "detail": f"Hash SHA-256 calculado: {test_invoice.verifactu_hash[:16]}..."})
     except Exception as e:
         checks.append({"check": "hash_computation", "ok": False, "detail": f"Error al calcular hash: {str(e)}"})
@@ -1490,7 +1520,7 @@ async def test_verifactu(
                 reg_dt=reg_dt,
             )
             soap_xml = aeat_client.build_soap_envelope(test_invoice, registro_xml)
-            raw_result = aeat_client.send_xml(soap_xml)
+            raw_result = await aeat_client.send_xml(soap_xml)
 
             if raw_result.get("error") and not raw_result.get("response"):
                 aeat_response = {
@@ -1586,7 +1616,8 @@ async def get_certificate_status(
     if not snap or not snap.get("certificate_pem_present"):
         return CertificateStatusResponse(has_certificate=False)
 
-    expires_at = snap.get("certificate_expires_at")
+    expires_raw = snap.get("certificate_expires_at")
+    expires_at = datetime.fromisoformat(expires_raw) if expires_raw else None
     is_expired = bool(expires_at and expires_at < datetime.now(timezone.utc))
 
     return CertificateStatusResponse(
@@ -1658,6 +1689,7 @@ async def upload_certificate(
 
     await db.commit()
     _invalidate_settings_cache(current_user.workspace_id)
+    await aeat_pool.evict(current_user.workspace_id)
 
     client_ip = request.client.host if request.client else "unknown"
     logger.info(
@@ -1708,6 +1740,7 @@ async def revoke_certificate(
 
     await db.commit()
     _invalidate_settings_cache(current_user.workspace_id)
+    await aeat_pool.evict(current_user.workspace_id)
 
     client_ip = request.client.host if request.client else "unknown"
     logger.info(
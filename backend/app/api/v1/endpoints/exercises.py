@@ -3,7 +3,7 @@ from typing import List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, or_, String
+from sqlalchemy import select, func, or_
 from pydantic import BaseModel
 
 from app.core.database import get_db
@@ -11,6 +11,7 @@ from app.core.storage import generate_filename, resolve_url, upload_workspace_fi
 from app.middleware.auth import get_current_user, require_workspace, require_staff, CurrentUser
 from app.models.exercise import Exercise, ExerciseAlternative, ExerciseFavorite
 from app.models.user import User
+from app.services import catalog_snapshot
 
 router = APIRouter()
 
@@ -78,63 +79,31 @@ async def list_exercises(
     current_user: CurrentUser = Depends(require_workspace),
     db: AsyncSession = Depends(get_db),
 ):
-    """List exercises (global and workspace-specific)."""
-    if source == "system":
-        query = select(Exercise).where(Exercise.is_global.is_(True))
-    elif source == "custom":
-        query = select(Exercise).where(
-            Exercise.workspace_id == current_user.workspace_id,
-            Exercise.is_global.is_(False),
-        )
-    else:
-        query = select(Exercise).where(
-            or_(
-                Exercise.workspace_id == current_user.workspace_id,
-                Exercise.is_global.is_(True)
-            )
-        )
-    
-    if search:
-        search_pattern = f"%{search}%"
-        alias_filter = Exercise.alias.isnot(None) & func.unaccent(Exercise.alias).ilike(func.unaccent(search_pattern))
-        query = query.where(
-            or_(
-                func.unaccent(Exercise.name).ilike(func.unaccent(search_pattern)),
-                alias_filter,
-                Exercise.muscle_groups.cast(String).ilike(search_pattern),
-            )
-        )
-    
-    if category:
-        query = query.where(Exercise.category == category)
-    
-    if muscle_group:
-        query = query.where(Exercise.muscle_groups.any(muscle_group))
+    """List exercises (global and workspace-specific).
 
+    Global exercises come from the in-memory catalog snapshot
+    (``app.services.catalog_snapshot``); only the workspace's are queried.
+    """
+    groups = [muscle_group] if muscle_group else []
     if muscle_groups:
-        groups = [g.strip() for g in muscle_groups.split(",") if g.strip()]
-        for group in groups:
-            query = query.where(Exercise.muscle_groups.any(group))
+        groups.extend(g.strip() for g in muscle_groups.split(",") if g.strip())
+
+    exercises = await catalog_snapshot.list_exercises(
+        db,
+        current_user.workspace_id,
+        include_global=source != "custom",
+        include_workspace=source != "system",
+        search=search,
+        muscle_groups=groups,
+        equipment=equipment,
+        category=category,
+        difficulty=difficulty,
+    )
+    total = len(exercises)
 
-    if equipment:
-        query = query.where(Exercise.equipment.any(equipment))
-    
-    if difficulty:
-        query = query.where(Exercise.difficulty == difficulty)
-    
-    # Count total
-    count_query = select(func.count()).select_from(query.subquery())
-    total = await db.scalar(count_query) or 0
-    
-    # Apply pagination
     offset = (page - 1) * page_size
-    query = query.order_by(Exercise.name).offset(offset).limit(page_size)
-    
-    result = await db.execute(query)
-    exercises = result.scalars().all()
-
     items = []
-    for e in exercises:
+    for e in exercises[offset:offset + page_size]:
         resp = ExerciseResponse.model_validate(e)
         resp.image_url = await resolve_url(resp.image_url)
         resp.thumbnail_url = await resolve_url(resp.thumbnail_url)
@@ -17,8 +17,8 @@ from app.core.database import get_db
 from app.core.config import settings
 from app.models.google_calendar import GoogleCalendarToken, CalendarSyncMapping
 from app.models.booking import Booking
-from app.models.client import Client
 from app.middleware.auth import require_workspace, CurrentUser
+from app.services import calendar_sync
 from app.services.google_calendar import google_calendar_service, GoogleCalendarError
 
 logger = logging.getLogger(__name__)
@@ -322,48 +322,18 @@ async def sync_calendar(
         )
         bookings = result.scalars().all()
         
-        logger.info("Encontrados %s bookings para sincronizar", len(bookings))
-        
-        events_synced = 0
-        errors = []
-        
-        for booking in bookings:
-            try:
-                # Obtener cliente si existe
-                client = None
-                if booking.client_id:
-                    client_result = await db.execute(
-                        select(Client).where(Client.id == booking.client_id)
-                    )
-                    client = client_result.scalar_one_or_none()
-                
-                # Sincronizar booking
-                event_id = await google_calendar_service.sync_booking_to_google(
-                    booking=booking,
-                    user_id=current_user.id,
-                    db=db,
-                    client=client
-                )
-                
-                if event_id:
-                    events_synced += 1
-                    logger.info("Booking %s sincronizado: %s", booking.id, event_id)
-            except Exception as e:
-                logger.error("Error sincronizando booking %s: %s", booking.id, e)
-                errors.append(str(e))
+        # Los eventos se crean en el worker (cola "calendar") en lotes
+        events_queued = await calendar_sync.enqueue_booking_sync(db, bookings, user_id=current_user.id)
+        logger.info("Encolados %s de %s bookings para sincronizar", events_queued, len(bookings))
         
         # Actualizar última sincronización
         token.last_sync_at = datetime.now(timezone.utc)
         await db.commit()
         
-        message = f"Se sincronizaron {events_synced} eventos con Google Calendar"
-        if errors:
-            message += f" ({len(errors)} errores)"
-        
         return GoogleCalendarSyncResponse(
             success=True,
-            events_synced=events_synced,
-            message=message
+            events_synced=events_queued,
+            message=f"Se están sincronizando {events_queued} eventos con Google Calendar"
         )
         
     except GoogleCalendarError as e:
@@ -468,7 +438,8 @@ async def get_google_events(
             token=token,
             time_min=start_date,
             time_max=end_date,
-            include_trackfiz=include_trackfiz
+            include_trackfiz=include_trackfiz,
+            db=db,
         )
         
         # Convertir a formato de respuesta
@@ -557,10 +528,12 @@ async def google_webhook(
     if resource_state == "sync":
         return {"status": "ok", "message": "Sync notification received"}
     
-    # Para otras notificaciones, podríamos sincronizar cambios desde Google
-    # Por ahora, solo registramos que recibimos la notificación
     logger.info("Webhook recibido - Channel: %s, State: %s", channel_id, resource_state)
     
+    # El calendario ha cambiado: la próxima consulta de eventos pedirá los
+    # cambios a Google en vez de servir la copia local
+    await google_calendar_service.invalidate_event_cache(token, db)
+    
     # TODO: Implementar sincronización de cambios desde Google a Trackfiz
     # Esto requeriría:
     # 1. Obtener eventos modificados desde Google
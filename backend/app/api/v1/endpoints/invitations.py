@@ -26,11 +26,10 @@ from app.models.user import User, UserRole, RoleType
 from app.models.payment import Payment, PaymentStatus, Subscription, SubscriptionStatus
 from app.models.product import Product
 from app.middleware.auth import require_staff, require_workspace, CurrentUser
+from app.core import password_hashing
 from app.core.security import (
-    get_password_hash,
     create_tokens,
     generate_verification_token,
-    verify_password,
 )
 import logging
 import traceback
@@ -725,7 +724,7 @@ async def complete_invitation(
             )
         # Verificamos que conoce la contraseña: para vincularse a otro
         # workspace debe demostrar que es el dueño de la cuenta.
-        if not existing_user.password_hash or not verify_password(
+        if not existing_user.password_hash or not await password_hashing.verify_password(
             data.password, existing_user.password_hash
         ):
             raise HTTPException(
@@ -813,7 +812,7 @@ async def complete_invitation(
                 email=email_lc,
                 full_name=full_name,
                 phone=data.phone,
-                password_hash=get_password_hash(data.password),
+                password_hash=await password_hashing.hash_password(data.password),
                 email_verified=False,
                 email_verification_token=verification_token,
                 email_verification_sent_at=datetime.now(timezone.utc),
@@ -6,13 +6,13 @@ from typing import List, Optional
 from uuid import UUID
 from fastapi import APIRouter, Depends, HTTPException, Query, status, Request
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, and_, func
+from sqlalchemy import select, or_, and_
 from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.core.config import settings
-from app.core import ttl_cache
+from app.core import realtime
 from app.models.message import (
     Conversation, Message, ConversationType, MessageType,
     MessageSource, MessageDirection, MessageStatus
@@ -20,6 +20,7 @@ from app.models.message import (
 from app.models.client import Client
 from app.models.workspace import Workspace
 from app.middleware.auth import require_workspace, CurrentUser
+from app.services import unread_counts
 from app.services.kapso import kapso_service, KapsoError
 
 logger = logging.getLogger(__name__)
@@ -390,6 +391,7 @@ async def list_messages(
     if conversation.unread_count > 0:
         conversation.unread_count = 0
         await db.commit()
+        await unread_counts.push_staff_messages(db, current_user.workspace_id)
     
     # Return in chronological order
     return list(reversed(messages))
@@ -480,6 +482,14 @@ async def send_message(
     
     await db.commit()
     await db.refresh(message)
+
+    if is_sent:
+        event = unread_counts.message_event(message, conversation)
+        realtime.publish(realtime.staff_topic(current_user.workspace_id), "message", event)
+        client_user_id = conversation.client.user_id if conversation.client else None
+        if client_user_id:
+            realtime.publish(realtime.user_topic(client_user_id), "message", event)
+            await unread_counts.push_client_messages(db, client_user_id, current_user.workspace_id)
     
     # Send via WhatsApp if requested
     if send_via == MessageSource.WHATSAPP and is_sent:
@@ -544,6 +554,7 @@ async def mark_conversation_read(
     
     conversation.unread_count = 0
     await db.commit()
+    await unread_counts.push_staff_messages(db, current_user.workspace_id)
     
     return {"status": "ok"}
 
@@ -670,8 +681,14 @@ async def whatsapp_webhook(
     conversation.unread_count = (conversation.unread_count or 0) + 1
     
     await db.commit()
-    
-    # TODO: Trigger real-time notification via WebSocket/Supabase Realtime
+
+    if conversation.workspace_id:
+        realtime.publish(
+            realtime.staff_topic(conversation.workspace_id),
+            "message",
+            unread_counts.message_event(message, conversation),
+        )
+        await unread_counts.push_staff_messages(db, conversation.workspace_id)
     
     return {"status": "ok", "message_id": str(message.id)}
 
@@ -701,11 +718,14 @@ async def whatsapp_status_webhook(
             return {"status": "error", "message": "Firma inválida"}
 
     result = await db.execute(
-        select(Message).where(Message.external_id == message_id)
+        select(Message, Conversation.workspace_id)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .where(Message.external_id == message_id)
     )
-    message = result.scalar_one_or_none()
+    row = result.first()
     
-    if message:
+    if row:
+        message, workspace_id = row
         status_map = {
             "sent": MessageStatus.SENT,
             "delivered": MessageStatus.DELIVERED,
@@ -714,6 +734,12 @@ async def whatsapp_status_webhook(
         }
         message.external_status = status_map.get(wa_status, MessageStatus.PENDING)
         await db.commit()
+        if workspace_id:
+            realtime.publish(realtime.staff_topic(workspace_id), "message_status", {
+                "conversation_id": str(message.conversation_id),
+                "message_id": str(message.id),
+                "external_status": message.external_status.value,
+            })
     
     return {"status": "ok"}
 
@@ -727,22 +753,9 @@ async def get_total_unread_count(
 ):
     """
     Get total unread message count across all conversations for staff.
-    Used to display badge in sidebar. Cached 5s to tame sidebar polling.
+    Used to display badge in sidebar; the realtime stream pushes updates,
+    this is the initial load and the fallback poll.
     """
-    cache_key = f"msg:unread:ws:{current_user.workspace_id}"
-    cached = ttl_cache.get(cache_key)
-    if cached is not None:
-        return {"unread_count": cached}
-
-    result = await db.execute(
-        select(func.coalesce(func.sum(Conversation.unread_count), 0)).where(
-            and_(
-                Conversation.workspace_id == current_user.workspace_id,
-                Conversation.is_archived == False
-            )
-        )
-    )
-    total = int(result.scalar() or 0)
-    ttl_cache.set(cache_key, total, ttl=20.0)
+    total = await unread_counts.staff_messages(db, current_user.workspace_id)
     return {"unread_count": total}
 
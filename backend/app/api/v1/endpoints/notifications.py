@@ -15,6 +15,7 @@ from app.middleware.auth import get_current_user, require_workspace, CurrentUser
 from app.models.notification import Notification
 from app.models.user import User
 from app.models.client import Client
+from app.services import unread_counts
 from app.schemas.notification import (
     NotificationResponse, NotificationList,
     NotificationMarkRead, NotificationMarkAllRead,
@@ -23,10 +24,6 @@ from app.schemas.notification import (
 router = APIRouter()
 
 
-def _unread_cache_key(user_id) -> str:
-    return f"notif:unread:{user_id}"
-
-
 # ==================== Dashboard Alerts ====================
 
 @router.get("/alerts")
@@ -120,7 +117,7 @@ async def list_notifications(
     )
     total = int(total)
     unread_count = int(unread_count)
-    ttl_cache.set(_unread_cache_key(current_user.id), unread_count, ttl=20.0)
+    ttl_cache.set(unread_counts.notifications_key(current_user.id), unread_count, ttl=20.0)
 
     return NotificationList(
         items=[NotificationResponse.model_validate(n) for n in notifications],
@@ -136,19 +133,8 @@ async def get_unread_count(
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
-    """Get count of unread notifications (cached for 5s to tame UI polling)."""
-    cache_key = _unread_cache_key(current_user.id)
-    cached = ttl_cache.get(cache_key)
-    if cached is not None:
-        return {"unread_count": cached}
-
-    count = await db.scalar(
-        select(func.count(Notification.id)).where(
-            Notification.user_id == current_user.id,
-            Notification.is_read == False,
-        )
-    ) or 0
-    ttl_cache.set(cache_key, int(count), ttl=20.0)
+    """Get count of unread notifications (initial load / fallback poll)."""
+    count = await unread_counts.notifications(db, current_user.id)
     return {"unread_count": count}
 
 
@@ -168,7 +154,7 @@ async def mark_notifications_read(
         .values(is_read=True, read_at=datetime.utcnow())
     )
     await db.commit()
-    ttl_cache.invalidate(_unread_cache_key(current_user.id))
+    await unread_counts.push_notifications(db, current_user.id)
     return {"message": "Notificaciones marcadas como leídas"}
 
 
@@ -193,7 +179,7 @@ async def mark_all_notifications_read(
     
     await db.execute(query)
     await db.commit()
-    ttl_cache.invalidate(_unread_cache_key(current_user.id))
+    await unread_counts.push_notifications(db, current_user.id)
     return {"message": "Todas las notificaciones marcadas como leídas"}
 
 
@@ -217,7 +203,7 @@ async def delete_notification(
     
     await db.delete(notification)
     await db.commit()
-    ttl_cache.invalidate(_unread_cache_key(current_user.id))
+    await unread_counts.push_notifications(db, current_user.id)
 
 
 # ---------------------------------------------------------------------------
@@ -1,9 +1,8 @@
 """Nutrition endpoints - simplified to match actual DB schema."""
 import asyncio
 import copy
-import re
 from collections import defaultdict
-from datetime import date, datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
 from typing import List, Optional
 from uuid import UUID
@@ -19,6 +18,8 @@ from app.middleware.auth import CurrentUser, get_current_user, require_staff, re
 from app.models.client import Client
 from app.models.nutrition import Food, FoodFavorite, FoodGroup, MealPlan, Recipe
 from app.api.v1.endpoints.tasks import create_auto_task
+from app.services import meal_plan_macros, nutrition_calc, nutrition_logs
+from app.services.food_search import catalog_food_page, search_foods
 
 router = APIRouter()
 
@@ -50,6 +51,10 @@ class FoodListResponse(BaseModel):
     page: int
     page_size: int
     total_pages: int
+    # ``total`` is the planner's estimate unless the results fit in the page.
+    total_is_estimate: bool = False
+    # Keyset cursor for the next page (faster than ``page`` on deep pages).
+    next_cursor: Optional[str] = None
 
 
 class MealPlanCreate(BaseModel):
@@ -126,6 +131,7 @@ async def list_foods(
     ),
     page: int = Query(1, ge=1),
     page_size: int = Query(50, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="``next_cursor`` de la página anterior (sustituye a ``page``)."),
     current_user: CurrentUser = Depends(require_workspace),
     db: AsyncSession = Depends(get_db)
 ):
@@ -135,6 +141,11 @@ async def list_foods(
     paginación devuelta al frontend cuadre con lo que el usuario realmente
     ve (antes el filtro se aplicaba después de paginar y mostraba páginas
     casi vacías).
+
+    ``search`` usa el índice trigram de ``foods.search_text`` (nombre, marca y
+    nombre genérico sin tildes) y ordena por relevancia; ver
+    ``app.services.food_search``. Sin ``search``, los alimentos globales se
+    sirven del snapshot en memoria (``app.services.catalog_snapshot``).
     """
     if source == "system":
         query = select(Food).where(Food.is_global.is_(True))
@@ -151,30 +162,30 @@ async def list_foods(
             )
         )
 
-    if search:
-        query = query.where(
-            func.unaccent(Food.name).ilike(func.unaccent(f"%{search}%"))
-        )
-    
     if category:
         query = query.where(Food.category == category)
-    
-    # Count total + items in parallel
-    count_query = select(func.count()).select_from(query.subquery())
-    offset = (page - 1) * page_size
-    items_query = query.order_by(Food.name).offset(offset).limit(page_size)
 
-    # NOTE: sequential because AsyncSession forbids concurrent ops (SQLAlchemy 2.0.46+).
-    total = (await db.scalar(count_query)) or 0
-    items_result = await db.execute(items_query)
-    foods = items_result.scalars().all()
+    result = None
+    if not (search or "").strip() and source != "custom":
+        # Sin búsqueda: los globales salen del snapshot en memoria.
+        result = await catalog_food_page(
+            db,
+            workspace_id=None if source == "system" else current_user.workspace_id,
+            category=category, page=page, page_size=page_size, cursor=cursor,
+        )
+    if result is None:
+        result = await search_foods(
+            db, query, search=search, page=page, page_size=page_size, cursor=cursor,
+        )
 
     return FoodListResponse(
-        items=[FoodResponse.model_validate(f) for f in foods],
-        total=total,
+        items=[FoodResponse.model_validate(f) for f in result.items],
+        total=result.total,
         page=page,
         page_size=page_size,
-        total_pages=(total + page_size - 1) // page_size
+        total_pages=(result.total + page_size - 1) // page_size,
+        total_is_estimate=result.total_is_estimate,
+        next_cursor=result.next_cursor,
     )
 
 
@@ -368,6 +379,8 @@ async def create_meal_plan(
     db.add(meal_plan)
     await db.commit()
     await db.refresh(meal_plan)
+    # Build the compiled plan index for this version on save.
+    meal_plan_macros.get_compiled(meal_plan)
 
     if parsed_end and data.client_id:
         await create_auto_task(
@@ -430,6 +443,34 @@ async def get_meal_plan(
     return plan
 
 
+@router.get("/meal-plans/{plan_id}/nutrients")
+async def get_meal_plan_nutrients(
+    plan_id: UUID,
+    current_user: CurrentUser = Depends(require_workspace),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Todos los nutrientes del plan por comida, día y semana, y la media diaria.
+    """
+    result = await db.execute(
+        select(MealPlan).where(
+            MealPlan.id == plan_id,
+            MealPlan.workspace_id == current_user.workspace_id
+        )
+    )
+    plan = result.scalar_one_or_none()
+
+    if not plan:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Plan nutricional no encontrado"
+        )
+
+    compiled = meal_plan_macros.get_compiled(plan)
+    table = await nutrition_calc.NutrientTable.load(db, compiled.food_ids)
+    return {"plan_id": str(plan.id), **compiled.nutrient_totals(table)}
+
+
 @router.put("/meal-plans/{plan_id}", response_model=MealPlanResponse)
 async def update_meal_plan(
     plan_id: UUID,
@@ -473,6 +514,15 @@ async def update_meal_plan(
         else:
             plan.next_review_date = None
 
+    # Las referencias del plan en los logs y los totales diarios dependen
+    # de la plantilla y de la rotación de semanas.
+    if data.plan is not None or data.duration_weeks is not None:
+        # Explicit timestamp: it keys the compiled plan index and must stay
+        # loaded after the flush (the server-side onupdate would expire it).
+        plan.updated_at = datetime.now(timezone.utc)
+        await db.flush()
+        await nutrition_logs.refresh_plan_references(db, plan)
+
     await db.commit()
     await db.refresh(plan)
 
@@ -688,6 +738,7 @@ async def assign_meal_plan_to_client(
     db.add(assigned_plan)
     await db.commit()
     await db.refresh(assigned_plan)
+    meal_plan_macros.get_compiled(assigned_plan)
 
     if parsed_end:
         await create_auto_task(
@@ -849,15 +900,29 @@ async def get_client_nutrition_logs(
         )
     
     result = await db.execute(
-        select(MealPlan)
+        select(
+            MealPlan.id, MealPlan.is_active,
+            MealPlan.target_calories, MealPlan.target_protein,
+            MealPlan.target_carbs, MealPlan.target_fat,
+        )
         .where(MealPlan.client_id == client_id)
         .order_by(desc(MealPlan.created_at))
     )
-    meal_plans = result.scalars().all()
+    meal_plans = result.all()
     
     active_plan = next((mp for mp in meal_plans if mp.is_active), meal_plans[0] if meal_plans else None)
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+    plan_ids = {mp.id for mp in meal_plans}
+    rollups = []
+    if plan_ids:
+        rollups = [
+            r for r in await nutrition_logs.fetch_day_rollups(db, client_id, start=start_date, end=end_date)
+            if r.meal_plan_id in plan_ids
+        ]
     
-    if not meal_plans or all(not mp.adherence for mp in meal_plans):
+    if not rollups:
         return {
             "client_id": str(client_id),
             "client_name": client.full_name,
@@ -870,129 +935,25 @@ async def get_client_nutrition_logs(
                 "fat": float(active_plan.target_fat) if active_plan and active_plan.target_fat else 70,
             }
         }
-    
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days)
-    
-    def _safe_float(val, default=0.0):
-        if val is None:
-            return default
-        try:
-            return float(val)
-        except (ValueError, TypeError):
-            m = re.search(r"[\d.]+", str(val))
-            return float(m.group()) if m else default
-
-    def _get_plan_days_trainer(mp_plan, week_num=None):
-        if not mp_plan:
-            return []
-        if "weeks" in mp_plan:
-            weeks = mp_plan["weeks"]
-            if not weeks:
-                return []
-            if week_num is not None:
-                wk = next((w for w in weeks if w.get("week") == week_num), None)
-                return wk.get("days", []) if wk else []
-            return weeks[0].get("days", [])
-        return mp_plan.get("days", [])
-
-    def _calc_plan_meal_macros_trainer(mp_plan, meal_name, log_date_str, plan_start_date=None, duration_weeks=1):
-        if not mp_plan:
-            return None
-        try:
-            d = date.fromisoformat(log_date_str)
-            plan_day_num = d.isoweekday()
-        except Exception:
-            return None
-
-        week_num = 1
-        if plan_start_date and duration_weeks and duration_weeks > 1:
-            try:
-                start = plan_start_date if isinstance(plan_start_date, date) else date.fromisoformat(str(plan_start_date))
-                delta_days = (d - start).days
-                week_num = (delta_days // 7) % duration_weeks + 1
-            except Exception:
-                week_num = 1
-
-        plan_days_ref = _get_plan_days_trainer(mp_plan, week_num)
-        day_data = next((dd for dd in plan_days_ref if dd.get("day") == plan_day_num), None)
-        if not day_data:
-            return None
-        meal_data = next((m for m in day_data.get("meals", []) if m.get("name") == meal_name), None)
-        if not meal_data:
-            return None
-        cal = prot = carb = fat_v = 0.0
-        plan_foods = []
-        for item in meal_data.get("items", []):
-            fd = item.get("food") or item.get("supplement") or {}
-            ss = _safe_float(fd.get("serving_size"), 100) or 100
-            qty = _safe_float(item.get("quantity_grams"), 0)
-            factor = qty / ss
-            ic = round(_safe_float(fd.get("calories")) * factor)
-            ip = round(_safe_float(fd.get("protein")) * factor, 1)
-            icb = round(_safe_float(fd.get("carbs")) * factor, 1)
-            ift = round(_safe_float(fd.get("fat")) * factor, 1)
-            cal += ic; prot += ip; carb += icb; fat_v += ift
-            per100 = 100 / ss
-            plan_foods.append({
-                "name": fd.get("name", ""),
-                "calories": ic, "protein": ip, "carbs": icb, "fat": ift,
-                "quantity": qty,
-                "recipe_group": item.get("recipe_group"),
-                "calories_per_100g": round(_safe_float(fd.get("calories")) * per100),
-                "protein_per_100g": round(_safe_float(fd.get("protein")) * per100, 1),
-                "carbs_per_100g": round(_safe_float(fd.get("carbs")) * per100, 1),
-                "fat_per_100g": round(_safe_float(fd.get("fat")) * per100, 1),
-            })
-        return {"calories": int(cal), "protein": round(prot, 1), "carbs": round(carb, 1), "fat": round(fat_v, 1), "foods": plan_foods}
-    
+
+    # Totales diarios precalculados (nutrition_day_rollups) + comidas con su
+    # referencia del plan ya resuelta; no se recorre la plantilla del plan.
+    plan_order = {mp.id: i for i, mp in enumerate(meal_plans)}
+    meals_by_plan_day = defaultdict(list)
+    for row in await nutrition_logs.fetch_logs(db, client_id, start=start_date, end=end_date):
+        meals_by_plan_day[(row.meal_plan_id, row.log_date)].append(nutrition_logs.meal_entry(row))
+
     days_data = defaultdict(lambda: {"meals": [], "totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "plan_totals": {"calories": 0, "protein": 0, "carbs": 0, "fat": 0}, "has_modifications": False})
     
-    for mp in meal_plans:
-        if not mp.adherence:
-            continue
-        logs = mp.adherence.get("logs", [])
-        mp_plan = mp.plan if mp.plan else {}
-        mp_start = mp.created_at.date() if mp.created_at else None
-        mp_dur_weeks = mp.duration_weeks if hasattr(mp, 'duration_weeks') and mp.duration_weeks else 1
-        filtered_logs = [
-            log for log in logs
-            if start_date.isoformat() <= log.get("date", "") <= end_date.isoformat()
-        ]
-        for log in filtered_logs:
-            log_date = log.get("date", "")
-            meal_name = log.get("meal_name")
-            plan_ref = _calc_plan_meal_macros_trainer(mp_plan, meal_name, log_date, mp_start, mp_dur_weeks)
-            has_mods = False
-            if plan_ref:
-                logged_names = {f.get("name") for f in log.get("foods", [])}
-                plan_names = {f.get("name") for f in plan_ref.get("foods", [])}
-                if logged_names != plan_names:
-                    has_mods = True
-            days_data[log_date]["meals"].append({
-                "meal_name": meal_name,
-                "total_calories": log.get("total_calories", 0),
-                "total_protein": log.get("total_protein", 0),
-                "total_carbs": log.get("total_carbs", 0),
-                "total_fat": log.get("total_fat", 0),
-                "foods": log.get("foods", []),
-                "logged_at": log.get("logged_at"),
-                "notes": log.get("notes"),
-                "satisfaction_rating": log.get("satisfaction_rating"),
-                "plan_reference": plan_ref,
-                "has_modifications": has_mods,
-            })
-            days_data[log_date]["totals"]["calories"] += log.get("total_calories", 0)
-            days_data[log_date]["totals"]["protein"] += log.get("total_protein", 0)
-            days_data[log_date]["totals"]["carbs"] += log.get("total_carbs", 0)
-            days_data[log_date]["totals"]["fat"] += log.get("total_fat", 0)
-            if plan_ref:
-                days_data[log_date]["plan_totals"]["calories"] += plan_ref["calories"]
-                days_data[log_date]["plan_totals"]["protein"] += plan_ref["protein"]
-                days_data[log_date]["plan_totals"]["carbs"] += plan_ref["carbs"]
-                days_data[log_date]["plan_totals"]["fat"] += plan_ref["fat"]
-            if has_mods:
-                days_data[log_date]["has_modifications"] = True
+    for rollup in sorted(rollups, key=lambda r: plan_order[r.meal_plan_id]):
+        day = days_data[rollup.log_date.isoformat()]
+        day["meals"].extend(meals_by_plan_day.get((rollup.meal_plan_id, rollup.log_date), []))
+        rolled = nutrition_logs.rollup_totals(rollup)
+        for key in ("totals", "plan_totals"):
+            for macro, value in rolled[key].items():
+                day[key][macro] += value
+        if rollup.has_modifications:
+            day["has_modifications"] = True
     
     days_list = [
         {"date": d, **data}
@@ -1127,6 +1088,12 @@ async def list_recipes(
     return result.scalars().all()
 
 
+async def _recipe_totals(db: AsyncSession, items: list) -> dict:
+    """Recipe totals computed from its items (values per 100 g, catalog for the rest)."""
+    table = await nutrition_calc.NutrientTable.load(db, nutrition_calc.recipe_food_ids(items))
+    return nutrition_calc.recipe_totals(items, table)
+
+
 @router.get("/recipes/{recipe_id}", response_model=RecipeResponse)
 async def get_recipe(
     recipe_id: UUID,
@@ -1154,6 +1121,9 @@ async def create_recipe(
     current_user: CurrentUser = Depends(require_staff),
     db: AsyncSession = Depends(get_db)
 ):
+    totals = data.model_dump(include=set(nutrition_calc.RECIPE_TOTALS))
+    if data.items:
+        totals = await _recipe_totals(db, data.items)
     recipe = Recipe(
         workspace_id=current_user.workspace_id,
         created_by=current_user.id,
@@ -1169,12 +1139,7 @@ async def create_recipe(
         notes=data.notes,
         is_public=data.is_public,
         items=data.items,
-        total_calories=data.total_calories,
-        total_protein=data.total_protein,
-        total_carbs=data.total_carbs,
-        total_fat=data.total_fat,
-        total_fiber=data.total_fiber,
-        total_sugar=data.total_sugar,
+        **totals,
     )
     db.add(recipe)
     await db.commit()
@@ -1195,7 +1160,10 @@ async def update_recipe(
     recipe = result.scalar_one_or_none()
     if not recipe:
         raise HTTPException(status_code=404, detail="Receta no encontrada")
-    for field, value in data.model_dump(exclude_unset=True).items():
+    changes = data.model_dump(exclude_unset=True)
+    if changes.get("items"):
+        changes.update(await _recipe_totals(db, changes["items"]))
+    for field, value in changes.items():
         setattr(recipe, field, value)
     await db.commit()
     await db.refresh(recipe)
@@ -26,7 +26,7 @@ from app.models.user import User, UserRole, RoleType
 from app.middleware.auth import require_workspace, require_owner, require_staff, CurrentUser
 from app.services.auto_invoice import create_invoice_for_payment
 from app.services.email import email_service, EmailTemplates
-from app.services.invoice_pdf import InvoicePDFGenerator
+from app.services import pdf_render
 from app.services.notification_service import notify
 from app.services.product_capacity import ensure_product_capacity_by_id
 
@@ -891,12 +891,12 @@ async def download_payment_invoice_pdf(
     invoice_settings = settings_q.scalar_one_or_none()
 
     try:
-        generator = InvoicePDFGenerator()
-        pdf_bytes = generator.generate(
+        pdf_bytes = await pdf_render.render_invoice(
             invoice=_invoice_to_pdf_dict(invoice),
             items=_items_to_pdf_dicts(invoice.items or []),
             settings=_invoice_settings_to_pdf_dict(invoice_settings),
             qr_data=invoice.verifactu_qr_data,
+            workspace_id=payment.workspace_id,
         )
     except Exception as exc:
         logger.exception("Error generando PDF de factura %s: %s", invoice.invoice_number, exc)
@@ -1007,12 +1007,12 @@ async def send_payment_invoice_email(
     )
     invoice_settings = settings_q.scalar_one_or_none()
 
-    generator = InvoicePDFGenerator()
-    pdf_bytes = generator.generate(
+    pdf_bytes = await pdf_render.render_invoice(
         invoice=_invoice_to_pdf_dict(invoice),
         items=_items_to_pdf_dicts(invoice.items or []),
         settings=_invoice_settings_to_pdf_dict(invoice_settings),
         qr_data=invoice.verifactu_qr_data,
+        workspace_id=payment.workspace_id,
     )
 
     business_name = invoice_settings.business_name if invoice_settings else "Tu entrenador"
@@ -15,7 +15,7 @@ from app.models.client import Client
 from app.models.workspace import Workspace
 from app.models.user import User
 from app.middleware.auth import require_workspace, CurrentUser
-from app.services.pdf_generator import pdf_generator
+from app.services import meal_plan_macros, pdf_render
 
 router = APIRouter()
 
@@ -101,7 +101,7 @@ async def generate_diet_plan_pdf(
     
     # Generate PDF
     try:
-        pdf_bytes = pdf_generator.generate_diet_plan_pdf(
+        pdf_bytes = await pdf_render.render_diet_plan(
             plan_name=plan.name,
             client_name=client_name,
             trainer_name=trainer.full_name if trainer else "Entrenador",
@@ -110,7 +110,7 @@ async def generate_diet_plan_pdf(
             target_protein=plan.target_protein or 150,
             target_carbs=plan.target_carbs or 200,
             target_fat=plan.target_fat or 70,
-            days=plan.plan.get("days", []) if plan.plan else [],
+            days=meal_plan_macros.get_compiled(plan).export_days(),
             client_allergies=client_allergies,
             client_intolerances=client_intolerances,
             notes=data.notes or plan.description or "",
@@ -187,7 +187,7 @@ async def generate_workout_plan_pdf(
     
     # Generate PDF
     try:
-        pdf_bytes = pdf_generator.generate_workout_plan_pdf(
+        pdf_bytes = await pdf_render.render_workout_plan(
             plan_name=program.name,
             client_name=client_name,
             trainer_name=trainer.full_name if trainer else "Entrenador",
@@ -284,7 +284,7 @@ async def download_meal_plan_pdf(
     
     # Generate PDF
     try:
-        pdf_bytes = pdf_generator.generate_diet_plan_pdf(
+        pdf_bytes = await pdf_render.render_diet_plan(
             plan_name=plan.name,
             client_name=client_name,
             trainer_name=trainer.full_name if trainer else "Entrenador",
@@ -293,7 +293,7 @@ async def download_meal_plan_pdf(
             target_protein=plan.target_protein or 150,
             target_carbs=plan.target_carbs or 200,
             target_fat=plan.target_fat or 70,
-            days=plan.plan.get("days", []) if plan.plan else [],
+            days=meal_plan_macros.get_compiled(plan).export_days(),
             client_allergies=client_allergies,
             client_intolerances=client_intolerances,
             notes=plan.description or "",
@@ -0,0 +1,77 @@
+"""Realtime stream (server-sent events) for badges, messages and notifications."""
+import asyncio
+
+import orjson
+from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import realtime
+from app.core.database import AsyncSessionLocal, get_db
+from app.middleware.auth import get_current_user, CurrentUser
+from app.services import unread_counts
+
+router = APIRouter()
+
+# Comment line sent when idle so proxies (Coolify/Traefik, 60s default
+# read timeout) keep the connection open.
+_HEARTBEAT_SECONDS = 25.0
+# Reconnect delay suggested to the browser after a drop (ms).
+_RETRY_MS = 5000
+
+
+def _sse(event: str, data) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, default=str) + b"\n\n"
+
+
+async def _snapshot(current_user: CurrentUser) -> dict:
+    async with AsyncSessionLocal() as session:
+        if current_user.is_client():
+            messages = await unread_counts.client_messages(session, current_user.id, current_user.workspace_id)
+        elif current_user.workspace_id:
+            messages = await unread_counts.staff_messages(session, current_user.workspace_id)
+        else:
+            messages = 0
+        notifications = await unread_counts.notifications(session, current_user.id)
+    return {"messages": messages, "notifications": notifications}
+
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Canal de eventos en tiempo real (text/event-stream).
+
+    Envía un evento ``snapshot`` con los contadores iniciales y después
+    ``unread``, ``message``, ``message_status`` y ``notification`` a medida
+    que ocurren.
+    """
+    topics = [realtime.user_topic(current_user.id)]
+    if current_user.workspace_id and not current_user.is_client():
+        topics.append(realtime.staff_topic(current_user.workspace_id))
+
+    # The stream can stay open for hours: hand the request's connection back
+    # to the pool now instead of when the response finishes.
+    await db.close()
+
+    async def events():
+        async with realtime.subscribe(*topics) as queue:
+            # Subscribe before counting so no update falls in between.
+            yield f"retry: {_RETRY_MS}\n\n".encode()
+            yield _sse("snapshot", await _snapshot(current_user))
+            while not await request.is_disconnected():
+                try:
+                    message = await asyncio.wait_for(queue.get(), timeout=_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": ping\n\n"
+                    continue
+                yield _sse(message["event"], message["data"])
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
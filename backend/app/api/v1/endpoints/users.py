@@ -11,7 +11,8 @@ from app.core import ttl_cache
 from app.core.database import get_db
 from app.core.storage import resolve_url
 from app.core.config import settings
-from app.core.security import get_password_hash, generate_verification_token, validate_password_strength
+from app.core import password_hashing
+from app.core.security import generate_verification_token, validate_password_strength
 from app.models.user import User, UserRole, RoleType
 from app.models.workspace import Workspace
 from app.schemas.user import (
@@ -200,7 +201,7 @@ async def accept_staff_invite(
         )
 
     user.full_name = data.full_name
-    user.password_hash = get_password_hash(data.password)
+    user.password_hash = await password_hashing.hash_password(data.password)
     user.email_verified = True
     user.email_verification_token = None
 
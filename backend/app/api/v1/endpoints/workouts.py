@@ -1,4 +1,3 @@
-import asyncio
 import copy
 from datetime import date, datetime, timedelta
 from typing import List, Optional
@@ -6,7 +5,7 @@ from uuid import UUID
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, or_, func, String, update
+from sqlalchemy import select, or_, func, update
 from pydantic import BaseModel
 
 from app.core.database import get_db
@@ -15,6 +14,7 @@ from app.models.workout import WorkoutProgram, WorkoutLog
 from app.models.exercise import Exercise, ExerciseAlternative
 from app.models.client import Client
 from app.middleware.auth import require_workspace, require_staff, CurrentUser
+from app.services import catalog_snapshot, exercise_performance, workout_analytics
 from app.api.v1.endpoints.tasks import create_auto_task
 
 router = APIRouter()
@@ -137,56 +137,31 @@ async def list_exercises(
 ):
     """
     Listar ejercicios (globales y del workspace).
-    """
-    query = select(Exercise).where(
-        or_(
-            Exercise.workspace_id == current_user.workspace_id,
-            Exercise.is_global.is_(True)
-        )
-    )
-    
-    if search:
-        search_pattern = f"%{search}%"
-        alias_filter = Exercise.alias.isnot(None) & Exercise.alias.ilike(search_pattern)
-        query = query.where(
-            or_(
-                Exercise.name.ilike(search_pattern),
-                alias_filter,
-                Exercise.muscle_groups.cast(String).ilike(search_pattern),
-            )
-        )
-    
-    if muscle_group:
-        query = query.where(Exercise.muscle_groups.contains([muscle_group]))
 
+    Los globales salen del snapshot en memoria del catálogo
+    (``app.services.catalog_snapshot``); sólo los del workspace se leen de BD.
+    """
+    groups = [muscle_group] if muscle_group else []
     if muscle_groups:
-        groups = [g.strip() for g in muscle_groups.split(",") if g.strip()]
-        for group in groups:
-            query = query.where(Exercise.muscle_groups.contains([group]))
-
-    if equipment:
-        query = query.where(Exercise.equipment.contains([equipment]))
-    
-    if category:
-        query = query.where(Exercise.category == category)
-    
-    result = await db.execute(query.order_by(Exercise.name))
-    exercises = result.scalars().all()
-
-    # Resuelve todas las URLs (image + thumbnail) en paralelo en lugar de
-    # secuencial: con 100+ ejercicios esto recorta fácilmente >500ms ya que
-    # cada presign R2 hace un run_in_executor individual.
-    urls_to_resolve = []
-    for e in exercises:
-        urls_to_resolve.append(e.image_url)
-        urls_to_resolve.append(e.thumbnail_url)
-    resolved = await asyncio.gather(*(resolve_url(u) for u in urls_to_resolve))
+        groups.extend(g.strip() for g in muscle_groups.split(",") if g.strip())
+
+    exercises = await catalog_snapshot.list_exercises(
+        db,
+        current_user.workspace_id,
+        search=search,
+        muscle_groups=groups,
+        equipment=equipment,
+        category=category,
+    )
 
+    # La firma de URLs R2 es síncrona y cacheada (ver app.core.storage), así
+    # que se resuelven en línea: un asyncio.gather creaba 2 tareas por
+    # ejercicio, que con el catálogo completo costaban más que la firma.
     items = []
-    for idx, e in enumerate(exercises):
+    for e in exercises:
         resp = ExerciseResponse.model_validate(e)
-        resp.image_url = resolved[idx * 2]
-        resp.thumbnail_url = resolved[idx * 2 + 1]
+        resp.image_url = await resolve_url(e.image_url)
+        resp.thumbnail_url = await resolve_url(e.thumbnail_url)
         items.append(resp)
     return items
 
@@ -967,6 +942,8 @@ async def create_workout_log(
         log=data.log
     )
     db.add(log)
+    await db.flush()
+    await exercise_performance.record(db, log)
     await db.commit()
     await db.refresh(log)
     return log
@@ -1007,6 +984,49 @@ async def get_client_logs(
     return result.scalars().all()
 
 
+# ============ ANALYTICS ============
+
+async def _ensure_client(db: AsyncSession, client_id: UUID, workspace_id: UUID) -> None:
+    client_check = await db.execute(
+        select(Client.id).where(
+            Client.id == client_id,
+            Client.workspace_id == workspace_id,
+        )
+    )
+    if not client_check.scalar_one_or_none():
+        raise HTTPException(status_code=404, detail="Cliente no encontrado")
+
+
+@router.get("/analytics/{client_id}/records")
+async def get_client_personal_records(
+    client_id: UUID,
+    current_user: CurrentUser = Depends(require_workspace),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Récords personales del cliente por ejercicio: mejor serie (1RM estimado),
+    sesiones y tonelaje acumulado.
+    """
+    await _ensure_client(db, client_id, current_user.workspace_id)
+    return await workout_analytics.personal_records(db, client_id)
+
+
+@router.get("/analytics/{client_id}/exercises/{exercise_id}")
+async def get_client_exercise_progress(
+    client_id: UUID,
+    exercise_id: str,
+    weeks: int = Query(26, ge=1, le=156),
+    current_user: CurrentUser = Depends(require_workspace),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Progresión semanal de un ejercicio (series, repeticiones, tonelaje, peso
+    máximo y 1RM estimado) de las últimas `weeks` semanas, más sus récords.
+    """
+    await _ensure_client(db, client_id, current_user.workspace_id)
+    return await workout_analytics.exercise_progress(db, client_id, exercise_id, weeks)
+
+
 # ============ AUTO-ACTIVATION ============
 
 @router.post("/auto-activate")
@@ -7,6 +7,7 @@ from app.api.v1.endpoints import (
     live_classes, ai, wearables, reminders, health, invitations, client_portal, account,
     whatsapp, google_calendar, storage, tasks, team_groups, rectifications, beverages, stock,
     boxes, machines, services, appointments, time_clock, schedules, suppliers,
+    realtime,
 )
 
 api_router = APIRouter()
@@ -47,6 +48,9 @@ api_router.include_router(forms.router, prefix="/forms", tags=["Formularios"])
 # Messages (Chat)
 api_router.include_router(messages.router, prefix="/messages", tags=["Mensajes"])
 
+# Realtime (SSE push of badges, messages and notifications)
+api_router.include_router(realtime.router, prefix="/realtime", tags=["Tiempo real"])
+
 # Documents & Progress Photos
 api_router.include_router(documents.router, prefix="/documents", tags=["Documentos"])
 
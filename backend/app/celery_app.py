@@ -29,6 +29,8 @@ celery_app = Celery(
         "app.tasks.reports",
         "app.tasks.payments",
         "app.tasks.reminders",
+        "app.tasks.calendar_sync",
+        "app.tasks.verifactu",
     ],
 )
 
@@ -94,6 +96,8 @@ celery_app.conf.task_routes = {
     "app.tasks.reports.*": {"queue": "reports"},
     "app.tasks.payments.*": {"queue": "payments"},
     "app.tasks.reminders.*": {"queue": "notifications"},
+    "app.tasks.calendar_sync.*": {"queue": "calendar"},
+    "app.tasks.verifactu.*": {"queue": "verifactu"},
 }
 
 celery_app.conf.beat_schedule = {
@@ -147,6 +151,16 @@ celery_app.conf.beat_schedule = {
         "schedule": crontab(hour=3, minute=0, day_of_week=0),
         "options": {"queue": "notifications"},
     },
+    "flush-calendar-sync-outbox": {
+        "task": "app.tasks.calendar_sync.flush_calendar_sync_outbox",
+        "schedule": crontab(minute="*"),
+        "options": {"queue": "calendar"},
+    },
+    "flush-verifactu-queue": {
+        "task": "app.tasks.verifactu.flush_verifactu_queue",
+        "schedule": crontab(minute="*"),
+        "options": {"queue": "verifactu"},
+    },
     "process-due-reminders": {
         "task": "app.tasks.reminders.process_due_reminders",
         "schedule": crontab(minute=0),
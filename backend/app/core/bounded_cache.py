@@ -0,0 +1,246 @@
+"""Bounded in-process LRU/TTL cache with size accounting.
+
+Building block for the per-worker caches (``ttl_cache`` tier 1, presigned
+URLs in ``core.storage``). Both used to be plain dicts: one never evicted idle
+keys and the other sorted the whole map every time it filled up.
+
+- ``get`` / ``set`` / ``pop`` are O(1): an ``OrderedDict`` keeps LRU order.
+- Entries expire after their TTL. Reads drop expired entries lazily, and a
+  background sweeper walks a min-heap of expiry times so idle keys are freed
+  without anyone reading them.
+- Capacity is bounded by entry count AND an approximate byte budget; the
+  least recently used entries go first.
+- String keys are indexed by every ``sep``-terminated prefix, so
+  ``invalidate_prefix("auth:me:<uid>:")`` touches only the matching keys.
+
+Not thread-safe: every cache lives on the event loop of its worker.
+"""
+from __future__ import annotations
+
+import asyncio
+import heapq
+import logging
+import sys
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterator, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Registry of live caches for the shared sweeper task.
+_INSTANCES: "weakref.WeakSet[BoundedCache]" = weakref.WeakSet()
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+def approx_size(value: Any, _depth: int = 0) -> int:
+    """Rough deep ``sys.getsizeof`` for JSON-like values.
+
+    Containers are followed three levels down; anything deeper or opaque
+    (ORM instances, etc.) counts only its shallow size.
+    """
+    size = sys.getsizeof(value)
+    if _depth >= 3:
+        return size
+    if isinstance(value, dict):
+        for k, v in value.items():
+            size += approx_size(k, _depth + 1) + approx_size(v, _depth + 1)
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        for item in value:
+            size += approx_size(item, _depth + 1)
+    return size
+
+
+class BoundedCache:
+    """LRU cache with per-entry TTL, entry/byte limits and a prefix index."""
+
+    __slots__ = (
+        "name", "max_entries", "max_bytes", "sep", "_sizeof",
+        "_data", "_expiry_heap", "_prefixes", "_bytes",
+        "evictions", "expirations", "__weakref__",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_entries: int,
+        max_bytes: Optional[int] = None,
+        sep: Optional[str] = None,
+        sizeof: Callable[[Any], int] = approx_size,
+    ):
+        self.name = name
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sep = sep
+        self._sizeof = sizeof
+        # key -> (expires_at, value, size)
+        self._data: "OrderedDict[Hashable, Tuple[float, Any, int]]" = OrderedDict()
+        self._expiry_heap: List[Tuple[float, int, Hashable]] = []
+        self._prefixes: Dict[str, Set[str]] = {}
+        self._bytes = 0
+        self.evictions = 0
+        self.expirations = 0
+        _INSTANCES.add(self)
+
+    # ------------------------------------------------------------------ core
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return default
+        if entry[0] <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            return default
+        self._data.move_to_end(key)
+        return entry[1]
+
+    def set(self, key: Hashable, value: Any, ttl: float) -> None:
+        expires_at = time.monotonic() + ttl
+        size = self._sizeof(key) + self._sizeof(value)
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (expires_at, value, size)
+        self._bytes += size
+        self._index(key)
+        # id() breaks ties so keys of mixed types never get compared.
+        heapq.heappush(self._expiry_heap, (expires_at, id(key), key))
+        self._enforce_limits()
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        if key not in self._data:
+            return default
+        return self._remove(key)
+
+    def invalidate_prefix(self, prefix: str) -> int:
+        """Drop every string key starting with ``prefix``. Returns the count.
+
+        Prefixes ending in ``sep`` are served from the index; anything else
+        falls back to a scan.
+        """
+        if self.sep and prefix.endswith(self.sep):
+            victims = list(self._prefixes.get(prefix, ()))
+        else:
+            victims = [k for k in self._data if isinstance(k, str) and k.startswith(prefix)]
+        for key in victims:
+            self._remove(key)
+        return len(victims)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._expiry_heap.clear()
+        self._prefixes.clear()
+        self._bytes = 0
+
+    def sweep(self, limit: int = 10_000) -> int:
+        """Remove up to ``limit`` expired entries, oldest expiry first."""
+        now = time.monotonic()
+        heap = self._expiry_heap
+        removed = 0
+        while heap and heap[0][0] <= now and removed < limit:
+            expires_at, _, key = heapq.heappop(heap)
+            entry = self._data.get(key)
+            # Stale heap node: the key was overwritten, evicted or dropped.
+            if entry is None or entry[0] != expires_at:
+                continue
+            self._remove(key)
+            self.expirations += 1
+            removed += 1
+        # Overwrites leave dead nodes behind; rebuild once they dominate.
+        if len(heap) > 2 * len(self._data) + 1024:
+            self._expiry_heap = [(e[0], id(k), k) for k, e in self._data.items()]
+            heapq.heapify(self._expiry_heap)
+        return removed
+
+    # ------------------------------------------------------------- internals
+
+    def _remove(self, key: Hashable) -> Any:
+        _, value, size = self._data.pop(key)
+        self._bytes -= size
+        self._unindex(key)
+        return value
+
+    def _enforce_limits(self) -> None:
+        data = self._data
+        while len(data) > self.max_entries or (
+            self.max_bytes is not None and self._bytes > self.max_bytes and len(data) > 1
+        ):
+            key, (_, _, size) = data.popitem(last=False)
+            self._bytes -= size
+            self._unindex(key)
+            self.evictions += 1
+
+    def _key_prefixes(self, key: Hashable) -> Iterator[str]:
+        if not self.sep or not isinstance(key, str):
+            return
+        pos = key.find(self.sep)
+        while pos != -1:
+            yield key[: pos + 1]
+            pos = key.find(self.sep, pos + 1)
+
+    def _index(self, key: Hashable) -> None:
+        for prefix in self._key_prefixes(key):
+            self._prefixes.setdefault(prefix, set()).add(key)
+
+    def _unindex(self, key: Hashable) -> None:
+        for prefix in self._key_prefixes(key):
+            bucket = self._prefixes.get(prefix)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._prefixes[prefix]
+
+    # ---------------------------------------------------------------- dunder
+
+    def __contains__(self, key: Hashable) -> bool:
+        entry = self._data.get(key)
+        return entry is not None and entry[0] > time.monotonic()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    @property
+    def nbytes(self) -> int:
+        return self._bytes
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+# ---------------------------------------------------------------------------
+# Background sweeper (one task per worker, started from the FastAPI lifespan)
+# ---------------------------------------------------------------------------
+
+async def _sweep_forever(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        for cache in list(_INSTANCES):
+            try:
+                cache.sweep()
+            except Exception:
+                logger.exception("bounded_cache: sweep failed for %s", cache.name)
+
+
+def start_sweeper(interval: float = 30.0) -> None:
+    global _sweeper_task
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.get_running_loop().create_task(_sweep_forever(interval))
+
+
+async def stop_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is not None:
+        _sweeper_task.cancel()
+        try:
+            await _sweeper_task
+        except asyncio.CancelledError:
+            pass
+        _sweeper_task = None
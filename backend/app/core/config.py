@@ -72,10 +72,96 @@ class Settings(BaseSettings):
     DATABASE_POOL_SIZE: int = 10
     DATABASE_POOL_MAX_OVERFLOW: int = 10
     DATABASE_POOL_RECYCLE_SECONDS: int = 1800  # 30m — matches Supabase PgBouncer idle
+    # Per-request SQL instrumentation (app.core.database.track_queries): statement
+    # count, DB time and pool wait go to the access log and, optionally, to a
+    # Server-Timing header. A statement shape repeated more than
+    # DB_REPEATED_STATEMENT_WARN times in one request is logged as a likely N+1.
+    DB_QUERY_STATS_ENABLED: bool = True
+    DB_SERVER_TIMING: bool = True
+    DB_REPEATED_STATEMENT_WARN: int = 10
     
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
+
+    # Hot-path cache (app.core.ttl_cache). The in-process tier is bounded to
+    # this many entries and roughly this many bytes; the Redis tier is shared
+    # by every worker and can be switched off for dev boxes without Redis.
+    CACHE_L1_MAX_ENTRIES: int = 10000
+    CACHE_L1_MAX_BYTES: int = 32 * 1024 * 1024
+    CACHE_REDIS_ENABLED: bool = True
+
+    # Password hashing (app.core.password_hashing). bcrypt runs in a pool of
+    # PASSWORD_HASH_WORKERS threads per process; with PASSWORD_HASH_MAX_PENDING
+    # operations already queued, new ones get a 503 + Retry-After instead of
+    # piling up. Hashes below PASSWORD_BCRYPT_ROUNDS are upgraded on login.
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32
+    PASSWORD_BCRYPT_ROUNDS: int = 12
+
+    # Renderizado de PDFs (app.services.pdf_render): ReportLab corre en un pool
+    # de PDF_RENDER_WORKERS procesos con los módulos ya importados (0 = hilo
+    # del executor, p. ej. en tests). Los PDFs se cachean por hash del
+    # contenido durante PDF_RENDER_CACHE_TTL_SECONDS y los de facturas
+    # emitidas se guardan en R2 para no volver a generarlos.
+    PDF_RENDER_WORKERS: int = 2
+    PDF_RENDER_CACHE_TTL_SECONDS: int = 600
+    PDF_RENDER_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    PDF_RENDER_ARCHIVE_INVOICES: bool = True
+
+    # Per-worker snapshot of the global food/exercise catalogs
+    # (app.services.catalog_snapshot). Changed rows are pulled at most every
+    # CATALOG_REFRESH_SECONDS and everything is reloaded every
+    # CATALOG_FULL_RELOAD_SECONDS. Food listings merge in memory only while
+    # the workspace has at most CATALOG_MERGE_MAX_ROWS foods of its own.
+    CATALOG_SNAPSHOT_ENABLED: bool = True
+    CATALOG_REFRESH_SECONDS: int = 60
+    CATALOG_FULL_RELOAD_SECONDS: int = 3600
+    CATALOG_MERGE_MAX_ROWS: int = 500
     
+    # Google Calendar sync queue (app.services.calendar_sync). Booking changes
+    # wait CALENDAR_SYNC_DEBOUNCE_SECONDS so bursts of edits coalesce, go to
+    # Google in batches of CALENDAR_SYNC_BATCH_SIZE and are retried with
+    # exponential backoff (base..max seconds) up to CALENDAR_SYNC_MAX_ATTEMPTS.
+    CALENDAR_SYNC_DEBOUNCE_SECONDS: float = 3.0
+    CALENDAR_SYNC_BATCH_SIZE: int = 50
+    CALENDAR_SYNC_MAX_ATTEMPTS: int = 8
+    CALENDAR_SYNC_RETRY_BASE_SECONDS: float = 30.0
+    CALENDAR_SYNC_RETRY_MAX_SECONDS: float = 3600.0
+    CALENDAR_SYNC_STUCK_SECONDS: int = 600
+    CALENDAR_SYNC_RETENTION_DAYS: int = 7
+
+    # Cola de envío VeriFactu (app.services.verifactu_queue). Los registros
+    # esperan VERIFACTU_DEBOUNCE_SECONDS para agruparse, viajan a AEAT en
+    # envíos de hasta VERIFACTU_BATCH_SIZE (máximo AEAT: 1000) respetando el
+    # TiempoEsperaEnvio devuelto (o VERIFACTU_DEFAULT_WAIT_SECONDS), y los
+    # fallos de transporte se reintentan con backoff hasta MAX_ATTEMPTS.
+    VERIFACTU_DEBOUNCE_SECONDS: float = 5.0
+    VERIFACTU_BATCH_SIZE: int = 1000
+    VERIFACTU_DEFAULT_WAIT_SECONDS: int = 60
+    VERIFACTU_MAX_ATTEMPTS: int = 10
+    VERIFACTU_RETRY_BASE_SECONDS: float = 60.0
+    VERIFACTU_RETRY_MAX_SECONDS: float = 3600.0
+    VERIFACTU_STUCK_SECONDS: int = 600
+    VERIFACTU_RETENTION_DAYS: int = 30
+
+    # Clientes mTLS hacia AEAT (app.services.aeat_pool): uno por workspace con
+    # el certificado ya cargado y conexiones keep-alive, que se reconstruye al
+    # cambiar el certificado o pasados AEAT_CLIENT_TTL_SECONDS.
+    AEAT_CLIENT_TTL_SECONDS: int = 900
+    AEAT_CLIENT_POOL_SIZE: int = 32
+    AEAT_MAX_CONNECTIONS: int = 4
+    AEAT_KEEPALIVE_SECONDS: float = 60.0
+    AEAT_TIMEOUT_SECONDS: float = 30.0
+
+    # Lectura de eventos de Google (GoogleCalendarService.get_all_user_events):
+    # calendarios en paralelo (hasta N a la vez), sincronización incremental
+    # con syncToken sobre la ventana [-PAST_DAYS, +FUTURE_DAYS] y copia local
+    # que se da por buena durante CACHE_SECONDS o hasta que llegue un webhook.
+    GOOGLE_CALENDAR_FETCH_CONCURRENCY: int = 4
+    GOOGLE_EVENTS_CACHE_SECONDS: int = 300
+    GOOGLE_EVENTS_PAST_DAYS: int = 30
+    GOOGLE_EVENTS_FUTURE_DAYS: int = 180
+
     # Stripe
     STRIPE_SECRET_KEY: str = ""
     STRIPE_WEBHOOK_SECRET: str = ""
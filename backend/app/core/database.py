@@ -1,9 +1,16 @@
 import logging
+import re
 import ssl
-from typing import AsyncGenerator
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from typing import AsyncGenerator, Iterator, List, Optional, Tuple
 
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 
 logger = logging.getLogger(__name__)
 
@@ -129,6 +136,161 @@ AsyncSessionLocal = async_sessionmaker(
 logger.info("Database URL configured (host hidden for security)")
 
 
+# ---------------------------------------------------------------------------
+# Per-request query statistics
+# ---------------------------------------------------------------------------
+#
+# ``track_queries()`` opens a scope (one per HTTP request, see the access log
+# middleware) and the engine hooks below add every statement executed inside
+# it: count, time spent in the driver, time spent acquiring a pooled
+# connection and how often each statement *shape* ran. The scope lives in a
+# ContextVar, which reaches the driver because SQLAlchemy's greenlets inherit
+# the caller's context, and ``parallel_queries`` tasks copy it.
+
+_PARAM_RE = re.compile(r"\$\d+|%\(\w+\)s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+_IN_LIST_RE = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_SPACE_RE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def statement_fingerprint(statement: str) -> str:
+    """Statement shape: literals and bind parameters replaced by ``?``.
+
+    IN lists of any length collapse to ``(?...)`` so a loop issuing
+    ``WHERE id IN (...)`` with varying sizes still counts as one shape.
+    """
+    shape = _SPACE_RE.sub(" ", statement).strip()
+    shape = _PARAM_RE.sub("?", shape)
+    return _IN_LIST_RE.sub("(?...)", shape)
+
+
+class QueryStats:
+    """SQL issued within one ``track_queries()`` scope."""
+
+    __slots__ = ("statements", "db_seconds", "pool_seconds", "shapes", "_acquire_started")
+
+    def __init__(self) -> None:
+        self.statements = 0
+        self.db_seconds = 0.0
+        self.pool_seconds = 0.0
+        self.shapes: Counter = Counter()
+        self._acquire_started: Optional[float] = None
+
+    @property
+    def db_ms(self) -> float:
+        return self.db_seconds * 1000
+
+    @property
+    def pool_ms(self) -> float:
+        return self.pool_seconds * 1000
+
+    def merge(self, other: "QueryStats") -> None:
+        self.statements += other.statements
+        self.db_seconds += other.db_seconds
+        self.pool_seconds += other.pool_seconds
+        self.shapes.update(other.shapes)
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Statement shapes executed more than ``threshold`` times."""
+        return [(shape, n) for shape, n in self.shapes.most_common() if n > threshold]
+
+    def server_timing(self, total_ms: Optional[float] = None) -> str:
+        parts = [
+            f'db;dur={self.db_ms:.1f};desc="{self.statements} queries"',
+            f"pool;dur={self.pool_ms:.1f}",
+        ]
+        if total_ms is not None:
+            parts.append(f"app;dur={total_ms:.1f}")
+        return ", ".join(parts)
+
+
+_query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Collect the statements executed in this context (and tasks it spawns).
+
+    Scopes nest: on exit an inner scope is added to the enclosing one, so a
+    caller wrapping a whole request (the benchmark runner) still sees what
+    the access log middleware measured.
+    """
+    parent = _query_stats.get()
+    stats = QueryStats()
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
+        if parent is not None:
+            parent.merge(stats)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    return _query_stats.get()
+
+
+def _mark_acquire(orm_execute_state) -> None:
+    # The session may check out a connection for this statement; "checkout"
+    # below closes the interval (queueing on the pool + connect + pre-ping).
+    stats = _query_stats.get()
+    if stats is not None:
+        stats._acquire_started = time.perf_counter()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    stats = _query_stats.get()
+    if stats is not None and stats._acquire_started is not None:
+        stats.pool_seconds += time.perf_counter() - stats._acquire_started
+        stats._acquire_started = None
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _query_stats.get()
+    if stats is None:
+        return
+    stats._acquire_started = None
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _query_stats.get()
+    if stats is None:
+        return
+    started = conn.info.get("query_started")
+    if started:
+        stats.db_seconds += time.perf_counter() - started.pop()
+    stats.statements += 1
+    stats.shapes[statement_fingerprint(statement)] += 1
+
+
+def _on_error(exception_context) -> None:
+    # Failed statements never reach after_cursor_execute: drop their start mark.
+    conn = exception_context.connection
+    if conn is not None and _query_stats.get() is not None:
+        started = conn.info.get("query_started")
+        if started:
+            started.pop()
+
+
+def install_query_stats() -> None:
+    """Register the engine hooks (idempotent)."""
+    hooks = (
+        (Session, "do_orm_execute", _mark_acquire),
+        (engine.sync_engine, "checkout", _on_checkout),
+        (engine.sync_engine, "before_cursor_execute", _before_cursor_execute),
+        (engine.sync_engine, "after_cursor_execute", _after_cursor_execute),
+        (engine.sync_engine, "handle_error", _on_error),
+    )
+    for target, name, fn in hooks:
+        if not event.contains(target, name, fn):
+            event.listen(target, name, fn)
+
+
+if settings.DB_QUERY_STATS_ENABLED:
+    install_query_stats()
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
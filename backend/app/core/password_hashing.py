@@ -0,0 +1,183 @@
+"""Password hashing off the event loop.
+
+``bcrypt`` costs 100-250 ms of CPU per call at 12 rounds. Called directly
+from the ``async def`` endpoints it froze the whole worker: during a login
+burst (Monday mornings, class check-ins) every other request on the process
+waited behind the hashes.
+
+- Hashing and verification run in a dedicated pool of
+  ``PASSWORD_HASH_WORKERS`` threads (bcrypt releases the GIL), so the loop
+  keeps serving and hashes never starve the default executor that storage
+  and email use.
+- Admission control: with ``PASSWORD_HASH_MAX_PENDING`` operations already
+  waiting or running, new ones fail fast with 503 + ``Retry-After`` instead
+  of queueing for seconds.
+- :func:`stats` (shown in ``/health/deep``) reports queue depth, peak,
+  rejections and queue-wait / hash latency percentiles.
+- :func:`verify_and_upgrade` re-hashes on login when the stored cost differs
+  from ``PASSWORD_BCRYPT_ROUNDS``, only while the pool has idle threads, so a
+  work-factor change rolls out with normal logins instead of a spike.
+
+Like the rest of the per-worker state, the counters live on the event loop.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+from app.core import security
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_RETRY_AFTER_SECONDS = 2
+# Latency samples kept per operation for the percentiles
+_SAMPLES = 512
+
+
+class PasswordHashingBusy(HTTPException):
+    """Too many password operations queued on this worker."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Hay muchos inicios de sesión en este momento. Inténtalo de nuevo en unos segundos.",
+            headers={"Retry-After": str(_RETRY_AFTER_SECONDS)},
+        )
+
+
+class _OpStats:
+    __slots__ = ("count", "wait_ms", "run_ms")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.wait_ms: Deque[float] = deque(maxlen=_SAMPLES)
+        self.run_ms: Deque[float] = deque(maxlen=_SAMPLES)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"count": self.count, "wait_ms": _percentiles(self.wait_ms), "run_ms": _percentiles(self.run_ms)}
+
+
+def _percentiles(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"p50": 0.0, "p95": 0.0, "max": 0.0}
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return {"p50": round(ordered[len(ordered) // 2], 1), "p95": round(p95, 1), "max": round(ordered[-1], 1)}
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_pending = 0
+_peak_pending = 0
+_rejected = 0
+_rehashed = 0
+_ops: Dict[str, _OpStats] = {"verify": _OpStats(), "hash": _OpStats()}
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash"
+        )
+    return _executor
+
+
+def _release(op: str, queued: float, future: Future) -> None:
+    global _pending
+    _pending -= 1
+    if future.cancelled() or future.exception() is not None:
+        return
+    _, started, finished = future.result()
+    stats = _ops[op]
+    stats.count += 1
+    stats.wait_ms.append((started - queued) * 1000)
+    stats.run_ms.append((finished - started) * 1000)
+
+
+async def _run(op: str, fn: Callable[..., Any], *args: Any) -> Any:
+    global _pending, _peak_pending, _rejected
+    if _pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        _rejected += 1
+        logger.warning("password hashing saturated (%d pending): rejecting %s", _pending, op)
+        raise PasswordHashingBusy()
+
+    def job() -> Tuple[Any, float, float]:
+        started = time.perf_counter()
+        return fn(*args), started, time.perf_counter()
+
+    loop = asyncio.get_running_loop()
+    queued = time.perf_counter()
+    future = _get_executor().submit(job)
+    _pending += 1
+    _peak_pending = max(_peak_pending, _pending)
+    # The slot is freed when the thread is done, not when the caller stops
+    # waiting (a cancelled request does not shorten the queue).
+    future.add_done_callback(lambda f: loop.call_soon_threadsafe(_release, op, queued, f))
+    result, _, _ = await asyncio.wrap_future(future)
+    return result
+
+
+async def verify_password(plain_password: str, hashed_password: Optional[str]) -> bool:
+    """:func:`app.core.security.verify_password` in the hashing pool."""
+    if not hashed_password:
+        return False
+    return await _run("verify", security.verify_password, plain_password, hashed_password)
+
+
+async def hash_password(password: str) -> str:
+    """:func:`app.core.security.get_password_hash` in the hashing pool."""
+    return await _run("hash", security.get_password_hash, password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Whether a ``$2b$<cost>$...`` hash was made with another work factor."""
+    try:
+        return int(hashed_password.split("$")[2]) != security.BCRYPT_ROUNDS
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+async def verify_and_upgrade(plain_password: str, hashed_password: Optional[str]) -> Tuple[bool, Optional[str]]:
+    """Verify a login and, if the hash is outdated, return a replacement.
+
+    Returns ``(valid, new_hash)``. ``new_hash`` is ``None`` unless the
+    password is valid, its cost differs from the current one and the pool
+    has an idle thread right now; the caller stores it.
+    """
+    global _rehashed
+    if not await verify_password(plain_password, hashed_password):
+        return False, None
+    if not needs_rehash(hashed_password) or _pending >= settings.PASSWORD_HASH_WORKERS:
+        return True, None
+    try:
+        new_hash = await hash_password(plain_password)
+    except PasswordHashingBusy:
+        return True, None
+    _rehashed += 1
+    return True, new_hash
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "workers": settings.PASSWORD_HASH_WORKERS,
+        "max_pending": settings.PASSWORD_HASH_MAX_PENDING,
+        "pending": _pending,
+        "peak_pending": _peak_pending,
+        "rejected": _rejected,
+        "rehashed": _rehashed,
+        **{op: op_stats.snapshot() for op, op_stats in _ops.items()},
+    }
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
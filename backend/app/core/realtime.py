@@ -0,0 +1,212 @@
+"""Per-user server push (unread badges, new messages, notifications).
+
+The sidebar, the client app and the notification bell used to poll their
+unread-count endpoints. Instead, a browser opens one long-lived stream
+(``GET /api/v1/realtime/stream``) and write paths publish events to it.
+
+Events are addressed to a *topic*:
+
+- ``user:<user_id>``: one person (client badges, notification counts);
+- ``staff:<workspace_id>``: every staff member of a workspace (inbox badge,
+  new conversations/messages).
+
+Each worker keeps the subscribers it serves in memory. Publishing goes
+through one Redis pub/sub channel so an event reaches the worker that holds
+the socket, whichever worker handled the write. Without Redis (local dev, or
+while it is unreachable) events are delivered to this worker's subscribers
+only, and clients fall back to their slow poll.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional, Set
+from uuid import UUID
+
+import orjson
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_CHANNEL = "rt:events"
+# Events a slow subscriber may fall behind before the oldest are dropped.
+# Badge events carry absolute counts, so dropping stale ones is harmless.
+_QUEUE_SIZE = 64
+_RECONNECT_SECONDS = 5.0
+
+_subscribers: Dict[str, Set[asyncio.Queue]] = {}
+_redis = None
+_connected = False
+_listener_task: Optional[asyncio.Task] = None
+_pending: Set[asyncio.Task] = set()
+_published = 0
+_dropped = 0
+
+
+def user_topic(user_id: UUID) -> str:
+    return f"user:{user_id}"
+
+
+def staff_topic(workspace_id: UUID) -> str:
+    return f"staff:{workspace_id}"
+
+
+# ---------------------------------------------------------------------------
+# Publishing
+# ---------------------------------------------------------------------------
+
+def publish(topic: str, event: str, data: Any) -> None:
+    """Send ``event`` to every subscriber of ``topic`` on any worker.
+
+    Fire-and-forget: never raises and never blocks the caller. ``data``
+    must be JSON-serialisable.
+    """
+    global _published
+    _published += 1
+    message = {"topic": topic, "event": event, "data": data, "ts": time.time()}
+    if _connected:
+        _schedule(_publish_remote(message))
+    else:
+        _dispatch(message)
+
+
+async def _publish_remote(message: dict) -> None:
+    try:
+        await _redis.publish(_CHANNEL, orjson.dumps(message, default=str))
+    except Exception as exc:
+        logger.warning("realtime: publish failed (%s), delivering locally", exc)
+        _dispatch(message)
+
+
+def _schedule(coro) -> None:
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coro.close()
+        return
+    task = loop.create_task(coro)
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+def _dispatch(message: dict) -> None:
+    global _dropped
+    for queue in _subscribers.get(message.get("topic"), ()):
+        if queue.full():
+            try:
+                queue.get_nowait()
+                _dropped += 1
+            except asyncio.QueueEmpty:
+                pass
+        queue.put_nowait(message)
+
+
+# ---------------------------------------------------------------------------
+# Subscribing
+# ---------------------------------------------------------------------------
+
+@asynccontextmanager
+async def subscribe(*topics: str) -> AsyncIterator[asyncio.Queue]:
+    """Queue receiving the messages of ``topics`` while the context is open."""
+    queue: asyncio.Queue = asyncio.Queue(maxsize=_QUEUE_SIZE)
+    for topic in topics:
+        _subscribers.setdefault(topic, set()).add(queue)
+    try:
+        yield queue
+    finally:
+        for topic in topics:
+            bucket = _subscribers.get(topic)
+            if bucket is not None:
+                bucket.discard(queue)
+                if not bucket:
+                    del _subscribers[topic]
+
+
+def stats() -> Dict[str, Any]:
+    return {
+        "redis": "connected" if _connected else "local-only",
+        "topics": len(_subscribers),
+        "subscribers": sum(len(b) for b in _subscribers.values()),
+        "published": _published,
+        "dropped": _dropped,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle (called from the FastAPI lifespan)
+# ---------------------------------------------------------------------------
+
+async def _listen() -> None:
+    """Deliver events published by any worker to local subscribers."""
+    global _connected
+    import redis.asyncio as async_redis
+
+    client = async_redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, health_check_interval=30)
+    try:
+        while True:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(_CHANNEL)
+                _connected = True
+                async for message in pubsub.listen():
+                    try:
+                        data = orjson.loads(message["data"])
+                    except (orjson.JSONDecodeError, TypeError, KeyError):
+                        continue
+                    _dispatch(data)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.warning("realtime: listener lost (%s), retrying", exc)
+                await asyncio.sleep(_RECONNECT_SECONDS)
+            finally:
+                _connected = False
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+    finally:
+        await client.aclose()
+
+
+async def start() -> None:
+    global _redis, _listener_task
+    if not settings.CACHE_REDIS_ENABLED or not settings.REDIS_URL:
+        logger.info("realtime: Redis disabled, delivering events per worker")
+        return
+    import redis.asyncio as async_redis
+
+    client = async_redis.from_url(
+        settings.REDIS_URL,
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5,
+        health_check_interval=30,
+    )
+    try:
+        await client.ping()
+    except Exception as exc:
+        logger.warning("realtime: Redis not reachable (%s), delivering events per worker", exc)
+        await client.aclose()
+        return
+    _redis = client
+    _listener_task = asyncio.create_task(_listen())
+
+
+async def stop() -> None:
+    global _redis, _listener_task, _connected
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _listener_task = None
+    _connected = False
+    if _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
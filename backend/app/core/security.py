@@ -17,7 +17,7 @@ REFRESH_TOKEN_EXPIRE_DAYS = 30  # 30 days
 
 # Password validation
 PASSWORD_MIN_LENGTH = 8
-BCRYPT_ROUNDS = 12  # Recommended: 12 rounds for good security/performance balance
+BCRYPT_ROUNDS = settings.PASSWORD_BCRYPT_ROUNDS  # 12 by default: good security/performance balance
 
 
 class TokenPayload(BaseModel):
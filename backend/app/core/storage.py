@@ -21,9 +21,9 @@ trackfiz-workspaces  (R2_WORKSPACES_BUCKET)
     w/{workspace_id}/exercises/{file}
     w/{workspace_id}/recipes/{file}
     w/{workspace_id}/lms/{file}
+    w/{workspace_id}/invoices/{invoice_id}/{content_hash}.pdf
 """
 import asyncio
-import time
 import uuid as _uuid
 import logging
 from functools import partial
@@ -32,6 +32,7 @@ from typing import Optional
 import boto3
 from botocore.config import Config as BotoConfig
 
+from app.core.bounded_cache import BoundedCache
 from app.core.config import settings
 
 logger = logging.getLogger(__name__)
@@ -44,10 +45,11 @@ WORKSPACE_PRESIGN_TTL = 900      # 15 min for user-generated content
 # Cache en memoria de URLs firmadas. Las respuestas de un endpoint que devuelve
 # 100 ejercicios hacían 200 presigns; ahora con cache reusamos la URL durante
 # la mitad del TTL (margen de seguridad frente a drift) y evitamos el
-# `run_in_executor` por entrada. Mapa: (bucket, key) -> (url, expires_epoch).
-_PRESIGN_CACHE: dict[tuple[str, str], tuple[str, float]] = {}
+# `run_in_executor` por entrada. Clave: (bucket, key) -> url. LRU acotado con
+# expulsión O(1); el sweeper de fondo libera las entradas caducadas.
 _PRESIGN_CACHE_MAX = 4096
 _PRESIGN_CACHE_RATIO = 0.5       # reutilizamos la URL como mucho TTL * ratio
+_PRESIGN_CACHE = BoundedCache("presign", max_entries=_PRESIGN_CACHE_MAX)
 
 
 def _get_s3():
@@ -72,6 +74,14 @@ def _sync_put(bucket: str, key: str, body: bytes, content_type: str):
     _get_s3().put_object(Bucket=bucket, Key=key, Body=body, ContentType=content_type)
 
 
+def _sync_get(bucket: str, key: str) -> Optional[bytes]:
+    try:
+        response = _get_s3().get_object(Bucket=bucket, Key=key)
+    except _get_s3().exceptions.NoSuchKey:
+        return None
+    return response["Body"].read()
+
+
 def _sync_delete(bucket: str, key: str):
     _get_s3().delete_object(Bucket=bucket, Key=key)
 
@@ -125,28 +135,11 @@ def workspace_key_from_url(url: str) -> Optional[str]:
 # ---------------------------------------------------------------------------
 
 def _cache_get(bucket: str, key: str) -> Optional[str]:
-    entry = _PRESIGN_CACHE.get((bucket, key))
-    if entry is None:
-        return None
-    url, expires = entry
-    if expires <= time.monotonic():
-        _PRESIGN_CACHE.pop((bucket, key), None)
-        return None
-    return url
+    return _PRESIGN_CACHE.get((bucket, key))
 
 
 def _cache_set(bucket: str, key: str, url: str, ttl: int) -> None:
-    if len(_PRESIGN_CACHE) >= _PRESIGN_CACHE_MAX:
-        # Eviction simple: borra el 25% más antiguo.
-        now = time.monotonic()
-        stale = [k for k, (_, exp) in _PRESIGN_CACHE.items() if exp <= now]
-        for k in stale:
-            _PRESIGN_CACHE.pop(k, None)
-        if len(_PRESIGN_CACHE) >= _PRESIGN_CACHE_MAX:
-            victims = sorted(_PRESIGN_CACHE.items(), key=lambda kv: kv[1][1])[: _PRESIGN_CACHE_MAX // 4]
-            for k, _ in victims:
-                _PRESIGN_CACHE.pop(k, None)
-    _PRESIGN_CACHE[(bucket, key)] = (url, time.monotonic() + ttl * _PRESIGN_CACHE_RATIO)
+    _PRESIGN_CACHE.set((bucket, key), url, ttl * _PRESIGN_CACHE_RATIO)
 
 
 async def presign_platform_url(key: str) -> str:
@@ -247,6 +240,16 @@ async def upload_workspace_file(
     return workspace_url(key)
 
 
+async def download_workspace_file(workspace_id, *path_parts: str) -> Optional[bytes]:
+    """Read a file from the workspace bucket; ``None`` if it does not exist."""
+    key = _ws_key(workspace_id, *path_parts)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None,
+        partial(_sync_get, settings.R2_WORKSPACES_BUCKET, key),
+    )
+
+
 async def delete_workspace_file(workspace_id, *path_parts: str) -> None:
     """Delete a file from the workspace bucket."""
     key = _ws_key(workspace_id, *path_parts)
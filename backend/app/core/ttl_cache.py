@@ -1,43 +1,316 @@
-"""Tiny in-process TTL cache for hot polling endpoints.
+"""Two-tier TTL cache for hot polling endpoints.
 
-Designed for high-frequency, low-stakes data (unread counters, status badges)
-where the UI polls every few seconds and a 3-10s window of staleness is
-acceptable. Prevents the "thundering herd" pattern where every tab hits the
-database every 15-30 seconds.
+Designed for high-frequency, low-stakes data (unread counters, status badges,
+settings snapshots) where the UI polls every few seconds and a short window of
+staleness is acceptable.
 
-Not a replacement for Redis / Celery / any distributed cache. This cache is
-per-worker and disappears on restart.
+Tier 1 is a :class:`~app.core.bounded_cache.BoundedCache` (LRU + TTL, entry
+and byte budget, prefix index), so a hit never leaves the worker. Tier 2
+is the Redis we already run for Celery and slowapi: under gunicorn with N
+uvicorn workers each worker used to keep its own copy of every key, which cut
+hit rates by ~1/N and made ``invalidate`` only clear the calling worker. Now
+shared namespaces are written through to Redis, and every invalidation is
+broadcast over pub/sub so all workers drop their local copy.
+
+The sync API (``get`` / ``set`` / ``invalidate`` / ``invalidate_prefix``) is
+unchanged and only touches tier 1 synchronously; Redis writes, deletes and
+broadcasts are scheduled on the running loop. ``aget`` falls through to Redis
+on a local miss. If Redis is unreachable the cache degrades to per-worker
+behaviour instead of failing the request.
 """
 from __future__ import annotations
 
+import asyncio
+import logging
 import time
-from typing import Any, Dict, Tuple
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Set
+
+import orjson
+
+from app.core.bounded_cache import BoundedCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Namespace:
+    """Per-namespace policy. ``shared`` values must be JSON-serialisable."""
+
+    ttl: float
+    shared: bool = True
+
+
+# Namespace = first two ``:``-separated segments of the key.
+NAMESPACES: Dict[str, Namespace] = {
+    # CurrentUser wraps live ORM instances, so it cannot be shared through
+    # Redis; invalidations are still broadcast to every worker.
+    "auth:ctx": Namespace(ttl=30.0, shared=False),
+    "auth:me": Namespace(ttl=15.0),
+    "msg:unread": Namespace(ttl=20.0),
+    "notif:unread": Namespace(ttl=20.0),
+    "erp:settings": Namespace(ttl=60.0),
+    # Invalidated on commit by app.services.dashboard_snapshot.
+    "dash:client": Namespace(ttl=300.0),
+    # Free slots per workspace and ISO week; invalidated on commit by
+    # app.services.availability.
+    "avail:slots": Namespace(ttl=120.0),
+}
+_DEFAULT_NAMESPACE = Namespace(ttl=5.0, shared=False)
+
+_REDIS_PREFIX = "ttlc:"
+_CHANNEL = "ttlc:invalidate"
+# After a Redis error we stop talking to it for this long instead of paying a
+# socket timeout on every request.
+_L2_BACKOFF_SECONDS = 10.0
+
+_CACHE = BoundedCache(
+    "ttl_cache",
+    max_entries=settings.CACHE_L1_MAX_ENTRIES,
+    max_bytes=settings.CACHE_L1_MAX_BYTES,
+    sep=":",
+)
+_STATS: Dict[str, Dict[str, int]] = {}
+_WORKER_ID = uuid.uuid4().hex
+
+_redis = None
+_l2_disabled_until = 0.0
+_listener_task: Optional[asyncio.Task] = None
+_pending: Set[asyncio.Task] = set()
+
+
+def _namespace_of(key: str) -> str:
+    return ":".join(key.split(":", 2)[:2])
+
+
+def _policy(key: str) -> Namespace:
+    return NAMESPACES.get(_namespace_of(key), _DEFAULT_NAMESPACE)
+
+
+def _count(key: str, field: str) -> None:
+    bucket = _STATS.setdefault(_namespace_of(key), {"l1_hits": 0, "l2_hits": 0, "misses": 0})
+    bucket[field] += 1
+
+
+# ---------------------------------------------------------------------------
+# Tier 1: bounded in-process LRU
+# ---------------------------------------------------------------------------
+
+def _l1_get(key: str) -> Any | None:
+    return _CACHE.get(key)
+
+
+def _l1_set(key: str, value: Any, ttl: float) -> None:
+    _CACHE.set(key, value, ttl)
+
+
+def _l1_drop_prefix(prefix: str) -> None:
+    _CACHE.invalidate_prefix(prefix)
 
 
-_CACHE: Dict[str, Tuple[float, Any]] = {}
+# ---------------------------------------------------------------------------
+# Tier 2: Redis
+# ---------------------------------------------------------------------------
 
+def _l2_available() -> bool:
+    return _redis is not None and time.monotonic() >= _l2_disabled_until
+
+
+def _l2_failed(exc: Exception) -> None:
+    global _l2_disabled_until
+    _l2_disabled_until = time.monotonic() + _L2_BACKOFF_SECONDS
+    logger.warning("ttl_cache: Redis tier unavailable for %.0fs: %s", _L2_BACKOFF_SECONDS, exc)
+
+
+def _schedule(coro) -> None:
+    """Fire-and-forget a Redis operation on the running loop, if any."""
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        coro.close()
+        return
+    task = loop.create_task(coro)
+    _pending.add(task)
+    task.add_done_callback(_pending.discard)
+
+
+async def _l2_set(key: str, payload: bytes, ttl: float) -> None:
+    try:
+        await _redis.set(_REDIS_PREFIX + key, payload, px=max(1, int(ttl * 1000)))
+    except Exception as exc:
+        _l2_failed(exc)
+
+
+async def _broadcast(message: dict, delete_keys: Optional[list] = None, delete_prefix: Optional[str] = None) -> None:
+    try:
+        if delete_keys:
+            await _redis.delete(*(_REDIS_PREFIX + k for k in delete_keys))
+        if delete_prefix is not None:
+            batch = []
+            async for k in _redis.scan_iter(match=f"{_REDIS_PREFIX}{delete_prefix}*", count=500):
+                batch.append(k)
+                if len(batch) >= 500:
+                    await _redis.delete(*batch)
+                    batch.clear()
+            if batch:
+                await _redis.delete(*batch)
+        await _redis.publish(_CHANNEL, orjson.dumps({**message, "origin": _WORKER_ID}))
+    except Exception as exc:
+        _l2_failed(exc)
+
+
+# ---------------------------------------------------------------------------
+# Public API
+# ---------------------------------------------------------------------------
 
 def get(key: str) -> Any | None:
-    entry = _CACHE.get(key)
-    if entry is None:
-        return None
-    expires_at, value = entry
-    if expires_at < time.monotonic():
-        _CACHE.pop(key, None)
-        return None
+    """Tier-1 lookup only. Use :func:`aget` to fall through to Redis."""
+    value = _l1_get(key)
+    _count(key, "l1_hits" if value is not None else "misses")
     return value
 
 
-def set(key: str, value: Any, ttl: float = 5.0) -> None:
-    _CACHE[key] = (time.monotonic() + ttl, value)
+async def aget(key: str) -> Any | None:
+    """Tier-1 lookup, then Redis for shared namespaces."""
+    value = _l1_get(key)
+    if value is not None:
+        _count(key, "l1_hits")
+        return value
+    if _policy(key).shared and _l2_available():
+        try:
+            async with _redis.pipeline(transaction=False) as pipe:
+                raw, pttl = await pipe.get(_REDIS_PREFIX + key).pttl(_REDIS_PREFIX + key).execute()
+        except Exception as exc:
+            _l2_failed(exc)
+            raw, pttl = None, 0
+        if raw is not None and pttl and pttl > 0:
+            value = orjson.loads(raw)
+            _l1_set(key, value, pttl / 1000.0)
+            _count(key, "l2_hits")
+            return value
+    _count(key, "misses")
+    return None
+
+
+def set(key: str, value: Any, ttl: Optional[float] = None) -> None:
+    policy = _policy(key)
+    ttl = policy.ttl if ttl is None else ttl
+    _l1_set(key, value, ttl)
+    if policy.shared and _l2_available():
+        try:
+            payload = orjson.dumps(value)
+        except TypeError:
+            logger.debug("ttl_cache: %s is not JSON-serialisable, keeping it local", key)
+            return
+        _schedule(_l2_set(key, payload, ttl))
 
 
 def invalidate(key: str) -> None:
     _CACHE.pop(key, None)
+    if _l2_available():
+        shared = _policy(key).shared
+        _schedule(_broadcast({"key": key}, delete_keys=[key] if shared else None))
 
 
 def invalidate_prefix(prefix: str) -> None:
-    """Drop every entry whose key starts with `prefix`. O(n)."""
-    for k in list(_CACHE.keys()):
-        if k.startswith(prefix):
-            _CACHE.pop(k, None)
+    """Drop every entry whose key starts with `prefix`, on every worker."""
+    _l1_drop_prefix(prefix)
+    if _l2_available():
+        _schedule(_broadcast({"prefix": prefix}, delete_prefix=prefix))
+
+
+def stats() -> Dict[str, Any]:
+    """Hit/miss counters per namespace plus tier-1 occupancy."""
+    return {
+        "l1": _CACHE.stats(),
+        "l2": "connected" if _l2_available() else "disabled",
+        "namespaces": {ns: dict(counters) for ns, counters in _STATS.items()},
+    }
+
+
+# ---------------------------------------------------------------------------
+# Lifecycle (called from the FastAPI lifespan)
+# ---------------------------------------------------------------------------
+
+async def _listen() -> None:
+    """Apply invalidations published by other workers to our tier 1.
+
+    Uses its own connection without ``socket_timeout``: a subscriber sits idle
+    between messages and must not be torn down every half second.
+    """
+    import redis.asyncio as async_redis
+
+    client = async_redis.from_url(settings.REDIS_URL, socket_connect_timeout=2, health_check_interval=30)
+    try:
+        while True:
+            pubsub = client.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(_CHANNEL)
+                async for message in pubsub.listen():
+                    try:
+                        data = orjson.loads(message["data"])
+                    except (orjson.JSONDecodeError, TypeError, KeyError):
+                        continue
+                    if data.get("origin") == _WORKER_ID:
+                        continue
+                    if "key" in data:
+                        _CACHE.pop(data["key"], None)
+                    elif "prefix" in data:
+                        _l1_drop_prefix(data["prefix"])
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                # Messages missed while disconnected could leave stale entries
+                # behind; tier 1 is short-lived, but flush it to be safe.
+                logger.warning("ttl_cache: invalidation listener lost (%s), resubscribing", exc)
+                _CACHE.clear()
+                await asyncio.sleep(_L2_BACKOFF_SECONDS)
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+    finally:
+        await client.aclose()
+
+
+async def start() -> None:
+    global _redis, _listener_task
+    if not settings.CACHE_REDIS_ENABLED or not settings.REDIS_URL:
+        logger.info("ttl_cache: Redis tier disabled, running per-worker only")
+        return
+    import redis.asyncio as async_redis
+
+    client = async_redis.from_url(
+        settings.REDIS_URL,
+        socket_connect_timeout=0.5,
+        socket_timeout=0.5,
+        health_check_interval=30,
+    )
+    try:
+        await client.ping()
+    except Exception as exc:
+        logger.warning("ttl_cache: Redis not reachable (%s), running per-worker only", exc)
+        await client.aclose()
+        return
+    _redis = client
+    _listener_task = asyncio.create_task(_listen())
+    logger.info("ttl_cache: Redis tier enabled (worker=%s)", _WORKER_ID[:8])
+
+
+async def stop() -> None:
+    global _redis, _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        try:
+            await _listener_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _listener_task = None
+    if _pending:
+        await asyncio.gather(*_pending, return_exceptions=True)
+    if _redis is not None:
+        await _redis.aclose()
+        _redis = None
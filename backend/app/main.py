@@ -2,8 +2,6 @@ from contextlib import asynccontextmanager
 import asyncio
 import logging
 import os
-import time
-import uuid
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
@@ -12,12 +10,14 @@ from fastapi.responses import JSONResponse
 from slowapi import _rate_limit_exceeded_handler
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
-from starlette.middleware.base import BaseHTTPMiddleware
 
+from app.core import bounded_cache, password_hashing, realtime, ttl_cache
 from app.core.config import settings
 from app.core.limiter import limiter
 from app.api.v1.router import api_router
 from app.middleware.permissions import PermissionsMiddleware
+from app.middleware.request_context import RequestContextMiddleware
+from app.services import aeat_pool, catalog_snapshot, pdf_render
 
 import sys
 
@@ -127,8 +127,19 @@ async def lifespan(app: FastAPI):
     else:
         logger.info("RUN_MIGRATIONS_ON_STARTUP=false -> skipping migrations on boot")
 
+    await ttl_cache.start()
+    await realtime.start()
+    bounded_cache.start_sweeper()
+    pdf_render.start()
     yield
     logger.info("Shutting down %s...", settings.APP_NAME)
+    await bounded_cache.stop_sweeper()
+    await catalog_snapshot.stop()
+    await realtime.stop()
+    await ttl_cache.stop()
+    await aeat_pool.close()
+    password_hashing.shutdown()
+    pdf_render.shutdown()
 
 
 app = FastAPI(
@@ -224,55 +235,9 @@ async def http_exception_handler(request: Request, exc: HTTPException):
 app.state.limiter = limiter
 app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
-# NOTE: Starlette runs middleware in reverse registration order. We register the
-# outermost layers (security headers, request IDs, gzip) first so they wrap
-# everything, then CORS, then auth/rate-limit stuff closer to the route.
-
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    """Attach hardened security headers to every API response.
-
-    Nginx already sets these for the static frontend, but API responses don't
-    transit through nginx (they go straight through the app), so we replicate
-    the relevant ones here.
-    """
-
-    _HSTS = "max-age=63072000; includeSubDomains; preload"
-
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        headers = response.headers
-        headers.setdefault("X-Content-Type-Options", "nosniff")
-        headers.setdefault("X-Frame-Options", "DENY")
-        headers.setdefault("Referrer-Policy", "strict-origin-when-cross-origin")
-        headers.setdefault("Permissions-Policy", "camera=(), microphone=(), geolocation=(), payment=()")
-        headers.setdefault("Cross-Origin-Opener-Policy", "same-origin")
-        headers.setdefault("Cross-Origin-Resource-Policy", "same-site")
-        # Lock down API responses — they should never be interpreted as HTML.
-        headers.setdefault("Content-Security-Policy", "default-src 'none'; frame-ancestors 'none';")
-        if settings.is_production:
-            headers.setdefault("Strict-Transport-Security", self._HSTS)
-        return response
-
-
-class RequestIDMiddleware(BaseHTTPMiddleware):
-    """Attach a stable request id for log correlation and troubleshooting."""
-
-    async def dispatch(self, request: Request, call_next):
-        rid = request.headers.get("x-request-id") or uuid.uuid4().hex
-        request.state.request_id = rid
-        response = await call_next(request)
-        response.headers["X-Request-ID"] = rid
-        return response
-
-
-class ProxySchemeMiddleware(BaseHTTPMiddleware):
-    """Force HTTPS scheme when behind a reverse proxy (Coolify/Traefik)."""
-
-    async def dispatch(self, request: Request, call_next):
-        if request.headers.get("x-forwarded-proto") == "https":
-            request.scope["scheme"] = "https"
-        return await call_next(request)
-
+# NOTE: every add_middleware() wraps the stack built so far, so the LAST one
+# registered is the outermost: request context → permissions → rate limit →
+# CORS → gzip → routes.
 
 # GZip response bodies to cut bandwidth on JSON endpoints. minimum_size avoids
 # wasting CPU on already-tiny payloads.
@@ -296,47 +261,17 @@ app.add_middleware(
     max_age=600,
 )
 
-app.add_middleware(SecurityHeadersMiddleware)
-app.add_middleware(RequestIDMiddleware)
-
 # Enforce application-wide rate limits so endpoints without an explicit
-# @limiter.limit decorator still get protection.
+# @limiter.limit decorator still get protection. (slowapi's ASGI variant
+# re-sends the response start message for every body chunk, which breaks
+# streaming responses, so this one stays a BaseHTTPMiddleware.)
 app.add_middleware(SlowAPIMiddleware)
 
-if settings.APP_ENV == "production":
-    app.add_middleware(ProxySchemeMiddleware)
-
 app.add_middleware(PermissionsMiddleware)
 
-access_logger = logging.getLogger("api.access")
-
-@app.middleware("http")
-async def access_log_middleware(request: Request, call_next):
-    start = time.perf_counter()
-    try:
-        response = await call_next(request)
-    except Exception as exc:
-        elapsed_ms = (time.perf_counter() - start) * 1000
-        rid = getattr(request.state, "request_id", "-")
-        logger.error(
-            "UNHANDLED rid=%s %s %s %.0fms – %s",
-            rid, request.method, request.url.path, elapsed_ms, exc,
-            exc_info=True,
-        )
-        raise
-    elapsed_ms = (time.perf_counter() - start) * 1000
-    if request.url.path not in ("/health", "/"):
-        log_fn = access_logger.warning if response.status_code >= 400 else access_logger.info
-        rid = getattr(request.state, "request_id", "-")
-        log_fn(
-            "rid=%s %s %s %s %.0fms",
-            rid,
-            request.method,
-            request.url.path,
-            response.status_code,
-            elapsed_ms,
-        )
-    return response
+# Outermost: request id, token decode shared through the scope state,
+# security headers, per-request SQL stats and the access log.
+app.add_middleware(RequestContextMiddleware)
 
 app.include_router(api_router, prefix=settings.API_V1_PREFIX)
 
@@ -417,6 +352,13 @@ async def health_check_deep():
             except Exception:
                 pass
 
+    checks["cache"] = ttl_cache.stats()
+    checks["realtime"] = realtime.stats()
+    checks["catalog"] = catalog_snapshot.stats()
+    checks["password_hashing"] = password_hashing.stats()
+    checks["aeat_pool"] = aeat_pool.stats()
+    checks["pdf_render"] = pdf_render.stats()
+
     # Celery inspect is intrinsically blocking; push it to a worker thread so
     # a slow/down broker doesn't stall the event loop.
     try:
@@ -10,7 +10,7 @@ import logging
 
 from app.core.database import get_db
 from app.core import ttl_cache
-from app.core.security import decode_access_token
+from app.middleware.request_context import request_token_payload
 from app.models.user import User, UserRole, RoleType
 
 
@@ -153,6 +153,7 @@ class CurrentUser:
 
 
 async def get_current_user(
+    request: Request,
     token: str = Depends(oauth2_scheme),
     db: AsyncSession = Depends(get_db)
 ) -> CurrentUser:
@@ -171,7 +172,9 @@ async def get_current_user(
     if cached is not None:
         return cached
 
-    payload = decode_access_token(token)
+    # Same Authorization header the token came from: RequestContextMiddleware
+    # already decoded it, this only decodes when running without it.
+    payload = request_token_payload(request.scope)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -13,12 +13,11 @@ import logging
 from typing import Optional
 from uuid import UUID
 
-from fastapi import Request
 from fastapi.responses import JSONResponse
 from sqlalchemy import select
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Receive, Scope, Send
 
-from app.core.security import decode_access_token
+from app.middleware.request_context import request_token_payload
 from app.models.user import UserRole, RoleType
 
 logger = logging.getLogger(__name__)
@@ -94,95 +93,81 @@ def _extract_resource_and_action(path: str, method: str):
     return resource, action
 
 
-def _populate_identity(request: Request) -> None:
-    """Best-effort: attach user_id/workspace_id/role to request.state.
+def _forbidden(detail: str) -> JSONResponse:
+    return JSONResponse(status_code=403, content={"detail": detail})
 
-    Runs on every request that has a Bearer token so downstream middleware
-    (notably the rate limiter's key_func) can bucket by user id instead of
-    IP. Decoding is ~50µs HMAC; cheap enough to do unconditionally.
-    """
-    auth_header = request.headers.get("authorization", "")
-    if not auth_header.startswith("Bearer "):
-        return
-    payload = decode_access_token(auth_header[7:])
-    if payload is None:
-        return
-    request.state.user_id = payload.sub
-    request.state.workspace_id = payload.workspace_id
-    request.state.role = payload.role
 
+async def _check_permissions(scope: Scope) -> Optional[JSONResponse]:
+    """Return the 403 response for a denied request, ``None`` to let it through."""
+    path = scope["path"]
+    method = scope["method"].upper()
 
-class PermissionsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        method = request.method.upper()
+    if method == "OPTIONS":
+        return None
 
-        # Populate identity first so the rate limiter (and anything else
-        # looking at request.state) can bucket authenticated traffic by user.
-        _populate_identity(request)
+    if not path.startswith("/api/v1/"):
+        return None
 
-        if method == "OPTIONS":
-            return await call_next(request)
+    for exempt in _EXEMPT_PREFIXES:
+        if path.startswith(exempt):
+            return None
 
-        if not path.startswith("/api/v1/"):
-            return await call_next(request)
+    # SECURITY: only access tokens count, refresh tokens cannot grant API
+    # access. Decoded once per request by RequestContextMiddleware.
+    payload = request_token_payload(scope)
+    if payload is None:
+        return None
 
-        for exempt in _EXEMPT_PREFIXES:
-            if path.startswith(exempt):
-                return await call_next(request)
+    role = payload.role
+    if not role or role == "owner":
+        return None
 
-        auth_header = request.headers.get("authorization", "")
-        if not auth_header.startswith("Bearer "):
-            return await call_next(request)
+    if role == "client":
+        return None
 
-        token = auth_header[7:]
-        # SECURITY: use decode_access_token so refresh tokens cannot grant API access.
-        # Previously this used a raw jwt.decode() that accepted any valid JWT type.
-        payload = decode_access_token(token)
-        if payload is None:
-            return await call_next(request)
+    resource, action = _extract_resource_and_action(path, method)
+    if not resource:
+        return None
 
-        role = payload.role
-        if not role or role == "owner":
-            return await call_next(request)
+    user_id_str = payload.sub
+    workspace_id_str = payload.workspace_id
+    if not user_id_str or not workspace_id_str:
+        return None
 
-        if role == "client":
-            return await call_next(request)
+    try:
+        user_id = UUID(user_id_str)
+        workspace_id = UUID(workspace_id_str)
+    except (ValueError, TypeError):
+        return None
 
-        resource, action = _extract_resource_and_action(path, method)
-        if not resource:
-            return await call_next(request)
+    user_role = await _load_user_role_cached(user_id, workspace_id)
 
-        user_id_str = payload.sub
-        workspace_id_str = payload.workspace_id
-        if not user_id_str or not workspace_id_str:
-            return await call_next(request)
+    if not user_role:
+        return _forbidden("No tienes rol asignado en este workspace")
 
-        try:
-            user_id = UUID(user_id_str)
-            workspace_id = UUID(workspace_id_str)
-        except (ValueError, TypeError):
-            return await call_next(request)
+    if not user_role.has_permission(resource, action):
+        logger.info(
+            "Permission denied: user=%s resource=%s action=%s",
+            user_id_str, resource, action,
+        )
+        return _forbidden(f"No tienes permiso de '{action}' en '{resource}'")
 
-        user_role = await _load_user_role_cached(user_id, workspace_id)
+    return None
 
-        if not user_role:
-            return JSONResponse(
-                status_code=403,
-                content={"detail": "No tienes rol asignado en este workspace"},
-            )
 
-        if not user_role.has_permission(resource, action):
-            logger.info(
-                "Permission denied: user=%s resource=%s action=%s",
-                user_id_str, resource, action,
-            )
-            return JSONResponse(
-                status_code=403,
-                content={"detail": f"No tienes permiso de '{action}' en '{resource}'"},
-            )
+class PermissionsMiddleware:
+    """Pure ASGI: requests that pass go to the app with the original send."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-        return await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            denied = await _check_permissions(scope)
+            if denied is not None:
+                await denied(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
 
 
 # ---------------------------------------------------------------------------
@@ -0,0 +1,153 @@
+"""Outermost per-request middleware (pure ASGI).
+
+Replaces the former ``BaseHTTPMiddleware`` stack (security headers, request
+id, proxy scheme and the ``@app.middleware("http")`` access log). Every
+``BaseHTTPMiddleware`` layer ran the rest of the app in a separate task and
+copied the response body through a memory stream; as plain ASGI the request
+only pays for a ``send`` wrapper, and streaming responses (SSE, exports)
+go out chunk by chunk untouched.
+
+It also decodes the bearer token once and leaves the result in the scope
+state, where the permissions middleware, the rate limiter's key function
+and ``get_current_user`` read it instead of decoding it again.
+"""
+
+import logging
+import time
+import uuid
+from typing import Any, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.database import track_queries
+from app.core.security import TokenPayload, decode_access_token
+
+logger = logging.getLogger(__name__)
+access_logger = logging.getLogger("api.access")
+
+_UNSET = object()
+
+# Nginx already sets these for the static frontend, but API responses don't
+# transit through nginx (they go straight through the app), so we replicate
+# the relevant ones here.
+_SECURITY_HEADERS = (
+    ("X-Content-Type-Options", "nosniff"),
+    ("X-Frame-Options", "DENY"),
+    ("Referrer-Policy", "strict-origin-when-cross-origin"),
+    ("Permissions-Policy", "camera=(), microphone=(), geolocation=(), payment=()"),
+    ("Cross-Origin-Opener-Policy", "same-origin"),
+    ("Cross-Origin-Resource-Policy", "same-site"),
+    # Lock down API responses — they should never be interpreted as HTML.
+    ("Content-Security-Policy", "default-src 'none'; frame-ancestors 'none';"),
+)
+_HSTS = "max-age=63072000; includeSubDomains; preload"
+
+_QUIET_PATHS = frozenset(("/health", "/"))
+
+
+def request_token_payload(scope: Scope) -> Optional[TokenPayload]:
+    """Access-token payload of this request, decoded at most once.
+
+    ``None`` when there is no bearer token or it is invalid, expired or not
+    an access token. The result is memoised in the scope state so every
+    layer after the first gets it for free.
+    """
+    state = scope.setdefault("state", {})
+    payload = state.get("token_payload", _UNSET)
+    if payload is _UNSET:
+        payload = None
+        auth = Headers(scope=scope).get("authorization", "")
+        if auth.startswith("Bearer "):
+            payload = decode_access_token(auth[7:])
+        state["token_payload"] = payload
+        if payload is not None:
+            # Read by the rate limiter's key_func to bucket by user.
+            state["user_id"] = payload.sub
+            state["workspace_id"] = payload.workspace_id
+            state["role"] = payload.role
+    return payload
+
+
+class RequestContextMiddleware:
+    """Request id, identity, security headers, query stats and access log."""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self.trust_forwarded_proto = settings.APP_ENV == "production"
+        self.security_headers = _SECURITY_HEADERS + (
+            (("Strict-Transport-Security", _HSTS),) if settings.is_production else ()
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        request_headers = Headers(scope=scope)
+        # Force HTTPS scheme when behind the reverse proxy (Coolify/Traefik).
+        if self.trust_forwarded_proto and request_headers.get("x-forwarded-proto") == "https":
+            scope["scheme"] = "https"
+        rid = request_headers.get("x-request-id") or uuid.uuid4().hex
+        scope.setdefault("state", {})["request_id"] = rid
+        request_token_payload(scope)
+
+        status_code = 500
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    headers = MutableHeaders(scope=message)
+                    for name, value in self.security_headers:
+                        headers.setdefault(name, value)
+                    headers["X-Request-ID"] = rid
+                    if settings.DB_SERVER_TIMING:
+                        elapsed_ms = (time.perf_counter() - start) * 1000
+                        headers.append("Server-Timing", stats.server_timing(elapsed_ms))
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            except Exception as exc:
+                elapsed_ms = (time.perf_counter() - start) * 1000
+                logger.error(
+                    "UNHANDLED rid=%s %s %s %.0fms db=%dq/%.1fms – %s",
+                    rid, scope["method"], scope["path"], elapsed_ms,
+                    stats.statements, stats.db_ms, exc,
+                    exc_info=True,
+                )
+                raise
+
+        if scope["path"] not in _QUIET_PATHS:
+            self._log(scope, rid, status_code, (time.perf_counter() - start) * 1000, stats)
+
+    @staticmethod
+    def _log(scope: Scope, rid: str, status_code: int, elapsed_ms: float, stats: Any) -> None:
+        method, path = scope["method"], scope["path"]
+        log_fn = access_logger.warning if status_code >= 400 else access_logger.info
+        log_fn(
+            "rid=%s %s %s %s %.0fms db=%dq/%.1fms pool=%.1fms",
+            rid, method, path, status_code, elapsed_ms,
+            stats.statements, stats.db_ms, stats.pool_ms,
+            extra={
+                "request_id": rid,
+                "method": method,
+                "path": path,
+                "status": status_code,
+                "duration_ms": round(elapsed_ms, 1),
+                "db_statements": stats.statements,
+                "db_ms": round(stats.db_ms, 1),
+                "pool_ms": round(stats.pool_ms, 1),
+            },
+        )
+        # The same statement shape over and over in one request is almost
+        # always a lazy load or a per-row query inside a loop (N+1).
+        for shape, count in stats.repeated(settings.DB_REPEATED_STATEMENT_WARN):
+            access_logger.warning(
+                "N+1? rid=%s %s %s ran %d× %s", rid, method, path, count, shape[:300],
+            )
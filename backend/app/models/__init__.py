@@ -3,8 +3,8 @@ from app.models.workspace import Workspace
 from app.models.user import User, UserRole, RoleType, DEFAULT_ROLE_PERMISSIONS
 from app.models.client import Client, ClientTag, COMMON_ALLERGENS
 from app.models.booking import Booking, BookingStatus
-from app.models.workout import WorkoutProgram, WorkoutLog
-from app.models.nutrition import Food, MealPlan, FoodFavorite
+from app.models.workout import WorkoutProgram, WorkoutLog, ExercisePerformance, ExerciseWeeklyStats
+from app.models.nutrition import Food, MealPlan, FoodFavorite, NutritionLog, NutritionDayRollup
 from app.models.exercise import Exercise, ExerciseAlternative, ExerciseFavorite, ClientMeasurement, ClientTask
 from app.models.form import Form, FormSubmission
 from app.models.message import Message, Conversation
@@ -26,7 +26,9 @@ from app.models.live_classes import (
     MeetingLog,
 )
 from app.models.invitation import ClientInvitation, InvitationStatus
-from app.models.google_calendar import GoogleCalendarToken, CalendarSyncMapping
+from app.models.google_calendar import (
+    GoogleCalendarToken, GoogleCalendarSyncState, CalendarSyncMapping, CalendarSyncOutbox,
+)
 from app.models.task import Task, TaskStatus, TaskPriority
 from app.models.team_group import TeamGroup, TeamGroupMember
 from app.models.rectification import RectificationRequest
@@ -54,12 +56,16 @@ __all__ = [
     "BookingStatus",
     "WorkoutProgram",
     "WorkoutLog",
+    "ExercisePerformance",
+    "ExerciseWeeklyStats",
     "Exercise",
     "ExerciseAlternative",
     "ExerciseFavorite",
     "MealPlan",
     "Food",
     "FoodFavorite",
+    "NutritionLog",
+    "NutritionDayRollup",
     "Form",
     "FormSubmission",
     "Message",
@@ -96,6 +102,8 @@ __all__ = [
     "InvitationStatus",
     "GoogleCalendarToken",
     "CalendarSyncMapping",
+    "CalendarSyncOutbox",
+    "GoogleCalendarSyncState",
     "Document",
     "Task",
     "TaskStatus",
@@ -1,11 +1,16 @@
 from enum import Enum as PyEnum
-from sqlalchemy import Column, String, Text, Boolean, Enum, ForeignKey, DateTime, Integer
-from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
+from sqlalchemy import Column, String, Text, Boolean, Enum, ForeignKey, DateTime, Integer, CheckConstraint, Index, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY, ExcludeConstraint
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
 
 
+# Periodo [start_time, end_time) como rango: la misma expresión que los
+# índices GiST (``&&`` sólo usa el índice si coincide con ella).
+PERIOD_SQL = "tstzrange(start_time, end_time)"
+
+
 class BookingStatus(str, PyEnum):
     """Booking status matching Supabase booking_status enum (lowercase values)."""
     pending = "pending"
@@ -29,6 +34,18 @@ class SessionModality(str, PyEnum):
 
 class Booking(BaseModel):
     __tablename__ = "bookings"
+    __table_args__ = (
+        CheckConstraint("end_time >= start_time", name="ck_bookings_period"),
+        Index("ix_bookings_workspace_period", "workspace_id", text(PERIOD_SQL), postgresql_using="gist"),
+        # Un organizador no puede tener dos reservas activas solapadas
+        ExcludeConstraint(
+            ("organizer_id", "="),
+            (text(PERIOD_SQL), "&&"),
+            name="ex_bookings_organizer_overlap",
+            using="gist",
+            where=text("organizer_id IS NOT NULL AND status IN ('pending', 'confirmed')"),
+        ),
+    )
     
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False, index=True)
     organizer_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
@@ -7,17 +7,20 @@ from typing import Any, List, Optional
 from uuid import UUID
 
 from sqlalchemy import (
+    BigInteger,
     Boolean,
     Column,
     Date,
     DateTime,
     ForeignKey,
+    Index,
     Integer,
     LargeBinary,
     Numeric,
     String,
     Text,
     func,
+    text,
 )
 from sqlalchemy.dialects.postgresql import JSONB, UUID as PG_UUID
 from sqlalchemy.orm import relationship
@@ -90,6 +93,9 @@ class InvoiceSettings(Base):
     software_version = Column(String, default="1.0")
     software_install_number = Column(String, default="00001")
 
+    # Próximo envío a AEAT permitido (TiempoEsperaEnvio de la última respuesta)
+    verifactu_next_send_at = Column(DateTime(timezone=True), nullable=True)
+
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
@@ -218,6 +224,67 @@ class InvoiceItem(Base):
     invoice = relationship("Invoice", back_populates="items")
 
 
+class VeriFactuSubmission(Base):
+    """
+    Cola de registros VeriFactu pendientes de enviar a AEAT.
+
+    Al finalizar una factura se encola una fila (una por factura abierta,
+    índice único parcial) y un worker de Celery envía las de cada workspace y
+    serie en orden, agrupadas en un único RegFactuSistemaFacturacion
+    (``app.services.verifactu_queue``).
+    """
+    __tablename__ = "verifactu_submissions"
+    __table_args__ = (
+        Index(
+            "uq_verifactu_submissions_open",
+            "invoice_id",
+            unique=True,
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+        Index("ix_verifactu_submissions_queue", "workspace_id", "series", "status", "chain_position"),
+        Index("ix_verifactu_submissions_due", "status", "next_attempt_at"),
+    )
+
+    id = Column(PG_UUID(as_uuid=True), primary_key=True, server_default=func.gen_random_uuid())
+    workspace_id = Column(PG_UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    invoice_id = Column(PG_UUID(as_uuid=True), ForeignKey("invoices.id", ondelete="CASCADE"), nullable=False)
+    series = Column(String, nullable=False)
+    # Posición en la cadena de la serie (InvoiceChainHead.records al encolar):
+    # el orden de envío, que created_at (inicio de la transacción) no garantiza.
+    chain_position = Column(BigInteger, nullable=False)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
+class InvoiceChainHead(Base):
+    """
+    Último registro encadenado de cada serie VeriFactu.
+
+    Finalizar una factura bloquea esta fila (``app.services.invoice_chain``)
+    hasta el commit, así dos finalizaciones simultáneas de la misma serie no
+    pueden encadenar con el mismo registro anterior, y la huella previa se
+    lee por clave primaria en lugar de ordenar todas las facturas.
+    """
+    __tablename__ = "invoice_chain_heads"
+
+    workspace_id = Column(PG_UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), primary_key=True)
+    series = Column(String, primary_key=True)
+
+    last_hash = Column(String, nullable=True)
+    last_invoice_number = Column(String, nullable=True)
+    last_registered_at = Column(DateTime(timezone=True), nullable=True)
+    records = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+
 class Expense(Base):
     """Modelo de Gasto"""
     __tablename__ = "expenses"
@@ -1,5 +1,5 @@
 """Exercise library models."""
-from sqlalchemy import Column, String, Text, Numeric, Integer, Boolean, ForeignKey, ARRAY, DateTime, UniqueConstraint
+from sqlalchemy import Column, String, Text, Numeric, Integer, Boolean, ForeignKey, ARRAY, DateTime, Index, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB
 from sqlalchemy.orm import relationship
 import uuid
@@ -18,6 +18,11 @@ class Exercise(BaseModel):
     """Exercise library model - matches Supabase schema."""
     
     __tablename__ = "exercises"
+    __table_args__ = (
+        # Change probe / delta fetch of the catalog snapshot
+        # (app.services.catalog_snapshot).
+        Index("ix_exercises_global_updated_at", "updated_at", postgresql_where=text("is_global IS TRUE")),
+    )
     
     workspace_id = Column(UUID(as_uuid=True), ForeignKey('workspaces.id', ondelete='CASCADE'), nullable=True, index=True)
     name = Column(Text, nullable=False)
@@ -4,8 +4,8 @@ Google Calendar Integration Models
 Modelos para almacenar tokens OAuth y mapeos de sincronización
 entre bookings de Trackfiz y eventos de Google Calendar.
 """
-from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, String, Text, Boolean, ForeignKey, DateTime, Index, Integer, UniqueConstraint, func, text
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
@@ -50,6 +50,38 @@ class GoogleCalendarToken(BaseModel):
         return f"<GoogleCalendarToken user={self.user_id} calendar={self.calendar_id}>"
 
 
+class GoogleCalendarSyncState(BaseModel):
+    """
+    Estado de sincronización incremental de un calendario de Google.
+
+    Guarda el ``nextSyncToken`` de Google y una copia local de los eventos
+    de la ventana sincronizada, así que las consultas de disponibilidad sólo
+    piden los cambios (o nada, si la copia es reciente). El webhook de push
+    notifications invalida la copia (``checked_at = NULL``).
+    """
+    __tablename__ = "google_calendar_sync_states"
+    __table_args__ = (
+        UniqueConstraint("token_id", "calendar_id", name="uq_google_calendar_sync_states_calendar"),
+    )
+
+    token_id = Column(UUID(as_uuid=True), ForeignKey("google_calendar_tokens.id", ondelete="CASCADE"), nullable=False)
+    calendar_id = Column(String(255), nullable=False)
+    calendar_name = Column(String(255), nullable=True)
+
+    sync_token = Column(Text, nullable=True)
+    # Ventana de la última sincronización completa
+    window_start = Column(DateTime(timezone=True), nullable=True)
+    window_end = Column(DateTime(timezone=True), nullable=True)
+    # {event_id: evento} con los campos que usa la app
+    events = Column(JSONB, nullable=False, default=dict)
+    # Última vez que se confirmó con Google que la copia está al día
+    checked_at = Column(DateTime(timezone=True), nullable=True)
+    full_synced_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<GoogleCalendarSyncState token={self.token_id} calendar={self.calendar_id}>"
+
+
 class CalendarSyncMapping(BaseModel):
     """
     Mapeo entre bookings de Trackfiz y eventos de Google Calendar.
@@ -77,3 +109,46 @@ class CalendarSyncMapping(BaseModel):
     
     def __repr__(self):
         return f"<CalendarSyncMapping booking={self.booking_id} event={self.google_event_id}>"
+
+
+class CalendarSyncOutbox(BaseModel):
+    """
+    Cola durable de cambios de bookings pendientes de llevar a Google Calendar.
+
+    La fila se escribe en la misma transacción que el cambio del booking y la
+    procesa un worker de Celery (``app.services.calendar_sync``). Mientras una
+    fila está ``pending``, nuevos cambios del mismo booking para el mismo
+    calendario la reutilizan (índice único parcial), así que muchas ediciones
+    seguidas acaban en una sola llamada a Google.
+    """
+    __tablename__ = "calendar_sync_outbox"
+    __table_args__ = (
+        Index(
+            "uq_calendar_sync_outbox_pending",
+            "booking_id", "user_id",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+        ),
+        Index("ix_calendar_sync_outbox_due", "status", "next_attempt_at"),
+        Index("ix_calendar_sync_outbox_user_status", "user_id", "status"),
+    )
+
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False)
+    # Usuario cuyo calendario hay que actualizar
+    user_id = Column(UUID(as_uuid=True), ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    # Sin FK: las filas ``delete`` sobreviven al booking borrado
+    booking_id = Column(UUID(as_uuid=True), nullable=False)
+
+    action = Column(String(10), nullable=False)  # upsert o delete
+    # Evento a borrar (el mapping desaparece en cascada con el booking)
+    google_event_id = Column(String(255), nullable=True)
+    google_calendar_id = Column(String(255), nullable=True)
+
+    status = Column(String(20), nullable=False, default="pending")  # pending, processing, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    processed_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<CalendarSyncOutbox booking={self.booking_id} user={self.user_id} {self.action}/{self.status}>"
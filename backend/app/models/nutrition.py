@@ -1,5 +1,5 @@
 """Nutrition and Food models."""
-from sqlalchemy import Column, Index, String, Text, ForeignKey, Float, Boolean, Numeric, Integer, CHAR, UniqueConstraint, Date
+from sqlalchemy import Column, Computed, DDL, DateTime, Index, String, Text, ForeignKey, Float, Boolean, Numeric, Integer, CHAR, UniqueConstraint, Date, event, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.ext.mutable import MutableDict
@@ -7,6 +7,36 @@ from sqlalchemy.ext.mutable import MutableDict
 from app.models.base import BaseModel
 
 
+# ``unaccent()`` is only STABLE (it depends on the dictionary search path), so
+# it can't be used in an index or a generated column. This wrapper pins the
+# dictionary by schema-qualified name and is safe to declare IMMUTABLE. The
+# schema is looked up because Supabase installs extensions in ``extensions``
+# and a plain Postgres usually in ``public``.
+F_UNACCENT_DDL = """
+DO $do$
+DECLARE ext_schema text;
+BEGIN
+    SELECT n.nspname INTO ext_schema
+    FROM pg_extension e JOIN pg_namespace n ON n.oid = e.extnamespace
+    WHERE e.extname = 'unaccent';
+    EXECUTE format(
+        $f$CREATE OR REPLACE FUNCTION public.f_unaccent(text) RETURNS text
+           LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT
+           AS $body$ SELECT %I.unaccent(%L::regdictionary, $1) $body$$f$,
+        ext_schema, ext_schema || '.unaccent'
+    );
+END
+$do$
+"""
+
+# Normalised text the food search matches against (see app.services.food_search).
+FOOD_SEARCH_TEXT_SQL = (
+    "lower(public.f_unaccent("
+    "coalesce(name, '') || ' ' || coalesce(brand, '') || ' ' || coalesce(generic_name, '')"
+    "))"
+)
+
+
 # NOTE: FoodCategory table does not exist in DB - foods have 'category' as text directly
 # class FoodCategory(BaseModel):
 #     """Food category model."""
@@ -18,6 +48,21 @@ class Food(BaseModel):
     """Food library model - matches Supabase schema."""
     
     __tablename__ = "foods"
+    __table_args__ = (
+        # Trigram index: serves both the substring LIKE and the typo-tolerant
+        # word-similarity operator of the food search.
+        Index(
+            "ix_foods_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
+        # Keyset order of the unfiltered listing.
+        Index("ix_foods_name_id", "name", "id"),
+        # Change probe / delta fetch of the catalog snapshot
+        # (app.services.catalog_snapshot).
+        Index("ix_foods_global_updated_at", "updated_at", postgresql_where=text("is_global IS TRUE")),
+    )
     
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=True, index=True)
     # NOTE: No category_id FK - category is stored as text directly
@@ -116,6 +161,9 @@ class Food(BaseModel):
     
     # Visibility
     is_global = Column(Boolean, default=False)
+
+    # Search document (generated by Postgres, never written by the app)
+    search_text = deferred(Column(Text, Computed(FOOD_SEARCH_TEXT_SQL, persisted=True)))
     
     # Aliases for backward compatibility with endpoints
     @property
@@ -146,6 +194,15 @@ class Food(BaseModel):
         return f"<Food {self.name}>"
 
 
+# create_all() (tests, benchmark database) needs the wrapper before the table.
+# DDL() %-formats its statement, hence the escaping.
+event.listen(
+    Food.__table__,
+    "before_create",
+    DDL(F_UNACCENT_DDL.replace("%", "%%")).execute_if(dialect="postgresql"),
+)
+
+
 class MealPlan(BaseModel):
     """Meal plan model - matches Supabase schema."""
     
@@ -194,7 +251,8 @@ class MealPlan(BaseModel):
     # Whether this plan is the active one for the client
     is_active = Column(Boolean, default=False, server_default="false")
     
-    # Adherence tracking - MutableDict allows SQLAlchemy to detect in-place changes
+    # Legacy adherence tracking. Meal logs now live in ``nutrition_logs``; the
+    # column is kept (read-only) for rollback safety after migration 051.
     adherence = Column(MutableDict.as_mutable(JSONB), default=lambda: {"logs": []})
     
     # Executed plan: client-modified version of `plan`. Initialized as a copy of `plan` on assignment.
@@ -233,6 +291,81 @@ class MealPlan(BaseModel):
         return f"<MealPlan {self.name}>"
 
 
+class NutritionLog(BaseModel):
+    """One logged meal for a client and day.
+
+    Replaces the ``MealPlan.adherence["logs"]`` JSONB array: every POST used to
+    rewrite the whole blob and every read loaded all of a client's plans to
+    filter by date in Python. A client logs each meal at most once per day.
+    """
+
+    __tablename__ = "nutrition_logs"
+    __table_args__ = (
+        UniqueConstraint("client_id", "log_date", "meal_name", name="uq_nutrition_logs_client_date_meal"),
+        Index("ix_nutrition_logs_client_logged_at", "client_id", "logged_at"),
+    )
+
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    # Plan that was active when the meal was logged; used for plan references.
+    meal_plan_id = Column(UUID(as_uuid=True), ForeignKey("meal_plans.id", ondelete="SET NULL"), nullable=True, index=True)
+
+    log_date = Column(Date, nullable=False)
+    meal_name = Column(Text, nullable=False)
+    # [{name, calories, protein, carbs, fat, quantity, food_id}]
+    foods = Column(JSONB, nullable=False, default=lambda: [])
+
+    total_calories = Column(Integer, nullable=False, default=0)
+    total_protein = Column(Float, nullable=False, default=0)
+    total_carbs = Column(Float, nullable=False, default=0)
+    total_fat = Column(Float, nullable=False, default=0)
+
+    notes = Column(Text, nullable=True)
+    satisfaction_rating = Column(Integer, nullable=True)
+    logged_at = Column(DateTime(timezone=True), nullable=False)
+
+    # Planned macros/foods for this meal and day, resolved from the plan
+    # template at write time and refreshed when the plan changes.
+    plan_reference = Column(JSONB, nullable=True)
+    has_modifications = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<NutritionLog {self.client_id} {self.log_date} {self.meal_name}>"
+
+
+class NutritionDayRollup(BaseModel):
+    """Per-day totals of a client's logs under one meal plan.
+
+    Maintained by ``app.services.nutrition_logs`` whenever a log is written or
+    deleted and when the plan template changes; the history endpoints read
+    these rows by (client_id, log_date) range instead of re-deriving them.
+    """
+
+    __tablename__ = "nutrition_day_rollups"
+    __table_args__ = (
+        UniqueConstraint("client_id", "log_date", "meal_plan_id", name="uq_nutrition_day_rollups_client_date_plan"),
+    )
+
+    workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    meal_plan_id = Column(UUID(as_uuid=True), ForeignKey("meal_plans.id", ondelete="CASCADE"), nullable=False, index=True)
+    log_date = Column(Date, nullable=False)
+
+    meals_logged = Column(Integer, nullable=False, default=0)
+    logged_calories = Column(Integer, nullable=False, default=0)
+    logged_protein = Column(Float, nullable=False, default=0)
+    logged_carbs = Column(Float, nullable=False, default=0)
+    logged_fat = Column(Float, nullable=False, default=0)
+    planned_calories = Column(Integer, nullable=False, default=0)
+    planned_protein = Column(Float, nullable=False, default=0)
+    planned_carbs = Column(Float, nullable=False, default=0)
+    planned_fat = Column(Float, nullable=False, default=0)
+    has_modifications = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<NutritionDayRollup {self.client_id} {self.log_date}>"
+
+
 class CustomFood(BaseModel):
     """Custom food created by workspace users."""
     
@@ -1,9 +1,10 @@
 """Box, Machine, Service-enhanced, and Appointment models."""
-from sqlalchemy import Column, String, Text, ForeignKey, Boolean, Integer, Numeric, DateTime, Table
+from sqlalchemy import Column, String, Text, ForeignKey, Boolean, Integer, Numeric, DateTime, Table, CheckConstraint, Index, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import relationship
 
 from app.models.base import BaseModel
+from app.models.booking import PERIOD_SQL
 
 
 # ── M2M: Service <-> Machine ──
@@ -119,6 +120,10 @@ class ServiceStockConsumption(BaseModel):
 
 class Appointment(BaseModel):
     __tablename__ = "appointments"
+    __table_args__ = (
+        CheckConstraint("end_time >= start_time", name="ck_appointments_period"),
+        Index("ix_appointments_workspace_period", "workspace_id", text(PERIOD_SQL), postgresql_using="gist"),
+    )
 
     workspace_id = Column(UUID(as_uuid=True), ForeignKey("workspaces.id", ondelete="CASCADE"), nullable=False, index=True)
     service_id = Column(UUID(as_uuid=True), ForeignKey("services.id", ondelete="SET NULL"), nullable=True, index=True)
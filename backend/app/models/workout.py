@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Index, String, Text, Integer, ForeignKey, Boolean, Date, text
+from sqlalchemy import Column, DateTime, Float, Index, String, Text, Integer, ForeignKey, Boolean, Date, UniqueConstraint, text
 from sqlalchemy.dialects.postgresql import UUID, JSONB, ARRAY
 from sqlalchemy.ext.mutable import MutableDict
 from sqlalchemy.orm import relationship
@@ -79,3 +79,78 @@ class WorkoutLog(BaseModel):
     
     def __repr__(self):
         return f"<WorkoutLog for {self.client_id}>"
+
+
+class ExercisePerformance(BaseModel):
+    """One exercise of one workout log, with its sets and per-session figures.
+
+    Maintained by ``app.services.exercise_performance`` whenever a workout
+    log is written; exercise history, personal records and progression read
+    these rows by (client_id, exercise_id, performed_at) instead of scanning
+    the ``log`` JSONB of every workout.
+    """
+
+    __tablename__ = "exercise_performances"
+    __table_args__ = (
+        UniqueConstraint("workout_log_id", "position", name="uq_exercise_performances_log_position"),
+        Index(
+            "ix_exercise_performances_client_exercise_performed",
+            "client_id", "exercise_id", text("performed_at DESC"),
+        ),
+    )
+
+    workout_log_id = Column(UUID(as_uuid=True), ForeignKey("workout_logs.id", ondelete="CASCADE"), nullable=False, index=True)
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    # Ids as stored in the log (catalog or custom exercises), not a FK
+    exercise_id = Column(String(64), nullable=False)
+    exercise_name = Column(String(255), nullable=True)
+    performed_at = Column(DateTime(timezone=True), nullable=False)
+    # Order of the exercise inside the log
+    position = Column(Integer, nullable=False)
+
+    # The exercise entry of the log as written (sets, notes, ...)
+    entry = Column(JSONB, nullable=False)
+    set_count = Column(Integer, nullable=False, default=0)
+    total_reps = Column(Integer, nullable=False, default=0)
+    total_volume_kg = Column(Float, nullable=False, default=0)
+    top_weight_kg = Column(Float, nullable=True)
+    # Best estimated one-rep max of the session (Epley) and the set it came from
+    best_e1rm_kg = Column(Float, nullable=True)
+    best_set_weight_kg = Column(Float, nullable=True)
+    best_set_reps = Column(Integer, nullable=True)
+
+    def __repr__(self):
+        return f"<ExercisePerformance {self.client_id} {self.exercise_id} {self.performed_at}>"
+
+
+class ExerciseWeeklyStats(BaseModel):
+    """Per-client, per-exercise aggregates of one ISO week (Monday, UTC).
+
+    Refreshed by ``app.services.workout_analytics`` from
+    ``exercise_performances`` for the weeks a workout log touches; the
+    trainer progression charts and personal records read these rows.
+    """
+
+    __tablename__ = "exercise_weekly_stats"
+    __table_args__ = (
+        UniqueConstraint("client_id", "exercise_id", "week_start", name="uq_exercise_weekly_stats_client_exercise_week"),
+    )
+
+    client_id = Column(UUID(as_uuid=True), ForeignKey("clients.id", ondelete="CASCADE"), nullable=False)
+    exercise_id = Column(String(64), nullable=False)
+    week_start = Column(Date, nullable=False)
+    exercise_name = Column(String(255), nullable=True)
+
+    sessions = Column(Integer, nullable=False, default=0)
+    sets = Column(Integer, nullable=False, default=0)
+    reps = Column(Integer, nullable=False, default=0)
+    # Tonnage: sum of weight x reps of the week's sets
+    volume_kg = Column(Float, nullable=False, default=0)
+    top_weight_kg = Column(Float, nullable=True)
+    best_e1rm_kg = Column(Float, nullable=True)
+    best_set_weight_kg = Column(Float, nullable=True)
+    best_set_reps = Column(Integer, nullable=True)
+    best_set_at = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self):
+        return f"<ExerciseWeeklyStats {self.client_id} {self.exercise_id} {self.week_start}>"
@@ -15,6 +15,7 @@ class BookingPoliciesSchema(BaseSchema):
     default_duration: int = 60
     buffer_time: int = 15
     max_advance_days: int = 30
+    max_concurrent_bookings: int = 1
     min_advance_hours: int = 2
     cancellation_hours: int = 24
     reschedule_hours: int = 12
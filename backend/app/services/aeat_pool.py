@@ -0,0 +1,176 @@
+"""
+Pooled mTLS HTTP clients for the AEAT SOAP endpoint, one per workspace.
+
+Each send used to decrypt the workspace private key, write cert and key to
+temp files, build an ``SSLContext`` and open a new TLS connection. Now the
+first send of a workspace builds an ``httpx.AsyncClient`` with the client
+certificate loaded and keep-alive connections, and later sends (a bulk
+submission, the ``/verifactu/test`` endpoint...) reuse it:
+
+- the key is decrypted once per client and wiped as soon as OpenSSL has
+  loaded it; the temp files live only during ``load_cert_chain`` (the
+  stdlib ``ssl`` module cannot load a key from memory);
+- a client lives at most ``AEAT_CLIENT_TTL_SECONDS`` and is rebuilt when
+  the stored certificate changes (serial number and key IV are checked on
+  every use, so other processes notice an upload or revocation too);
+- :func:`evict` closes the workspace's clients right away (certificate
+  upload and revocation); the LRU keeps at most ``AEAT_CLIENT_POOL_SIZE``.
+
+httpx clients belong to the event loop that opened their connections, so
+there is one pool per loop: the API process keeps warm connections, and a
+Celery task (its own ``asyncio.run``) reuses them for every batch it sends
+and closes them on exit (:func:`close`).
+"""
+import asyncio
+import logging
+import ssl
+import time
+import weakref
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+import httpx
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, str]  # (workspace_id, url)
+
+_stats: Dict[str, int] = {"builds": 0, "reuses": 0, "evictions": 0}
+
+
+def fingerprint(inv_settings: Any) -> Tuple[Optional[str], Optional[str]]:
+    """Identity of the stored certificate (the IV changes on every upload)."""
+    iv = inv_settings.certificate_key_iv
+    return inv_settings.certificate_serial_number, bytes(iv).hex() if iv else None
+
+
+def ssl_context(cert_pem: str, encrypted_key: bytes, key_iv: bytes, workspace_id: str) -> ssl.SSLContext:
+    """Client-certificate context; the plaintext key never outlives the call."""
+    from app.services.certificate import (
+        cleanup_temp_files,
+        decrypt_private_key,
+        write_secure_temp_files,
+        _wipe_bytearray,
+    )
+
+    key_pem = bytearray()
+    cert_path = key_path = ""
+    try:
+        key_pem = decrypt_private_key(encrypted_key, key_iv, workspace_id)
+        cert_path, key_path = write_secure_temp_files(cert_pem, key_pem)
+        context = ssl.create_default_context()
+        context.load_cert_chain(certfile=cert_path, keyfile=key_path)
+        return context
+    finally:
+        _wipe_bytearray(key_pem)
+        if cert_path or key_path:
+            cleanup_temp_files(cert_path, key_path)
+
+
+@dataclass
+class _Entry:
+    client: httpx.AsyncClient
+    fingerprint: Tuple[Optional[str], Optional[str]]
+    expires_at: float
+
+
+class AEATClientPool:
+    """LRU of mTLS clients of one event loop, keyed by (workspace, AEAT url)."""
+
+    def __init__(self):
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def client_for(self, inv_settings: Any, url: str) -> httpx.AsyncClient:
+        key = (str(inv_settings.workspace_id), url)
+        current = fingerprint(inv_settings)
+        async with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry.fingerprint == current and entry.expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    _stats["reuses"] += 1
+                    return entry.client
+                await self._drop(key)
+
+            context = await asyncio.to_thread(
+                ssl_context,
+                inv_settings.certificate_pem,
+                bytes(inv_settings.certificate_key_encrypted),
+                bytes(inv_settings.certificate_key_iv),
+                key[0],
+            )
+            client = httpx.AsyncClient(
+                verify=context,
+                timeout=settings.AEAT_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.AEAT_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.AEAT_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.AEAT_KEEPALIVE_SECONDS,
+                ),
+                headers={"Content-Type": "text/xml"},
+            )
+            self._entries[key] = _Entry(client, current, time.monotonic() + settings.AEAT_CLIENT_TTL_SECONDS)
+            _stats["builds"] += 1
+            while len(self._entries) > settings.AEAT_CLIENT_POOL_SIZE:
+                await self._drop(next(iter(self._entries)))
+            return client
+
+    async def evict(self, workspace_id) -> int:
+        async with self._lock:
+            keys = [k for k in self._entries if k[0] == str(workspace_id)]
+            for key in keys:
+                await self._drop(key)
+            return len(keys)
+
+    async def close(self) -> None:
+        async with self._lock:
+            for key in list(self._entries):
+                await self._drop(key)
+
+    async def _drop(self, key: _Key) -> None:
+        entry = self._entries.pop(key)
+        _stats["evictions"] += 1
+        try:
+            await entry.client.aclose()
+        except Exception:
+            logger.debug("AEAT client close failed", exc_info=True)
+
+
+_pools: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AEATClientPool]" = weakref.WeakKeyDictionary()
+
+
+def pool() -> AEATClientPool:
+    """Pool of the running event loop."""
+    loop = asyncio.get_running_loop()
+    current = _pools.get(loop)
+    if current is None:
+        current = _pools[loop] = AEATClientPool()
+    return current
+
+
+async def client_for(inv_settings: Any, url: str) -> httpx.AsyncClient:
+    return await pool().client_for(inv_settings, url)
+
+
+async def evict(workspace_id) -> None:
+    """Close the workspace's clients (certificate uploaded or revoked)."""
+    if await pool().evict(workspace_id):
+        logger.info("AEAT client pool: evicted workspace %s", workspace_id)
+
+
+async def close() -> None:
+    """Close every client of the running loop (shutdown, end of a Celery task)."""
+    current = _pools.pop(asyncio.get_running_loop(), None)
+    if current is not None:
+        await current.close()
+
+
+def stats() -> dict:
+    return {"clients": sum(len(p) for p in list(_pools.values())), **_stats}
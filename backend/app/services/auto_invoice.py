@@ -6,7 +6,7 @@ SeQura IPN, and recurring payment tasks.
 
 import logging
 import uuid
-from datetime import date, datetime, timezone
+from datetime import date
 from typing import Any, Optional
 from uuid import UUID
 
@@ -16,6 +16,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.models.client import Client
 from app.models.erp import Invoice, InvoiceAuditLog, InvoiceItem, InvoiceSettings
 from app.models.payment import Payment
+from app.services import invoice_chain, verifactu_queue
 from app.services.verifactu import VeriFactuService
 
 logger = logging.getLogger(__name__)
@@ -107,7 +108,7 @@ async def create_invoice_for_payment(
             )
 
     prefix = settings.invoice_prefix or "F"
-    next_number = settings.invoice_next_number or 1
+    next_number = await invoice_chain.allocate_number(db, payment.workspace_id, "F")
     year = date.today().year
     invoice_number = _generate_invoice_number(prefix, year, next_number)
 
@@ -220,8 +221,6 @@ async def create_invoice_for_payment(
     )
     invoice.items.append(item)
 
-    settings.invoice_next_number = next_number + 1
-
     audit = InvoiceAuditLog(
         workspace_id=payment.workspace_id,
         action="created",
@@ -252,18 +251,9 @@ async def create_invoice_for_payment(
                 logger.exception("VeriFactu hash compute failed, continuing without chain hash")
                 invoice.verifactu_hash = invoice.verifactu_hash or None
 
-            try:
-                resp = await VeriFactuService.send_to_provider(invoice, settings, db_session=db)
-                invoice.verifactu_response = resp
-                if resp.get("status") == "accepted":
-                    invoice.verifactu_status = "accepted"
-                    invoice.verifactu_sent_at = datetime.now(timezone.utc)
-            except Exception:
-                logger.exception(
-                    "VeriFactu send_to_provider failed for invoice %s",
-                    invoice_number,
-                )
-                invoice.verifactu_status = "pending"
+            # El envío a AEAT lo hace el worker de la cola, tras el commit
+            if invoice.verifactu_hash and settings.verifactu_mode in verifactu_queue.DIRECT_MODES:
+                await verifactu_queue.enqueue_invoice(db, invoice)
         else:
             invoice.verifactu_status = None
             invoice.verifactu_hash = None
@@ -0,0 +1,479 @@
+"""Availability engine: free slots and conflict checks over sorted intervals.
+
+Everything that decides whether a time is bookable is merged once into
+sorted, disjoint intervals and then queried by bisection:
+
+- opening hours: the workspace ``weekly_schedule`` (``{"monday": [{"start":
+  "09:00", "end": "14:00"}, ...]}``), minus public holidays and, for a given
+  professional, their approved leave;
+- busy time: active bookings (pending/confirmed), reduced to the periods
+  where ``capacity`` of them run at once (``booking_policies.
+  max_concurrent_bookings``, 1 by default), so a 90-minute session blocks
+  every slot it overlaps, not only the one starting at the same "HH:MM";
+- resources: appointments hold their professional, box and machines (and
+  the box a machine is anchored to) one at a time.
+
+Bookings and appointments are read with ``tstzrange(start_time, end_time)
+&& tstzrange(:from, :to)``, served by the GiST indexes of migration 057;
+Postgres also rejects overlapping bookings of one organizer
+(``ex_bookings_organizer_overlap``), which closes the race between two
+concurrent requests.
+
+As the client portal always did, schedule hours are wall-clock times
+without a timezone and slots are emitted the same way.
+
+Client-facing slots are cached in ``ttl_cache`` per workspace and ISO week
+(:func:`workspace_slots`), so a month view is a handful of cache reads, and
+the weeks that miss are built together from one bookings query. A session
+that flushes a booking records the weeks its old and new times touch;
+holiday and workspace (schedule/policy) changes drop the whole workspace.
+Both are invalidated on every worker once the transaction commits. Booking
+creation always re-checks against live data (:meth:`WorkspaceAvailability.
+is_free`), so a stale cached slot can at worst be offered, never booked.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta, timezone
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import ttl_cache
+
+from app.models.booking import Booking, BookingStatus
+from app.models.resource import Appointment, Machine, appointment_machines
+from app.models.time_clock import LeaveRequest, PublicHoliday
+from app.models.workspace import Workspace
+
+Interval = Tuple[datetime, datetime]
+
+ACTIVE_BOOKING_STATUSES = (BookingStatus.pending, BookingStatus.confirmed)
+DAY_NAMES = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+OVERLAP_CONSTRAINT = "ex_bookings_organizer_overlap"
+
+_KEY_PREFIX = "avail:slots:"
+_INFO_KEY = "availability_dirty_weeks"
+
+
+def period(model):
+    """``tstzrange(start_time, end_time)`` of ``model``, as the GiST indexes have it."""
+    return func.tstzrange(model.start_time, model.end_time)
+
+
+def overlapping(model, start: datetime, end: datetime):
+    """Rows of ``model`` whose period overlaps ``[start, end)``."""
+    return period(model).op("&&")(func.tstzrange(start, end))
+
+
+def is_overlap_violation(exc: IntegrityError) -> bool:
+    """Whether ``exc`` comes from the bookings exclusion constraint."""
+    return OVERLAP_CONSTRAINT in str(exc.orig)
+
+
+def merge(intervals: Iterable[Interval]) -> List[Interval]:
+    """Sort and coalesce overlapping (or touching) intervals."""
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def saturated(intervals: Iterable[Interval], capacity: int) -> List[Interval]:
+    """Periods where at least ``capacity`` of ``intervals`` run at once."""
+    if capacity <= 1:
+        return merge(intervals)
+    # Sweep line; at the same instant ends go first (periods are half-open).
+    intervals = [(start, end) for start, end in intervals if end > start]
+    events = sorted([(start, 1) for start, _ in intervals] + [(end, -1) for _, end in intervals])
+    busy: List[Interval] = []
+    load = 0
+    opened: Optional[datetime] = None
+    for instant, delta in events:
+        load += delta
+        if load >= capacity and opened is None:
+            opened = instant
+        elif load < capacity and opened is not None:
+            if instant > opened:
+                busy.append((opened, instant))
+            opened = None
+    return merge(busy)
+
+
+class BusyIndex:
+    """Sorted, disjoint busy intervals with O(log n) overlap lookups."""
+
+    __slots__ = ("starts", "ends")
+
+    def __init__(self, intervals: Sequence[Interval] = ()) -> None:
+        # ``intervals`` must already be merged (see :func:`merge`).
+        self.starts = [start for start, _ in intervals]
+        self.ends = [end for _, end in intervals]
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def overlaps(self, start: datetime, end: datetime) -> bool:
+        i = bisect_right(self.starts, start) - 1
+        if i >= 0 and self.ends[i] > start:
+            return True
+        return i + 1 < len(self.starts) and self.starts[i + 1] < end
+
+
+def free_slots(windows: Sequence[Interval], busy: BusyIndex, duration: timedelta,
+               step: Optional[timedelta] = None) -> List[Interval]:
+    """Slots of ``duration`` every ``step`` inside ``windows`` that avoid ``busy``.
+
+    ``windows`` must be sorted; the busy pointer only moves forward, so the
+    whole range is one pass over windows, slots and busy intervals.
+    """
+    step = step or duration
+    slots: List[Interval] = []
+    j = 0
+    for window_start, window_end in windows:
+        slot_start = window_start
+        while slot_start + duration <= window_end:
+            slot_end = slot_start + duration
+            while j < len(busy.starts) and busy.ends[j] <= slot_start:
+                j += 1
+            if j < len(busy.starts) and busy.starts[j] < slot_end:
+                # Jump to the first step at or after the end of the busy block
+                gap = busy.ends[j] - slot_start
+                slot_start += step * max(1, -(-gap // step))
+                continue
+            slots.append((slot_start, slot_end))
+            slot_start += step
+    return slots
+
+
+def _clock(value: str, default: str) -> time:
+    hours, minutes = map(int, (value or default).split(":")[:2])
+    return time(23, 59, 59, 999999) if hours >= 24 else time(hours, minutes)
+
+
+def opening_windows(weekly_schedule: dict, first_day: date, last_day: date,
+                    closed_days: Set[date] = frozenset()) -> List[Interval]:
+    """Opening hours of every open day in ``[first_day, last_day]``, sorted."""
+    windows: List[Interval] = []
+    day = first_day
+    while day <= last_day:
+        if day not in closed_days:
+            for slot_range in weekly_schedule.get(DAY_NAMES[day.weekday()]) or []:
+                start = datetime.combine(day, _clock(slot_range.get("start"), "09:00"))
+                end = datetime.combine(day, _clock(slot_range.get("end"), "17:00"))
+                if end > start:
+                    windows.append((start, end))
+        day += timedelta(days=1)
+    return merge(windows)
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+@dataclass
+class WorkspaceAvailability:
+    """Everything needed to answer slot questions for a date range."""
+
+    first_day: date
+    last_day: date
+    weekly_schedule: dict
+    duration: timedelta
+    closed_days: Set[date]
+    busy: BusyIndex
+
+    def slots(self) -> List[Interval]:
+        windows = opening_windows(self.weekly_schedule, self.first_day, self.last_day, self.closed_days)
+        return free_slots(windows, self.busy, self.duration)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        start, end = _naive_utc(start), _naive_utc(end)
+        return start.date() not in self.closed_days and not self.busy.overlaps(start, end)
+
+
+def booking_policies(workspace: Optional[Workspace]) -> dict:
+    return ((workspace.settings or {}) if workspace else {}).get("booking_policies", {}) or {}
+
+
+async def load_workspace(
+    db: AsyncSession,
+    workspace: Workspace,
+    first_day: date,
+    last_day: date,
+    *,
+    staff_id: Optional[UUID] = None,
+    exclude_booking_id: Optional[UUID] = None,
+) -> WorkspaceAvailability:
+    """Schedule, holidays, leave and bookings of ``workspace`` for the range.
+
+    Three queries whatever the length of the range. With ``staff_id`` only
+    that professional's bookings and leave count.
+    """
+    ws_settings = workspace.settings or {}
+    policies = booking_policies(workspace)
+    range_start = datetime.combine(first_day, time.min, tzinfo=timezone.utc)
+    range_end = datetime.combine(last_day + timedelta(days=1), time.min, tzinfo=timezone.utc)
+
+    query = select(Booking.start_time, Booking.end_time).where(
+        Booking.workspace_id == workspace.id,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        overlapping(Booking, range_start, range_end),
+    )
+    if staff_id is not None:
+        query = query.where(Booking.organizer_id == staff_id)
+    if exclude_booking_id is not None:
+        query = query.where(Booking.id != exclude_booking_id)
+    bookings = [(_naive_utc(s), _naive_utc(e)) for s, e in (await db.execute(query)).all()]
+
+    closed_days: Set[date] = set(await db.scalars(
+        select(PublicHoliday.date).where(
+            PublicHoliday.workspace_id == workspace.id,
+            PublicHoliday.date.between(first_day, last_day),
+        )
+    ))
+    if staff_id is not None:
+        leave = await db.execute(
+            select(LeaveRequest.start_date, LeaveRequest.end_date).where(
+                LeaveRequest.workspace_id == workspace.id,
+                LeaveRequest.user_id == staff_id,
+                LeaveRequest.status == "aprobada",
+                LeaveRequest.start_date <= last_day,
+                LeaveRequest.end_date >= first_day,
+            )
+        )
+        for leave_start, leave_end in leave.all():
+            day = max(leave_start, first_day)
+            while day <= min(leave_end, last_day):
+                closed_days.add(day)
+                day += timedelta(days=1)
+
+    capacity = max(1, int(policies.get("max_concurrent_bookings") or 1))
+    return WorkspaceAvailability(
+        first_day=first_day,
+        last_day=last_day,
+        weekly_schedule=ws_settings.get("weekly_schedule") or {},
+        duration=timedelta(minutes=int(policies.get("default_duration") or 60)),
+        closed_days=closed_days,
+        busy=BusyIndex(saturated(bookings, capacity)),
+    )
+
+
+async def organizer_has_overlap(
+    db: AsyncSession,
+    workspace_id: UUID,
+    organizer_id: UUID,
+    start: datetime,
+    end: datetime,
+    exclude_booking_id: Optional[UUID] = None,
+) -> bool:
+    """Whether the organizer already has an active booking overlapping ``[start, end)``."""
+    query = select(Booking.id).where(
+        Booking.workspace_id == workspace_id,
+        Booking.organizer_id == organizer_id,
+        Booking.status.in_(ACTIVE_BOOKING_STATUSES),
+        overlapping(Booking, start, end),
+    )
+    if exclude_booking_id is not None:
+        query = query.where(Booking.id != exclude_booking_id)
+    return (await db.execute(query.limit(1))).first() is not None
+
+
+async def appointment_conflicts(
+    db: AsyncSession,
+    workspace_id: UUID,
+    start: datetime,
+    end: datetime,
+    staff_id: Optional[UUID],
+    box_id: Optional[UUID],
+    machine_ids: Sequence[UUID],
+    exclude_id: Optional[UUID] = None,
+) -> List[dict]:
+    """Staff, box and machine conflicts of an appointment in ``[start, end)``.
+
+    Each resource holds one appointment at a time; a machine anchored to a
+    box (``fixed_box_id``) also needs that box. One query loads every
+    appointment overlapping the period with its machines.
+    """
+    query = (
+        select(Appointment.id, Appointment.staff_id, Appointment.box_id, appointment_machines.c.machine_id)
+        .outerjoin(appointment_machines, appointment_machines.c.appointment_id == Appointment.id)
+        .where(
+            Appointment.workspace_id == workspace_id,
+            Appointment.status.notin_(["cancelled"]),
+            overlapping(Appointment, start, end),
+        )
+    )
+    if exclude_id:
+        query = query.where(Appointment.id != exclude_id)
+    busy: Dict[str, Set[UUID]] = defaultdict(set)
+    for _, busy_staff, busy_box, busy_machine in (await db.execute(query)).all():
+        busy["staff"].add(busy_staff)
+        busy["box"].add(busy_box)
+        busy["machine"].add(busy_machine)
+
+    conflicts = []
+    if staff_id and staff_id in busy["staff"]:
+        conflicts.append({"type": "staff", "id": str(staff_id), "message": "El profesional ya tiene una cita en ese horario"})
+    if box_id and box_id in busy["box"]:
+        conflicts.append({"type": "box", "id": str(box_id), "message": "El box/consulta ya está ocupado en ese horario"})
+    for mid in machine_ids:
+        if mid in busy["machine"]:
+            conflicts.append({"type": "machine", "id": str(mid), "message": "La máquina está ocupada en ese horario"})
+
+    # Anchor rule: if a machine has fixed_box_id, that box is also blocked.
+    # Scope the lookup by workspace to avoid returning anchors from other tenants.
+    if machine_ids:
+        machines = (
+            await db.execute(
+                select(Machine.name, Machine.fixed_box_id).where(
+                    Machine.id.in_(machine_ids),
+                    Machine.workspace_id == workspace_id,
+                )
+            )
+        ).all()
+        for name, fixed_box_id in machines:
+            if fixed_box_id and fixed_box_id != box_id and fixed_box_id in busy["box"]:
+                conflicts.append({
+                    "type": "box_anchor",
+                    "id": str(fixed_box_id),
+                    "message": f"El box asociado a la máquina '{name}' está ocupado",
+                })
+    return conflicts
+
+
+# ---------------------------------------------------------------------------
+# Cached client slots
+# ---------------------------------------------------------------------------
+
+def week_of(day: date) -> date:
+    """Monday of ``day``'s ISO week (the cache unit)."""
+    return day - timedelta(days=day.weekday())
+
+
+def _key(workspace_id: UUID, monday: date) -> str:
+    return f"{_KEY_PREFIX}{workspace_id}:{monday.isoformat()}"
+
+
+async def workspace_slots(
+    db: AsyncSession,
+    workspace_id: UUID,
+    first_day: date,
+    last_day: date,
+) -> Dict[date, List[dict]]:
+    """Free slots of every day in ``[first_day, last_day]``, week-cached.
+
+    Returns ``{day: [{"start": iso, "end": iso}, ...]}`` with an entry for
+    every day of the range (empty when closed or fully booked).
+    """
+    mondays = []
+    monday = week_of(first_day)
+    while monday <= last_day:
+        mondays.append(monday)
+        monday += timedelta(days=7)
+
+    weeks: Dict[date, list] = {}
+    missing = []
+    for monday in mondays:
+        cached = await ttl_cache.aget(_key(workspace_id, monday))
+        if cached is None:
+            missing.append(monday)
+        else:
+            weeks[monday] = cached
+
+    if missing:
+        workspace = await db.get(Workspace, workspace_id)
+        if workspace is None:
+            return {}
+        # One load for the span of every missing week
+        engine = await load_workspace(db, workspace, missing[0], missing[-1] + timedelta(days=6))
+        built: Dict[date, list] = {monday: [] for monday in missing}
+        for slot_start, slot_end in engine.slots():
+            bucket = built.get(week_of(slot_start.date()))
+            if bucket is not None:
+                bucket.append([slot_start.isoformat(), slot_end.isoformat()])
+        for monday, slots in built.items():
+            ttl_cache.set(_key(workspace_id, monday), slots)
+            weeks[monday] = slots
+
+    days: Dict[date, List[dict]] = {}
+    day = first_day
+    while day <= last_day:
+        days[day] = []
+        day += timedelta(days=1)
+    for slots in weeks.values():
+        for slot_start, slot_end in slots:
+            bucket = days.get(date.fromisoformat(slot_start[:10]))
+            if bucket is not None:
+                bucket.append({"start": slot_start, "end": slot_end})
+    return days
+
+
+def invalidate_workspace(workspace_id: UUID) -> None:
+    ttl_cache.invalidate_prefix(f"{_KEY_PREFIX}{workspace_id}:")
+
+
+def _booking_weeks(obj: Booking) -> Set[Tuple[UUID, Optional[date]]]:
+    # Read loaded state only: lazy loads are not allowed inside flush hooks
+    # of an AsyncSession. Old and new times both count (a moved booking
+    # frees one week and fills another).
+    state = inspect(obj)
+    workspace_id = state.dict.get("workspace_id")
+    if workspace_id is None:
+        return set()
+    times = [state.dict.get("start_time"), state.dict.get("end_time")]
+    times += list(state.attrs.start_time.history.deleted) + list(state.attrs.end_time.history.deleted)
+    days = sorted(_naive_utc(value).date() for value in times if value is not None)
+    if not days:
+        return {(workspace_id, None)}
+    weeks = set()
+    monday = week_of(days[0])
+    while monday <= days[-1]:
+        weeks.add((workspace_id, monday))
+        monday += timedelta(days=7)
+    return weeks
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_weeks(session: Session, flush_context) -> None:
+    dirty: Optional[Set[Tuple[UUID, Optional[date]]]] = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if isinstance(obj, Booking):
+            weeks = _booking_weeks(obj)
+        elif isinstance(obj, PublicHoliday):
+            weeks = {(inspect(obj).dict.get("workspace_id"), None)}
+        elif isinstance(obj, Workspace):
+            weeks = {(inspect(obj).dict.get("id"), None)}
+        else:
+            continue
+        if dirty is None:
+            dirty = session.info.setdefault(_INFO_KEY, set())
+        dirty.update(week for week in weeks if week[0] is not None)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    for workspace_id, monday in session.info.pop(_INFO_KEY, ()):
+        if monday is None:
+            invalidate_workspace(workspace_id)
+        else:
+            ttl_cache.invalidate(_key(workspace_id, monday))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
@@ -0,0 +1,559 @@
+"""
+Booking -> Google Calendar sync through a durable outbox.
+
+Creating, editing or cancelling a booking used to wait for up to two Google
+API round-trips before answering. Now the request only writes
+``calendar_sync_outbox`` rows in the same transaction as the booking change
+(:func:`enqueue_booking_sync`) and, once it commits, schedules a Celery task
+per affected calendar owner (``app.tasks.calendar_sync``). The worker
+(:func:`process_user`):
+
+- claims the user's due rows (``FOR UPDATE SKIP LOCKED``, never two rows of
+  the same booking at once). While a row is still pending, later edits of the
+  same booking reuse it, so a burst of edits becomes one API call;
+- sends them to Google in batch requests of up to
+  ``CALENDAR_SYNC_BATCH_SIZE`` operations;
+- commits the ``CalendarSyncMapping`` changes together with the outbox row
+  status, so each change is recorded exactly once. New events get an id
+  derived from (booking, user): if a worker dies after Google created the
+  event but before the commit, the retry finds the event instead of creating
+  a duplicate;
+- reschedules transient failures (rate limits, 5xx, network) with
+  exponential backoff and gives up after ``CALENDAR_SYNC_MAX_ATTEMPTS``.
+
+A beat task (:func:`sweep`) re-kicks due rows whose task was lost, releases
+rows stuck in ``processing`` by a dead worker and purges old finished rows.
+"""
+import asyncio
+import logging
+import random
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+from uuid import UUID
+
+from googleapiclient.errors import HttpError
+from sqlalchemy import and_, delete, event, exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.booking import Booking
+from app.models.client import Client
+from app.models.google_calendar import CalendarSyncMapping, CalendarSyncOutbox, GoogleCalendarToken
+from app.services.google_calendar import GoogleCalendarError, google_calendar_service
+
+logger = logging.getLogger(__name__)
+
+UPSERT = "upsert"
+DELETE = "delete"
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+# Google answers these when the caller should slow down or the backend had
+# a hiccup; anything else (bad request, forbidden calendar...) won't improve
+# by retrying.
+_TRANSIENT_STATUSES = frozenset((401, 408, 429, 500, 502, 503, 504))
+_RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+_SESSION_KEY = "calendar_sync_users"
+
+
+def event_id_for(booking_id: UUID, user_id: UUID) -> str:
+    """Google event id for a booking in a user's calendar.
+
+    Google accepts client-chosen ids in base32hex (``0-9a-v``), which plain
+    hex digits satisfy.
+    """
+    return uuid.uuid5(booking_id, str(user_id)).hex
+
+
+def retry_delay(attempts: int, rand: Optional[float] = None) -> float:
+    """Seconds before retry number ``attempts`` (exponential, ±20% jitter)."""
+    base = min(
+        settings.CALENDAR_SYNC_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+        settings.CALENDAR_SYNC_RETRY_MAX_SECONDS,
+    )
+    return base * (0.8 + 0.4 * (random.random() if rand is None else rand))
+
+
+def is_transient(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        # Timeouts, connection resets, TLS errors...
+        return True
+    if error.resp.status in _TRANSIENT_STATUSES:
+        return True
+    return error.resp.status == 403 and any(reason in str(error.content) for reason in _RATE_LIMIT_REASONS)
+
+
+# ============ REQUEST SIDE ============
+
+async def enqueue_booking_sync(
+    db: AsyncSession,
+    bookings: Sequence[Booking],
+    *,
+    action: str = UPSERT,
+    user_id: Optional[UUID] = None,
+) -> int:
+    """
+    Encola la sincronización de ``bookings`` con los calendarios conectados
+    del organizador y del cliente (o solo con el de ``user_id``). No hace
+    commit: las filas se confirman junto con el cambio del booking, y al
+    confirmarse se lanza el worker.
+
+    Returns:
+        Número de filas encoladas (o fusionadas con una pendiente).
+    """
+    if not bookings:
+        return 0
+    booking_ids = [b.id for b in bookings]
+
+    # Usuarios cuyo calendario contiene (o debe contener) cada booking
+    client_users: Dict[UUID, UUID] = {}
+    client_ids = {b.client_id for b in bookings if b.client_id}
+    if client_ids and user_id is None:
+        client_users = dict((await db.execute(
+            select(Client.id, Client.user_id).where(Client.id.in_(client_ids), Client.user_id.isnot(None))
+        )).all())
+    candidates: Dict[UUID, Set[UUID]] = {}
+    for b in bookings:
+        if user_id is not None:
+            candidates[b.id] = {user_id}
+        else:
+            candidates[b.id] = {u for u in (b.organizer_id, client_users.get(b.client_id)) if u}
+    all_users = set().union(*candidates.values())
+
+    connected: Set[Tuple[UUID, UUID]] = set()
+    if all_users:
+        connected = set((await db.execute(
+            select(GoogleCalendarToken.user_id, GoogleCalendarToken.workspace_id).where(
+                GoogleCalendarToken.user_id.in_(all_users),
+                GoogleCalendarToken.sync_enabled.is_(True),
+            )
+        )).all())
+
+    mappings: Dict[Tuple[UUID, UUID], CalendarSyncMapping] = {}
+    if action == DELETE:
+        # El mapping se borra en cascada con el booking: el evento a borrar
+        # viaja en la fila del outbox.
+        result = await db.execute(
+            select(CalendarSyncMapping).where(CalendarSyncMapping.booking_id.in_(booking_ids))
+        )
+        mappings = {(m.booking_id, m.user_id): m for m in result.scalars()}
+
+    values = []
+    for b in bookings:
+        users = {u for u in candidates[b.id] if (u, b.workspace_id) in connected}
+        if action == DELETE:
+            users |= {target for booking_id, target in mappings if booking_id == b.id}
+        for target in users:
+            mapping = mappings.get((b.id, target))
+            values.append({
+                "id": uuid.uuid4(),
+                "workspace_id": b.workspace_id,
+                "user_id": target,
+                "booking_id": b.id,
+                "action": action,
+                "google_event_id": mapping.google_event_id if mapping else None,
+                "google_calendar_id": mapping.google_calendar_id if mapping else None,
+                "status": PENDING,
+                "attempts": 0,
+            })
+    if not values:
+        return 0
+
+    stmt = insert(CalendarSyncOutbox).values(values)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[CalendarSyncOutbox.booking_id, CalendarSyncOutbox.user_id],
+        index_where=CalendarSyncOutbox.status == PENDING,
+        set_={
+            "action": stmt.excluded.action,
+            "google_event_id": func.coalesce(stmt.excluded.google_event_id, CalendarSyncOutbox.google_event_id),
+            "google_calendar_id": func.coalesce(
+                stmt.excluded.google_calendar_id, CalendarSyncOutbox.google_calendar_id
+            ),
+            "updated_at": func.now(),
+        },
+    ))
+    db.sync_session.info.setdefault(_SESSION_KEY, set()).update(v["user_id"] for v in values)
+    return len(values)
+
+
+@event.listens_for(Session, "after_commit")
+def _kick_after_commit(session: Session) -> None:
+    users = session.info.pop(_SESSION_KEY, None)
+    if users:
+        kick(users)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def kick(user_ids: Iterable[UUID], countdown: Optional[float] = None) -> None:
+    """Schedule the sync task of each user (the beat sweep covers failures)."""
+    try:
+        from app.tasks.calendar_sync import sync_user_calendar
+
+        delay = settings.CALENDAR_SYNC_DEBOUNCE_SECONDS if countdown is None else countdown
+        for user_id in user_ids:
+            sync_user_calendar.apply_async(args=[str(user_id)], countdown=delay)
+    except Exception:
+        logger.exception("calendar sync: failed to enqueue task (the sweep will retry)")
+
+
+# ============ WORKER SIDE ============
+
+@dataclass
+class _Op:
+    row: CalendarSyncOutbox
+    kind: str  # insert, insert_fixed, update, delete
+    calendar_id: str
+    event_id: Optional[str] = None
+    body: Optional[dict] = None
+
+    def request(self, service):
+        events = service.events()
+        if self.kind == "delete":
+            return events.delete(calendarId=self.calendar_id, eventId=self.event_id, sendUpdates="none")
+        if self.kind == "update":
+            return events.update(
+                calendarId=self.calendar_id, eventId=self.event_id, body=self.body, sendUpdates="none",
+            )
+        body = {**self.body, "id": self.event_id} if self.kind == "insert_fixed" else self.body
+        return events.insert(calendarId=self.calendar_id, body=body, sendUpdates="none")
+
+
+async def _execute_batch(service, ops: List[_Op]) -> List[Tuple[Any, Optional[Exception]]]:
+    """Run ``ops`` through Google's batch endpoint; one (response, error) per op."""
+    missing = RuntimeError("Google no devolvió respuesta para la operación")
+    results: List[Tuple[Any, Optional[Exception]]] = [(None, missing)] * len(ops)
+
+    def callback(request_id, response, exception):
+        results[int(request_id)] = (response, exception)
+
+    size = settings.CALENDAR_SYNC_BATCH_SIZE
+    for start in range(0, len(ops), size):
+        batch = service.new_batch_http_request(callback=callback)
+        for i, op in enumerate(ops[start:start + size], start):
+            batch.add(op.request(service), request_id=str(i))
+        try:
+            await asyncio.to_thread(batch.execute)
+        except Exception as exc:
+            for i in range(start, min(start + size, len(ops))):
+                results[i] = (None, exc)
+    return results
+
+
+class _Run:
+    """Outcome of one worker pass over a user's claimed rows."""
+
+    def __init__(self, db: AsyncSession, user_id: UUID, mappings: Dict[UUID, CalendarSyncMapping]):
+        self.db = db
+        self.user_id = user_id
+        self.mappings = mappings
+        self.done: List[CalendarSyncOutbox] = []
+        self.retry: List[Tuple[CalendarSyncOutbox, str]] = []
+        self.failed: List[Tuple[CalendarSyncOutbox, str]] = []
+
+    def set_mapping(self, op: _Op, event_id: str) -> None:
+        now = datetime.now(timezone.utc)
+        mapping = self.mappings.get(op.row.booking_id)
+        if mapping is None:
+            mapping = CalendarSyncMapping(
+                booking_id=op.row.booking_id,
+                user_id=self.user_id,
+                sync_direction="trackfiz_to_google",
+            )
+            self.db.add(mapping)
+            self.mappings[op.row.booking_id] = mapping
+        mapping.google_event_id = event_id
+        mapping.google_calendar_id = op.calendar_id
+        mapping.last_synced_at = now
+
+    async def drop_mapping(self, op: _Op) -> None:
+        mapping = self.mappings.pop(op.row.booking_id, None)
+        if mapping is not None and mapping in self.db:
+            await self.db.delete(mapping)
+
+    async def handle(self, op: _Op, response: Any, error: Optional[Exception]) -> Optional[_Op]:
+        """Record the result of ``op``; returns the follow-up operation, if any."""
+        status_code = error.resp.status if isinstance(error, HttpError) else None
+        if error is None:
+            if op.kind == "delete":
+                await self.drop_mapping(op)
+            else:
+                self.set_mapping(op, (response or {}).get("id") or op.event_id)
+            self.done.append(op.row)
+        elif op.kind == "delete" and status_code in (404, 410):
+            await self.drop_mapping(op)
+            self.done.append(op.row)
+        elif op.kind == "insert_fixed" and status_code == 409:
+            # Ya existe: lo creó un intento anterior que no llegó a confirmar.
+            return _Op(op.row, "update", op.calendar_id, op.event_id, op.body)
+        elif op.kind == "update" and status_code in (404, 410):
+            # Borrado a mano en Google: se crea de nuevo (con id nuevo, el
+            # anterior queda reservado por el evento borrado).
+            await self.drop_mapping(op)
+            return _Op(op.row, "insert", op.calendar_id, None, op.body)
+        elif is_transient(error):
+            self.retry.append((op.row, str(error)[:500]))
+        else:
+            self.failed.append((op.row, str(error)[:500]))
+        return None
+
+
+async def _claim(db: AsyncSession, user_id: UUID) -> List[CalendarSyncOutbox]:
+    other = aliased(CalendarSyncOutbox)
+    due = (
+        select(CalendarSyncOutbox.id)
+        .where(
+            CalendarSyncOutbox.user_id == user_id,
+            CalendarSyncOutbox.status == PENDING,
+            CalendarSyncOutbox.next_attempt_at <= func.now(),
+            ~exists().where(
+                other.user_id == CalendarSyncOutbox.user_id,
+                other.booking_id == CalendarSyncOutbox.booking_id,
+                other.status == PROCESSING,
+            ),
+        )
+        .order_by(CalendarSyncOutbox.next_attempt_at)
+        .limit(settings.CALENDAR_SYNC_BATCH_SIZE * 4)
+        .with_for_update(skip_locked=True)
+    )
+    rows = (await db.scalars(
+        update(CalendarSyncOutbox)
+        .where(CalendarSyncOutbox.id.in_(due.scalar_subquery()))
+        .values(status=PROCESSING, attempts=CalendarSyncOutbox.attempts + 1, updated_at=func.now())
+        .returning(CalendarSyncOutbox)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    # Fuera de la sesión: un rollback por un workspace no debe expirar las
+    # filas de los siguientes.
+    for row in rows:
+        db.expunge(row)
+    return list(rows)
+
+
+async def _settle(db: AsyncSession, ids: Iterable[UUID], status: str, error: Optional[str] = None) -> None:
+    ids = list(ids)
+    if ids:
+        await db.execute(
+            update(CalendarSyncOutbox)
+            .where(CalendarSyncOutbox.id.in_(ids))
+            .values(status=status, last_error=error, processed_at=func.now(), updated_at=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+
+async def _requeue(db: AsyncSession, row_id: UUID, delay: float, error: Optional[str]) -> None:
+    """Back to ``pending`` after ``delay`` seconds, unless a newer change superseded it."""
+    newer = aliased(CalendarSyncOutbox)
+    superseded = exists().where(
+        newer.booking_id == CalendarSyncOutbox.booking_id,
+        newer.user_id == CalendarSyncOutbox.user_id,
+        newer.status == PENDING,
+    )
+    result = await db.execute(
+        update(CalendarSyncOutbox)
+        .where(CalendarSyncOutbox.id == row_id, ~superseded)
+        .values(
+            status=PENDING,
+            last_error=error,
+            next_attempt_at=func.now() + timedelta(seconds=delay),
+            updated_at=func.now(),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        await _settle(db, [row_id], DONE, "superseded")
+
+
+async def _sync_workspace(
+    db: AsyncSession, user_id: UUID, workspace_id: UUID, rows: List[CalendarSyncOutbox],
+) -> _Run:
+    booking_ids = [r.booking_id for r in rows]
+    mappings = {
+        m.booking_id: m
+        for m in (await db.scalars(
+            select(CalendarSyncMapping).where(
+                CalendarSyncMapping.user_id == user_id,
+                CalendarSyncMapping.booking_id.in_(booking_ids),
+            )
+        ))
+    }
+    run = _Run(db, user_id, mappings)
+
+    token = await db.scalar(
+        select(GoogleCalendarToken).where(
+            GoogleCalendarToken.user_id == user_id,
+            GoogleCalendarToken.workspace_id == workspace_id,
+            GoogleCalendarToken.sync_enabled.is_(True),
+        )
+    )
+    if token is None:
+        # Calendario desconectado: no hay nada que sincronizar.
+        run.failed.extend((r, "Google Calendar no conectado") for r in rows)
+        return run
+    try:
+        token = await google_calendar_service.ensure_valid_token(token, db)
+    except GoogleCalendarError as e:
+        run.failed.extend((r, e.message) for r in rows)
+        return run
+    if not token.calendar_id or token.calendar_id == "primary":
+        await google_calendar_service.get_or_create_trackfiz_calendar(token, db)
+    calendar_id = token.calendar_id or "primary"
+
+    bookings = {
+        b.id: b
+        for b in (await db.scalars(select(Booking).where(Booking.id.in_(booking_ids))))
+    }
+    clients = {}
+    client_ids = {b.client_id for b in bookings.values() if b.client_id and b.organizer_id == user_id}
+    if client_ids:
+        clients = {c.id: c for c in (await db.scalars(select(Client).where(Client.id.in_(client_ids))))}
+
+    ops: List[_Op] = []
+    for row in rows:
+        booking = bookings.get(row.booking_id)
+        mapping = mappings.get(row.booking_id)
+        if row.action == DELETE or booking is None:
+            event_id = row.google_event_id or (mapping.google_event_id if mapping else None)
+            if event_id is None and row.action == DELETE:
+                # Quizá lo creó un intento que no llegó a guardar el mapping.
+                event_id = event_id_for(row.booking_id, user_id)
+            if event_id is None:
+                run.done.append(row)
+                continue
+            target = row.google_calendar_id or (mapping.google_calendar_id if mapping else calendar_id)
+            ops.append(_Op(row, "delete", target, event_id))
+            continue
+        # Sólo el organizador ve al cliente como asistente (como antes).
+        client = clients.get(booking.client_id) if booking.organizer_id == user_id else None
+        body = google_calendar_service._booking_to_event(booking, client)
+        if mapping is not None:
+            ops.append(_Op(row, "update", mapping.google_calendar_id, mapping.google_event_id, body))
+        else:
+            ops.append(_Op(row, "insert_fixed", calendar_id, event_id_for(row.booking_id, user_id), body))
+
+    service = google_calendar_service._get_calendar_service(token)
+    # Cada operación puede necesitar una segunda llamada (409 -> update,
+    # 404 -> insert); como mucho tres rondas.
+    for _ in range(3):
+        if not ops:
+            break
+        results = await _execute_batch(service, ops)
+        follow_ups = []
+        for op, (response, error) in zip(ops, results):
+            follow_up = await run.handle(op, response, error)
+            if follow_up is not None:
+                follow_ups.append(follow_up)
+        ops = follow_ups
+    run.retry.extend((op.row, "sin respuesta definitiva de Google") for op in ops)
+    return run
+
+
+async def _finish(db: AsyncSession, run: _Run) -> None:
+    await _settle(db, [r.id for r in run.done], DONE)
+    for row, error in run.failed:
+        await _settle(db, [row.id], FAILED, error)
+    for row, error in run.retry:
+        if row.attempts >= settings.CALENDAR_SYNC_MAX_ATTEMPTS:
+            await _settle(db, [row.id], FAILED, error)
+        else:
+            await _requeue(db, row.id, retry_delay(row.attempts), error)
+
+
+async def process_user(db: AsyncSession, user_id: UUID) -> Optional[float]:
+    """
+    Lleva a Google los cambios pendientes del calendario de ``user_id``.
+
+    Returns:
+        Segundos hasta la siguiente fila pendiente de este usuario, o None.
+    """
+    rows = await _claim(db, user_id)
+    by_workspace: Dict[UUID, List[CalendarSyncOutbox]] = defaultdict(list)
+    for row in rows:
+        by_workspace[row.workspace_id].append(row)
+
+    for workspace_id, workspace_rows in by_workspace.items():
+        # El rollback expira los objetos de la sesión: los reintentos usan
+        # sólo estos valores.
+        claimed = [(row.id, row.attempts) for row in workspace_rows]
+        try:
+            run = await _sync_workspace(db, user_id, workspace_id, workspace_rows)
+            await _finish(db, run)
+            # Mappings y estado de las filas en la misma transacción.
+            await db.commit()
+        except IntegrityError as exc:
+            # El booking se borró mientras tanto: el próximo intento lo trata como delete.
+            await db.rollback()
+            for row_id, attempts in claimed:
+                await _requeue(db, row_id, retry_delay(attempts), str(exc.orig)[:500])
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            logger.exception("calendar sync: user %s workspace %s failed", user_id, workspace_id)
+            for row_id, attempts in claimed:
+                await _requeue(db, row_id, retry_delay(attempts), str(exc)[:500])
+            await db.commit()
+
+    if rows:
+        logger.info("calendar sync: user %s processed %d change(s)", user_id, len(rows))
+    next_due = await db.scalar(
+        select(func.min(CalendarSyncOutbox.next_attempt_at)).where(
+            CalendarSyncOutbox.user_id == user_id, CalendarSyncOutbox.status == PENDING,
+        )
+    )
+    if next_due is None:
+        return None
+    return max((next_due - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+async def sweep(db: AsyncSession) -> List[UUID]:
+    """
+    Mantenimiento periódico del outbox. Devuelve los usuarios con filas ya
+    vencidas, para relanzar su tarea.
+    """
+    stuck_before = func.now() - timedelta(seconds=settings.CALENDAR_SYNC_STUCK_SECONDS)
+    stuck = and_(CalendarSyncOutbox.status == PROCESSING, CalendarSyncOutbox.updated_at < stuck_before)
+    newer = aliased(CalendarSyncOutbox)
+    # Un worker murió a mitad: si hay un cambio posterior pendiente, gana ése.
+    await db.execute(
+        update(CalendarSyncOutbox)
+        .where(stuck, exists().where(
+            newer.booking_id == CalendarSyncOutbox.booking_id,
+            newer.user_id == CalendarSyncOutbox.user_id,
+            newer.status == PENDING,
+        ))
+        .values(status=DONE, last_error="superseded", processed_at=func.now(), updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        update(CalendarSyncOutbox)
+        .where(stuck)
+        .values(status=PENDING, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(CalendarSyncOutbox).where(
+            CalendarSyncOutbox.status.in_((DONE, FAILED)),
+            CalendarSyncOutbox.updated_at < func.now() - timedelta(days=settings.CALENDAR_SYNC_RETENTION_DAYS),
+        )
+    )
+    users = (await db.scalars(
+        select(CalendarSyncOutbox.user_id)
+        .where(CalendarSyncOutbox.status == PENDING, CalendarSyncOutbox.next_attempt_at <= func.now())
+        .distinct()
+    )).all()
+    await db.commit()
+    return list(users)
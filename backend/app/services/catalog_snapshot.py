@@ -0,0 +1,403 @@
+"""In-memory snapshot of the global food and exercise catalogs.
+
+Every workspace sees the same global (``is_global``) foods and exercises, and
+they change a few times a week, yet the exercise picker, the library screens
+and the food list re-read and re-hydrate thousands of those rows per request.
+Each worker now keeps a read-only copy of them:
+
+- compact ``__slots__`` records kept in display order (accent- and
+  case-insensitive name, then id), plus value -> ids indexes for the
+  exercise muscle groups, equipment, category and difficulty and the food
+  category, so filters intersect small sets instead of scanning;
+- loaded on first use; afterwards, at most every ``CATALOG_REFRESH_SECONDS``,
+  a request triggers a background probe (``count(*)``, ``max(updated_at)``)
+  and only the rows changed since the last one are fetched. A count that
+  no longer adds up (deleted rows) or ``CATALOG_FULL_RELOAD_SECONDS`` since
+  the last full load reloads everything. Requests keep reading the current
+  copy meanwhile, so they never wait for a refresh;
+- workspace rows are still read from the database (they are per tenant and
+  edited all the time) and merged in order with :func:`merge_sorted`.
+
+Text search matches name, alias and muscle groups without accents or case,
+the same as :func:`exercise_search_clause` does in SQL for the workspace rows.
+Ranked food search stays in SQL (``app.services.food_search``).
+"""
+from __future__ import annotations
+
+import asyncio
+import contextvars
+import heapq
+import logging
+import time
+import unicodedata
+from datetime import datetime
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple, Type
+from uuid import UUID
+
+from sqlalchemy import String, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.exercise import Exercise
+from app.models.nutrition import Food
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=8192)
+def fold(value: Optional[str]) -> str:
+    """Lower-case ``value`` without accents ("Tríceps" -> "triceps")."""
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def sort_key(item: Any) -> Tuple[str, str, UUID]:
+    """Display order of catalog rows: folded name, then name and id as tie-breaks."""
+    return (fold(item.name), item.name, item.id)
+
+
+# Sort/bisect key of records (their precomputed ``sort_key``).
+record_key = attrgetter("sort_key")
+
+
+def merge_sorted(*sources: Iterable[Any]) -> List[Any]:
+    """Merge record lists already in display order into one."""
+    return list(heapq.merge(*sources, key=record_key))
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def exercise_search_clause(search: str, *, name_only: bool = False):
+    """SQL twin of the snapshot's exercise text match, for workspace rows."""
+    pattern = func.unaccent(f"%{_escape_like(search)}%")
+    clauses = [func.unaccent(Exercise.name).ilike(pattern)]
+    if not name_only:
+        clauses.append(Exercise.alias.isnot(None) & func.unaccent(Exercise.alias).ilike(pattern))
+        clauses.append(Exercise.muscle_groups.cast(String).ilike(pattern))
+    return or_(*clauses)
+
+
+# ---------------------------------------------------------------------------
+# Records
+# ---------------------------------------------------------------------------
+
+class ExerciseRecord:
+    """Read-only global exercise; same attributes the response schemas read."""
+
+    __slots__ = (
+        "id", "workspace_id", "name", "alias", "description", "instructions",
+        "muscle_groups", "equipment", "difficulty", "category", "video_url",
+        "image_url", "thumbnail_url", "is_global", "updated_at",
+        "sort_key", "name_text", "search_text",
+    )
+    columns = (
+        Exercise.id, Exercise.workspace_id, Exercise.name, Exercise.alias,
+        Exercise.description, Exercise.instructions, Exercise.muscle_groups,
+        Exercise.equipment, Exercise.difficulty, Exercise.category,
+        Exercise.video_url, Exercise.image_url, Exercise.thumbnail_url,
+        Exercise.is_global, Exercise.updated_at,
+    )
+    indexed = ("muscle_groups", "equipment", "category", "difficulty")
+
+    def __init__(self, row: Any) -> None:
+        for column in self.columns:
+            setattr(self, column.key, getattr(row, column.key))
+        self.muscle_groups = tuple(self.muscle_groups or ())
+        self.equipment = tuple(self.equipment or ())
+        self.sort_key = sort_key(self)
+        self.name_text = fold(self.name)
+        self.search_text = "\n".join((self.name_text, fold(self.alias), fold(",".join(self.muscle_groups))))
+
+    def matches(self, term: str, name_only: bool) -> bool:
+        return term in (self.name_text if name_only else self.search_text)
+
+
+class FoodRecord:
+    """Read-only global food with the columns the list screens show."""
+
+    __slots__ = (
+        "id", "workspace_id", "name", "brand", "category", "serving_size",
+        "serving_unit", "calories", "protein_g", "carbs_g", "fat_g", "fiber_g",
+        "image_url", "is_global", "updated_at", "sort_key",
+    )
+    columns = (
+        Food.id, Food.workspace_id, Food.name, Food.brand, Food.category,
+        Food.serving_size, Food.serving_unit, Food.calories, Food.protein_g,
+        Food.carbs_g, Food.fat_g, Food.fiber_g, Food.image_url, Food.is_global,
+        Food.updated_at,
+    )
+    indexed = ("category",)
+
+    def __init__(self, row: Any) -> None:
+        for column in self.columns:
+            setattr(self, column.key, getattr(row, column.key))
+        self.sort_key = sort_key(self)
+
+
+# ---------------------------------------------------------------------------
+# Catalog
+# ---------------------------------------------------------------------------
+
+class Catalog:
+    """Global rows of one model, kept in display order with value indexes."""
+
+    def __init__(self, model: Type, record_cls: Type) -> None:
+        self.model = model
+        self.record_cls = record_cls
+        self.records: Dict[UUID, Any] = {}
+        self.ordered: List[Any] = []
+        self.indexes: Dict[str, Dict[Any, Set[UUID]]] = {}
+        self.watermark: Optional[datetime] = None
+        self.loaded = False
+        self.checked_at = 0.0
+        self.full_loaded_at = 0.0
+        self.full_loads = 0
+        self.delta_loads = 0
+        self._lock = asyncio.Lock()
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    # -- building ---------------------------------------------------------
+
+    def replace(self, rows: Iterable[Any]) -> None:
+        """Swap in a full set of global rows."""
+        self.watermark = None
+        self.apply(rows, full=True)
+
+    def apply(self, rows: Iterable[Any], *, full: bool = False) -> int:
+        """Upsert changed rows (and drop the ones that are no longer global)."""
+        records = {} if full else dict(self.records)
+        watermark = self.watermark
+        changed = 0
+        for row in rows:
+            changed += 1
+            if row.updated_at is not None and (watermark is None or row.updated_at > watermark):
+                watermark = row.updated_at
+            if row.is_global:
+                records[row.id] = self.record_cls(row)
+            else:
+                records.pop(row.id, None)
+        if changed or full:
+            self._publish(records)
+        self.watermark = watermark
+        return changed
+
+    def _publish(self, records: Dict[UUID, Any]) -> None:
+        ordered = sorted(records.values(), key=record_key)
+        indexes: Dict[str, Dict[Any, Set[UUID]]] = {field: {} for field in self.record_cls.indexed}
+        for record in ordered:
+            for field, index in indexes.items():
+                value = getattr(record, field)
+                for item in (value if isinstance(value, tuple) else (value,)):
+                    if item is not None:
+                        index.setdefault(item, set()).add(record.id)
+        # Readers grab these attributes without awaiting, so swapping them
+        # here (no await in between) is atomic for them.
+        self.records, self.ordered, self.indexes = records, ordered, indexes
+        self.loaded = True
+
+    # -- reading ----------------------------------------------------------
+
+    def select(
+        self,
+        *,
+        search: Optional[str] = None,
+        name_only: bool = False,
+        **filters: Optional[Sequence[Any]],
+    ) -> List[Any]:
+        """Records in display order matching every filter.
+
+        Keyword filters name an indexed field and list the values that must
+        all be present (array fields) or match (scalar fields); ``None`` or an
+        empty list skips the filter.
+        """
+        ordered, records, indexes = self.ordered, self.records, self.indexes
+        candidates: Optional[Set[UUID]] = None
+        for field, values in filters.items():
+            for value in values or ():
+                ids = indexes[field].get(value, set())
+                candidates = set(ids) if candidates is None else candidates & ids
+        if candidates is None:
+            result = ordered
+        elif len(candidates) * 8 < len(ordered):
+            result = sorted((records[i] for i in candidates), key=record_key)
+        else:
+            result = [r for r in ordered if r.id in candidates]
+        term = fold((search or "").strip())
+        if term:
+            result = [r for r in result if r.matches(term, name_only)]
+        return result
+
+    async def workspace_records(
+        self, db: AsyncSession, *criteria: Any, limit: Optional[int] = None,
+    ) -> Optional[List[Any]]:
+        """Non-global rows matching ``criteria``, as records in display order.
+
+        ``None`` when there are more than ``limit`` of them (the caller then
+        pages in SQL instead).
+        """
+        criteria = (self.model.is_global.isnot(True), *criteria)
+        if limit is not None:
+            # Counting up to limit + 1 ids is cheap; loading them is not.
+            capped = select(self.model.id).where(*criteria).limit(limit + 1).subquery()
+            if await db.scalar(select(func.count()).select_from(capped)) > limit:
+                return None
+        rows = (await db.execute(select(*self.record_cls.columns).where(*criteria))).all()
+        return sorted(map(self.record_cls, rows), key=record_key)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": len(self.records),
+            "watermark": self.watermark.isoformat() if self.watermark else None,
+            "age_seconds": round(time.monotonic() - self.checked_at, 1) if self.loaded else None,
+            "full_loads": self.full_loads,
+            "delta_loads": self.delta_loads,
+        }
+
+    # -- loading ----------------------------------------------------------
+
+    async def ensure(self) -> "Catalog":
+        """The snapshot, loading it on first use and refreshing it when due."""
+        if not self.loaded:
+            async with self._lock:
+                if not self.loaded:
+                    await self.refresh(full=True)
+        elif time.monotonic() - self.checked_at >= settings.CATALOG_REFRESH_SECONDS:
+            self._schedule_refresh()
+        return self
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        # Empty context: the refresh's queries don't belong to the request
+        # that happened to trigger it (see app.core.database.track_queries).
+        self._refresh_task = asyncio.get_running_loop().create_task(
+            self._background_refresh(), context=contextvars.Context(),
+        )
+
+    async def _background_refresh(self) -> None:
+        try:
+            async with self._lock:
+                await self.refresh()
+        except Exception as exc:
+            # Keep serving the current copy; the next request retries.
+            self.checked_at = time.monotonic()
+            logger.warning("catalog %s: refresh failed: %s", self.model.__tablename__, exc)
+
+    async def refresh(self, *, full: bool = False) -> None:
+        from app.core.database import AsyncSessionLocal
+
+        model = self.model
+        async with AsyncSessionLocal() as session:
+            if not full and time.monotonic() - self.full_loaded_at >= settings.CATALOG_FULL_RELOAD_SECONDS:
+                full = True
+            if not full:
+                full = not await self._refresh_delta(session)
+            if full:
+                rows = await session.execute(select(*self.record_cls.columns).where(model.is_global.is_(True)))
+                self.replace(rows.all())
+                self.full_loaded_at = time.monotonic()
+                self.full_loads += 1
+        self.checked_at = time.monotonic()
+
+    async def _refresh_delta(self, session: AsyncSession) -> bool:
+        """Apply the rows changed since the watermark; False if that can't be trusted."""
+        model = self.model
+        count, latest = (await session.execute(
+            select(func.count(), func.max(model.updated_at)).where(model.is_global.is_(True))
+        )).one()
+        if count == len(self.records) and latest == self.watermark:
+            return True
+        if self.watermark is None:
+            return False
+        # ``>=``: rows written in the same instant as the watermark may not
+        # have been visible yet when it was read. Deleted rows and rows that
+        # stopped being global don't show up here; the count then doesn't
+        # add up and the caller reloads everything.
+        rows = await session.execute(
+            select(*self.record_cls.columns).where(
+                model.is_global.is_(True), model.updated_at >= self.watermark,
+            )
+        )
+        self.apply(rows.all())
+        self.delta_loads += 1
+        return len(self.records) == count
+
+    async def stop(self) -> None:
+        if self._refresh_task is not None:
+            self._refresh_task.cancel()
+            try:
+                await self._refresh_task
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._refresh_task = None
+
+
+exercises = Catalog(Exercise, ExerciseRecord)
+foods = Catalog(Food, FoodRecord)
+
+
+async def list_exercises(
+    db: AsyncSession,
+    workspace_id: Optional[UUID],
+    *,
+    include_global: bool = True,
+    include_workspace: bool = True,
+    search: Optional[str] = None,
+    name_only: bool = False,
+    muscle_groups: Sequence[str] = (),
+    equipment: Optional[str] = None,
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+) -> List[ExerciseRecord]:
+    """Exercises visible to a workspace, in display order, as records.
+
+    Global ones come from the snapshot and the workspace's own from the
+    database; every muscle group in ``muscle_groups`` has to be present.
+    """
+    search = (search or "").strip() or None
+    criteria: List[Any] = []
+    if search:
+        criteria.append(exercise_search_clause(search, name_only=name_only))
+    criteria.extend(Exercise.muscle_groups.any(group) for group in muscle_groups)
+    if equipment:
+        criteria.append(Exercise.equipment.any(equipment))
+    if category:
+        criteria.append(Exercise.category == category)
+    if difficulty:
+        criteria.append(Exercise.difficulty == difficulty)
+
+    own: List[ExerciseRecord] = []
+    if include_workspace and workspace_id is not None:
+        own = await exercises.workspace_records(db, Exercise.workspace_id == workspace_id, *criteria)
+    if not include_global:
+        return own
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        rows = await db.execute(
+            select(*ExerciseRecord.columns).where(Exercise.is_global.is_(True), *criteria)
+        )
+        return merge_sorted(sorted(map(ExerciseRecord, rows.all()), key=record_key), own)
+    catalog = await exercises.ensure()
+    globals_ = catalog.select(
+        search=search,
+        name_only=name_only,
+        muscle_groups=muscle_groups,
+        equipment=[equipment] if equipment else None,
+        category=[category] if category else None,
+        difficulty=[difficulty] if difficulty else None,
+    )
+    return merge_sorted(globals_, own)
+
+
+async def stop() -> None:
+    await exercises.stop()
+    await foods.stop()
+
+
+def stats() -> Dict[str, Any]:
+    return {"exercises": exercises.stats(), "foods": foods.stats()}
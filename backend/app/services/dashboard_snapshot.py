@@ -0,0 +1,115 @@
+"""Per-client snapshot of the client portal dashboard.
+
+``GET /my/dashboard`` is polled by the app and needs seven independent reads
+(bookings, workout logs, programs, meal plan, two measurements, today's
+nutrition). Each load used to fan them out through ``parallel_queries``,
+i.e. seven pool checkouts. The rendered payload is now kept in the shared
+``ttl_cache`` (Redis-backed, so one worker's build serves all of them) and
+a dashboard read is a single cache lookup.
+
+Freshness:
+
+- A session that flushes changes to a client's bookings, workout logs,
+  programs, meal plans, measurements or the client row records the client
+  id; the snapshot is invalidated on every worker once the transaction
+  commits. Writes made with Core statements call :func:`mark_dirty`.
+- Snapshots carry the day they were built for. Day-scoped figures (today's
+  nutrition, today's workouts) make a snapshot from another day stale, and
+  the endpoint then rebuilds it with the live fan-out.
+- Writes from processes without a running event loop (Celery), and a
+  rebuild that races with a commit, can leave an outdated snapshot; the
+  namespace TTL bounds that window. Callers that need read-your-writes ask
+  for ``consistency=strong``.
+"""
+from __future__ import annotations
+
+import time
+from datetime import date
+from itertools import chain
+from typing import Any, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core import ttl_cache
+from app.models.booking import Booking
+from app.models.client import Client
+from app.models.exercise import ClientMeasurement
+from app.models.nutrition import MealPlan
+from app.models.workout import WorkoutLog, WorkoutProgram
+
+_KEY_PREFIX = "dash:client:"
+_INFO_KEY = "dashboard_dirty_clients"
+_WATCHED = (Booking, WorkoutLog, WorkoutProgram, MealPlan, ClientMeasurement)
+
+
+def _key(client_id: UUID) -> str:
+    return f"{_KEY_PREFIX}{client_id}"
+
+
+async def get(client_id: UUID) -> Optional[dict]:
+    """Snapshot payload for today, or None when missing or stale."""
+    snap = await ttl_cache.aget(_key(client_id))
+    if not snap or snap.get("day") != date.today().isoformat():
+        return None
+    return snap["data"]
+
+
+def store(client_id: UUID, data: dict) -> None:
+    """Save a freshly built payload (must be JSON-serialisable)."""
+    ttl_cache.set(
+        _key(client_id),
+        {"day": date.today().isoformat(), "built_at": time.time(), "data": data},
+    )
+
+
+def invalidate(client_id: UUID) -> None:
+    ttl_cache.invalidate(_key(client_id))
+
+
+def mark_dirty(db: AsyncSession, client_id: UUID) -> None:
+    """Invalidate ``client_id``'s snapshot when ``db`` commits."""
+    db.sync_session.info.setdefault(_INFO_KEY, set()).add(client_id)
+
+
+# ---------------------------------------------------------------------------
+# Session hooks
+# ---------------------------------------------------------------------------
+
+def _client_ids(obj: Any) -> Set[UUID]:
+    # Read loaded state only: lazy loads are not allowed inside flush hooks
+    # of an AsyncSession.
+    state = inspect(obj)
+    if isinstance(obj, Client):
+        ids = {state.dict.get("id")}
+    else:
+        history = state.attrs.client_id.history
+        ids = {state.dict.get("client_id"), *history.deleted}
+    ids.discard(None)
+    return ids
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_dirty_clients(session: Session, flush_context) -> None:
+    dirty: Optional[Set[UUID]] = None
+    for obj in chain(session.new, session.dirty, session.deleted):
+        if not isinstance(obj, _WATCHED) and not isinstance(obj, Client):
+            continue
+        ids = _client_ids(obj)
+        if ids:
+            if dirty is None:
+                dirty = session.info.setdefault(_INFO_KEY, set())
+            dirty.update(ids)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    for client_id in session.info.pop(_INFO_KEY, ()):
+        invalidate(client_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_on_rollback(session: Session) -> None:
+    session.info.pop(_INFO_KEY, None)
@@ -0,0 +1,146 @@
+"""Per-exercise performance rows (``exercise_performances`` table).
+
+A workout log keeps the session as one JSONB document. Every write also
+stores one row per logged exercise with its sets and the figures the
+history views need (sets, reps, volume, top weight, estimated 1RM), so
+"last sessions of this exercise" is an index range scan on
+(client_id, exercise_id, performed_at) however long the client's history is.
+
+``performed_at`` is the log's ``created_at`` (the day chosen for back-dated
+detailed logs), the same order the history always used. Writing the rows
+also refreshes the weekly aggregates of ``app.services.workout_analytics``.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import func, inspect, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.base import NO_VALUE
+
+from app.models.workout import ExercisePerformance, WorkoutLog
+from app.services import workout_analytics
+
+
+def _number(value: Any) -> Optional[float]:
+    if value is None or isinstance(value, bool):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def estimated_1rm(weight_kg: float, reps: int) -> float:
+    """Epley estimate; a single is its own 1RM."""
+    return weight_kg if reps == 1 else weight_kg * (1 + reps / 30)
+
+
+def summarize(entry: dict) -> Dict[str, Any]:
+    """Per-session figures of one exercise entry of a log.
+
+    Accepts the detailed log shape (``weight_kg`` / ``reps_completed``) and
+    the looser one some clients send (``weight`` / ``reps``). Sets marked
+    ``completed: false`` don't count.
+    """
+    set_count = total_reps = 0
+    volume = 0.0
+    top_weight: Optional[float] = None
+    best_e1rm: Optional[float] = None
+    best_set: Tuple[Optional[float], Optional[int]] = (None, None)
+    for s in entry.get("sets") or []:
+        if not isinstance(s, dict) or s.get("completed") is False:
+            continue
+        set_count += 1
+        weight = _number(s.get("weight_kg", s.get("weight")))
+        reps = _number(s.get("reps_completed", s.get("reps")))
+        reps = int(reps) if reps and reps > 0 else 0
+        total_reps += reps
+        if weight is None or weight <= 0:
+            continue
+        volume += weight * reps
+        top_weight = weight if top_weight is None else max(top_weight, weight)
+        if reps:
+            e1rm = estimated_1rm(weight, reps)
+            if best_e1rm is None or e1rm > best_e1rm:
+                best_e1rm, best_set = e1rm, (weight, reps)
+    return {
+        "set_count": set_count,
+        "total_reps": total_reps,
+        "total_volume_kg": round(volume, 2),
+        "top_weight_kg": top_weight,
+        "best_e1rm_kg": round(best_e1rm, 2) if best_e1rm is not None else None,
+        "best_set_weight_kg": best_set[0],
+        "best_set_reps": best_set[1],
+    }
+
+
+def rows_for(log_id: UUID, client_id: UUID, performed_at: Any, log: Optional[dict]) -> List[dict]:
+    """``exercise_performances`` rows of a log document (one per exercise)."""
+    rows = []
+    exercises = (log or {}).get("exercises") or []
+    for position, entry in enumerate(exercises):
+        if not isinstance(entry, dict) or not entry.get("exercise_id"):
+            continue
+        rows.append({
+            "workout_log_id": log_id,
+            "client_id": client_id,
+            "exercise_id": str(entry["exercise_id"])[:64],
+            "exercise_name": (entry.get("exercise_name") or entry.get("name") or None),
+            "performed_at": performed_at,
+            "position": position,
+            "entry": entry,
+            **summarize(entry),
+        })
+    return rows
+
+
+async def record(db: AsyncSession, log: WorkoutLog) -> None:
+    """Write the rows of a new ``log`` (already flushed) in the current transaction."""
+    # created_at comes from the server default unless set explicitly; now()
+    # is the transaction timestamp, i.e. the same value.
+    created_at = inspect(log).attrs.created_at.loaded_value
+    performed_at = func.now() if created_at is NO_VALUE or created_at is None else created_at
+    rows = rows_for(log.id, log.client_id, performed_at, log.log)
+    if not rows:
+        return
+    written = await db.execute(
+        insert(ExercisePerformance)
+        .values(rows)
+        .returning(ExercisePerformance.exercise_id, ExercisePerformance.performed_at)
+    )
+    written = written.all()
+    await workout_analytics.refresh_weeks(
+        db,
+        log.client_id,
+        {exercise_id for exercise_id, _ in written},
+        {workout_analytics.week_of(performed_at) for _, performed_at in written},
+    )
+
+
+async def history(db: AsyncSession, client_id: UUID, exercise_id: str, limit: int) -> List[dict]:
+    """Last ``limit`` sessions of an exercise, newest first.
+
+    Same shape the client portal always returned: ``date``, the logged
+    ``exercise`` entry and ``log_id`` (one entry per log).
+    """
+    # An exercise repeated within one log counts once (its first entry)
+    rows = await db.execute(
+        select(ExercisePerformance.workout_log_id, ExercisePerformance.performed_at, ExercisePerformance.entry)
+        .where(
+            ExercisePerformance.client_id == client_id,
+            ExercisePerformance.exercise_id == exercise_id,
+        )
+        .distinct(ExercisePerformance.performed_at, ExercisePerformance.workout_log_id)
+        .order_by(
+            ExercisePerformance.performed_at.desc(),
+            ExercisePerformance.workout_log_id,
+            ExercisePerformance.position,
+        )
+        .limit(limit)
+    )
+    return [
+        {"date": performed_at.isoformat(), "exercise": entry, "log_id": str(log_id)}
+        for log_id, performed_at, entry in rows.all()
+    ]
@@ -0,0 +1,225 @@
+"""Ranked, typo-tolerant food search with keyset pagination.
+
+Matches against ``foods.search_text`` (name + brand + generic name, lower-
+cased and without accents, kept by Postgres as a generated column) through
+its trigram GIN index, so the food picker no longer scans the table on every
+keystroke:
+
+- substring: ``search_text LIKE '%word%'``;
+- typos: ``word <% search_text`` (pg_trgm word similarity, "platno" finds
+  "plátano"; it scores 0.57, hence the threshold below pg_trgm's 0.6).
+
+Every word of the term has to match one way or the other. Results come best
+first: foods whose name starts with the term, then by mean word similarity,
+then alphabetically. Pages can be requested by number (offset,
+what the current screens use) or with the opaque ``next_cursor`` of the
+previous page, which stays fast however deep the user scrolls. The total is
+the planner's estimate unless the last page is reached by number (then it is
+exact), or counted when the page asked for is past the end.
+
+Without a search term, global foods come from the per-worker catalog
+snapshot (``app.services.catalog_snapshot``) and only the workspace's own
+foods are read from the database; see :func:`catalog_food_page`.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import List, Optional
+from uuid import UUID
+
+from fastapi import HTTPException, status
+from sqlalchemy import Numeric, Select, and_, case, cast, func, literal, or_, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.row_estimates import estimated_count
+from app.models.nutrition import Food
+from app.services import catalog_snapshot
+from app.services.catalog_snapshot import fold, merge_sorted, record_key
+
+
+# pg_trgm.word_similarity_threshold for the ``<%`` match, set per transaction.
+WORD_SIMILARITY_THRESHOLD = 0.5
+# Words of the search term that are matched (the rest is ignored).
+MAX_WORDS = 5
+
+
+@dataclass
+class FoodPage:
+    # ORM rows, or catalog records with the same attributes.
+    items: List[Food]
+    total: int
+    total_is_estimate: bool
+    next_cursor: Optional[str]
+
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _normalized(value: str):
+    # Same normalisation as the generated column, applied to the bind value.
+    return func.lower(func.f_unaccent(literal(value)))
+
+
+def _encode_cursor(values: list) -> str:
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str, size: int) -> list:
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError):
+        values = None
+    if not isinstance(values, list) or len(values) != size:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido")
+    return values
+
+
+def _cursor_id(value) -> UUID:
+    try:
+        return UUID(str(value))
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Cursor de paginación inválido")
+
+
+async def search_foods(
+    db: AsyncSession,
+    query: Select,
+    *,
+    search: Optional[str],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> FoodPage:
+    """Run ``query`` (a ``select(Food)`` with visibility filters) as a search page."""
+    term = (search or "").strip()
+    if term:
+        await db.execute(
+            text("SELECT set_config('pg_trgm.word_similarity_threshold', :value, true)"),
+            {"value": str(WORD_SIMILARITY_THRESHOLD)},
+        )
+        # Every word has to match (in any order, name or brand), so
+        # "hacendado integral" intersects two candidate sets instead of
+        # ranking everything either word resembles.
+        words = term.split()[:MAX_WORDS]
+        query = query.where(*(
+            or_(
+                Food.search_text.like(func.concat("%", _normalized(_escape_like(word)), "%")),
+                Food.search_text.op("%>")(_normalized(word)),
+            )
+            for word in words
+        ))
+        similarity = sum(func.word_similarity(_normalized(word), Food.search_text) for word in words) / len(words)
+        rank = cast(
+            case((Food.search_text.like(func.concat(_normalized(_escape_like(term)), "%")), 1), else_=0)
+            + similarity,
+            Numeric(6, 4),
+        )
+        ordered = query.add_columns(rank.label("rank")).order_by(rank.desc(), Food.name, Food.id)
+        if cursor:
+            last_rank, last_name, last_id = _decode_cursor(cursor, 3)
+            last_rank = Decimal(str(last_rank))
+            ordered = ordered.where(
+                or_(
+                    rank < last_rank,
+                    and_(rank == last_rank, tuple_(Food.name, Food.id) > (last_name, _cursor_id(last_id))),
+                )
+            )
+    else:
+        ordered = query.order_by(Food.name, Food.id)
+        if cursor:
+            last_name, last_id = _decode_cursor(cursor, 2)
+            ordered = ordered.where(tuple_(Food.name, Food.id) > (last_name, _cursor_id(last_id)))
+
+    offset = 0 if cursor else (page - 1) * page_size
+    # One extra row tells whether there is a next page without counting.
+    rows = (await db.execute(ordered.offset(offset).limit(page_size + 1))).all()
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    items = [row[0] for row in rows]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        values = [last[0].name, str(last[0].id)]
+        if term:
+            values.insert(0, str(last.rank))
+        next_cursor = _encode_cursor(values)
+
+    if not cursor and not has_more:
+        if items or offset == 0:
+            # Last page reached by number: the exact total is known for free.
+            total = offset + len(items)
+        else:
+            # Page past the end: nothing here tells how many rows there are.
+            total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        return FoodPage(items, total, False, None)
+    seen = offset + len(items) + (1 if has_more else 0)
+    total = max(await estimated_count(db, query), seen)
+    return FoodPage(items, total, True, next_cursor)
+
+
+def _sort_key_at(values: list) -> tuple:
+    name, last_id = values
+    return (fold(name), name, _cursor_id(last_id))
+
+
+def _merged_offset(first: list, second: list, offset: int) -> tuple:
+    """How many items of each sorted list come before ``offset`` in their merge."""
+    lo, hi = 0, len(second)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if mid + bisect_left(first, second[mid].sort_key, key=record_key) < offset:
+            lo = mid + 1
+        else:
+            hi = mid
+    return min(offset - lo, len(first)), lo
+
+
+async def catalog_food_page(
+    db: AsyncSession,
+    *,
+    workspace_id: Optional[UUID],
+    category: Optional[str],
+    page: int,
+    page_size: int,
+    cursor: Optional[str] = None,
+) -> Optional[FoodPage]:
+    """Unsearched listing from the catalog snapshot plus the workspace's foods.
+
+    ``workspace_id=None`` lists global foods only. Returns ``None`` (page it
+    in SQL) when the snapshot is disabled or the workspace has more than
+    ``CATALOG_MERGE_MAX_ROWS`` foods of its own. Totals are exact.
+    """
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return None
+    catalog = await catalog_snapshot.foods.ensure()
+    globals_ = catalog.select(category=[category] if category else None)
+    own: list = []
+    if workspace_id is not None:
+        criteria = [Food.workspace_id == workspace_id]
+        if category:
+            criteria.append(Food.category == category)
+        own = await catalog.workspace_records(db, *criteria, limit=settings.CATALOG_MERGE_MAX_ROWS)
+        if own is None:
+            return None
+
+    if cursor:
+        key = _sort_key_at(_decode_cursor(cursor, 2))
+        start = (bisect_right(globals_, key, key=record_key), bisect_right(own, key, key=record_key))
+    else:
+        start = _merged_offset(globals_, own, (page - 1) * page_size)
+    window = merge_sorted(globals_[start[0]:start[0] + page_size + 1], own[start[1]:start[1] + page_size + 1])
+    items = window[:page_size]
+    has_more = len(window) > page_size
+
+    next_cursor = None
+    if has_more and items:
+        next_cursor = _encode_cursor([items[-1].name, str(items[-1].id)])
+    return FoodPage(items, len(globals_) + len(own), False, next_cursor)
@@ -13,7 +13,7 @@ import secrets
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from uuid import UUID
 from urllib.parse import urlencode
 
@@ -24,14 +24,15 @@ from google.oauth2.credentials import Credentials
 from google.auth.transport.requests import Request as GoogleRequest
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, and_
+from sqlalchemy import select, and_, delete, update
 
 # Thread pool para ejecutar llamadas síncronas de Google API
 _executor = ThreadPoolExecutor(max_workers=5)
 
 from app.core.config import settings
-from app.models.google_calendar import GoogleCalendarToken, CalendarSyncMapping
+from app.models.google_calendar import GoogleCalendarToken, GoogleCalendarSyncState, CalendarSyncMapping
 from app.models.booking import Booking, BookingStatus
 from app.models.client import Client
 from app.models.user import User
@@ -56,6 +57,55 @@ class GoogleCalendarError(Exception):
         super().__init__(self.message)
 
 
+# Campos de cada evento que se guardan en la copia local
+_CACHED_EVENT_FIELDS = ("id", "status", "summary", "description", "location", "start", "end")
+_VISIBLE_ROLES = ("owner", "writer", "reader")
+_SYNC_STATE_COLUMNS = (
+    "token_id", "calendar_id", "calendar_name", "sync_token", "window_start", "window_end",
+    "events", "checked_at", "full_synced_at",
+)
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _rfc3339(value: datetime) -> str:
+    # Google Calendar requiere RFC3339 sin microsegundos
+    return _as_utc(value).replace(microsecond=0).isoformat()
+
+
+def _event_time(data: dict) -> Optional[datetime]:
+    if data.get("dateTime"):
+        return _as_utc(datetime.fromisoformat(data["dateTime"].replace("Z", "+00:00")))
+    if data.get("date"):
+        # Evento de todo el día
+        return datetime.fromisoformat(data["date"]).replace(tzinfo=timezone.utc)
+    return None
+
+
+def _in_window(event: dict, time_min: Optional[datetime], time_max: Optional[datetime]) -> bool:
+    """Mismo criterio que ``events.list``: termina después de time_min y empieza antes de time_max."""
+    start = _event_time(event.get("start") or {})
+    if start is None:
+        return False
+    end = _event_time(event.get("end") or {}) or start
+    return (time_min is None or end > time_min) and (time_max is None or start < time_max)
+
+
+def _apply_changes(events: Dict[str, dict], items: List[dict]) -> Dict[str, dict]:
+    """Aplica a la copia local la página de cambios de ``events.list``."""
+    events = dict(events)
+    for item in items:
+        if item.get("status") == "cancelled":
+            events.pop(item["id"], None)
+        else:
+            events[item["id"]] = {k: item[k] for k in _CACHED_EVENT_FIELDS if k in item}
+    return events
+
+
 class GoogleCalendarService:
     """
     Servicio para integración con Google Calendar API
@@ -740,85 +790,229 @@ class GoogleCalendarService:
         except HttpError as e:
             raise GoogleCalendarError(f"Error al obtener eventos: {e.reason}", e.resp.status)
     
+    def _list_all_events(self, token: GoogleCalendarToken, params: dict) -> Tuple[List[dict], Optional[str]]:
+        """
+        Recorre todas las páginas de ``events.list`` (en el thread pool).
+
+        Cada llamada crea su propio servicio: el cliente HTTP de googleapiclient
+        no es thread-safe y los calendarios se piden en paralelo.
+
+        Returns:
+            (eventos, nextSyncToken)
+        """
+        events = self._get_calendar_service(token).events()
+        items: List[dict] = []
+        page_token = None
+        while True:
+            result = events.list(**params, **({"pageToken": page_token} if page_token else {})).execute()
+            items.extend(result.get('items', []))
+            page_token = result.get('nextPageToken')
+            if not page_token:
+                return items, result.get('nextSyncToken')
+    
+    async def _calendar_events(
+        self,
+        token: GoogleCalendarToken,
+        state: GoogleCalendarSyncState,
+        time_min: Optional[datetime],
+        time_max: Optional[datetime],
+        now: datetime,
+    ) -> list:
+        """
+        Eventos de un calendario en [time_min, time_max) usando su copia local.
+        
+        - Copia reciente (``GOOGLE_EVENTS_CACHE_SECONDS``) y no invalidada por
+          el webhook: no se llama a Google.
+        - Con syncToken: sólo se piden los cambios desde la última vez.
+        - Si no, o si Google devuelve 410 (token caducado): sincronización
+          completa de la ventana [-GOOGLE_EVENTS_PAST_DAYS, +GOOGLE_EVENTS_FUTURE_DAYS].
+        
+        Los rangos que se salen de esa ventana se piden directamente, sin copia.
+        """
+        window_start = now - timedelta(days=settings.GOOGLE_EVENTS_PAST_DAYS)
+        window_end = now + timedelta(days=settings.GOOGLE_EVENTS_FUTURE_DAYS)
+        if (time_min is not None and time_min < window_start) or (time_max is not None and time_max > window_end):
+            return await self.get_events_from_google(
+                token=token,
+                time_min=time_min,
+                time_max=time_max,
+                max_results=2500,
+                calendar_id=state.calendar_id,
+            )
+        
+        loop = asyncio.get_running_loop()
+        covered = (
+            state.sync_token is not None
+            and state.window_start is not None
+            and state.window_start <= (time_min or window_start)
+            and (time_max or window_end) <= state.window_end
+        )
+        fresh = (
+            covered
+            and state.checked_at is not None
+            and now - state.checked_at < timedelta(seconds=settings.GOOGLE_EVENTS_CACHE_SECONDS)
+        )
+        
+        if covered and not fresh:
+            params = {"calendarId": state.calendar_id, "singleEvents": True, "maxResults": 2500,
+                      "syncToken": state.sync_token}
+            try:
+                items, sync_token = await loop.run_in_executor(
+                    _executor, lambda: self._list_all_events(token, params)
+                )
+                state.events = _apply_changes(state.events or {}, items)
+                state.sync_token = sync_token or state.sync_token
+                state.checked_at = now
+                logger.debug("[Google Calendar] %s cambios en %s", len(items), state.calendar_name)
+            except HttpError as e:
+                if e.resp.status != 410:
+                    raise
+                # syncToken caducado: Google pide volver a sincronizar todo
+                covered = False
+        
+        if not covered:
+            params = {"calendarId": state.calendar_id, "singleEvents": True, "maxResults": 2500,
+                      "timeMin": _rfc3339(window_start), "timeMax": _rfc3339(window_end)}
+            items, sync_token = await loop.run_in_executor(
+                _executor, lambda: self._list_all_events(token, params)
+            )
+            state.events = _apply_changes({}, items)
+            state.sync_token = sync_token
+            state.window_start, state.window_end = window_start, window_end
+            state.checked_at = state.full_synced_at = now
+            logger.info("[Google Calendar] %s eventos en %s (sincronización completa)", len(items), state.calendar_name)
+        
+        return [event for event in state.events.values() if _in_window(event, time_min, time_max)]
+    
     async def get_all_user_events(
         self,
         token: GoogleCalendarToken,
         time_min: Optional[datetime] = None,
         time_max: Optional[datetime] = None,
-        include_trackfiz: bool = True
+        include_trackfiz: bool = True,
+        db: Optional[AsyncSession] = None,
     ) -> list:
         """
         Obtiene todos los eventos del usuario de todos sus calendarios visibles.
         Útil para mostrar disponibilidad completa.
         
+        Los calendarios se piden en paralelo (hasta
+        ``GOOGLE_CALENDAR_FETCH_CONCURRENCY`` a la vez). Con ``db`` se usa y
+        actualiza la copia local de cada calendario (``GoogleCalendarSyncState``),
+        así que las consultas repetidas no vuelven a descargar eventos sin cambios.
+        
         Args:
             token: Token OAuth
             time_min: Fecha mínima
             time_max: Fecha máxima
             include_trackfiz: Si incluir eventos del calendario Trackfiz
+            db: Sesión de base de datos (opcional, para la copia local)
             
         Returns:
             Lista de eventos de todos los calendarios
         """
-        try:
-            service = self._get_calendar_service(token)
-            loop = asyncio.get_running_loop()
-            
-            # Obtener lista de calendarios del usuario (en thread pool)
-            logger.info("[Google Calendar] Obteniendo lista de calendarios del usuario...")
-            calendar_list = await loop.run_in_executor(
-                _executor,
-                lambda: service.calendarList().list().execute()
+        now = datetime.now(timezone.utc)
+        time_min, time_max = _as_utc(time_min), _as_utc(time_max)
+        states: Dict[str, GoogleCalendarSyncState] = {}
+        if db is not None:
+            result = await db.execute(
+                select(GoogleCalendarSyncState).where(GoogleCalendarSyncState.token_id == token.id)
             )
-            
-            all_events = []
-            trackfiz_calendar_id = token.calendar_id if token.calendar_name == 'Trackfiz' else None
-            
-            logger.info("[Google Calendar] Encontrados %s calendarios", len(calendar_list.get('items', [])))
-            
-            for calendar in calendar_list.get('items', []):
-                calendar_id = calendar['id']
-                calendar_name = calendar.get('summary', 'Sin nombre')
-                
-                # Saltar Trackfiz si no se quiere incluir
-                if not include_trackfiz and calendar_id == trackfiz_calendar_id:
-                    logger.debug("[Google Calendar] Saltando calendario Trackfiz: %s", calendar_name)
-                    continue
-                
-                # Solo calendarios que el usuario puede ver
-                if calendar.get('accessRole') not in ['owner', 'writer', 'reader']:
-                    continue
-                
-                try:
-                    logger.info("[Google Calendar] Obteniendo eventos de: %s", calendar_name)
-                    events = await self.get_events_from_google(
-                        token=token,
-                        time_min=time_min,
-                        time_max=time_max,
-                        calendar_id=calendar_id
+            states = {state.calendar_id: state for state in result.scalars()}
+        
+        ttl = timedelta(seconds=settings.GOOGLE_EVENTS_CACHE_SECONDS)
+        if states and all(s.checked_at is not None and now - s.checked_at < ttl for s in states.values()):
+            # Todas las copias son recientes: la lista de calendarios también
+            calendars = [(s.calendar_id, s.calendar_name) for s in states.values()]
+        else:
+            try:
+                service = self._get_calendar_service(token)
+                calendar_list = await asyncio.get_running_loop().run_in_executor(
+                    _executor,
+                    lambda: service.calendarList().list().execute()
+                )
+            except HttpError as e:
+                raise GoogleCalendarError(f"Error al obtener calendarios: {e.reason}", e.resp.status)
+            # Solo calendarios que el usuario puede ver
+            calendars = [
+                (calendar['id'], calendar.get('summary', 'Sin nombre'))
+                for calendar in calendar_list.get('items', [])
+                if calendar.get('accessRole') in _VISIBLE_ROLES
+            ]
+            logger.info("[Google Calendar] Encontrados %s calendarios", len(calendars))
+            if db is not None:
+                gone = set(states) - {calendar_id for calendar_id, _ in calendars}
+                if gone:
+                    await db.execute(
+                        delete(GoogleCalendarSyncState).where(
+                            GoogleCalendarSyncState.token_id == token.id,
+                            GoogleCalendarSyncState.calendar_id.in_(gone),
+                        )
                     )
-                    
-                    logger.info("[Google Calendar] %s eventos en %s", len(events), calendar_name)
-                    
-                    # Añadir metadata del calendario a cada evento
-                    for event in events:
-                        event['_calendar_id'] = calendar_id
-                        event['_calendar_name'] = calendar_name
-                        event['_is_trackfiz'] = (calendar_id == trackfiz_calendar_id)
-                    
-                    all_events.extend(events)
-                    
-                except Exception as e:
-                    logger.error("[Google Calendar] Error obteniendo eventos de %s: %s", calendar_name, e)
-                    continue
-            
-            # Ordenar por fecha de inicio
-            all_events.sort(key=lambda e: e.get('start', {}).get('dateTime', e.get('start', {}).get('date', '')))
-            
-            return all_events
-            
-        except HttpError as e:
-            raise GoogleCalendarError(f"Error al obtener calendarios: {e.reason}", e.resp.status)
+        
+        trackfiz_calendar_id = token.calendar_id if token.calendar_name == 'Trackfiz' else None
+        if not include_trackfiz:
+            calendars = [c for c in calendars if c[0] != trackfiz_calendar_id]
+        
+        semaphore = asyncio.Semaphore(settings.GOOGLE_CALENDAR_FETCH_CONCURRENCY)
+        new_states: List[GoogleCalendarSyncState] = []
+        
+        async def fetch(calendar_id: str, calendar_name: str) -> list:
+            state = states.get(calendar_id)
+            if state is None:
+                state = GoogleCalendarSyncState(token_id=token.id, calendar_id=calendar_id, events={})
+                states[calendar_id] = state
+                new_states.append(state)
+            state.calendar_name = calendar_name
+            try:
+                async with semaphore:
+                    events = await self._calendar_events(token, state, time_min, time_max, now)
+            except Exception as e:
+                logger.error("[Google Calendar] Error obteniendo eventos de %s: %s", calendar_name, e)
+                return []
+            # Añadir metadata del calendario a cada evento (sin tocar la copia)
+            return [
+                {
+                    **event,
+                    '_calendar_id': calendar_id,
+                    '_calendar_name': calendar_name,
+                    '_is_trackfiz': calendar_id == trackfiz_calendar_id,
+                }
+                for event in events
+            ]
+        
+        results = await asyncio.gather(*(fetch(calendar_id, name) for calendar_id, name in calendars))
+        if db is not None:
+            if new_states:
+                # Dos primeras lecturas simultáneas crean la misma copia: se
+                # queda la primera (las dos traen los mismos eventos).
+                await db.execute(
+                    pg_insert(GoogleCalendarSyncState)
+                    .values([
+                        {column: getattr(state, column) for column in _SYNC_STATE_COLUMNS}
+                        for state in new_states
+                    ])
+                    .on_conflict_do_nothing(constraint="uq_google_calendar_sync_states_calendar")
+                )
+            await db.commit()
+        
+        all_events = [event for events in results for event in events]
+        # Ordenar por fecha de inicio
+        all_events.sort(key=lambda e: e.get('start', {}).get('dateTime', e.get('start', {}).get('date', '')))
+        
+        return all_events
+    
+    async def invalidate_event_cache(self, token: GoogleCalendarToken, db: AsyncSession) -> None:
+        """
+        Marca como desactualizadas las copias locales de los calendarios del
+        token: la próxima consulta pedirá los cambios a Google (syncToken).
+        """
+        await db.execute(
+            update(GoogleCalendarSyncState)
+            .where(GoogleCalendarSyncState.token_id == token.id)
+            .values(checked_at=None)
+        )
+        await db.commit()
     
     # ============ PUSH NOTIFICATIONS ============
     
@@ -854,10 +1048,13 @@ class GoogleCalendarService:
                 "expiration": int(expiration.timestamp() * 1000),
             }
             
-            result = service.events().watch(
-                calendarId=token.calendar_id or 'primary',
-                body=body
-            ).execute()
+            result = await asyncio.get_running_loop().run_in_executor(
+                _executor,
+                lambda: service.events().watch(
+                    calendarId=token.calendar_id or 'primary',
+                    body=body
+                ).execute()
+            )
             
             # Guardar info del canal
             token.channel_id = result.get('id')
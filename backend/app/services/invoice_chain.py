@@ -0,0 +1,135 @@
+"""
+VeriFactu hash chain and invoice numbering, serialized per series.
+
+``compute_and_set_hash`` used to read the previous hash with an
+``ORDER BY registration LIMIT 1`` over every hashed invoice of the series:
+a sort per finalize, and two concurrent finalizations could both read the
+same predecessor and fork the chain. Now each (workspace, series) has a row
+in ``invoice_chain_heads``:
+
+- :func:`lock_head` takes that row's lock with an ``UPDATE ... RETURNING``
+  (a primary-key lookup) and returns the previous hash; a second finalize
+  of the same series waits there until the first one commits or rolls back,
+  so it always chains to the committed head;
+- :func:`advance_head` stores the new hash in the same transaction;
+- :func:`peek_head` reads the head without locking (diagnostics, the
+  ``/verifactu/test`` preview that is never persisted).
+
+Invoice numbers come from the ``invoice_settings`` counters the settings
+page edits; :func:`allocate_number` takes and increments them in one
+``UPDATE ... RETURNING``, so concurrent creations can no longer read the
+same counter and issue duplicate numbers.
+"""
+from datetime import datetime
+from typing import Any
+
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+
+from app.models.erp import Invoice, InvoiceChainHead, InvoiceSettings
+
+DEFAULT_SERIES = "F"
+RECTIFICATIVE_SERIES = "R"
+
+
+def _counter(series: str):
+    if series == RECTIFICATIVE_SERIES:
+        return InvoiceSettings.rectificative_next_number
+    return InvoiceSettings.invoice_next_number
+
+
+async def allocate_number(db: AsyncSession, workspace_id: Any, series: str) -> int:
+    """Take the next number of the series; the settings row stays locked until commit."""
+    counter = _counter(series)
+    result = await db.execute(
+        update(InvoiceSettings)
+        .where(InvoiceSettings.workspace_id == workspace_id)
+        .values({counter: func.coalesce(counter, 1) + 1})
+        .returning(InvoiceSettings.id, counter)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.first()
+    if row is None:
+        # Sin configuración de facturación la numeración no avanza (como antes)
+        return 1
+    settings_id, following = row
+    # Keep an already loaded InvoiceSettings in step without expiring it
+    # (an expired attribute would lazy-load outside the greenlet).
+    loaded = db.sync_session.identity_map.get(identity_key(InvoiceSettings, settings_id))
+    if loaded is not None:
+        set_committed_value(loaded, counter.key, following)
+    return following - 1
+
+
+def _latest_hash(workspace_id: Any, series: str):
+    # Consulta previa a invoice_chain_heads; sólo se usa para crear la fila
+    return (
+        select(Invoice.verifactu_hash)
+        .where(Invoice.workspace_id == workspace_id)
+        .where(Invoice.invoice_series == series)
+        .where(Invoice.verifactu_hash.isnot(None))
+        .order_by(Invoice.verifactu_registration_datetime.desc(), Invoice.created_at.desc())
+        .limit(1)
+    )
+
+
+async def lock_head(db: AsyncSession, workspace_id: Any, series: str) -> str:
+    """Lock the series head until commit and return the previous hash ("" for the first record)."""
+    lock = (
+        update(InvoiceChainHead)
+        .where(InvoiceChainHead.workspace_id == workspace_id)
+        .where(InvoiceChainHead.series == series)
+        .values(updated_at=func.now())
+        .returning(InvoiceChainHead.last_hash)
+        .execution_options(synchronize_session=False)
+    )
+    row = (await db.execute(lock)).first()
+    if row is None:
+        # Primera factura de la serie: la fila se crea una vez, partiendo de
+        # la última huella existente. Si otra transacción la crea a la vez,
+        # ON CONFLICT no hace nada y el UPDATE espera a su commit.
+        await db.execute(
+            insert(InvoiceChainHead)
+            .values(
+                workspace_id=workspace_id,
+                series=series,
+                last_hash=_latest_hash(workspace_id, series).scalar_subquery(),
+                records=0,
+            )
+            .on_conflict_do_nothing(index_elements=["workspace_id", "series"])
+        )
+        row = (await db.execute(lock)).first()
+    return row[0] or ""
+
+
+async def advance_head(db: AsyncSession, invoice: Invoice, registered_at: datetime) -> None:
+    """Make ``invoice`` the head of its series (after :func:`lock_head` in the same transaction)."""
+    await db.execute(
+        update(InvoiceChainHead)
+        .where(InvoiceChainHead.workspace_id == invoice.workspace_id)
+        .where(InvoiceChainHead.series == (invoice.invoice_series or DEFAULT_SERIES))
+        .values(
+            last_hash=invoice.verifactu_hash,
+            last_invoice_number=invoice.invoice_number,
+            last_registered_at=registered_at,
+            records=InvoiceChainHead.records + 1,
+        )
+        .execution_options(synchronize_session=False)
+    )
+
+
+async def peek_head(db: AsyncSession, workspace_id: Any, series: str) -> str:
+    """Current previous hash of the series, without locking."""
+    result = await db.execute(
+        select(InvoiceChainHead.last_hash)
+        .where(InvoiceChainHead.workspace_id == workspace_id)
+        .where(InvoiceChainHead.series == series)
+    )
+    row = result.first()
+    if row is None:
+        row = (await db.execute(_latest_hash(workspace_id, series))).first()
+    return (row[0] if row else None) or ""
+
@@ -0,0 +1,191 @@
+"""Bulk invoice export: one ZIP of PDFs for a period or series, streamed.
+
+Month-end accounting used to download invoices one by one, each request
+reloading the invoice, its items and ``InvoiceSettings`` and buffering the
+PDF. :func:`stream_zip` instead:
+
+- loads the invoices in keyset pages of ``_PAGE_SIZE`` (each page in its own
+  short session, so no connection is held while PDFs render or the client
+  reads), with the settings dict passed in once for the whole batch;
+- renders through :mod:`app.services.pdf_render` with up to ``window`` PDFs
+  in flight, keeping ZIP order; issued invoices come from the cache or the
+  R2 archive when they were rendered before;
+- writes each PDF as a stored (uncompressed, PDFs are already deflated) ZIP
+  entry with a data descriptor and yields the bytes right away.
+
+The response is already under way when a PDF fails, so a failed render does
+not abort it (that would leave the client with a truncated ZIP): the entry
+is skipped and listed in an ``ERRORES.txt`` member at the end of the
+archive.
+
+Memory depends on the page size and the window, not on the number of
+invoices.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import zipfile
+from collections import deque
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.orm import selectinload
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.erp import Invoice
+from app.services import pdf_render
+
+logger = logging.getLogger(__name__)
+
+_PAGE_SIZE = 50
+ERRORS_ENTRY = "ERRORES.txt"
+
+
+def filters(
+    workspace_id: Any,
+    from_date: Optional[date] = None,
+    to_date: Optional[date] = None,
+    series: Optional[str] = None,
+    include_drafts: bool = False,
+) -> List[Any]:
+    """WHERE clauses of the export (shared with the endpoint's count)."""
+    clauses = [Invoice.workspace_id == workspace_id]
+    if from_date:
+        clauses.append(Invoice.issue_date >= from_date)
+    if to_date:
+        clauses.append(Invoice.issue_date <= to_date)
+    if series:
+        clauses.append(Invoice.invoice_series == series)
+    if not include_drafts:
+        clauses.append(Invoice.status != "draft")
+    return clauses
+
+
+class _Sink:
+    """Write-only, non-seekable file for ``zipfile``: collects the bytes to yield."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def entry_name(invoice_number: str, used: Set[str]) -> str:
+    base = f"Factura_{(invoice_number or 'sin_numero').replace('/', '-')}"
+    name, n = f"{base}.pdf", 1
+    while name in used:
+        n += 1
+        name = f"{base}_{n}.pdf"
+    used.add(name)
+    return name
+
+
+async def _pages(clauses: List[Any]) -> AsyncIterator[List[Invoice]]:
+    last: Optional[Tuple[date, Any]] = None
+    while True:
+        query = (
+            select(Invoice)
+            .where(*clauses)
+            .options(selectinload(Invoice.items))
+            .order_by(Invoice.issue_date, Invoice.id)
+            .limit(_PAGE_SIZE)
+        )
+        if last is not None:
+            query = query.where(tuple_(Invoice.issue_date, Invoice.id) > last)
+        async with AsyncSessionLocal() as db:
+            page = list((await db.execute(query)).scalars().all())
+        if not page:
+            return
+        yield page
+        if len(page) < _PAGE_SIZE:
+            return
+        last = (page[-1].issue_date, page[-1].id)
+
+
+async def _outcome(name: str, task: "asyncio.Future[bytes]") -> Tuple[Optional[bytes], Optional[str]]:
+    try:
+        return await task, None
+    except Exception as exc:
+        logger.exception("Invoice export: PDF %s failed", name)
+        return None, f"no se pudo generar el PDF ({type(exc).__name__})"
+
+
+async def rendered(
+    clauses: List[Any],
+    settings_dict: Optional[dict],
+    pdf_args: Callable[[Invoice], Dict[str, Any]],
+    window: int,
+) -> AsyncIterator[Tuple[str, datetime, Optional[bytes], Optional[str]]]:
+    """(entry name, issue date, PDF, error) in export order, ``window`` renders at a time.
+
+    A failed invoice comes with ``PDF = None`` and the error instead.
+    """
+    pending: Deque[Tuple[str, datetime, "asyncio.Future[bytes]"]] = deque()
+    used: Set[str] = set()
+
+    async def render(invoice: Invoice) -> bytes:
+        return await pdf_render.render_invoice(
+            settings=settings_dict, workspace_id=invoice.workspace_id, **pdf_args(invoice),
+        )
+
+    try:
+        async for page in _pages(clauses):
+            for invoice in page:
+                task = asyncio.ensure_future(render(invoice))
+                issued = datetime.combine(invoice.issue_date, datetime.min.time())
+                pending.append((entry_name(invoice.invoice_number, used), issued, task))
+                if len(pending) >= window:
+                    name, issued_at, oldest = pending.popleft()
+                    yield (name, issued_at, *await _outcome(name, oldest))
+        while pending:
+            name, issued_at, oldest = pending.popleft()
+            yield (name, issued_at, *await _outcome(name, oldest))
+    finally:
+        # Cliente desconectado: dejar de esperar los PDFs pendientes
+        for _, _, task in pending:
+            task.cancel()
+
+
+def _entry(name: str, when: datetime) -> zipfile.ZipInfo:
+    info = zipfile.ZipInfo(name, date_time=when.timetuple()[:6])
+    info.external_attr = 0o644 << 16
+    return info
+
+
+async def stream_zip(
+    workspace_id: Any,
+    settings_dict: Optional[dict],
+    pdf_args: Callable[[Invoice], Dict[str, Any]],
+    **filter_args: Any,
+) -> AsyncIterator[bytes]:
+    """ZIP bytes of the matching invoices' PDFs, yielded entry by entry."""
+    sink = _Sink()
+    window = max(2, settings.PDF_RENDER_WORKERS * 2)
+    errors: List[str] = []
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_STORED) as archive:
+        async for name, issued_at, pdf, error in rendered(
+            filters(workspace_id, **filter_args), settings_dict, pdf_args, window,
+        ):
+            if pdf is None:
+                errors.append(f"{name}: {error}")
+                continue
+            archive.writestr(_entry(name, issued_at), pdf)
+            yield sink.drain()
+        if errors:
+            report = "Facturas no incluidas en la exportación:\n" + "\n".join(errors) + "\n"
+            archive.writestr(_entry(ERRORS_ENTRY, datetime.now()), report.encode("utf-8"))
+    # Directorio central, escrito al cerrar el ZipFile
+    yield sink.drain()
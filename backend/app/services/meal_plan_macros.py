@@ -0,0 +1,313 @@
+"""Planned-macro lookups over a meal plan's JSONB template.
+
+A plan template (weeks -> days -> meals -> items) is compiled once per plan
+version into a flat index: (week, weekday, meal_name) -> planned macros and
+foods, plus the food ids and item positions used for image hydration. The
+index is cached per worker by (plan id, updated_at) and shared by the log
+writers, the portal plan endpoints and the PDF export. Quantities are turned
+into nutrients by ``app.services.nutrition_calc``.
+"""
+from __future__ import annotations
+
+from datetime import date
+from typing import Any, Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple, Union
+
+from app.core.bounded_cache import BoundedCache
+from app.services import nutrition_calc
+from app.services.nutrition_calc import safe_float
+
+
+def plan_week_for(log_date: date, plan_start: Optional[date], duration_weeks: Optional[int]) -> int:
+    """Week of a rotating multi-week plan that applies on ``log_date``."""
+    if plan_start and duration_weeks and duration_weeks > 1:
+        return (log_date - plan_start).days // 7 % duration_weeks + 1
+    return 1
+
+
+def plan_meal_reference(
+    plan: Optional[dict],
+    meal_name: str,
+    log_date: date,
+    plan_start: Optional[date] = None,
+    duration_weeks: Optional[int] = 1,
+) -> Optional[dict]:
+    """Planned macros and foods of ``meal_name`` on ``log_date``, or None.
+
+    One-off lookup on a raw template; request paths use ``get_compiled``.
+    """
+    if not plan:
+        return None
+    return compile_plan(plan).reference(meal_name, log_date, plan_start, duration_weeks)
+
+
+def has_modifications(logged_foods: Iterable[dict], plan_ref: Optional[dict]) -> bool:
+    """True when the logged foods differ from the planned ones (by name)."""
+    if not plan_ref:
+        return False
+    logged: List[str] = sorted(f.get("name", "") for f in logged_foods or [])
+    planned: List[str] = sorted(f.get("name", "") for f in plan_ref.get("foods", []))
+    return logged != planned
+
+
+# ---------------------------------------------------------------------------
+# Compiled plan index
+# ---------------------------------------------------------------------------
+
+MealKey = Tuple[Optional[int], Any, str]
+_Path = Tuple[Union[str, int], ...]
+
+
+class CompiledPlan:
+    """Flat, read-only view of a meal plan built in a single walk.
+
+    ``meals`` maps (week, weekday, meal_name) to the planned reference of
+    that meal (week is None for the legacy ``{days}`` layout). ``food_ids``
+    and the media slots cover both ``plan`` and ``executed_plan`` so image
+    hydration does not walk the templates again.
+    """
+
+    __slots__ = (
+        "plan_id", "version", "has_weeks", "meals", "food_ids",
+        "_media_slots", "_layout", "_allergens", "_items",
+    )
+
+    def __init__(self, plan_id, version, has_weeks: bool):
+        self.plan_id = plan_id
+        self.version = version
+        self.has_weeks = has_weeks
+        self.meals: Dict[MealKey, dict] = {}
+        self.food_ids: FrozenSet[str] = frozenset()
+        # template attribute -> ((path to item, food_id), ...)
+        self._media_slots: Dict[str, Tuple[Tuple[_Path, str], ...]] = {}
+        # [(week, [(day_num, day_name, [meal_name, ...]), ...]), ...] in template order
+        self._layout: List[Tuple[Optional[int], List[Tuple[Any, str, List[str]]]]] = []
+        self._allergens: Dict[MealKey, Tuple[list, ...]] = {}
+        # meal -> ((food values, grams, catalog food id), ...)
+        self._items: Dict[MealKey, Tuple[Tuple[dict, float, Optional[str]], ...]] = {}
+
+    def reference(
+        self,
+        meal_name: str,
+        log_date: date,
+        plan_start: Optional[date] = None,
+        duration_weeks: Optional[int] = 1,
+    ) -> Optional[dict]:
+        """Planned reference of ``meal_name`` on ``log_date`` (a shared dict)."""
+        week = plan_week_for(log_date, plan_start, duration_weeks) if self.has_weeks else None
+        return self.meals.get((week, log_date.isoweekday(), meal_name))
+
+    def export_days(self) -> List[dict]:
+        """Days with meals and per-food macros, in the shape the diet PDF uses.
+
+        Multi-week plans list every week, prefixing the day names.
+        """
+        multi_week = len(self._layout) > 1
+        days = []
+        for week, week_days in self._layout:
+            for day_num, day_name, meal_names in week_days:
+                meals = []
+                for meal_name in meal_names:
+                    key = (week, day_num, meal_name)
+                    ref = self.meals[key]
+                    meals.append({
+                        "name": meal_name,
+                        "foods": [
+                            {**food, "type": "food", "allergens": allergens}
+                            for food, allergens in zip(ref["foods"], self._allergens[key])
+                        ],
+                    })
+                name = day_name or f"Día {day_num}"
+                days.append({
+                    "day": day_num,
+                    "dayName": f"Semana {week} · {name}" if multi_week else name,
+                    "meals": meals,
+                })
+        return days
+
+    def nutrient_totals(self, table: nutrition_calc.NutrientTable) -> dict:
+        """Every ``Food`` nutrient per meal, day and week, plus the daily average.
+
+        One pass over the items; ``table`` must cover ``food_ids``.
+        """
+        acc_zeros, add_into, as_dict = nutrition_calc.zeros, nutrition_calc.add_into, nutrition_calc.as_dict
+        plan_acc = acc_zeros()
+        weeks, days, meals = [], [], []
+        for week, week_days in self._layout:
+            week_acc = acc_zeros()
+            for day_num, day_name, meal_names in week_days:
+                day_acc = acc_zeros()
+                for meal_name in meal_names:
+                    meal_acc = acc_zeros()
+                    for food, grams, food_id in self._items[(week, day_num, meal_name)]:
+                        add_into(meal_acc, table.vector(food, grams, food_id))
+                    add_into(day_acc, meal_acc)
+                    meals.append({"week": week, "day": day_num, "meal": meal_name, "totals": as_dict(meal_acc)})
+                add_into(week_acc, day_acc)
+                days.append({"week": week, "day": day_num, "dayName": day_name, "totals": as_dict(day_acc)})
+            add_into(plan_acc, week_acc)
+            weeks.append({"week": week, "days": len(week_days), "totals": as_dict(week_acc)})
+        return {
+            "nutrients": list(nutrition_calc.NUTRIENTS),
+            "daily_average": as_dict(plan_acc, len(days) or 1),
+            "weeks": weeks,
+            "days": days,
+            "meals": meals,
+        }
+
+    def apply_food_media(self, template: Optional[dict], media: Dict[str, str], attr: str = "plan") -> None:
+        """Set ``food.image_url`` in ``template`` (a copy of ``attr``) in place."""
+        if not isinstance(template, dict) or not media:
+            return
+        for path, fid in self._media_slots.get(attr, ()):
+            url = media.get(fid)
+            if not url:
+                continue
+            item: Any = template
+            for step in path:
+                item = item[step]
+            food = item.get("food")
+            if not isinstance(food, dict):
+                food = {"id": fid}
+                item["food"] = food
+            food["image_url"] = url
+
+
+def _iter_food_items(template: Optional[dict]) -> Iterator[Tuple[_Path, dict]]:
+    """Yield (path, item) for every meal item, in both plan layouts."""
+    if not isinstance(template, dict):
+        return
+    layouts: List[Tuple[_Path, list]] = []
+    weeks = template.get("weeks")
+    if isinstance(weeks, list):
+        for wi, week in enumerate(weeks):
+            if isinstance(week, dict) and isinstance(week.get("days"), list):
+                layouts.append((("weeks", wi, "days"), week["days"]))
+    days = template.get("days")
+    if isinstance(days, list):
+        layouts.append((("days",), days))
+    for prefix, day_list in layouts:
+        for di, day in enumerate(day_list):
+            if not isinstance(day, dict):
+                continue
+            for mi, meal in enumerate(day.get("meals") or []):
+                if not isinstance(meal, dict):
+                    continue
+                for ii, item in enumerate(meal.get("items") or []):
+                    if isinstance(item, dict):
+                        yield prefix + (di, "meals", mi, "items", ii), item
+
+
+def _media_slots(template: Optional[dict]) -> Tuple[Tuple[_Path, str], ...]:
+    slots = []
+    for path, item in _iter_food_items(template):
+        if item.get("type") and item.get("type") != "food":
+            continue
+        fid = item.get("food_id") or (item.get("food") or {}).get("id")
+        if fid:
+            slots.append((path, str(fid)))
+    return tuple(slots)
+
+
+def _item_food(item: dict) -> Tuple[dict, float, Optional[str]]:
+    """(food values, grams, catalog food id) of a plan item."""
+    fd = item.get("food") or item.get("supplement") or {}
+    food_id = None
+    if not item.get("type") or item.get("type") == "food":
+        food_id = item.get("food_id") or (item.get("food") or {}).get("id")
+    return fd, safe_float(item.get("quantity_grams"), 0), food_id
+
+
+def _meal_reference(meal_data: dict) -> dict:
+    cal = prot = carb = fat = 0.0
+    plan_foods = []
+    for item in meal_data.get("items", []):
+        fd, qty, _ = _item_food(item)
+        c, p, cb, f = nutrition_calc.scale(fd, qty)
+        c100, p100, cb100, f100 = nutrition_calc.scale(fd, 100)
+        ic, ip, icb, ift = round(c), round(p, 1), round(cb, 1), round(f, 1)
+        cal += ic; prot += ip; carb += icb; fat += ift
+        plan_foods.append({
+            "name": fd.get("name", ""),
+            "calories": ic, "protein": ip, "carbs": icb, "fat": ift,
+            "quantity": qty,
+            "recipe_group": item.get("recipe_group"),
+            "calories_per_100g": round(c100),
+            "protein_per_100g": round(p100, 1),
+            "carbs_per_100g": round(cb100, 1),
+            "fat_per_100g": round(f100, 1),
+        })
+    return {
+        "calories": int(cal),
+        "protein": round(prot, 1),
+        "carbs": round(carb, 1),
+        "fat": round(fat, 1),
+        "foods": plan_foods,
+    }
+
+
+def compile_plan(plan: Optional[dict], executed_plan: Optional[dict] = None, *, plan_id=None, version=None) -> CompiledPlan:
+    """Build the index of a plan template in one pass.
+
+    First match wins for repeated week numbers, weekdays and meal names,
+    like the ``next(...)`` lookups this replaces.
+    """
+    plan = plan if isinstance(plan, dict) else {}
+    has_weeks = "weeks" in plan
+    compiled = CompiledPlan(plan_id, version, has_weeks)
+
+    if has_weeks:
+        seen_weeks = set()
+        week_days = []
+        for wk in plan["weeks"] or []:
+            if wk.get("week") in seen_weeks:
+                continue
+            seen_weeks.add(wk.get("week"))
+            week_days.append((wk.get("week"), wk.get("days", [])))
+    else:
+        week_days = [(None, plan.get("days", []))]
+
+    for week, days in week_days:
+        seen_days = set()
+        layout_days = []
+        for day in days:
+            day_num = day.get("day")
+            if day_num in seen_days:
+                continue
+            seen_days.add(day_num)
+            meal_names = []
+            for meal in day.get("meals", []):
+                key = (week, day_num, meal.get("name"))
+                if key not in compiled.meals:
+                    compiled.meals[key] = _meal_reference(meal)
+                    compiled._allergens[key] = tuple(
+                        (item.get("food") or item.get("supplement") or {}).get("allergens") or []
+                        for item in meal.get("items", [])
+                    )
+                    compiled._items[key] = tuple(_item_food(item) for item in meal.get("items", []))
+                    meal_names.append(meal.get("name"))
+            layout_days.append((day_num, day.get("dayName") or "", meal_names))
+        compiled._layout.append((week, layout_days))
+
+    compiled._media_slots = {"plan": _media_slots(plan), "executed_plan": _media_slots(executed_plan)}
+    compiled.food_ids = frozenset(
+        fid for slots in compiled._media_slots.values() for _, fid in slots
+    )
+    return compiled
+
+
+# (plan_id, updated_at) -> CompiledPlan. A save bumps updated_at, so stale
+# versions are never read again and simply age out of the LRU.
+_COMPILED = BoundedCache("meal_plan_index", max_entries=512, sizeof=lambda _: 0)
+_COMPILED_TTL = 3600.0
+
+
+def get_compiled(meal_plan) -> CompiledPlan:
+    """Compiled index of a ``MealPlan`` row, built once per plan version."""
+    key = (meal_plan.id, meal_plan.updated_at)
+    compiled = _COMPILED.get(key)
+    if compiled is None:
+        compiled = compile_plan(
+            meal_plan.plan, meal_plan.executed_plan, plan_id=meal_plan.id, version=meal_plan.updated_at
+        )
+        _COMPILED.set(key, compiled, _COMPILED_TTL)
+    return compiled
@@ -28,8 +28,10 @@ from uuid import UUID
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core import realtime
 from app.models.notification import Notification
 from app.models.user import User
+from app.services import unread_counts
 
 logger = logging.getLogger(__name__)
 
@@ -98,6 +100,15 @@ async def notify(
                 await session.commit()
                 logger.info("notify: in_app created event=%s user=%s", event, user_id)
 
+                realtime.publish(realtime.user_topic(user_id), "notification", {
+                    "id": str(notif.id),
+                    "event": event,
+                    "title": title,
+                    "type": notification_type,
+                    "link": link,
+                })
+                await unread_counts.push_notifications(session, user_id)
+
         if prefs.get("email") and email_html:
             try:
                 from app.tasks.notifications import send_email_task
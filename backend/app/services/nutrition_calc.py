@@ -0,0 +1,171 @@
+"""Nutrient arithmetic shared by meal plans, recipes and the diet PDF.
+
+Every place that turns "quantity of a food" into nutrients goes through
+:func:`scale` (the four macros, per item) or :class:`NutrientTable` (all the
+numeric nutrient columns of ``Food``, ~40 of them).
+
+A :class:`NutrientTable` is the food-by-nutrient matrix of one plan or
+recipe: a single query loads the per-gram vector of every catalog food it
+references. Totals are then one pass over the items, each item's vector
+being added into its meal, the meal into its day and the day into its week.
+Values stored on the item itself (what the trainer saw and possibly edited
+in the builder) win over the catalog, which fills in the nutrients the item
+does not carry.
+"""
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from uuid import UUID
+
+from sqlalchemy import Numeric, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.nutrition import Food
+
+_NUMBER_RE = re.compile(r"[\d.]+")
+
+MACRO_KEYS = ("calories", "protein", "carbs", "fat")
+
+# Numeric nutrient columns of Food, in model order (units in the name)
+NUTRIENTS: Tuple[str, ...] = tuple(
+    column.name
+    for column in Food.__table__.columns
+    if isinstance(column.type, Numeric) and column.name != "serving_size"
+)
+
+
+def _short(name: str) -> str:
+    for suffix in ("_g", "_mg", "_ug"):
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+# Keys a food dict may use for each nutrient: the column name and the short
+# one the plan builder writes ("protein" for protein_g).
+_ALIASES: Dict[str, Tuple[str, ...]] = {name: (name, _short(name)) for name in NUTRIENTS}
+_ALIASES["sugars_g"] += ("sugar",)
+
+# Recipe columns and the nutrient they total
+RECIPE_TOTALS = {
+    "total_calories": "calories",
+    "total_protein": "protein_g",
+    "total_carbs": "carbs_g",
+    "total_fat": "fat_g",
+    "total_fiber": "fiber_g",
+    "total_sugar": "sugars_g",
+}
+
+
+def safe_float(val, default: float = 0.0) -> float:
+    """Parse numbers stored as strings by older plan editors ("120 g")."""
+    if val is None:
+        return default
+    try:
+        return float(val)
+    except (ValueError, TypeError):
+        m = _NUMBER_RE.search(str(val))
+        try:
+            return float(m.group()) if m else default
+        except ValueError:
+            return default
+
+
+def serving_size(food: dict) -> float:
+    return safe_float(food.get("serving_size"), 100) or 100
+
+
+def scale(food: dict, grams: float, keys: Sequence[str] = MACRO_KEYS) -> List[float]:
+    """``keys`` of ``food`` (given per serving) for ``grams`` grams."""
+    factor = grams / serving_size(food)
+    return [safe_float(food.get(key)) * factor for key in keys]
+
+
+def zeros() -> List[float]:
+    return [0.0] * len(NUTRIENTS)
+
+
+def add_into(acc: List[float], vector: Sequence[float]) -> List[float]:
+    for i, value in enumerate(vector):
+        acc[i] += value
+    return acc
+
+
+def as_dict(vector: Sequence[float], divisor: float = 1) -> Dict[str, float]:
+    """Nutrient vector as ``{column name: value}`` (kcal whole, the rest to 0.1)."""
+    return {
+        name: round(value / divisor) if name == "calories" else round(value / divisor, 1)
+        for name, value in zip(NUTRIENTS, vector)
+    }
+
+
+def _uuid(value) -> Optional[UUID]:
+    try:
+        return UUID(str(value))
+    except (TypeError, ValueError):
+        return None
+
+
+class NutrientTable:
+    """Per-gram nutrient vectors of catalog foods, keyed by food id.
+
+    A ``None`` entry means the catalog does not know that nutrient.
+    """
+
+    __slots__ = ("rows",)
+
+    def __init__(self, rows: Optional[Dict[str, Tuple[Optional[float], ...]]] = None):
+        self.rows = rows or {}
+
+    @classmethod
+    async def load(cls, db: AsyncSession, food_ids: Iterable) -> "NutrientTable":
+        ids = {uid for uid in map(_uuid, food_ids) if uid is not None}
+        if not ids:
+            return cls()
+        result = await db.execute(
+            select(Food.id, Food.serving_size, *(getattr(Food, name) for name in NUTRIENTS))
+            .where(Food.id.in_(ids))
+        )
+        rows = {}
+        for food_id, size, *values in result.all():
+            size = float(size) if size and size > 0 else 100.0
+            rows[str(food_id)] = tuple(None if v is None else float(v) / size for v in values)
+        return cls(rows)
+
+    def vector(self, food: dict, grams: float, food_id=None) -> List[float]:
+        """All nutrients of ``grams`` of ``food``: its own values, then the catalog's."""
+        factor = grams / serving_size(food)
+        catalog = self.rows.get(str(food_id)) if food_id else None
+        vector = []
+        for i, name in enumerate(NUTRIENTS):
+            raw = next((food[key] for key in _ALIASES[name] if food.get(key) is not None), None)
+            if raw is not None:
+                vector.append(safe_float(raw) * factor)
+            elif catalog is not None and catalog[i] is not None:
+                vector.append(catalog[i] * grams)
+            else:
+                vector.append(0.0)
+        return vector
+
+
+def recipe_item_food(item: dict) -> Tuple[dict, float, Optional[str]]:
+    """(values, grams, catalog id) of a recipe item (values per 100 g on the item)."""
+    grams = safe_float(item.get("quantity_grams"), 0) or 100
+    food_id = item.get("food_id") if item.get("type", "food") == "food" else None
+    return item, grams, food_id
+
+
+def recipe_food_ids(items: Iterable[dict]) -> List[str]:
+    return [item.get("food_id") for item in items or [] if isinstance(item, dict) and item.get("food_id")]
+
+
+def recipe_totals(items: Iterable[dict], table: NutrientTable) -> Dict[str, float]:
+    """Recipe ``total_*`` columns from its items."""
+    acc = zeros()
+    for item in items or []:
+        if isinstance(item, dict):
+            food, grams, food_id = recipe_item_food(item)
+            add_into(acc, table.vector(food, grams, food_id))
+    totals = as_dict(acc)
+    return {column: totals[nutrient] for column, nutrient in RECIPE_TOTALS.items()}
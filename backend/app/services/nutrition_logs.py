@@ -0,0 +1,314 @@
+"""Client nutrition log storage (``nutrition_logs`` table).
+
+Shared by the client portal (write + read) and the trainer views. Rows are
+unique per (client_id, log_date, meal_name); date-range and limit filtering
+happen in SQL so no endpoint needs to load a plan's JSONB to find its logs.
+
+Each write also stores the planned reference of the meal and refreshes the
+``nutrition_day_rollups`` rows of the affected days, so the history views are
+plain range reads.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set
+from uuid import UUID
+
+from sqlalchemy import Float, Integer, Numeric, delete, desc, exists, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.nutrition import MealPlan, NutritionDayRollup, NutritionLog
+from app.services import dashboard_snapshot, meal_plan_macros
+
+
+def compute_totals(foods: Iterable[dict]) -> dict:
+    """Sum the macros of the foods in a logged meal (same rounding as before)."""
+    foods = list(foods)
+    return {
+        "total_calories": int(sum(f.get("calories", 0) for f in foods)),
+        "total_protein": round(sum(f.get("protein", 0) for f in foods), 1),
+        "total_carbs": round(sum(f.get("carbs", 0) for f in foods), 1),
+        "total_fat": round(sum(f.get("fat", 0) for f in foods), 1),
+    }
+
+
+def log_to_dict(log: NutritionLog) -> dict:
+    """Serialise a row to the dict shape the legacy adherence logs had."""
+    return {
+        "id": str(log.id),
+        "date": log.log_date.isoformat(),
+        "meal_name": log.meal_name,
+        "foods": log.foods or [],
+        "total_calories": log.total_calories or 0,
+        "total_protein": log.total_protein or 0,
+        "total_carbs": log.total_carbs or 0,
+        "total_fat": log.total_fat or 0,
+        "notes": log.notes,
+        "satisfaction_rating": log.satisfaction_rating,
+        "logged_at": log.logged_at.isoformat() if log.logged_at else None,
+    }
+
+
+def meal_entry(log: NutritionLog) -> dict:
+    """Meal entry of the history views (log plus its planned reference)."""
+    return {
+        "meal_name": log.meal_name,
+        "total_calories": log.total_calories or 0,
+        "total_protein": log.total_protein or 0,
+        "total_carbs": log.total_carbs or 0,
+        "total_fat": log.total_fat or 0,
+        "foods": log.foods or [],
+        "logged_at": log.logged_at.isoformat() if log.logged_at else None,
+        "notes": log.notes,
+        "satisfaction_rating": log.satisfaction_rating,
+        "plan_reference": log.plan_reference,
+        "has_modifications": bool(log.has_modifications),
+    }
+
+
+def rollup_totals(rollup: NutritionDayRollup) -> dict:
+    """``totals`` / ``plan_totals`` / ``has_modifications`` of a rollup row."""
+    return {
+        "totals": {
+            "calories": rollup.logged_calories,
+            "protein": rollup.logged_protein,
+            "carbs": rollup.logged_carbs,
+            "fat": rollup.logged_fat,
+        },
+        "plan_totals": {
+            "calories": rollup.planned_calories,
+            "protein": rollup.planned_protein,
+            "carbs": rollup.planned_carbs,
+            "fat": rollup.planned_fat,
+        },
+        "has_modifications": rollup.has_modifications,
+    }
+
+
+def _plan_reference(meal_plan: Optional[MealPlan], meal_name: str, log_date: date, foods: List[dict]):
+    if meal_plan is None:
+        return None, False
+    plan_ref = meal_plan_macros.get_compiled(meal_plan).reference(
+        meal_name,
+        log_date,
+        meal_plan.created_at.date() if meal_plan.created_at else None,
+        meal_plan.duration_weeks or 1,
+    )
+    return plan_ref, meal_plan_macros.has_modifications(foods, plan_ref)
+
+
+async def save_log(
+    db: AsyncSession,
+    *,
+    workspace_id: UUID,
+    client_id: UUID,
+    meal_plan: Optional[MealPlan],
+    log_date: date,
+    meal_name: str,
+    foods: List[dict],
+    notes: Optional[str],
+    satisfaction_rating: Optional[int],
+    replace: bool,
+) -> Optional[NutritionLog]:
+    """Insert a meal log in one statement.
+
+    With ``replace`` an existing (client, date, meal) row is overwritten;
+    otherwise the insert is skipped and ``None`` is returned so the caller
+    can answer 409. The day's rollup is refreshed. Does not commit.
+    """
+    plan_ref, has_mods = _plan_reference(meal_plan, meal_name, log_date, foods)
+    values = {
+        "workspace_id": workspace_id,
+        "client_id": client_id,
+        "meal_plan_id": meal_plan.id if meal_plan is not None else None,
+        "log_date": log_date,
+        "meal_name": meal_name,
+        "foods": foods,
+        "notes": notes,
+        "satisfaction_rating": satisfaction_rating,
+        "logged_at": datetime.now(timezone.utc),
+        "plan_reference": plan_ref,
+        "has_modifications": has_mods,
+        **compute_totals(foods),
+    }
+    stmt = pg_insert(NutritionLog).values(**values)
+    if replace:
+        update_cols = {k: stmt.excluded[k] for k in values if k not in ("workspace_id", "client_id", "log_date", "meal_name")}
+        update_cols["updated_at"] = stmt.excluded.logged_at
+        stmt = stmt.on_conflict_do_update(
+            constraint="uq_nutrition_logs_client_date_meal",
+            set_=update_cols,
+        )
+    else:
+        stmt = stmt.on_conflict_do_nothing(constraint="uq_nutrition_logs_client_date_meal")
+    result = await db.execute(
+        stmt.returning(NutritionLog).execution_options(populate_existing=True)
+    )
+    log = result.scalar_one_or_none()
+    if log is not None:
+        await refresh_days(db, client_id, [log_date])
+        dashboard_snapshot.mark_dirty(db, client_id)
+    return log
+
+
+async def delete_log(db: AsyncSession, client_id: UUID, log_id: UUID) -> bool:
+    """Delete one log of a client and refresh its day. Does not commit."""
+    log_date = (await db.execute(
+        delete(NutritionLog)
+        .where(NutritionLog.id == log_id, NutritionLog.client_id == client_id)
+        .returning(NutritionLog.log_date)
+    )).scalar_one_or_none()
+    if log_date is None:
+        return False
+    await refresh_days(db, client_id, [log_date])
+    dashboard_snapshot.mark_dirty(db, client_id)
+    return True
+
+
+_ROLLUP_COLUMNS = [
+    "id", "workspace_id", "client_id", "meal_plan_id", "log_date",
+    "meals_logged",
+    "logged_calories", "logged_protein", "logged_carbs", "logged_fat",
+    "planned_calories", "planned_protein", "planned_carbs", "planned_fat",
+    "has_modifications",
+]
+
+
+async def refresh_days(db: AsyncSession, client_id: UUID, days: Iterable[date]) -> None:
+    """Recompute the rollup rows of ``client_id`` for ``days`` from its logs.
+
+    One INSERT ... SELECT ... ON CONFLICT aggregates the logs, one DELETE
+    drops rollups whose logs are gone. Logs without a plan are not rolled up
+    (the history views only list logs under an existing plan).
+    """
+    days = sorted(set(days))
+    if not days:
+        return
+    nl = NutritionLog
+
+    def _planned(key: str):
+        return func.coalesce(func.sum(nl.plan_reference[key].astext.cast(Float)), 0)
+
+    def _round1(expr):
+        return func.round(expr.cast(Numeric), 1).cast(Float)
+
+    source = (
+        select(
+            func.gen_random_uuid(),
+            nl.workspace_id,
+            nl.client_id,
+            nl.meal_plan_id,
+            nl.log_date,
+            func.count(),
+            func.coalesce(func.sum(nl.total_calories), 0),
+            _round1(func.coalesce(func.sum(nl.total_protein), 0)),
+            _round1(func.coalesce(func.sum(nl.total_carbs), 0)),
+            _round1(func.coalesce(func.sum(nl.total_fat), 0)),
+            func.round(_planned("calories")).cast(Integer),
+            _round1(_planned("protein")),
+            _round1(_planned("carbs")),
+            _round1(_planned("fat")),
+            func.bool_or(nl.has_modifications),
+        )
+        .where(
+            nl.client_id == client_id,
+            nl.log_date.in_(days),
+            nl.meal_plan_id.is_not(None),
+        )
+        .group_by(nl.workspace_id, nl.client_id, nl.meal_plan_id, nl.log_date)
+    )
+    upsert = pg_insert(NutritionDayRollup).from_select(_ROLLUP_COLUMNS, source)
+    upsert = upsert.on_conflict_do_update(
+        constraint="uq_nutrition_day_rollups_client_date_plan",
+        set_={
+            **{c: upsert.excluded[c] for c in _ROLLUP_COLUMNS[5:]},
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(upsert)
+
+    r = NutritionDayRollup
+    await db.execute(
+        delete(r).where(
+            r.client_id == client_id,
+            r.log_date.in_(days),
+            ~exists().where(
+                nl.client_id == r.client_id,
+                nl.log_date == r.log_date,
+                nl.meal_plan_id == r.meal_plan_id,
+            ),
+        )
+    )
+
+
+async def refresh_plan_references(db: AsyncSession, meal_plan: MealPlan) -> None:
+    """Re-resolve the planned reference of every log under ``meal_plan``.
+
+    Called when the plan template or its duration changes; the affected
+    rollup days are refreshed afterwards. Does not commit.
+    """
+    meal_plan_macros.get_compiled(meal_plan)
+    rows = (await db.execute(
+        select(
+            NutritionLog.id,
+            NutritionLog.client_id,
+            NutritionLog.log_date,
+            NutritionLog.meal_name,
+            NutritionLog.foods,
+        ).where(NutritionLog.meal_plan_id == meal_plan.id)
+    )).all()
+    if not rows:
+        return
+
+    params = []
+    days_by_client: Dict[UUID, Set[date]] = defaultdict(set)
+    for row in rows:
+        plan_ref, has_mods = _plan_reference(meal_plan, row.meal_name, row.log_date, row.foods or [])
+        params.append({"id": row.id, "plan_reference": plan_ref, "has_modifications": has_mods})
+        days_by_client[row.client_id].add(row.log_date)
+    await db.execute(update(NutritionLog), params)
+
+    for client_id, days in days_by_client.items():
+        await refresh_days(db, client_id, days)
+
+
+async def fetch_logs(
+    db: AsyncSession,
+    client_id: UUID,
+    *,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    limit: Optional[int] = None,
+) -> List[NutritionLog]:
+    """Logs of a client in ``[start, end]``, newest logged first."""
+    q = select(NutritionLog).where(NutritionLog.client_id == client_id)
+    if start is not None:
+        q = q.where(NutritionLog.log_date >= start)
+    if end is not None:
+        q = q.where(NutritionLog.log_date <= end)
+    q = q.order_by(desc(NutritionLog.logged_at))
+    if limit is not None:
+        q = q.limit(limit)
+    return list((await db.execute(q)).scalars().all())
+
+
+async def fetch_day_rollups(
+    db: AsyncSession,
+    client_id: UUID,
+    *,
+    start: date,
+    end: date,
+) -> List[NutritionDayRollup]:
+    """Rollup rows of a client in ``[start, end]``, newest day first."""
+    result = await db.execute(
+        select(NutritionDayRollup)
+        .where(
+            NutritionDayRollup.client_id == client_id,
+            NutritionDayRollup.log_date >= start,
+            NutritionDayRollup.log_date <= end,
+        )
+        .order_by(desc(NutritionDayRollup.log_date))
+    )
+    return list(result.scalars().all())
@@ -4,6 +4,8 @@ from datetime import datetime
 import io
 import base64
 
+from app.services.nutrition_calc import safe_float
+
 
 class PDFGeneratorService:
     """Service for generating PDF documents for diet and workout plans."""
@@ -295,7 +297,7 @@ class PDFGeneratorService:
 
                     if food_type == 'recipe':
                         items = food.get('items', [])
-                        total_grams = sum(float(it.get('quantity_grams', 0) or it.get('quantity', 0)) for it in items)
+                        total_grams = sum(safe_float(it.get('quantity_grams') or it.get('quantity')) for it in items)
                         food_data.append([
                             food_name,
                             f"{total_grams:.0f}g",
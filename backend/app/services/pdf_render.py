@@ -0,0 +1,243 @@
+"""PDF rendering off the event loop, with a content-hash cache.
+
+ReportLab is pure-Python CPU work: a multi-page diet plan took hundreds of
+milliseconds inside the ``async def`` endpoints, and every other request of
+the worker waited behind it. Threads don't help (the GIL is held
+throughout), so:
+
+- Renders run in a pool of ``PDF_RENDER_WORKERS`` processes (``spawn``, so
+  no event loop or DB connections are inherited). Each process imports
+  ReportLab and the generators once when it starts (:func:`_warm`), and
+  :func:`start` spawns them at boot, so the first PDF does not pay for it.
+- The result is cached per worker under a hash of the generator inputs for
+  ``PDF_RENDER_CACHE_TTL_SECONDS``; concurrent requests for the same PDF
+  share a single render.
+- Issued invoices (anything but drafts) are immutable, so their PDF is
+  rendered once and kept in R2 under
+  ``w/{workspace}/invoices/{invoice_id}/{hash}.pdf``. The hash covers the
+  inputs, so a status change (PAGADA, RECTIFICADA...) is a new file, never
+  a stale one.
+
+With ``PDF_RENDER_WORKERS = 0`` renders run in the default executor (tests,
+local runs without the pool).
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Deque, Dict, List, Optional
+
+from app.core import storage
+from app.core.bounded_cache import BoundedCache
+from app.core.config import settings as app_settings
+
+logger = logging.getLogger(__name__)
+
+INVOICE = "invoice"
+DIET_PLAN = "diet_plan"
+WORKOUT_PLAN = "workout_plan"
+
+_SAMPLES = 512
+
+_executor: Optional[ProcessPoolExecutor] = None
+_cache = BoundedCache(
+    "pdf_render",
+    max_entries=1024,
+    max_bytes=app_settings.PDF_RENDER_CACHE_MAX_BYTES,
+    sizeof=lambda value: len(value) if isinstance(value, (bytes, bytearray)) else 64,
+)
+_inflight: Dict[str, "asyncio.Task[bytes]"] = {}
+_counters: Dict[str, int] = {"renders": 0, "cache_hits": 0, "shared": 0, "archive_hits": 0, "errors": 0}
+_render_ms: Deque[float] = deque(maxlen=_SAMPLES)
+
+
+# ---------------------------------------------------------------------------
+# Worker side (runs in the pool processes)
+# ---------------------------------------------------------------------------
+
+def _warm() -> None:
+    from app.services.invoice_pdf import InvoicePDFGenerator
+    from app.services.pdf_generator import pdf_generator
+
+    InvoicePDFGenerator()._get_rl()
+    pdf_generator._get_reportlab()
+
+
+def _render(kind: str, payload: Dict[str, Any]) -> bytes:
+    if kind == INVOICE:
+        from app.services.invoice_pdf import InvoicePDFGenerator
+
+        return InvoicePDFGenerator().generate(**payload)
+
+    from app.services.pdf_generator import pdf_generator
+
+    if kind == DIET_PLAN:
+        return pdf_generator.generate_diet_plan_pdf(**payload)
+    if kind == WORKOUT_PLAN:
+        return pdf_generator.generate_workout_plan_pdf(**payload)
+    raise ValueError(f"Unknown PDF kind: {kind}")
+
+
+def _ping() -> bool:
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Loop side
+# ---------------------------------------------------------------------------
+
+def content_key(kind: str, payload: Dict[str, Any]) -> str:
+    """Stable hash of the generator inputs."""
+    blob = json.dumps([kind, payload], sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    global _executor
+    if _executor is None and app_settings.PDF_RENDER_WORKERS > 0:
+        _executor = ProcessPoolExecutor(
+            max_workers=app_settings.PDF_RENDER_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_warm,
+        )
+    return _executor
+
+
+async def _run(kind: str, payload: Dict[str, Any]) -> bytes:
+    global _executor
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    executor = _get_executor()
+    try:
+        result = await loop.run_in_executor(executor, _render, kind, payload)
+    except BrokenProcessPool:
+        # Un proceso murió (OOM...): se descarta el pool y el siguiente
+        # render arranca uno nuevo.
+        logger.exception("PDF render pool broken, restarting it")
+        if _executor is executor:
+            _executor = None
+            executor.shutdown(wait=False, cancel_futures=True)
+        raise
+    _counters["renders"] += 1
+    _render_ms.append((time.perf_counter() - started) * 1000)
+    return result
+
+
+async def _produce(kind: str, payload: Dict[str, Any], key: str, archive: Optional[tuple]) -> bytes:
+    if archive is not None:
+        try:
+            stored = await storage.download_workspace_file(*archive)
+        except Exception:
+            logger.warning("PDF archive read failed %s", archive, exc_info=True)
+            stored = None
+        if stored:
+            _counters["archive_hits"] += 1
+            return stored
+
+    pdf = await _run(kind, payload)
+
+    if archive is not None:
+        try:
+            await storage.upload_workspace_file(pdf, *archive, content_type="application/pdf")
+        except Exception:
+            logger.warning("PDF archive write failed %s", archive, exc_info=True)
+    return pdf
+
+
+def _finish(key: str, task: "asyncio.Task[bytes]") -> None:
+    _inflight.pop(key, None)
+    if task.cancelled():
+        return
+    if task.exception() is not None:
+        _counters["errors"] += 1
+        return
+    _cache.set(key, task.result(), app_settings.PDF_RENDER_CACHE_TTL_SECONDS)
+
+
+async def render(kind: str, payload: Dict[str, Any], archive: Optional[tuple] = None) -> bytes:
+    """Render ``kind`` with ``payload`` (the generator's keyword arguments).
+
+    ``archive`` is ``(workspace_id, *path_parts)`` of the R2 copy to read
+    first and write after rendering.
+    """
+    key = content_key(kind, payload)
+    cached = _cache.get(key)
+    if cached is not None:
+        _counters["cache_hits"] += 1
+        return cached
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_produce(kind, payload, key, archive))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _finish(key, t))
+    else:
+        _counters["shared"] += 1
+    # A client that disconnects must not cancel the render other callers wait for
+    return await asyncio.shield(task)
+
+
+def _archive_enabled() -> bool:
+    return app_settings.PDF_RENDER_ARCHIVE_INVOICES and bool(app_settings.R2_ACCOUNT_ID)
+
+
+async def render_invoice(
+    invoice: dict,
+    items: List[dict],
+    settings: Optional[dict] = None,
+    qr_data: Optional[str] = None,
+    *,
+    workspace_id: Any = None,
+) -> bytes:
+    """:meth:`InvoicePDFGenerator.generate` in the pool; issued invoices are archived in R2."""
+    payload = {"invoice": invoice, "items": items, "settings": settings, "qr_data": qr_data}
+    archive = None
+    if workspace_id and invoice.get("id") and invoice.get("status", "draft") != "draft" and _archive_enabled():
+        archive = (workspace_id, "invoices", str(invoice["id"]), f"{content_key(INVOICE, payload)}.pdf")
+    return await render(INVOICE, payload, archive)
+
+
+async def render_diet_plan(**kwargs: Any) -> bytes:
+    """:meth:`PDFGeneratorService.generate_diet_plan_pdf` in the pool."""
+    return await render(DIET_PLAN, kwargs)
+
+
+async def render_workout_plan(**kwargs: Any) -> bytes:
+    """:meth:`PDFGeneratorService.generate_workout_plan_pdf` in the pool."""
+    return await render(WORKOUT_PLAN, kwargs)
+
+
+def start() -> None:
+    """Spawn the pool processes now so the first PDF doesn't wait for them."""
+    executor = _get_executor()
+    if executor is not None:
+        for _ in range(app_settings.PDF_RENDER_WORKERS):
+            executor.submit(_ping)
+
+
+def stats() -> Dict[str, Any]:
+    ordered = sorted(_render_ms)
+    return {
+        "workers": app_settings.PDF_RENDER_WORKERS,
+        "inflight": len(_inflight),
+        **_counters,
+        "render_ms": {
+            "p50": round(ordered[len(ordered) // 2], 1) if ordered else 0.0,
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 1) if ordered else 0.0,
+        },
+        "cache": _cache.stats(),
+    }
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,136 @@
+"""Unread badges: counting, caching and pushing.
+
+The three badge counts (staff inbox, client inbox, notifications) are read
+by their polling endpoints and by the realtime stream's initial snapshot.
+Write paths call the ``push_*`` helpers after committing: they recount,
+refresh the ``ttl_cache`` entry and publish the new value, so neither the
+stream nor a late poll sees a stale figure.
+"""
+from __future__ import annotations
+
+from typing import Optional
+from uuid import UUID
+
+from sqlalchemy import and_, func, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core import realtime, ttl_cache
+from app.models.client import Client
+from app.models.message import Conversation, Message, MessageDirection
+from app.models.notification import Notification
+
+_TTL = 20.0
+
+
+def staff_messages_key(workspace_id: UUID) -> str:
+    return f"msg:unread:ws:{workspace_id}"
+
+
+def client_messages_key(user_id: UUID) -> str:
+    return f"msg:unread:client:{user_id}"
+
+
+def notifications_key(user_id: UUID) -> str:
+    return f"notif:unread:{user_id}"
+
+
+# ---------------------------------------------------------------------------
+# Counts (cache-aside)
+# ---------------------------------------------------------------------------
+
+async def staff_messages(db: AsyncSession, workspace_id: UUID, *, fresh: bool = False) -> int:
+    """Unread messages across the workspace's non-archived conversations."""
+    key = staff_messages_key(workspace_id)
+    if not fresh:
+        cached = await ttl_cache.aget(key)
+        if cached is not None:
+            return cached
+    total = int(await db.scalar(
+        select(func.coalesce(func.sum(Conversation.unread_count), 0)).where(
+            and_(
+                Conversation.workspace_id == workspace_id,
+                Conversation.is_archived == False,
+            )
+        )
+    ) or 0)
+    ttl_cache.set(key, total, ttl=_TTL)
+    return total
+
+
+async def client_messages(
+    db: AsyncSession, user_id: UUID, workspace_id: Optional[UUID], *, fresh: bool = False
+) -> int:
+    """Trainer messages the client user has not read yet."""
+    key = client_messages_key(user_id)
+    if not fresh:
+        cached = await ttl_cache.aget(key)
+        if cached is not None:
+            return cached
+    # Single round-trip: JOIN messages -> conversations -> clients.
+    count = int(await db.scalar(
+        select(func.count(Message.id))
+        .select_from(Message)
+        .join(Conversation, Conversation.id == Message.conversation_id)
+        .join(Client, Client.id == Conversation.client_id)
+        .where(
+            Client.user_id == user_id,
+            Client.workspace_id == workspace_id,
+            Message.direction == MessageDirection.OUTBOUND,
+            Message.is_deleted.is_(False),
+            ~Message.read_by.contains([user_id]),
+        )
+    ) or 0)
+    ttl_cache.set(key, count, ttl=_TTL)
+    return count
+
+
+async def notifications(db: AsyncSession, user_id: UUID, *, fresh: bool = False) -> int:
+    """Unread in-app notifications of a user."""
+    key = notifications_key(user_id)
+    if not fresh:
+        cached = await ttl_cache.aget(key)
+        if cached is not None:
+            return cached
+    count = int(await db.scalar(
+        select(func.count(Notification.id)).where(
+            Notification.user_id == user_id,
+            Notification.is_read == False,
+        )
+    ) or 0)
+    ttl_cache.set(key, count, ttl=_TTL)
+    return count
+
+
+# ---------------------------------------------------------------------------
+# Push (call after commit)
+# ---------------------------------------------------------------------------
+
+async def push_staff_messages(db: AsyncSession, workspace_id: UUID) -> None:
+    count = await staff_messages(db, workspace_id, fresh=True)
+    realtime.publish(realtime.staff_topic(workspace_id), "unread", {"scope": "messages", "unread_count": count})
+
+
+async def push_client_messages(db: AsyncSession, user_id: UUID, workspace_id: Optional[UUID]) -> None:
+    count = await client_messages(db, user_id, workspace_id, fresh=True)
+    realtime.publish(realtime.user_topic(user_id), "unread", {"scope": "messages", "unread_count": count})
+
+
+async def push_notifications(db: AsyncSession, user_id: UUID) -> None:
+    count = await notifications(db, user_id, fresh=True)
+    realtime.publish(realtime.user_topic(user_id), "unread", {"scope": "notifications", "unread_count": count})
+
+
+def message_event(message: Message, conversation: Conversation) -> dict:
+    """Payload of a ``message`` event (enough to refresh a conversation list)."""
+    # created_at is a server default: only read it if the row was refreshed,
+    # a lazy load is not possible on an AsyncSession.
+    created_at = inspect(message).dict.get("created_at")
+    return {
+        "conversation_id": str(conversation.id),
+        "client_id": str(conversation.client_id) if conversation.client_id else None,
+        "message_id": str(message.id),
+        "direction": getattr(message.direction, "value", message.direction),
+        "source": getattr(message.source, "value", message.source),
+        "preview": conversation.last_message_preview,
+        "created_at": created_at.isoformat() if created_at else None,
+    }
@@ -9,22 +9,21 @@ Hash algorithm follows AEAT spec (Orden HAC/1177/2024).
 
 import hashlib
 import logging
-import os
 import re
 import ssl
-import tempfile
 import uuid
 import urllib.parse
-import urllib.request
 import xml.etree.ElementTree as ET
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 from typing import Any, Optional
 
+import httpx
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.erp import Invoice, InvoiceSettings
+from app.services import invoice_chain
 
 logger = logging.getLogger(__name__)
 
@@ -55,23 +54,30 @@ def _clean_nif(nif: str) -> str:
     return re.sub(r"[^A-Za-z0-9]", "", nif).upper().strip()
 
 
-def _local_timestamp() -> str:
+def _last_sunday(year: int, month: int) -> datetime:
+    """01:00 UTC of the last Sunday of ``month`` (EU summer time switch)."""
+    day = max(d for d in range(25, 32) if datetime(year, month, d).weekday() == 6)
+    return datetime(year, month, day, 1, tzinfo=timezone.utc)
+
+
+def _local_timestamp(moment: Optional[datetime] = None) -> str:
     """
     Generate FechaHoraHusoGenRegistro in local Madrid timezone.
     AEAT requires the timestamp in the timezone of the issuer (Spain).
+
+    ``moment`` (UTC, default now) lets a queued record be sent with the same
+    timestamp its hash was computed with.
     """
-    year = datetime.now().year
-    last_sunday_march = max(
-        datetime(year, 3, day) for day in range(31, 24, -1)
-        if datetime(year, 3, day).weekday() == 6
-    )
-    last_sunday_october = max(
-        datetime(year, 10, day) for day in range(31, 24, -1)
-        if datetime(year, 10, day).weekday() == 6
-    )
-    now = datetime.now()
-    offset = 2 if last_sunday_march <= now < last_sunday_october else 1
-    return now.strftime(f"%Y-%m-%dT%H:%M:%S+{offset:02d}:00")
+    moment = (moment or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    summer = _last_sunday(moment.year, 3) <= moment < _last_sunday(moment.year, 10)
+    offset = 2 if summer else 1
+    local = moment + timedelta(hours=offset)
+    return local.strftime(f"%Y-%m-%dT%H:%M:%S+{offset:02d}:00")
+
+
+def registration_timestamp(invoice: Invoice) -> str:
+    """FechaHoraHusoGenRegistro used in the invoice's hash."""
+    return _local_timestamp(invoice.verifactu_registration_datetime)
 
 
 # =====================================================
@@ -191,6 +197,10 @@ class AEATSoapClient:
         return xml
 
     def build_soap_envelope(self, invoice: Invoice, registro_xml: str) -> str:
+        return self.build_batch_envelope([registro_xml])
+
+    def build_batch_envelope(self, registros_xml: list) -> str:
+        """One RegFactuSistemaFacturacion with every RegistroFactura of ``registros_xml``."""
         s = self.settings
         nif = _clean_nif(s.tax_id or "")
 
@@ -208,83 +218,57 @@ class AEATSoapClient:
             f'<NIF>{nif}</NIF>'
             '</ObligadoEmision>'
             '</sum:Cabecera>'
-            f'{registro_xml}'
+            f'{"".join(registros_xml)}'
             '</sum:RegFactuSistemaFacturacion>'
             '</soapenv:Body>'
             '</soapenv:Envelope>'
         )
 
-    def send_xml(self, xml_str: str) -> dict:
-        """Send SOAP XML to AEAT using client SSL certificate (decrypted at runtime)."""
-        from app.services.certificate import (
-            cleanup_temp_files,
-            decrypt_private_key,
-            write_secure_temp_files,
-            _wipe_bytearray,
-        )
+    async def send_xml(self, xml_str: str) -> dict:
+        """Send SOAP XML to AEAT over the workspace's pooled mTLS client (``aeat_pool``)."""
+        from app.services import aeat_pool
 
         xml_str = re.sub(r">\s+<", "><", re.sub(r"\s*xmlns", " xmlns", xml_str))
         logger.info("AEAT SOAP request: url=%s length=%d", self.url, len(xml_str))
         logger.debug("AEAT SOAP XML (first 2000 chars): %s", xml_str[:2000])
 
-        cert_pem = self.settings.certificate_pem or ""
-        encrypted_key = self.settings.certificate_key_encrypted
-        key_iv = self.settings.certificate_key_iv
-
-        if not cert_pem or not encrypted_key or not key_iv:
+        if (
+            not self.settings.certificate_pem
+            or not self.settings.certificate_key_encrypted
+            or not self.settings.certificate_key_iv
+        ):
             return {
                 "status": 0,
                 "error": "Certificado digital no configurado. Sube tu archivo .p12/.pfx en Configuración > VeriFactu.",
                 "response": "",
             }
 
-        key_pem = bytearray()
-        cert_path = ""
-        key_path = ""
         try:
-            workspace_id = str(self.settings.workspace_id)
-            key_pem = decrypt_private_key(bytes(encrypted_key), bytes(key_iv), workspace_id)
-
-            cert_path, key_path = write_secure_temp_files(cert_pem, key_pem)
-
-            context = ssl.create_default_context()
-            context.load_cert_chain(certfile=cert_path, keyfile=key_path)
-
-            req = urllib.request.Request(
-                self.url,
-                data=xml_str.encode("utf-8"),
-                headers={"Content-Type": "text/xml"},
-                method="POST",
-            )
-
-            with urllib.request.urlopen(req, context=context, timeout=30) as response:
-                status_code = response.getcode()
-                body = response.read().decode("utf-8")
-
-            logger.info("AEAT response: status=%d length=%d", status_code, len(body))
-            return {"status": status_code, "response": body, "error": None}
-
-        except urllib.error.HTTPError as e:
-            resp_body = ""
-            try:
-                resp_body = e.read().decode("utf-8")
-            except Exception:
-                pass
-            logger.error("AEAT HTTP error: status=%d reason=%s body=%s", e.code, e.reason, resp_body[:500])
-            return {"status": e.code, "error": f"HTTP {e.code}: {e.reason}", "response": resp_body}
-        except urllib.error.URLError as e:
-            logger.exception("AEAT SOAP connection error")
-            return {"status": 0, "error": str(e), "response": ""}
+            client = await aeat_pool.client_for(self.settings, self.url)
+            response = await client.post(self.url, content=xml_str.encode("utf-8"))
         except ssl.SSLError as e:
             logger.exception("SSL certificate error")
             return {"status": 0, "error": f"Error de certificado SSL: {str(e)}", "response": ""}
+        except httpx.HTTPError as e:
+            logger.exception("AEAT SOAP connection error")
+            return {"status": 0, "error": str(e) or type(e).__name__, "response": ""}
         except Exception as e:
             logger.exception("AEAT SOAP unexpected error")
             return {"status": 0, "error": str(e), "response": ""}
-        finally:
-            _wipe_bytearray(key_pem)
-            if cert_path or key_path:
-                cleanup_temp_files(cert_path, key_path)
+
+        body = response.text
+        if response.status_code >= 400:
+            logger.error(
+                "AEAT HTTP error: status=%d reason=%s body=%s",
+                response.status_code, response.reason_phrase, body[:500],
+            )
+            return {
+                "status": response.status_code,
+                "error": f"HTTP {response.status_code}: {response.reason_phrase}",
+                "response": body,
+            }
+        logger.info("AEAT response: status=%d length=%d", response.status_code, len(body))
+        return {"status": response.status_code, "response": body, "error": None}
 
     @staticmethod
     def _find_by_local(element, local_name: str):
@@ -492,16 +476,7 @@ class VeriFactuService:
         workspace_id: Any,
         series: str,
     ) -> str:
-        result = await db.execute(
-            select(Invoice.verifactu_hash)
-            .where(Invoice.workspace_id == workspace_id)
-            .where(Invoice.invoice_series == series)
-            .where(Invoice.verifactu_hash.isnot(None))
-            .order_by(Invoice.verifactu_registration_datetime.desc(), Invoice.created_at.desc())
-            .limit(1)
-        )
-        prev = result.scalar_one_or_none()
-        return prev or ""
+        return await invoice_chain.peek_head(db, workspace_id, series)
 
     @classmethod
     async def compute_and_set_hash(
@@ -509,15 +484,24 @@ class VeriFactuService:
         db: AsyncSession,
         invoice: Invoice,
         settings: Optional[InvoiceSettings],
+        preview: bool = False,
     ) -> None:
-        """Compute the chained hash for an invoice and set VeriFactu fields."""
+        """Compute the chained hash for an invoice and set VeriFactu fields.
+
+        Locks the series head until the caller commits (``invoice_chain``);
+        ``preview`` computes against the current head without taking it.
+        """
         nif = settings.tax_id if settings else ""
         series = invoice.invoice_series or "F"
 
-        prev_hash = await cls.get_previous_hash(db, invoice.workspace_id, series)
+        if preview:
+            prev_hash = await invoice_chain.peek_head(db, invoice.workspace_id, series)
+        else:
+            prev_hash = await invoice_chain.lock_head(db, invoice.workspace_id, series)
 
-        reg_dt = _local_timestamp()
-        invoice.verifactu_registration_datetime = datetime.now(timezone.utc)
+        registered_at = datetime.now(timezone.utc).replace(microsecond=0)
+        reg_dt = _local_timestamp(registered_at)
+        invoice.verifactu_registration_datetime = registered_at
 
         invoice.verifactu_uuid = cls.generate_uuid()
         invoice.verifactu_prev_hash = prev_hash
@@ -532,6 +516,8 @@ class VeriFactuService:
             prev_hash=prev_hash,
             fecha_hora_huso_gen=reg_dt,
         )
+        if not preview:
+            await invoice_chain.advance_head(db, invoice, registered_at)
 
         is_production = (settings.verifactu_mode if settings else "direct_aeat_test") == "direct_aeat_prod"
         invoice.verifactu_qr_data = cls.generate_qr_url(invoice, nif or "", is_production=is_production)
@@ -581,7 +567,7 @@ class VeriFactuService:
             "CuotaTotal": _decimal_str(invoice.tax_amount),
             "ImporteTotal": _decimal_str(invoice.total),
             "Encadenamiento": {},
-            "FechaHoraHusoGenRegistro": _local_timestamp(),
+            "FechaHoraHusoGenRegistro": registration_timestamp(invoice),
             "TipoHuella": "01",
             "Huella": invoice.verifactu_hash,
         }
@@ -633,7 +619,7 @@ class VeriFactuService:
         series = invoice.invoice_series or "F"
         prev_invoice = await cls.get_previous_invoice(db_session, invoice.workspace_id, series)
 
-        reg_dt = _local_timestamp()
+        reg_dt = registration_timestamp(invoice)
 
         client = AEATSoapClient(settings, is_test=is_test)
         registro_xml = client.build_registro_alta_xml(
@@ -648,7 +634,7 @@ class VeriFactuService:
 
         logger.info("VeriFactu AEAT: sending to %s for invoice %s", client.url, invoice.invoice_number)
 
-        raw_result = client.send_xml(soap_xml)
+        raw_result = await client.send_xml(soap_xml)
 
         if raw_result.get("error"):
             return {
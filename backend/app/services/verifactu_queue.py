@@ -0,0 +1,435 @@
+"""
+VeriFactu submission to AEAT through a durable queue.
+
+Finalizing an invoice used to wait for a blocking SOAP call to AEAT (up to
+30 s, on the event loop) with one record per envelope. Now the request only
+computes the chained hash and writes a ``verifactu_submissions`` row in the
+same transaction (:func:`enqueue_invoice`); once it commits, a Celery task
+per (workspace, series) queue is scheduled (``app.tasks.verifactu``). The
+worker (:func:`process_queue`):
+
+- claims the oldest pending records of the queue, in chain order (the
+  position the series head gave each record while it was locked), and
+  never while another batch of the same queue is in flight;
+- packs up to ``VERIFACTU_BATCH_SIZE`` of them (AEAT accepts 1000) into one
+  ``RegFactuSistemaFacturacion`` and sends it off the event loop;
+- writes the per-record result (``RespuestaLinea``) back to each invoice
+  together with the queue rows, in one transaction;
+- honors the ``TiempoEsperaEnvio`` of the response: the workspace does not
+  send again before it elapses unless a full batch is waiting, as AEAT
+  allows;
+- retries transport failures (network, TLS, 5xx) with exponential backoff
+  up to ``VERIFACTU_MAX_ATTEMPTS``.
+
+A beat task (:func:`sweep`) re-kicks due queues whose task was lost,
+releases rows stuck in ``processing`` by a dead worker and purges old
+finished rows.
+"""
+import logging
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from sqlalchemy import and_, delete, event, exists, func, select, text, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, aliased
+
+from app.core.config import settings
+from app.models.erp import Invoice, InvoiceChainHead, InvoiceSettings, VeriFactuSubmission
+from app.services.verifactu import AEATSoapClient, registration_timestamp
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSING = "processing"
+DONE = "done"
+FAILED = "failed"
+
+DIRECT_MODES = ("direct_aeat_test", "direct_aeat_prod")
+
+# "Registro de facturación duplicado": un envío anterior llegó a AEAT pero
+# el worker murió antes de guardar la respuesta.
+DUPLICATE_ERROR = "3000"
+
+_SESSION_KEY = "verifactu_queues"
+
+Queue = Tuple[UUID, str]
+
+
+def retry_delay(attempts: int, rand: Optional[float] = None) -> float:
+    """Seconds before retry number ``attempts`` (exponential, ±20% jitter)."""
+    base = min(
+        settings.VERIFACTU_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0),
+        settings.VERIFACTU_RETRY_MAX_SECONDS,
+    )
+    return base * (0.8 + 0.4 * (random.random() if rand is None else rand))
+
+
+def wait_seconds(tiempo_espera_envio: Optional[str]) -> int:
+    """TiempoEsperaEnvio of a response in seconds (default if missing)."""
+    try:
+        return max(int(tiempo_espera_envio), 0)
+    except (TypeError, ValueError):
+        return settings.VERIFACTU_DEFAULT_WAIT_SECONDS
+
+
+# ============ REQUEST SIDE ============
+
+async def enqueue_invoice(db: AsyncSession, invoice: Invoice) -> None:
+    """
+    Encola el registro VeriFactu de ``invoice`` (ya con hash). No hace commit:
+    la fila se confirma junto con la factura, y al confirmarse se lanza el
+    worker de su cola.
+
+    Se llama después de ``compute_and_set_hash`` en la misma transacción: la
+    cabeza de la serie sigue bloqueada y su contador de registros es la
+    posición de este registro en la cadena.
+    """
+    if invoice.id is None:
+        await db.flush()
+    series = invoice.invoice_series or "F"
+    position = (
+        select(InvoiceChainHead.records)
+        .where(InvoiceChainHead.workspace_id == invoice.workspace_id, InvoiceChainHead.series == series)
+        .scalar_subquery()
+    )
+    stmt = insert(VeriFactuSubmission).values(
+        id=uuid.uuid4(),
+        workspace_id=invoice.workspace_id,
+        invoice_id=invoice.id,
+        series=series,
+        chain_position=func.coalesce(position, 0),
+        status=PENDING,
+        attempts=0,
+    )
+    await db.execute(stmt.on_conflict_do_nothing(
+        index_elements=[VeriFactuSubmission.invoice_id],
+        # Literal, no bind params: the generic plan of a prepared statement
+        # must still match the predicate of the partial index.
+        index_where=text("status IN ('pending', 'processing')"),
+    ))
+    db.sync_session.info.setdefault(_SESSION_KEY, set()).add((invoice.workspace_id, series))
+
+
+@event.listens_for(Session, "after_commit")
+def _kick_after_commit(session: Session) -> None:
+    queues = session.info.pop(_SESSION_KEY, None)
+    if queues:
+        kick(queues)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_after_rollback(session: Session) -> None:
+    session.info.pop(_SESSION_KEY, None)
+
+
+def kick(queues: Iterable[Queue], countdown: Optional[float] = None) -> None:
+    """Schedule the submission task of each queue (the beat sweep covers failures)."""
+    try:
+        from app.tasks.verifactu import submit_verifactu_queue
+
+        delay = settings.VERIFACTU_DEBOUNCE_SECONDS if countdown is None else countdown
+        for workspace_id, series in queues:
+            submit_verifactu_queue.apply_async(args=[str(workspace_id), series], countdown=delay)
+    except Exception:
+        logger.exception("verifactu: failed to enqueue task (the sweep will retry)")
+
+
+# ============ WORKER SIDE ============
+
+def _queue_filter(workspace_id: UUID, series: str):
+    return and_(VeriFactuSubmission.workspace_id == workspace_id, VeriFactuSubmission.series == series)
+
+
+async def _seconds_until_due(db: AsyncSession, workspace_id: UUID, series: str) -> Optional[float]:
+    """Seconds until the head of the queue can be sent (0 if now), or None if empty."""
+    head = (await db.execute(
+        select(VeriFactuSubmission.next_attempt_at)
+        .where(_queue_filter(workspace_id, series), VeriFactuSubmission.status == PENDING)
+        .order_by(VeriFactuSubmission.chain_position)
+        .limit(1)
+    )).scalar_one_or_none()
+    if head is None:
+        return None
+    hold = await db.scalar(
+        select(InvoiceSettings.verifactu_next_send_at).where(InvoiceSettings.workspace_id == workspace_id)
+    )
+    due = max(head, hold) if hold else head
+    return max((due - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+async def _claim(db: AsyncSession, workspace_id: UUID, series: str) -> Optional[List[VeriFactuSubmission]]:
+    """Oldest due records of the queue, in chain order; [] if it must wait,
+    None if another worker owns it."""
+    # Un solo worker decide por cola; el lock se libera con el commit.
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(
+        func.hashtext(f"verifactu:{workspace_id}:{series}")
+    )))
+    in_flight = await db.scalar(select(exists().where(
+        _queue_filter(workspace_id, series), VeriFactuSubmission.status == PROCESSING,
+    )))
+    if not locked or in_flight:
+        await db.rollback()
+        return None
+
+    size = settings.VERIFACTU_BATCH_SIZE
+    head = (await db.execute(
+        select(VeriFactuSubmission.id, VeriFactuSubmission.next_attempt_at)
+        .where(_queue_filter(workspace_id, series), VeriFactuSubmission.status == PENDING)
+        .order_by(VeriFactuSubmission.chain_position)
+        .limit(size)
+    )).all()
+    now = datetime.now(timezone.utc)
+    # Los registros salen en orden de encadenamiento: si el primero espera
+    # un reintento, esperan todos.
+    if not head or head[0].next_attempt_at > now:
+        await db.rollback()
+        return []
+    hold = await db.scalar(
+        select(InvoiceSettings.verifactu_next_send_at).where(InvoiceSettings.workspace_id == workspace_id)
+    )
+    if hold and hold > now and len(head) < size:
+        await db.rollback()
+        return []
+
+    ids = [row_id for row_id, due in head if due <= now]
+    rows = (await db.scalars(
+        update(VeriFactuSubmission)
+        .where(VeriFactuSubmission.id.in_(ids), VeriFactuSubmission.status == PENDING)
+        .values(status=PROCESSING, attempts=VeriFactuSubmission.attempts + 1, updated_at=func.now())
+        .returning(VeriFactuSubmission)
+        .execution_options(synchronize_session=False)
+    )).all()
+    await db.commit()
+    return sorted(rows, key=lambda r: r.chain_position)
+
+
+def _settle(row: VeriFactuSubmission, status: str, error: Optional[str] = None) -> None:
+    row.status = status
+    row.last_error = error
+    row.processed_at = datetime.now(timezone.utc)
+
+
+def _retry(row: VeriFactuSubmission, error: str) -> bool:
+    """Back to ``pending`` after a backoff; False once attempts are exhausted."""
+    if row.attempts >= settings.VERIFACTU_MAX_ATTEMPTS:
+        return False
+    row.status = PENDING
+    row.last_error = error
+    row.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=retry_delay(row.attempts))
+    return True
+
+
+def _fail_invoice(invoice: Optional[Invoice], message: str, **extra) -> None:
+    if invoice is not None:
+        invoice.verifactu_status = "error"
+        invoice.verifactu_response = {"status": "error", "provider": "direct_aeat", "message": message, **extra}
+
+
+def _record_result(registro: dict, attempts: int) -> Tuple[str, str]:
+    """(status, message) of one RespuestaLinea."""
+    estado = registro.get("estado")
+    if estado == "Correcto":
+        return "accepted", "Registro aceptado por AEAT"
+    if estado == "AceptadoConErrores":
+        return "accepted", f"Aceptado con errores: [{registro.get('cod_error')}] {registro.get('desc_error') or ''}"
+    if registro.get("cod_error") == DUPLICATE_ERROR and attempts > 1:
+        return "accepted", "Registro ya presentado en un envío anterior"
+    return "error", AEATSoapClient._build_error_msg([registro])
+
+
+async def _load_invoices(db: AsyncSession, rows: List[VeriFactuSubmission]) -> Tuple[Dict[UUID, Invoice], Dict[str, Invoice]]:
+    """Invoices of ``rows`` and the previous invoice of each chain link, by hash."""
+    invoices = {
+        inv.id: inv
+        for inv in (await db.scalars(select(Invoice).where(Invoice.id.in_([r.invoice_id for r in rows]))))
+    }
+    prev_hashes = {inv.verifactu_prev_hash for inv in invoices.values() if inv.verifactu_prev_hash}
+    previous: Dict[str, Invoice] = {}
+    if prev_hashes:
+        first = next(iter(invoices.values()))
+        previous = {
+            inv.verifactu_hash: inv
+            for inv in (await db.scalars(
+                select(Invoice).where(
+                    Invoice.workspace_id == first.workspace_id,
+                    Invoice.verifactu_hash.in_(prev_hashes),
+                )
+            ))
+        }
+    return invoices, previous
+
+
+async def _submit(
+    db: AsyncSession,
+    rows: List[VeriFactuSubmission],
+    invoices: Dict[UUID, Invoice],
+    previous: Dict[str, Invoice],
+    inv_settings: InvoiceSettings,
+) -> None:
+    """Send one envelope with ``rows`` and record the outcome (no commit)."""
+    client = AEATSoapClient(inv_settings, is_test=inv_settings.verifactu_mode != "direct_aeat_prod")
+    batch: List[Tuple[VeriFactuSubmission, Invoice]] = []
+    registros_xml = []
+    for row in rows:
+        invoice = invoices.get(row.invoice_id)
+        if invoice is None or not invoice.verifactu_hash:
+            _settle(row, FAILED, "Factura sin hash VeriFactu")
+            continue
+        batch.append((row, invoice))
+        registros_xml.append(client.build_registro_alta_xml(
+            invoice=invoice,
+            prev_invoice=previous.get(invoice.verifactu_prev_hash),
+            verifactu_hash=invoice.verifactu_hash,
+            reg_dt=registration_timestamp(invoice),
+            is_subsanacion=bool(invoice.verifactu_response and invoice.verifactu_response.get("status") == "error"),
+        ))
+    if not batch:
+        return
+
+    logger.info("VeriFactu AEAT: sending %d record(s) to %s", len(batch), client.url)
+    raw = await client.send_xml(client.build_batch_envelope(registros_xml))
+    http_status = raw.get("status")
+
+    parsed = client.parse_response(raw["response"]) if raw.get("response") else None
+    if parsed is None or "registros" not in parsed:
+        # Sin respuesta SOAP de AEAT (red, TLS, 5xx de un proxy...): se
+        # reintenta el envío entero.
+        error = raw.get("error") or (parsed or {}).get("message") or "Sin respuesta de AEAT"
+        for row, invoice in batch:
+            if not _retry(row, error):
+                _settle(row, FAILED, error)
+                _fail_invoice(invoice, error, http_status=http_status)
+        return
+
+    inv_settings.verifactu_next_send_at = datetime.now(timezone.utc) + timedelta(
+        seconds=wait_seconds(parsed.get("tiempo_espera_envio"))
+    )
+    by_number = {r.get("num_serie"): r for r in parsed["registros"]}
+    if not by_number:
+        # SOAP Fault o respuesta sin líneas: AEAT rechaza el envío completo
+        for row, invoice in batch:
+            _settle(row, FAILED, parsed["message"])
+            _fail_invoice(invoice, parsed["message"], http_status=http_status)
+        return
+
+    now = datetime.now(timezone.utc)
+    for row, invoice in batch:
+        registro = by_number.get(invoice.invoice_number)
+        if registro is None:
+            message = "AEAT no devolvió resultado para este registro"
+            _settle(row, FAILED, message)
+            _fail_invoice(invoice, message, csv=parsed.get("csv"), http_status=http_status)
+            continue
+        status, message = _record_result(registro, row.attempts)
+        invoice.verifactu_response = {
+            "status": status,
+            "provider": "direct_aeat",
+            "message": message,
+            "csv": parsed.get("csv"),
+            "timestamp_presentacion": parsed.get("timestamp_presentacion"),
+            "tiempo_espera_envio": parsed.get("tiempo_espera_envio"),
+            "registros": [registro],
+            "http_status": http_status,
+        }
+        if status == "accepted":
+            invoice.verifactu_status = "accepted"
+            invoice.verifactu_sent_at = now
+            _settle(row, DONE)
+        else:
+            invoice.verifactu_status = "error"
+            _settle(row, FAILED, message)
+
+
+async def process_queue(db: AsyncSession, workspace_id: UUID, series: str) -> Optional[float]:
+    """
+    Envía a AEAT los registros pendientes de la cola (workspace, serie).
+
+    Returns:
+        Segundos hasta que la cola pueda volver a enviar, o None si está vacía.
+    """
+    rows = await _claim(db, workspace_id, series)
+    if rows is None:
+        # Otro worker está enviando esta cola y se reprograma él mismo
+        return None
+    if rows:
+        # El rollback expira las filas: la recuperación usa sólo estos valores.
+        claimed_ids = [r.id for r in rows]
+        max_attempts = max(r.attempts for r in rows)
+        try:
+            inv_settings = await db.scalar(
+                select(InvoiceSettings).where(InvoiceSettings.workspace_id == workspace_id)
+            )
+            invoices, previous = await _load_invoices(db, rows)
+            if inv_settings is None or not inv_settings.verifactu_enabled or inv_settings.verifactu_mode not in DIRECT_MODES:
+                # Desactivado después de encolar: no se envía nada
+                for row in rows:
+                    _settle(row, DONE, "VeriFactu no habilitado")
+                    invoice = invoices.get(row.invoice_id)
+                    if invoice is not None:
+                        invoice.verifactu_response = {"status": "skipped", "message": "VeriFactu no habilitado"}
+            elif not inv_settings.certificate_pem or not inv_settings.certificate_key_encrypted:
+                message = "Certificado digital no configurado. Sube tu archivo .p12/.pfx en Configuración > VeriFactu."
+                for row in rows:
+                    _settle(row, FAILED, message)
+                    _fail_invoice(invoices.get(row.invoice_id), message)
+            else:
+                await _submit(db, rows, invoices, previous, inv_settings)
+            # Facturas y filas de la cola en la misma transacción.
+            await db.commit()
+        except Exception as exc:
+            await db.rollback()
+            logger.exception("verifactu: queue %s/%s failed", workspace_id, series)
+            await db.execute(
+                update(VeriFactuSubmission)
+                .where(VeriFactuSubmission.id.in_(claimed_ids))
+                .values(
+                    status=PENDING,
+                    last_error=str(exc)[:500],
+                    next_attempt_at=func.now() + timedelta(seconds=retry_delay(max_attempts)),
+                    updated_at=func.now(),
+                )
+                .execution_options(synchronize_session=False)
+            )
+            await db.commit()
+        logger.info("verifactu: queue %s/%s processed %d record(s)", workspace_id, series, len(rows))
+    return await _seconds_until_due(db, workspace_id, series)
+
+
+async def sweep(db: AsyncSession) -> List[Queue]:
+    """
+    Mantenimiento periódico de la cola. Devuelve las colas con registros ya
+    vencidos, para relanzar su tarea.
+    """
+    stuck_before = func.now() - timedelta(seconds=settings.VERIFACTU_STUCK_SECONDS)
+    # Un worker murió a mitad de envío: se reenvía (AEAT marca el duplicado).
+    await db.execute(
+        update(VeriFactuSubmission)
+        .where(VeriFactuSubmission.status == PROCESSING, VeriFactuSubmission.updated_at < stuck_before)
+        .values(status=PENDING, updated_at=func.now())
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(
+        delete(VeriFactuSubmission).where(
+            VeriFactuSubmission.status.in_((DONE, FAILED)),
+            VeriFactuSubmission.updated_at < func.now() - timedelta(days=settings.VERIFACTU_RETENTION_DAYS),
+        )
+    )
+    hold = aliased(InvoiceSettings)
+    queues = (await db.execute(
+        select(VeriFactuSubmission.workspace_id, VeriFactuSubmission.series)
+        .where(
+            VeriFactuSubmission.status == PENDING,
+            VeriFactuSubmission.next_attempt_at <= func.now(),
+            ~exists().where(
+                hold.workspace_id == VeriFactuSubmission.workspace_id,
+                hold.verifactu_next_send_at > func.now(),
+            ),
+        )
+        .distinct()
+    )).all()
+    await db.commit()
+    return [tuple(q) for q in queues]
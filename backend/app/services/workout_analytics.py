@@ -0,0 +1,209 @@
+"""Personal records and progression per client and exercise.
+
+``exercise_weekly_stats`` keeps one row per (client, exercise, ISO week):
+sessions, sets, reps, tonnage, top weight, best estimated 1RM and the set
+it came from. When a workout log is written, :func:`refresh_weeks`
+re-aggregates only the weeks and exercises it touched from
+``exercise_performances`` (one INSERT ... SELECT ... ON CONFLICT), so the
+trainer charts and PR lists read a few dozen small rows instead of walking
+every ``WorkoutLog.log`` document.
+
+Weeks start on Monday and are computed in UTC, like ``performed_at``.
+"""
+from __future__ import annotations
+
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Iterable, List, Optional
+from uuid import UUID
+
+from sqlalchemy import Date, DateTime, Float, Integer, delete, exists, func, select
+from sqlalchemy.dialects.postgresql import ARRAY, aggregate_order_by, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.workout import ExercisePerformance, ExerciseWeeklyStats
+
+_STATS_COLUMNS = [
+    "id", "client_id", "exercise_id", "week_start", "exercise_name",
+    "sessions", "sets", "reps", "volume_kg", "top_weight_kg",
+    "best_e1rm_kg", "best_set_weight_kg", "best_set_reps", "best_set_at",
+]
+
+
+def week_of(moment: datetime) -> date:
+    """Monday (UTC) of the week ``moment`` falls in."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc)
+    day = moment.date()
+    return day - timedelta(days=day.weekday())
+
+
+def _week_start(column):
+    return func.date_trunc("week", func.timezone("UTC", column)).cast(Date)
+
+
+def _utc(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+async def refresh_weeks(
+    db: AsyncSession,
+    client_id: UUID,
+    exercise_ids: Iterable[str],
+    weeks: Iterable[date],
+) -> None:
+    """Recompute the weekly rows of ``client_id`` for ``exercise_ids`` x ``weeks``.
+
+    The best set of a week is the one with the highest estimated 1RM
+    (earliest on ties). Rows whose sessions are gone are deleted.
+    """
+    exercise_ids, weeks = sorted(set(exercise_ids)), sorted(set(weeks))
+    if not exercise_ids or not weeks:
+        return
+    ep = ExercisePerformance
+    week = _week_start(ep.performed_at)
+    best_first = (ep.best_e1rm_kg.desc().nulls_last(), ep.performed_at)
+
+    def _best(column, type_):
+        return func.array_agg(aggregate_order_by(column, *best_first), type_=ARRAY(type_))[1]
+
+    source = (
+        select(
+            func.gen_random_uuid(),
+            ep.client_id,
+            ep.exercise_id,
+            week,
+            func.max(ep.exercise_name),
+            func.count(func.distinct(ep.workout_log_id)),
+            func.sum(ep.set_count),
+            func.sum(ep.total_reps),
+            func.sum(ep.total_volume_kg),
+            func.max(ep.top_weight_kg),
+            func.max(ep.best_e1rm_kg),
+            _best(ep.best_set_weight_kg, Float),
+            _best(ep.best_set_reps, Integer),
+            _best(ep.performed_at, DateTime(timezone=True)),
+        )
+        .where(
+            ep.client_id == client_id,
+            ep.exercise_id.in_(exercise_ids),
+            ep.performed_at >= _utc(weeks[0]),
+            ep.performed_at < _utc(weeks[-1] + timedelta(days=7)),
+            week.in_(weeks),
+        )
+        .group_by(ep.client_id, ep.exercise_id, week)
+    )
+    upsert = pg_insert(ExerciseWeeklyStats).from_select(_STATS_COLUMNS, source)
+    upsert = upsert.on_conflict_do_update(
+        constraint="uq_exercise_weekly_stats_client_exercise_week",
+        set_={
+            **{c: upsert.excluded[c] for c in _STATS_COLUMNS[4:]},
+            "updated_at": func.now(),
+        },
+    )
+    await db.execute(upsert)
+
+    ws = ExerciseWeeklyStats
+    await db.execute(
+        delete(ws).where(
+            ws.client_id == client_id,
+            ws.exercise_id.in_(exercise_ids),
+            ws.week_start.in_(weeks),
+            ~exists().where(
+                ep.client_id == ws.client_id,
+                ep.exercise_id == ws.exercise_id,
+                week == ws.week_start,
+            ),
+        )
+    )
+
+
+def _stats_dict(row: ExerciseWeeklyStats) -> dict:
+    return {
+        "week_start": row.week_start.isoformat(),
+        "sessions": row.sessions,
+        "sets": row.sets,
+        "reps": row.reps,
+        "volume_kg": round(row.volume_kg or 0, 1),
+        "top_weight_kg": row.top_weight_kg,
+        "best_e1rm_kg": row.best_e1rm_kg,
+    }
+
+
+def _best_set(row: ExerciseWeeklyStats) -> Optional[dict]:
+    if row.best_e1rm_kg is None:
+        return None
+    return {
+        "e1rm_kg": row.best_e1rm_kg,
+        "weight_kg": row.best_set_weight_kg,
+        "reps": row.best_set_reps,
+        "performed_at": row.best_set_at.isoformat() if row.best_set_at else None,
+    }
+
+
+async def exercise_progress(db: AsyncSession, client_id: UUID, exercise_id: str, weeks: int) -> dict:
+    """Weekly series of the last ``weeks`` weeks plus all-time records."""
+    ws = ExerciseWeeklyStats
+    since = week_of(datetime.now(timezone.utc)) - timedelta(weeks=weeks - 1)
+    rows = (await db.execute(
+        select(ws)
+        .where(ws.client_id == client_id, ws.exercise_id == exercise_id)
+        .order_by(ws.week_start)
+    )).scalars().all()
+
+    best = max(
+        (r for r in rows if r.best_e1rm_kg is not None),
+        key=lambda r: (r.best_e1rm_kg, -r.week_start.toordinal()),
+        default=None,
+    )
+    heaviest = max(
+        (r for r in rows if r.top_weight_kg is not None),
+        key=lambda r: (r.top_weight_kg, -r.week_start.toordinal()),
+        default=None,
+    )
+    biggest_week = max(rows, key=lambda r: (r.volume_kg or 0, -r.week_start.toordinal()), default=None)
+    return {
+        "exercise_id": exercise_id,
+        "exercise_name": next((r.exercise_name for r in reversed(rows) if r.exercise_name), None),
+        "records": {
+            "best_set": _best_set(best) if best else None,
+            "top_weight_kg": heaviest.top_weight_kg if heaviest else None,
+            "top_weight_week": heaviest.week_start.isoformat() if heaviest else None,
+            "best_week_volume_kg": round(biggest_week.volume_kg or 0, 1) if biggest_week else None,
+            "best_week": biggest_week.week_start.isoformat() if biggest_week else None,
+            "sessions": sum(r.sessions for r in rows),
+            "total_volume_kg": round(sum(r.volume_kg or 0 for r in rows), 1),
+        },
+        "weekly": [_stats_dict(r) for r in rows if r.week_start >= since],
+    }
+
+
+async def personal_records(db: AsyncSession, client_id: UUID) -> List[dict]:
+    """Best set (highest estimated 1RM) and totals of every exercise logged."""
+    ws = ExerciseWeeklyStats
+    best_rows = (await db.execute(
+        select(ws)
+        .where(ws.client_id == client_id)
+        .distinct(ws.exercise_id)
+        .order_by(ws.exercise_id, ws.best_e1rm_kg.desc().nulls_last(), ws.week_start)
+    )).scalars().all()
+    totals = {
+        exercise_id: (sessions, volume, last_week)
+        for exercise_id, sessions, volume, last_week in (await db.execute(
+            select(ws.exercise_id, func.sum(ws.sessions), func.sum(ws.volume_kg), func.max(ws.week_start))
+            .where(ws.client_id == client_id)
+            .group_by(ws.exercise_id)
+        )).all()
+    }
+    records = []
+    for row in best_rows:
+        sessions, volume, last_week = totals.get(row.exercise_id, (0, 0, None))
+        records.append({
+            "exercise_id": row.exercise_id,
+            "exercise_name": row.exercise_name,
+            "best_set": _best_set(row),
+            "sessions": sessions,
+            "total_volume_kg": round(volume or 0, 1),
+            "last_week": last_week.isoformat() if last_week else None,
+        })
+    records.sort(key=lambda r: r["sessions"], reverse=True)
+    return records
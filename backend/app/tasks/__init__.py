@@ -38,6 +38,14 @@ from app.tasks.reminders import (
     process_due_reminders,
     create_default_reminders_for_client,
 )
+from app.tasks.calendar_sync import (
+    sync_user_calendar,
+    flush_calendar_sync_outbox,
+)
+from app.tasks.verifactu import (
+    submit_verifactu_queue,
+    flush_verifactu_queue,
+)
 
 __all__ = [
     "celery_app",
@@ -69,4 +77,8 @@ __all__ = [
     "calculate_workspace_metrics",
     "process_due_reminders",
     "create_default_reminders_for_client",
+    "sync_user_calendar",
+    "flush_calendar_sync_outbox",
+    "submit_verifactu_queue",
+    "flush_verifactu_queue",
 ]
@@ -0,0 +1,62 @@
+"""Celery tasks for the Google Calendar sync queue (see app.services.calendar_sync)."""
+import asyncio
+import logging
+from uuid import UUID
+
+from celery import shared_task
+
+from app.core.database import AsyncSessionLocal as async_session, engine
+
+logger = logging.getLogger(__name__)
+
+# Only follow up in-process on retries due this soon; later ones are picked
+# up by the beat sweep (long ETAs would outlive the broker's visibility
+# timeout and be delivered twice).
+_MAX_FOLLOW_UP_SECONDS = 300
+
+
+async def _in_fresh_pool(coro):
+    # Every task runs its own event loop (asyncio.run); pooled asyncpg
+    # connections belong to the loop that opened them.
+    try:
+        return await coro
+    finally:
+        await engine.dispose()
+
+
+async def _process_user(user_id: UUID):
+    from app.services import calendar_sync
+
+    async with async_session() as db:
+        return await calendar_sync.process_user(db, user_id)
+
+
+async def _sweep():
+    from app.services import calendar_sync
+
+    async with async_session() as db:
+        return await calendar_sync.sweep(db)
+
+
+@shared_task(bind=True, max_retries=5)
+def sync_user_calendar(self, user_id: str):
+    """Push the pending booking changes of one user's Google Calendar."""
+    try:
+        next_due = asyncio.run(_in_fresh_pool(_process_user(UUID(user_id))))
+    except Exception as exc:
+        logger.error("Calendar sync failed for user %s: %s", user_id, exc)
+        raise self.retry(exc=exc, countdown=min(30 * 2 ** self.request.retries, 600))
+
+    if next_due is not None and next_due <= _MAX_FOLLOW_UP_SECONDS:
+        sync_user_calendar.apply_async(args=[user_id], countdown=max(next_due, 1))
+    return {"user_id": user_id, "next_due_seconds": next_due}
+
+
+@shared_task
+def flush_calendar_sync_outbox():
+    """Re-kick users with due changes, release stuck rows and purge old ones."""
+    from app.services import calendar_sync
+
+    users = asyncio.run(_in_fresh_pool(_sweep()))
+    calendar_sync.kick(users, countdown=0)
+    return {"users": len(users)}
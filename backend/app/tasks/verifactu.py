@@ -0,0 +1,65 @@
+"""Celery tasks for the VeriFactu submission queue (see app.services.verifactu_queue)."""
+import asyncio
+import logging
+from uuid import UUID
+
+from celery import shared_task
+
+from app.core.database import AsyncSessionLocal as async_session, engine
+
+logger = logging.getLogger(__name__)
+
+# Only follow up in-process on sends due this soon (TiempoEsperaEnvio is
+# usually 60 s); later ones are picked up by the beat sweep.
+_MAX_FOLLOW_UP_SECONDS = 300
+
+
+async def _in_fresh_pool(coro):
+    # Every task runs its own event loop (asyncio.run); pooled asyncpg
+    # connections and AEAT keep-alive clients belong to the loop that
+    # opened them.
+    from app.services import aeat_pool
+
+    try:
+        return await coro
+    finally:
+        await aeat_pool.close()
+        await engine.dispose()
+
+
+async def _process_queue(workspace_id: UUID, series: str):
+    from app.services import verifactu_queue
+
+    async with async_session() as db:
+        return await verifactu_queue.process_queue(db, workspace_id, series)
+
+
+async def _sweep():
+    from app.services import verifactu_queue
+
+    async with async_session() as db:
+        return await verifactu_queue.sweep(db)
+
+
+@shared_task(bind=True, max_retries=5)
+def submit_verifactu_queue(self, workspace_id: str, series: str):
+    """Send the pending VeriFactu records of one workspace and series to AEAT."""
+    try:
+        next_due = asyncio.run(_in_fresh_pool(_process_queue(UUID(workspace_id), series)))
+    except Exception as exc:
+        logger.error("VeriFactu queue %s/%s failed: %s", workspace_id, series, exc)
+        raise self.retry(exc=exc, countdown=min(60 * 2 ** self.request.retries, 900))
+
+    if next_due is not None and next_due <= _MAX_FOLLOW_UP_SECONDS:
+        submit_verifactu_queue.apply_async(args=[workspace_id, series], countdown=max(next_due, 1))
+    return {"workspace_id": workspace_id, "series": series, "next_due_seconds": next_due}
+
+
+@shared_task
+def flush_verifactu_queue():
+    """Re-kick queues with due records, release stuck rows and purge old ones."""
+    from app.services import verifactu_queue
+
+    queues = asyncio.run(_in_fresh_pool(_sweep()))
+    verifactu_queue.kick(queues, countdown=0)
+    return {"queues": len(queues)}
@@ -0,0 +1,117 @@
+"""CLI: ``python -m tests.perf {seed,run,compare}`` (see the package docstring)."""
+import argparse
+import asyncio
+import os
+import sys
+
+
+def _configure_env() -> None:
+    # Must run before anything imports app.core.config: the engine and the
+    # cache tiers are built at import time.
+    url = os.environ.get("BENCH_DATABASE_URL")
+    if not url:
+        sys.exit("Set BENCH_DATABASE_URL to a local scratch database (it will be written to).")
+    os.environ["DATABASE_URL"] = url
+    os.environ.setdefault("DATABASE_SSL", "false")
+    os.environ.setdefault("CACHE_REDIS_ENABLED", "false")
+    os.environ.setdefault("RUN_MIGRATIONS_ON_STARTUP", "false")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m tests.perf")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_seed = sub.add_parser("seed", help="create the schema and load the benchmark dataset")
+    p_seed.add_argument("--scale", default="medium", choices=("small", "medium", "large"))
+    p_seed.add_argument("--seed", type=int, default=42)
+    p_seed.add_argument("--reset", action="store_true", help="drop and recreate the public schema first")
+    p_seed.add_argument("--allow-remote", action="store_true")
+
+    p_run = sub.add_parser("run", help="benchmark the hot endpoints")
+    p_run.add_argument("--scale", default="medium", help="label stored in the results (must match the seed)")
+    p_run.add_argument("--requests", type=int, default=300)
+    p_run.add_argument("--concurrency", type=int, default=10)
+    p_run.add_argument("--warmup", type=int, default=20)
+    p_run.add_argument("--only", nargs="*", help="endpoint names to run")
+    p_run.add_argument("--output", help="write the JSON results here")
+    p_run.add_argument("--allow-remote", action="store_true")
+
+    p_mw = sub.add_parser("middleware", help="per-request cost of the middleware stack (no database)")
+    p_mw.add_argument("--requests", type=int, default=5000)
+    p_mw.add_argument("--output", help="write the JSON results here")
+
+    p_chain = sub.add_parser("chain", help="concurrent VeriFactu finalizations of one series")
+    p_chain.add_argument("--finalizations", type=int, default=200)
+    p_chain.add_argument("--concurrency", type=int, default=20)
+    p_chain.add_argument("--output", help="write the JSON results here")
+    p_chain.add_argument("--allow-remote", action="store_true")
+
+    p_cmp = sub.add_parser("compare", help="compare two result files; exit 1 on regression")
+    p_cmp.add_argument("base")
+    p_cmp.add_argument("head")
+    p_cmp.add_argument("--max-regression", type=float, default=0.20, help="allowed p95 growth (0.2 = 20%%)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "compare":
+        from tests.perf import report
+
+        lines, regressions = report.compare(
+            report.load(args.base), report.load(args.head), max_latency_regression=args.max_regression,
+        )
+        print("\n".join(lines))
+        if regressions:
+            print("\nRegressions:\n  " + "\n  ".join(regressions))
+            return 1
+        return 0
+
+    if args.command == "middleware":
+        os.environ.setdefault("CACHE_REDIS_ENABLED", "false")
+        from tests.perf import middleware, report
+
+        results = asyncio.run(middleware.run(requests=args.requests))
+        print(middleware.format_table(results["results"]))
+        if args.output:
+            report.write(args.output, results)
+        return 0
+
+    _configure_env()
+    from tests.perf import report, seed
+
+    seed.check_local(os.environ["DATABASE_URL"], args.allow_remote)
+
+    if args.command == "seed":
+        async def _seed():
+            await seed.prepare_schema(reset=args.reset)
+            return await seed.seed(seed.SCALES[args.scale], args.seed)
+
+        counts = asyncio.run(_seed())
+        if not counts:
+            print(f"Workspace {seed.WORKSPACE_SLUG!r} already seeded (use --reset to rebuild).")
+        for table, count in counts.items():
+            print(f"{table:<16}{count:>10}")
+        return 0
+
+    if args.command == "chain":
+        from tests.perf import chain
+
+        results = asyncio.run(chain.run(finalizations=args.finalizations, concurrency=args.concurrency))
+        print(chain.format_table(results["results"], results["problems"]))
+        if args.output:
+            report.write(args.output, results)
+        return 1 if results["problems"] else 0
+
+    from tests.perf import runner
+
+    results = asyncio.run(runner.run(
+        scale=args.scale, requests=args.requests, concurrency=args.concurrency,
+        warmup=args.warmup, only=args.only,
+    ))
+    print(report.format_table(results["results"]))
+    if args.output:
+        report.write(args.output, results)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""Concurrent VeriFactu finalizations of one series against the chain head.
+
+Drafts are created in a scratch series of the bench workspace and finalized
+from ``concurrency`` sessions at once through
+``VeriFactuService.compute_and_set_hash`` (one transaction each, as the
+finalize endpoint does). The run fails if the records do not form a single
+chain (a fork means two finalizations read the same predecessor) and
+reports per-finalize latency. The scratch rows are deleted afterwards.
+"""
+from __future__ import annotations
+
+import asyncio
+import time
+import uuid
+from datetime import date
+from decimal import Decimal
+from typing import Dict, List
+
+from sqlalchemy import delete, insert, select
+
+from app.core.database import AsyncSessionLocal, engine
+from app.models.erp import Invoice, InvoiceChainHead
+from app.models.workspace import Workspace
+from app.services.verifactu import VeriFactuService
+from tests.perf import report
+from tests.perf.seed import WORKSPACE_SLUG
+
+
+def check_chain(rows: List[tuple]) -> List[str]:
+    """Problems of ``(hash, prev_hash)`` pairs that should form one linear chain."""
+    problems = []
+    hashes = {h for h, _ in rows}
+    prevs = [p or "" for _, p in rows]
+    if len(set(prevs)) != len(prevs):
+        problems.append(f"fork: {len(prevs) - len(set(prevs))} records share a predecessor")
+    if prevs.count("") != 1:
+        problems.append(f"{prevs.count('')} records start the chain")
+    dangling = [p for p in prevs if p and p not in hashes]
+    if dangling:
+        problems.append(f"{len(dangling)} records chain to an unknown hash")
+    return problems
+
+
+async def _finalize(invoice_id: uuid.UUID) -> float:
+    started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
+        invoice = await db.get(Invoice, invoice_id)
+        await VeriFactuService.compute_and_set_hash(db, invoice, None)
+        invoice.status = "finalized"
+        await db.commit()
+    return (time.perf_counter() - started) * 1000
+
+
+async def run(finalizations: int = 200, concurrency: int = 20) -> dict:
+    series = f"PERF{uuid.uuid4().hex[:6].upper()}"
+    async with AsyncSessionLocal() as db:
+        ws_id = await db.scalar(select(Workspace.id).where(Workspace.slug == WORKSPACE_SLUG))
+        if ws_id is None:
+            raise SystemExit("Bench workspace missing: run `python -m tests.perf seed` first.")
+        ids = [uuid.uuid4() for _ in range(finalizations)]
+        await db.execute(insert(Invoice), [
+            {
+                "id": invoice_id, "workspace_id": ws_id, "invoice_number": f"{series}-{i:05d}",
+                "invoice_series": series, "client_name": "Cliente", "issue_date": date.today(),
+                "status": "draft", "subtotal": Decimal("100"), "tax_amount": Decimal("21"),
+                "total": Decimal("121"),
+            }
+            for i, invoice_id in enumerate(ids)
+        ])
+        await db.commit()
+
+    latencies: List[float] = []
+    errors = 0
+    pending = list(ids)
+
+    async def worker() -> None:
+        nonlocal errors
+        while pending:
+            invoice_id = pending.pop()
+            try:
+                latencies.append(await _finalize(invoice_id))
+            except Exception:
+                errors += 1
+
+    try:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+        async with AsyncSessionLocal() as db:
+            rows = (await db.execute(
+                select(Invoice.verifactu_hash, Invoice.verifactu_prev_hash)
+                .where(Invoice.workspace_id == ws_id, Invoice.invoice_series == series)
+                .where(Invoice.verifactu_hash.isnot(None))
+            )).all()
+            head = await db.get(InvoiceChainHead, (ws_id, series))
+        problems = check_chain(rows)
+        if head is None or head.records != len(rows):
+            problems.append("chain head does not count every record")
+    finally:
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(InvoiceChainHead).where(
+                InvoiceChainHead.workspace_id == ws_id, InvoiceChainHead.series == series,
+            ))
+            await db.execute(delete(Invoice).where(Invoice.workspace_id == ws_id, Invoice.invoice_series == series))
+            await db.commit()
+        await engine.dispose()
+
+    summary = report.summarize(latencies, [], [], errors=errors, wall_seconds=wall)
+    return {
+        "revision": report.git_revision(), "concurrency": concurrency, "environment": report.environment(),
+        "results": {"finalize": summary}, "problems": problems,
+    }
+
+
+def format_table(results: Dict[str, dict], problems: List[str]) -> str:
+    r = results["finalize"]
+    lines = [
+        f"{'':<10}{'n':>6}{'err':>5}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}",
+        f"{'finalize':<10}{r['requests']:>6}{r['errors']:>5}{r['rps']:>8.1f}"
+        f"{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}",
+    ]
+    lines.append("chain: " + ("OK" if not problems else "; ".join(problems)))
+    return "\n".join(lines)
@@ -0,0 +1,79 @@
+"""Per-request cost of the middleware stack, measured without a database.
+
+A no-op route is mounted on the real application and on a bare FastAPI app;
+both are driven in-process and the difference is what the middlewares add to
+every request (token decode, request id, security headers, access log,
+permission check). The limiter is disabled so its counters don't throttle
+the run.
+"""
+from __future__ import annotations
+
+import time
+from typing import Dict, List
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+
+from app.core.config import settings
+from tests.perf import report
+
+PATH = settings.API_V1_PREFIX + "/_bench/ping"
+
+
+async def _ping() -> Dict[str, bool]:
+    return {"ok": True}
+
+
+async def _measure(app, headers: Dict[str, str], requests: int, warmup: int) -> List[float]:
+    samples: List[float] = []
+    async with AsyncClient(transport=ASGITransport(app=app), base_url="http://bench") as client:
+        for i in range(warmup + requests):
+            started = time.perf_counter()
+            response = await client.get(PATH, headers=headers)
+            elapsed = (time.perf_counter() - started) * 1_000_000
+            if response.status_code != 200:
+                raise SystemExit(f"{PATH} returned {response.status_code}: {response.text[:200]}")
+            if i >= warmup:
+                samples.append(elapsed)
+    return sorted(samples)
+
+
+async def run(requests: int = 5000, warmup: int = 200) -> dict:
+    from app.core.limiter import limiter
+    from app.core.security import create_access_token
+    from app.main import app
+
+    limiter.enabled = False
+    bare = FastAPI()
+    bare.add_api_route(PATH, _ping, methods=["GET"])
+    # First in the routing table of both apps, so the delta is the
+    # middlewares and not matching against the application's routes.
+    app.router.routes.insert(0, bare.router.routes[-1])
+
+    token = create_access_token(
+        "00000000-0000-0000-0000-000000000001", "owner@bench.local",
+        "00000000-0000-0000-0000-000000000002", "owner",
+    )
+    headers = {"Authorization": f"Bearer {token}"}
+
+    results = {}
+    for name, target in (("bare", bare), ("app", app)):
+        lat = await _measure(target, headers, requests, warmup)
+        results[name] = {
+            "mean_us": round(sum(lat) / len(lat), 1),
+            "p50_us": round(report.percentile(lat, 50), 1),
+            "p95_us": round(report.percentile(lat, 95), 1),
+        }
+    results["overhead_us"] = {
+        key: round(results["app"][key] - results["bare"][key], 1) for key in ("mean_us", "p50_us", "p95_us")
+    }
+    return {"revision": report.git_revision(), "requests": requests, "environment": report.environment(),
+            "results": results}
+
+
+def format_table(results: Dict[str, dict]) -> str:
+    lines = [f"{'':<14}{'mean µs':>10}{'p50 µs':>10}{'p95 µs':>10}"]
+    for name in ("bare", "app", "overhead_us"):
+        r = results[name]
+        lines.append(f"{name:<14}{r['mean_us']:>10.1f}{r['p50_us']:>10.1f}{r['p95_us']:>10.1f}")
+    return "\n".join(lines)
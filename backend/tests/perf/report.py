@@ -0,0 +1,128 @@
+"""Summaries, result files and cross-commit comparison."""
+from __future__ import annotations
+
+import json
+import math
+import platform
+import subprocess
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """Linear-interpolated percentile (``q`` in 0..100) of sorted values."""
+    if not sorted_values:
+        return 0.0
+    pos = (len(sorted_values) - 1) * q / 100.0
+    lo, hi = math.floor(pos), math.ceil(pos)
+    if lo == hi:
+        return float(sorted_values[lo])
+    return sorted_values[lo] + (sorted_values[hi] - sorted_values[lo]) * (pos - lo)
+
+
+def summarize(
+    latencies_ms: List[float],
+    queries: List[int],
+    db_ms: List[float],
+    *,
+    errors: int,
+    wall_seconds: float,
+    cold_ms: Optional[float] = None,
+) -> dict:
+    """Stats of one endpoint run. ``queries``/``db_ms`` may be empty (remote)."""
+    lat = sorted(latencies_ms)
+    summary = {
+        "requests": len(lat),
+        "errors": errors,
+        "rps": round(len(lat) / wall_seconds, 1) if wall_seconds else 0.0,
+        "cold_ms": round(cold_ms, 2) if cold_ms is not None else None,
+        "mean_ms": round(sum(lat) / len(lat), 2) if lat else 0.0,
+        "p50_ms": round(percentile(lat, 50), 2),
+        "p95_ms": round(percentile(lat, 95), 2),
+        "p99_ms": round(percentile(lat, 99), 2),
+        "max_ms": round(lat[-1], 2) if lat else 0.0,
+        "queries_mean": None,
+        "queries_max": None,
+        "db_ms_mean": None,
+    }
+    if queries:
+        summary["queries_mean"] = round(sum(queries) / len(queries), 2)
+        summary["queries_max"] = max(queries)
+        summary["db_ms_mean"] = round(sum(db_ms) / len(db_ms), 2)
+    return summary
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def environment() -> dict:
+    return {"python": platform.python_version(), "machine": platform.machine(), "system": platform.system()}
+
+
+def write(path: str, payload: dict) -> None:
+    target = Path(path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    target.write_text(json.dumps(payload, indent=2, sort_keys=True), encoding="utf-8")
+
+
+def load(path: str) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def format_table(results: Dict[str, dict]) -> str:
+    header = f"{'endpoint':<28}{'p50':>9}{'p95':>9}{'p99':>9}{'rps':>8}{'q/req':>8}{'db ms':>8}{'err':>5}"
+    lines = [header, "-" * len(header)]
+    for name, r in results.items():
+        q = "-" if r["queries_mean"] is None else f"{r['queries_mean']:g}"
+        db = "-" if r["db_ms_mean"] is None else f"{r['db_ms_mean']:.1f}"
+        lines.append(
+            f"{name:<28}{r['p50_ms']:>9.1f}{r['p95_ms']:>9.1f}{r['p99_ms']:>9.1f}"
+            f"{r['rps']:>8.0f}{q:>8}{db:>8}{r['errors']:>5}"
+        )
+    return "\n".join(lines)
+
+
+def compare(
+    base: dict,
+    head: dict,
+    *,
+    max_latency_regression: float = 0.20,
+    min_latency_delta_ms: float = 2.0,
+) -> Tuple[List[str], List[str]]:
+    """Compare two result files. Returns (report lines, regressions).
+
+    An endpoint regresses when its p95 grows by more than
+    ``max_latency_regression`` (and by at least ``min_latency_delta_ms``, so
+    sub-millisecond noise does not fail a run), when it issues more SQL
+    statements per request, or when it starts returning errors.
+    """
+    lines, regressions = [], []
+    lines.append(f"{'endpoint':<28}{'p95 base':>10}{'p95 head':>10}{'delta':>9}{'q base':>8}{'q head':>8}")
+    base_results, head_results = base.get("results", {}), head.get("results", {})
+    for name, h in head_results.items():
+        b = base_results.get(name)
+        if b is None:
+            lines.append(f"{name:<28}{'-':>10}{h['p95_ms']:>10.1f}{'new':>9}")
+            continue
+        delta = (h["p95_ms"] - b["p95_ms"]) / b["p95_ms"] if b["p95_ms"] else 0.0
+        qb, qh = b.get("queries_mean"), h.get("queries_mean")
+        lines.append(
+            f"{name:<28}{b['p95_ms']:>10.1f}{h['p95_ms']:>10.1f}{delta:>+9.0%}"
+            f"{'-' if qb is None else f'{qb:g}':>8}{'-' if qh is None else f'{qh:g}':>8}"
+        )
+        if delta > max_latency_regression and h["p95_ms"] - b["p95_ms"] >= min_latency_delta_ms:
+            regressions.append(f"{name}: p95 {b['p95_ms']:.1f} -> {h['p95_ms']:.1f} ms ({delta:+.0%})")
+        if qb is not None and qh is not None and qh > qb:
+            regressions.append(f"{name}: queries/request {qb:g} -> {qh:g}")
+        if h["errors"] > b["errors"]:
+            regressions.append(f"{name}: errors {b['errors']} -> {h['errors']}")
+    for key in ("scale", "concurrency"):
+        if base.get(key) != head.get(key):
+            lines.append(f"warning: {key} differs ({base.get(key)} vs {head.get(key)}), results are not comparable")
+    return lines, regressions
@@ -0,0 +1,156 @@
+"""Drive the hot endpoints in-process and measure latency and SQL per request."""
+from __future__ import annotations
+
+import asyncio
+import time
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine, install_query_stats, track_queries
+from app.core.limiter import limiter
+from app.core.security import create_access_token
+from app.main import app
+from app.models.user import RoleType, User
+from app.models.workspace import Workspace
+from tests.perf import report
+from tests.perf.seed import CLIENT_EMAIL, OWNER_EMAIL, WORKSPACE_SLUG
+
+
+@dataclass(frozen=True)
+class Endpoint:
+    name: str
+    path: str
+    as_client: bool = False
+
+
+def default_endpoints(today: Optional[date] = None) -> Tuple[Endpoint, ...]:
+    today = today or date.today()
+    year_ago = today - timedelta(days=365)
+    return (
+        Endpoint("my_dashboard", "/my/dashboard", as_client=True),
+        Endpoint("my_dashboard_strong", "/my/dashboard?consistency=strong", as_client=True),
+        Endpoint("clients", "/clients?page=1&page_size=20"),
+        Endpoint("clients_search", "/clients?page=1&page_size=20&search=mart"),
+        Endpoint("foods", "/nutrition/foods?page=1&page_size=50"),
+        Endpoint("foods_search", "/nutrition/foods?page=1&page_size=50&search=platano"),
+        Endpoint("foods_search_brand", "/nutrition/foods?page=1&page_size=50&search=hacendado%20integral"),
+        Endpoint("foods_search_typo", "/nutrition/foods?page=1&page_size=50&search=platno"),
+        Endpoint("foods_deep_page", "/nutrition/foods?page=200&page_size=50"),
+        Endpoint("my_foods_search", "/my/nutrition/foods?page=1&page_size=30&search=yogur", as_client=True),
+        Endpoint("exercises", "/workouts/exercises"),
+        Endpoint("exercises_search", "/workouts/exercises?search=press"),
+        Endpoint("exercise_library", "/exercises/?page=1&page_size=50&muscle_groups=espalda,b%C3%ADceps"),
+        Endpoint("foods_system", "/nutrition/foods?page=1&page_size=50&source=system"),
+        Endpoint("my_exercises", "/my/exercises?search=remo", as_client=True),
+        Endpoint("conversations", "/messages/conversations"),
+        Endpoint("invoice_stats", f"/erp/invoice-stats?from_date={year_ago}&to_date={today}"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# Run
+# ---------------------------------------------------------------------------
+
+async def _auth_headers() -> Dict[str, Dict[str, str]]:
+    async with AsyncSessionLocal() as session:
+        ws_id = await session.scalar(select(Workspace.id).where(Workspace.slug == WORKSPACE_SLUG))
+        users = dict((await session.execute(
+            select(User.email, User.id).where(User.email.in_([OWNER_EMAIL, CLIENT_EMAIL]))
+        )).all())
+    if ws_id is None or len(users) != 2:
+        raise SystemExit("Benchmark data not found: run `python -m tests.perf seed` first.")
+
+    def headers(email: str, role: RoleType) -> Dict[str, str]:
+        token = create_access_token(str(users[email]), email, str(ws_id), role.value)
+        return {"Authorization": f"Bearer {token}", "X-Workspace-ID": str(ws_id)}
+
+    return {"owner": headers(OWNER_EMAIL, RoleType.owner), "client": headers(CLIENT_EMAIL, RoleType.client)}
+
+
+async def _timed(client: AsyncClient, path: str, headers: Dict[str, str]) -> Tuple[float, int, float, bool]:
+    with track_queries() as stats:
+        started = time.perf_counter()
+        try:
+            response = await client.get(path, headers=headers)
+            ok = response.status_code < 400
+        except Exception:
+            ok = False
+    return (time.perf_counter() - started) * 1000, stats.statements, stats.db_ms, ok
+
+
+async def run_endpoint(
+    client: AsyncClient,
+    endpoint: Endpoint,
+    headers: Dict[str, str],
+    *,
+    requests: int,
+    concurrency: int,
+    warmup: int,
+) -> dict:
+    """First (cold) request, warm-up, then ``requests`` over ``concurrency`` workers."""
+    path = settings.API_V1_PREFIX + endpoint.path
+    cold_ms, _, _, _ = await _timed(client, path, headers)
+    for _ in range(warmup):
+        await _timed(client, path, headers)
+
+    latencies: List[float] = []
+    queries: List[int] = []
+    db_ms: List[float] = []
+    errors = 0
+    pending = iter(range(requests))
+
+    async def worker() -> None:
+        nonlocal errors
+        for _ in pending:
+            ms, q, db, ok = await _timed(client, path, headers)
+            latencies.append(ms)
+            queries.append(q)
+            db_ms.append(db)
+            errors += not ok
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return report.summarize(latencies, queries, db_ms, errors=errors, wall_seconds=wall, cold_ms=cold_ms)
+
+
+async def run(
+    *,
+    scale: str,
+    requests: int = 300,
+    concurrency: int = 10,
+    warmup: int = 20,
+    only: Optional[Sequence[str]] = None,
+) -> dict:
+    # Measure the handlers, not the limiter's per-user budget.
+    limiter.enabled = False
+    # Same hooks as the access log, on even if DB_QUERY_STATS_ENABLED is off.
+    install_query_stats()
+    auth = await _auth_headers()
+    selected = [e for e in default_endpoints() if not only or e.name in only]
+
+    results: Dict[str, dict] = {}
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://bench") as client:
+        for endpoint in selected:
+            headers = auth["client" if endpoint.as_client else "owner"]
+            results[endpoint.name] = await run_endpoint(
+                client, endpoint, headers, requests=requests, concurrency=concurrency, warmup=warmup,
+            )
+    await engine.dispose()
+
+    return {
+        "revision": report.git_revision(),
+        "scale": scale,
+        "requests": requests,
+        "concurrency": concurrency,
+        "warmup": warmup,
+        "pool_size": settings.DATABASE_POOL_SIZE,
+        "environment": report.environment(),
+        "results": results,
+    }
@@ -0,0 +1,469 @@
+"""Deterministic benchmark dataset.
+
+One workspace (slug ``bench-perf``) owned by ``owner@bench.local``. The first
+client is linked to ``client@bench.local`` and carries the full history the
+client dashboard reads (active plan and program, bookings, workout logs,
+measurements, adherence logs). Volumes come from :data:`SCALES`; every id
+and value is drawn from a seeded generator.
+"""
+from __future__ import annotations
+
+import random
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Dict, Iterable, List
+
+from sqlalchemy import Enum as SAEnum, insert, select, text
+from sqlalchemy.engine import make_url
+
+from app.core.database import AsyncSessionLocal, Base, engine
+from app.core.security import get_password_hash
+# Importing any app.models module runs app/models/__init__.py, which
+# registers every table for create_all.
+from app.models.booking import Booking, BookingStatus
+from app.models.client import Client
+from app.models.erp import Invoice
+from app.models.exercise import ClientMeasurement, Exercise
+from app.models.message import Conversation, Message
+from app.models.nutrition import Food, MealPlan, NutritionLog
+from app.models.user import RoleType, User, UserRole
+from app.models.workout import WorkoutLog, WorkoutProgram
+from app.models.workspace import Workspace
+from app.services import meal_plan_macros, nutrition_logs
+
+WORKSPACE_SLUG = "bench-perf"
+OWNER_EMAIL = "owner@bench.local"
+CLIENT_EMAIL = "client@bench.local"
+PASSWORD = "bench-password"
+
+_LOCAL_HOSTS = {"localhost", "127.0.0.1", "::1", "postgres", "db"}
+_CHUNK = 2000
+
+
+@dataclass(frozen=True)
+class Scale:
+    clients: int
+    foods: int
+    exercises: int
+    conversations: int
+    messages_per_conversation: int
+    # Days of adherence history, for the bench client and ``logged_clients``
+    # others.
+    history_days: int
+    logged_clients: int
+    invoices: int
+
+
+SCALES: Dict[str, Scale] = {
+    "small": Scale(
+        clients=300, foods=2_000, exercises=400, conversations=100, messages_per_conversation=20,
+        history_days=180, logged_clients=10, invoices=3_000,
+    ),
+    "medium": Scale(
+        clients=3_000, foods=20_000, exercises=1_500, conversations=1_000, messages_per_conversation=30,
+        history_days=730, logged_clients=50, invoices=30_000,
+    ),
+    "large": Scale(
+        clients=10_000, foods=100_000, exercises=3_000, conversations=4_000, messages_per_conversation=40,
+        history_days=1_095, logged_clients=200, invoices=120_000,
+    ),
+}
+
+_FIRST_NAMES = (
+    "María", "Lucía", "Martina", "Paula", "Sofía", "Julia", "Carmen", "Ana", "Elena", "Marta",
+    "Hugo", "Mateo", "Martín", "Lucas", "Pablo", "Daniel", "Álvaro", "Javier", "Sergio", "Íñigo",
+)
+_LAST_NAMES = (
+    "García", "Fernández", "González", "Rodríguez", "López", "Martínez", "Sánchez", "Pérez",
+    "Gómez", "Martín", "Jiménez", "Ruiz", "Hernández", "Díaz", "Moreno", "Muñoz", "Álvarez", "Romero",
+)
+_FOOD_BASES = (
+    ("Pechuga de pollo", "Carnes", 110, 23.0, 0.0, 1.5),
+    ("Arroz", "Cereales", 350, 7.0, 77.0, 0.6),
+    ("Plátano", "Frutas", 89, 1.1, 23.0, 0.3),
+    ("Jamón serrano", "Embutidos", 241, 31.0, 0.0, 13.0),
+    ("Yogur natural", "Lácteos", 61, 3.5, 4.7, 3.3),
+    ("Salmón", "Pescados", 208, 20.0, 0.0, 13.0),
+    ("Avena", "Cereales", 389, 16.9, 66.0, 6.9),
+    ("Huevo", "Huevos", 155, 13.0, 1.1, 11.0),
+    ("Lentejas", "Legumbres", 116, 9.0, 20.0, 0.4),
+    ("Aceite de oliva", "Grasas", 884, 0.0, 0.0, 100.0),
+    ("Atún", "Pescados", 132, 28.0, 0.0, 1.3),
+    ("Pan", "Panadería", 265, 9.0, 49.0, 3.2),
+    ("Queso fresco", "Lácteos", 174, 12.0, 3.0, 13.0),
+    ("Manzana", "Frutas", 52, 0.3, 14.0, 0.2),
+    ("Garbanzos", "Legumbres", 164, 8.9, 27.0, 2.6),
+    ("Almendras", "Frutos secos", 579, 21.0, 22.0, 50.0),
+)
+_FOOD_QUALIFIERS = (
+    "", "integral", "light", "ecológico", "en conserva", "a la plancha", "cocido",
+    "natural", "sin lactosa", "bajo en sal", "con piel", "desnatado",
+)
+_BRANDS = ("Hacendado", "Carrefour", "Eroski", "Dia", "Consum", "Pascual", "Central Lechera", None)
+_EXERCISES = (
+    ("Press", ("pecho", "tríceps"), ("barra",)),
+    ("Sentadilla", ("cuádriceps", "glúteos"), ("barra",)),
+    ("Peso muerto", ("isquiotibiales", "espalda"), ("barra",)),
+    ("Remo", ("espalda", "bíceps"), ("mancuernas",)),
+    ("Zancada", ("cuádriceps", "glúteos"), ("mancuernas",)),
+    ("Curl", ("bíceps",), ("mancuernas",)),
+    ("Dominada", ("espalda", "bíceps"), ("barra fija",)),
+    ("Plancha", ("core",), ("peso corporal",)),
+    ("Elevación lateral", ("hombros",), ("mancuernas",)),
+    ("Hip thrust", ("glúteos",), ("barra", "banco")),
+)
+_EXERCISE_VARIANTS = ("", "inclinado", "declinado", "con pausa", "unilateral", "en máquina", "con banda", "en polea")
+_MEALS = ("Desayuno", "Almuerzo", "Comida", "Merienda", "Cena")
+_INVOICE_STATUSES = ("paid", "paid", "paid", "sent", "finalized", "overdue", "draft", "cancelled")
+
+
+def check_local(url: str, allow_remote: bool = False) -> None:
+    """Refuse to touch anything but a local scratch database."""
+    host = make_url(url).host or "localhost"
+    if host not in _LOCAL_HOSTS and not allow_remote:
+        raise SystemExit(
+            f"Refusing to seed {host!r}: benchmarks run against a local scratch database "
+            "(pass --allow-remote to override)."
+        )
+
+
+def _uuid(rng: random.Random) -> uuid.UUID:
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+
+def _chunks(rows: List[dict], size: int = _CHUNK) -> Iterable[List[dict]]:
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+async def _insert(session, model, rows: List[dict]) -> None:
+    for chunk in _chunks(rows):
+        await session.execute(insert(model), chunk)
+
+
+# ---------------------------------------------------------------------------
+# Schema
+# ---------------------------------------------------------------------------
+
+async def prepare_schema(reset: bool = False) -> None:
+    """Extensions, enum types and tables, as the Supabase schema has them."""
+    async with engine.begin() as conn:
+        if reset:
+            await conn.execute(text("DROP SCHEMA IF EXISTS public CASCADE"))
+            await conn.execute(text("CREATE SCHEMA public"))
+        await conn.execute(text("CREATE SCHEMA IF NOT EXISTS extensions"))
+        for ext in ("unaccent", "pg_trgm", "btree_gist"):
+            await conn.execute(text(f'CREATE EXTENSION IF NOT EXISTS "{ext}" WITH SCHEMA extensions'))
+        if await conn.scalar(text("SELECT 1 FROM pg_available_extensions WHERE name = 'uuid-ossp'")):
+            await conn.execute(text('CREATE EXTENSION IF NOT EXISTS "uuid-ossp" WITH SCHEMA extensions'))
+        else:
+            # Builds without contrib's uuid support: the models only need
+            # uuid_generate_v4(), which gen_random_uuid() (core since 13) covers.
+            await conn.execute(text(
+                "CREATE OR REPLACE FUNCTION extensions.uuid_generate_v4() RETURNS uuid "
+                "LANGUAGE sql VOLATILE AS 'SELECT gen_random_uuid()'"
+            ))
+        await conn.execute(text(
+            "DO $$ BEGIN EXECUTE format('ALTER DATABASE %I SET search_path TO public, extensions', "
+            "current_database()); END $$"
+        ))
+        await conn.execute(text("SET search_path TO public, extensions"))
+
+        # The models declare their enums with create_type=False (Supabase
+        # created them), so create_all would not.
+        enums = {}
+        for table in Base.metadata.tables.values():
+            for column in table.columns:
+                if isinstance(column.type, SAEnum) and column.type.name:
+                    enums.setdefault(column.type.name, column.type)
+        for enum_type in enums.values():
+            await conn.run_sync(lambda sync_conn, t=enum_type: t.create(sync_conn, checkfirst=True))
+
+        await conn.run_sync(Base.metadata.create_all)
+
+
+# ---------------------------------------------------------------------------
+# Data
+# ---------------------------------------------------------------------------
+
+def _meal_plan_template(rng: random.Random, foods: List[dict]) -> dict:
+    days = []
+    for day in range(1, 8):
+        meals = []
+        for meal_name in _MEALS:
+            items = []
+            for food in rng.sample(foods, 3):
+                items.append({
+                    "type": "food",
+                    "food_id": str(food["id"]),
+                    "quantity_grams": rng.choice((50, 80, 100, 120, 150, 200)),
+                    "food": {
+                        "id": str(food["id"]),
+                        "name": food["name"],
+                        "serving_size": 100,
+                        "calories": float(food["calories"]),
+                        "protein": float(food["protein_g"]),
+                        "carbs": float(food["carbs_g"]),
+                        "fat": float(food["fat_g"]),
+                    },
+                })
+            meals.append({"name": meal_name, "items": items})
+        days.append({"day": day, "dayName": "", "meals": meals})
+    return {"weeks": [{"week": 1, "days": days}]}
+
+
+def _logged_foods(rng: random.Random, plan_ref: dict) -> List[dict]:
+    foods = []
+    for food in plan_ref["foods"]:
+        factor = rng.choice((0.8, 1.0, 1.0, 1.0, 1.2))
+        foods.append({
+            "name": food["name"] if rng.random() > 0.1 else "Sustituto",
+            "quantity": round(food["quantity"] * factor),
+            "calories": round(food["calories"] * factor),
+            "protein": round(food["protein"] * factor, 1),
+            "carbs": round(food["carbs"] * factor, 1),
+            "fat": round(food["fat"] * factor, 1),
+        })
+    return foods
+
+
+async def seed(scale: Scale, seed_value: int = 42) -> Dict[str, int]:
+    """Load the dataset (skipped if the bench workspace already exists)."""
+    rng = random.Random(seed_value)
+    now = datetime.now(timezone.utc)
+    today = now.date()
+    counts: Dict[str, int] = {}
+
+    async with AsyncSessionLocal() as session:
+        existing = await session.scalar(select(Workspace.id).where(Workspace.slug == WORKSPACE_SLUG))
+        if existing is not None:
+            return counts
+
+        ws_id, owner_id, client_user_id = _uuid(rng), _uuid(rng), _uuid(rng)
+        password_hash = get_password_hash(PASSWORD)
+        await _insert(session, Workspace, [{"id": ws_id, "name": "Bench Perf", "slug": WORKSPACE_SLUG}])
+        await _insert(session, User, [
+            {"id": owner_id, "email": OWNER_EMAIL, "full_name": "Bench Owner",
+             "password_hash": password_hash, "is_active": True, "email_verified": True},
+            {"id": client_user_id, "email": CLIENT_EMAIL, "full_name": "Bench Client",
+             "password_hash": password_hash, "is_active": True, "email_verified": True},
+        ])
+        await _insert(session, UserRole, [
+            {"id": _uuid(rng), "user_id": owner_id, "workspace_id": ws_id, "role": RoleType.owner, "is_default": True},
+            {"id": _uuid(rng), "user_id": client_user_id, "workspace_id": ws_id, "role": RoleType.client, "is_default": True},
+        ])
+
+        # Clients
+        clients = []
+        for i in range(scale.clients):
+            first, last = rng.choice(_FIRST_NAMES), f"{rng.choice(_LAST_NAMES)} {rng.choice(_LAST_NAMES)}"
+            clients.append({
+                "id": _uuid(rng),
+                "workspace_id": ws_id,
+                "created_by": owner_id,
+                "user_id": client_user_id if i == 0 else None,
+                "first_name": first,
+                "last_name": last,
+                "email": f"cliente{i}@bench.local",
+                "phone": f"+346{rng.randrange(10**7, 10**8)}",
+                "is_active": rng.random() > 0.1,
+                "chat_enabled": True,
+                "created_at": now - timedelta(days=rng.randrange(1, 3 * 365)),
+            })
+        await _insert(session, Client, clients)
+        counts["clients"] = len(clients)
+        client_ids = [c["id"] for c in clients]
+
+        # Catalogs: half global, half workspace-owned.
+        foods = []
+        for i in range(scale.foods):
+            name, category, kcal, prot, carbs, fat = rng.choice(_FOOD_BASES)
+            qualifier = rng.choice(_FOOD_QUALIFIERS)
+            foods.append({
+                "id": _uuid(rng),
+                "workspace_id": None if i % 2 == 0 else ws_id,
+                "is_global": i % 2 == 0,
+                "name": f"{name} {qualifier}".strip() + f" #{i}",
+                "brand": rng.choice(_BRANDS),
+                "category": category,
+                "serving_size": Decimal(100),
+                "calories": Decimal(str(round(kcal * rng.uniform(0.9, 1.1)))),
+                "protein_g": Decimal(str(round(prot * rng.uniform(0.9, 1.1), 1))),
+                "carbs_g": Decimal(str(round(carbs * rng.uniform(0.9, 1.1), 1))),
+                "fat_g": Decimal(str(round(fat * rng.uniform(0.9, 1.1), 1))),
+                "data_source": "bench",
+            })
+        await _insert(session, Food, foods)
+        counts["foods"] = len(foods)
+
+        exercises = []
+        for i in range(scale.exercises):
+            name, muscles, equipment = rng.choice(_EXERCISES)
+            variant = rng.choice(_EXERCISE_VARIANTS)
+            exercises.append({
+                "id": _uuid(rng),
+                "workspace_id": None if i % 3 else ws_id,
+                "is_global": bool(i % 3),
+                "name": f"{name} {variant}".strip() + f" #{i}",
+                "muscle_groups": list(muscles),
+                "equipment": list(equipment),
+                "category": "fuerza",
+                "difficulty": rng.choice(("beginner", "intermediate", "advanced")),
+            })
+        await _insert(session, Exercise, exercises)
+        counts["exercises"] = len(exercises)
+
+        # Conversations and messages
+        conversations, messages = [], []
+        for client_id in client_ids[: scale.conversations]:
+            conv_id = _uuid(rng)
+            last_at = now - timedelta(minutes=rng.randrange(1, 60 * 24 * 90))
+            conversations.append({
+                "id": conv_id,
+                "workspace_id": ws_id,
+                "client_id": client_id,
+                "name": "Chat",
+                "conversation_type": "direct",
+                "participant_ids": [owner_id],
+                "preferred_channel": "platform",
+                "last_message_at": last_at,
+                "last_message_preview": "Último mensaje",
+                "last_message_source": "platform",
+                "unread_count": rng.choice((0, 0, 0, 1, 2, 5)),
+                "scope": "client",
+                "is_archived": False,
+            })
+            for m in range(scale.messages_per_conversation):
+                outbound = rng.random() < 0.5
+                messages.append({
+                    "id": _uuid(rng),
+                    "conversation_id": conv_id,
+                    "sender_id": owner_id if outbound else None,
+                    "source": "platform",
+                    "direction": "outbound" if outbound else "inbound",
+                    "message_type": "text",
+                    "content": f"Mensaje {m} de la conversación",
+                    "external_status": "sent",
+                    "read_by": [owner_id],
+                    "is_sent": True,
+                    "is_deleted": False,
+                    "created_at": last_at - timedelta(hours=scale.messages_per_conversation - m),
+                })
+        await _insert(session, Conversation, conversations)
+        await _insert(session, Message, messages)
+        counts["conversations"], counts["messages"] = len(conversations), len(messages)
+
+        # Plans and programs of the clients with history
+        logged = client_ids[: max(1, scale.logged_clients)]
+        history_start = today - timedelta(days=scale.history_days)
+        plans, programs = {}, {}
+        plan_rows, program_rows = [], []
+        for client_id in logged:
+            template = _meal_plan_template(rng, foods)
+            plan_id = _uuid(rng)
+            plans[client_id] = (plan_id, template)
+            plan_rows.append({
+                "id": plan_id, "workspace_id": ws_id, "client_id": client_id, "created_by": owner_id,
+                "name": "Plan de mantenimiento", "plan": template, "is_template": False, "is_active": True,
+                "start_date": history_start, "target_calories": Decimal(2200), "target_protein": Decimal(140),
+                "target_carbs": Decimal(250), "target_fat": Decimal(70),
+            })
+            program_id = _uuid(rng)
+            programs[client_id] = program_id
+            program_rows.append({
+                "id": program_id, "workspace_id": ws_id, "client_id": client_id, "created_by": owner_id,
+                "name": "Fuerza 4 días", "is_template": False, "is_active": True, "start_date": history_start,
+                "template": {"weeks": [{"week": 1, "days": [
+                    {"day": d, "exercises": [{"exercise_id": str(e["id"]), "name": e["name"], "sets": 4, "reps": "8-10"}
+                                             for e in rng.sample(exercises, 5)]}
+                    for d in (1, 2, 4, 5)
+                ]}]},
+            })
+        await _insert(session, MealPlan, plan_rows)
+        await _insert(session, WorkoutProgram, program_rows)
+
+        # Adherence history: meal logs on ~85% of days, workouts 4 days a week.
+        log_rows, workout_rows, measurement_rows = [], [], []
+        log_days: Dict[uuid.UUID, set] = {}
+        for client_id in logged:
+            plan_id, template = plans[client_id]
+            compiled = meal_plan_macros.compile_plan(template)
+            days = log_days.setdefault(client_id, set())
+            for offset in range(scale.history_days + 1):
+                day = history_start + timedelta(days=offset)
+                if rng.random() < 0.85:
+                    for meal_name in _MEALS:
+                        if rng.random() < 0.2:
+                            continue
+                        plan_ref = compiled.reference(meal_name, day, history_start, 1)
+                        logged_foods = _logged_foods(rng, plan_ref)
+                        log_rows.append({
+                            "id": _uuid(rng), "workspace_id": ws_id, "client_id": client_id,
+                            "meal_plan_id": plan_id, "log_date": day, "meal_name": meal_name,
+                            "foods": logged_foods, "logged_at": datetime.combine(day, time(13), timezone.utc),
+                            "plan_reference": plan_ref,
+                            "has_modifications": meal_plan_macros.has_modifications(logged_foods, plan_ref),
+                            **nutrition_logs.compute_totals(logged_foods),
+                        })
+                        days.add(day)
+                if day.isoweekday() in (1, 2, 4, 5) and rng.random() < 0.8:
+                    workout_rows.append({
+                        "id": _uuid(rng), "program_id": programs[client_id], "client_id": client_id,
+                        "log": {"date": day.isoformat(), "week": 1, "day": day.isoweekday(), "exercises": [],
+                                "duration_minutes": rng.randrange(40, 80), "perceived_effort": rng.randrange(5, 10)},
+                        "created_at": datetime.combine(day, time(19), timezone.utc),
+                    })
+                if offset % 14 == 0:
+                    measurement_rows.append({
+                        "id": _uuid(rng), "client_id": client_id,
+                        "measured_at": datetime.combine(day, time(8), timezone.utc),
+                        "weight_kg": Decimal(str(round(rng.uniform(60, 90), 1))),
+                        "body_fat_percentage": Decimal(str(round(rng.uniform(12, 30), 1))),
+                    })
+        await _insert(session, NutritionLog, log_rows)
+        await _insert(session, WorkoutLog, workout_rows)
+        await _insert(session, ClientMeasurement, measurement_rows)
+        for client_id, days in log_days.items():
+            await nutrition_logs.refresh_days(session, client_id, days)
+        counts["nutrition_logs"], counts["workout_logs"] = len(log_rows), len(workout_rows)
+
+        # Bookings: past and upcoming for every client with history.
+        booking_rows = []
+        for client_id in logged:
+            for offset in range(-60, 30, 3):
+                start = datetime.combine(today + timedelta(days=offset), time(rng.randrange(8, 20)), timezone.utc)
+                booking_rows.append({
+                    "id": _uuid(rng), "workspace_id": ws_id, "organizer_id": owner_id, "client_id": client_id,
+                    "title": "Sesión individual", "start_time": start, "end_time": start + timedelta(hours=1),
+                    "status": BookingStatus.completed if offset < 0 else BookingStatus.confirmed,
+                })
+        await _insert(session, Booking, booking_rows)
+        counts["bookings"] = len(booking_rows)
+
+        # Invoices spread over the history window.
+        invoice_rows = []
+        span = max(scale.history_days, 365)
+        numbers: Dict[int, int] = {}
+        for _ in range(scale.invoices):
+            issue = today - timedelta(days=rng.randrange(span))
+            numbers[issue.year] = numbers.get(issue.year, 0) + 1
+            subtotal = Decimal(rng.choice((30, 45, 60, 90, 120, 240)))
+            tax = (subtotal * Decimal("0.21")).quantize(Decimal("0.01"))
+            client_id = rng.choice(client_ids)
+            invoice_rows.append({
+                "id": _uuid(rng), "workspace_id": ws_id, "client_id": client_id,
+                "invoice_number": f"F{issue.year}-{numbers[issue.year]:05d}", "invoice_series": "F",
+                "client_name": "Cliente", "issue_date": issue, "due_date": issue + timedelta(days=30),
+                "status": rng.choice(_INVOICE_STATUSES), "subtotal": subtotal, "tax_amount": tax,
+                "total": subtotal + tax,
+            })
+        await _insert(session, Invoice, invoice_rows)
+        counts["invoices"] = len(invoice_rows)
+
+        await session.commit()
+
+    async with engine.begin() as conn:
+        await conn.execute(text("ANALYZE"))
+    return counts
@@ -0,0 +1,110 @@
+"""Unit tests for the pooled AEAT mTLS clients."""
+import ssl
+from types import SimpleNamespace
+from uuid import uuid4
+
+import httpx
+
+from app.core.config import settings
+from app.services import aeat_pool
+from app.services.verifactu import AEATSoapClient
+
+_URL = "https://prewww1.aeat.es/wlpl/TIKE-CONT/ws/SistemaFacturacion/VerifactuSOAP"
+
+
+def _settings(workspace_id=None, iv=b"iv-1"):
+    return SimpleNamespace(
+        workspace_id=workspace_id or uuid4(), verifactu_mode="direct_aeat_test",
+        certificate_pem="-----BEGIN CERTIFICATE-----", certificate_key_encrypted=b"key",
+        certificate_key_iv=iv, certificate_serial_number="01AB",
+    )
+
+
+def _count_builds(monkeypatch):
+    builds = []
+
+    def fake_context(cert_pem, encrypted_key, key_iv, workspace_id):
+        builds.append(workspace_id)
+        return ssl.create_default_context()
+
+    monkeypatch.setattr(aeat_pool, "ssl_context", fake_context)
+    return builds
+
+
+class TestAEATClientPool:
+    """Tests for client reuse, rebuilds and eviction."""
+
+    async def test_client_is_reused_per_workspace(self, monkeypatch):
+        """Test the key is decrypted once and later sends share the client."""
+        builds = _count_builds(monkeypatch)
+        pool = aeat_pool.AEATClientPool()
+        inv_settings = _settings()
+
+        first = await pool.client_for(inv_settings, _URL)
+        assert await pool.client_for(inv_settings, _URL) is first
+        assert await pool.client_for(_settings(), _URL) is not first
+        assert len(builds) == 2 and len(pool) == 2
+        await pool.close()
+        assert first.is_closed and len(pool) == 0
+
+    async def test_new_certificate_or_ttl_rebuilds(self, monkeypatch):
+        """Test an uploaded certificate or an expired client builds a new one."""
+        builds = _count_builds(monkeypatch)
+        pool = aeat_pool.AEATClientPool()
+        workspace_id = uuid4()
+
+        old = await pool.client_for(_settings(workspace_id), _URL)
+        monkeypatch.setattr(settings, "AEAT_CLIENT_TTL_SECONDS", 0)
+        renewed = await pool.client_for(_settings(workspace_id, iv=b"iv-2"), _URL)
+        assert renewed is not old and old.is_closed
+
+        expired = await pool.client_for(_settings(workspace_id, iv=b"iv-2"), _URL)
+        assert expired is not renewed and len(builds) == 3
+        await pool.close()
+
+    async def test_evict_and_size_bound(self, monkeypatch):
+        """Test revocation closes the workspace's clients and the LRU stays bounded."""
+        _count_builds(monkeypatch)
+        monkeypatch.setattr(settings, "AEAT_CLIENT_POOL_SIZE", 2)
+        pool = aeat_pool.AEATClientPool()
+        revoked = _settings()
+
+        client = await pool.client_for(revoked, _URL)
+        assert await pool.evict(revoked.workspace_id) == 1 and client.is_closed
+
+        clients = [await pool.client_for(_settings(), _URL) for _ in range(3)]
+        assert len(pool) == 2 and clients[0].is_closed and not clients[2].is_closed
+        await pool.close()
+
+    async def test_send_xml_maps_http_errors(self, monkeypatch):
+        """Test AEAT answers and transport failures keep the send_xml contract."""
+        answers = iter([
+            httpx.Response(200, text="<ok/>"),
+            httpx.Response(503, text="caido"),
+        ])
+
+        def handler(request):
+            try:
+                return next(answers)
+            except StopIteration:
+                raise httpx.ConnectTimeout("timed out", request=request)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+        async def fake_client_for(inv_settings, url):
+            return client
+
+        monkeypatch.setattr(aeat_pool, "client_for", fake_client_for)
+        soap = AEATSoapClient(_settings())
+
+        assert await soap.send_xml("<x/>") == {"status": 200, "response": "<ok/>", "error": None}
+        assert await soap.send_xml("<x/>") == {
+            "status": 503, "error": "HTTP 503: Service Unavailable", "response": "caido",
+        }
+        failed = await soap.send_xml("<x/>")
+        assert failed["status"] == 0 and "timed out" in failed["error"]
+
+        no_cert = AEATSoapClient(_settings())
+        no_cert.settings.certificate_pem = None
+        assert "Certificado digital no configurado" in (await no_cert.send_xml("<x/>"))["error"]
+        await client.aclose()
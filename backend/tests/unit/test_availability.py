@@ -0,0 +1,138 @@
+"""Unit tests for the interval-based availability engine."""
+import uuid
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core import ttl_cache
+from app.models.booking import Booking
+from app.services import availability
+from app.services.availability import (
+    BusyIndex,
+    WorkspaceAvailability,
+    free_slots,
+    merge,
+    opening_windows,
+    saturated,
+)
+
+MONDAY = date(2026, 10, 19)
+SCHEDULE = {
+    "monday": [{"start": "09:00", "end": "12:00"}, {"start": "16:00", "end": "18:00"}],
+    "tuesday": [{"start": "10:00", "end": "12:00"}],
+}
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    ttl_cache._CACHE.clear()
+    yield
+    ttl_cache._CACHE.clear()
+
+
+class _FakeDB:
+    def __init__(self, workspace):
+        self.workspace = workspace
+
+    async def get(self, model, ident):
+        return self.workspace
+
+
+def _at(day, hhmm):
+    hours, minutes = map(int, hhmm.split(":"))
+    return datetime.combine(day, datetime.min.time()).replace(hour=hours, minute=minutes)
+
+
+class TestAvailability:
+    """Tests for busy indexes, capacity and multi-day slot generation."""
+
+    def test_merge_and_overlaps(self):
+        """Test intervals coalesce and lookups respect half-open bounds."""
+        busy = BusyIndex(merge([
+            (_at(MONDAY, "10:00"), _at(MONDAY, "11:00")),
+            (_at(MONDAY, "10:30"), _at(MONDAY, "11:30")),
+            (_at(MONDAY, "15:00"), _at(MONDAY, "16:00")),
+        ]))
+        assert len(busy) == 2
+        assert busy.overlaps(_at(MONDAY, "11:00"), _at(MONDAY, "12:00"))
+        assert busy.overlaps(_at(MONDAY, "09:00"), _at(MONDAY, "18:00"))
+        assert not busy.overlaps(_at(MONDAY, "09:00"), _at(MONDAY, "10:00"))
+        assert not busy.overlaps(_at(MONDAY, "11:30"), _at(MONDAY, "15:00"))
+
+    def test_saturation_by_capacity(self):
+        """Test only the periods at full capacity are busy."""
+        bookings = [
+            (_at(MONDAY, "09:00"), _at(MONDAY, "11:00")),
+            (_at(MONDAY, "10:00"), _at(MONDAY, "12:00")),
+            (_at(MONDAY, "11:00"), _at(MONDAY, "11:30")),
+        ]
+        assert saturated(bookings, 2) == [(_at(MONDAY, "10:00"), _at(MONDAY, "11:30"))]
+        # A booking ending as another starts does not stack
+        assert saturated(bookings[:1] + [(_at(MONDAY, "11:00"), _at(MONDAY, "12:00"))], 2) == []
+        assert saturated(bookings, 3) == []
+
+    def test_long_booking_blocks_every_overlapping_slot(self):
+        """Test a 90-minute session removes both slots it touches."""
+        windows = opening_windows(SCHEDULE, MONDAY, MONDAY)
+        busy = BusyIndex([(_at(MONDAY, "09:30"), _at(MONDAY, "11:00"))])
+        slots = free_slots(windows, busy, timedelta(hours=1))
+        assert [start.strftime("%H:%M") for start, _ in slots] == ["11:00", "16:00", "17:00"]
+
+    def test_multi_day_range_skips_closed_days(self):
+        """Test holidays and leave drop whole days and bookings are filtered."""
+        tuesday, wednesday = MONDAY + timedelta(days=1), MONDAY + timedelta(days=2)
+        engine = WorkspaceAvailability(
+            first_day=MONDAY,
+            last_day=wednesday,
+            weekly_schedule=SCHEDULE,
+            duration=timedelta(minutes=60),
+            closed_days={MONDAY},
+            busy=BusyIndex([(_at(tuesday, "10:00"), _at(tuesday, "11:00"))]),
+        )
+        assert engine.slots() == [(_at(tuesday, "11:00"), _at(tuesday, "12:00"))]
+        assert not engine.is_free(_at(MONDAY, "16:00"), _at(MONDAY, "17:00"))
+        assert not engine.is_free(_at(tuesday, "10:30"), _at(tuesday, "11:30"))
+        assert engine.is_free(_at(tuesday, "11:00"), _at(tuesday, "12:00"))
+
+    async def test_range_is_built_once_and_cached_per_week(self, monkeypatch):
+        """Test missing weeks load together and later reads hit the cache."""
+        workspace = SimpleNamespace(id=uuid.uuid4())
+        loads = []
+
+        async def load_workspace(db, ws, first_day, last_day, **kwargs):
+            loads.append((first_day, last_day))
+            return WorkspaceAvailability(first_day, last_day, SCHEDULE, timedelta(hours=1), set(), BusyIndex())
+
+        monkeypatch.setattr(availability, "load_workspace", load_workspace)
+        db = _FakeDB(workspace)
+        last_day = MONDAY + timedelta(days=8)
+        days = await availability.workspace_slots(db, workspace.id, MONDAY, last_day)
+        assert loads == [(MONDAY, MONDAY + timedelta(days=13))]
+        assert len(days) == 9 and len(days[MONDAY]) == 5 and days[MONDAY + timedelta(days=2)] == []
+        assert days[MONDAY][0] == {"start": "2026-10-19T09:00:00", "end": "2026-10-19T10:00:00"}
+
+        tuesday = MONDAY + timedelta(days=1)
+        assert (await availability.workspace_slots(db, workspace.id, tuesday, tuesday)) == {
+            tuesday: [{"start": "2026-10-20T10:00:00", "end": "2026-10-20T11:00:00"},
+                      {"start": "2026-10-20T11:00:00", "end": "2026-10-20T12:00:00"}],
+        }
+        assert len(loads) == 1
+
+    async def test_booking_commit_invalidates_its_weeks(self):
+        """Test a flushed booking drops only the weeks it touches."""
+        workspace_id = uuid.uuid4()
+        next_week = MONDAY + timedelta(days=7)
+        for monday in (MONDAY, next_week):
+            ttl_cache.set(availability._key(workspace_id, monday), [])
+
+        session = Session()
+        start = datetime(2026, 10, 21, 10, tzinfo=timezone.utc)
+        session.add(Booking(workspace_id=workspace_id, start_time=start, end_time=start + timedelta(hours=1)))
+        availability._collect_dirty_weeks(session, None)
+        assert session.info[availability._INFO_KEY] == {(workspace_id, MONDAY)}
+
+        availability._invalidate_on_commit(session)
+        assert ttl_cache.get(availability._key(workspace_id, MONDAY)) is None
+        assert ttl_cache.get(availability._key(workspace_id, next_week)) == []
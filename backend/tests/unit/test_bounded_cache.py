@@ -0,0 +1,87 @@
+"""Unit tests for the bounded LRU/TTL cache core."""
+import time
+
+import pytest
+
+from app.core.bounded_cache import BoundedCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock."""
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    return now
+
+
+class TestBoundedCache:
+    """Tests for BoundedCache."""
+
+    def test_lru_eviction_by_entries(self):
+        """Test the least recently used entry is evicted first."""
+        cache = BoundedCache("t", max_entries=2)
+        cache.set("a", 1, ttl=60)
+        cache.set("b", 2, ttl=60)
+        assert cache.get("a") == 1
+        cache.set("c", 3, ttl=60)
+        assert "b" not in cache
+        assert cache.get("a") == 1
+        assert cache.get("c") == 3
+        assert cache.evictions == 1
+
+    def test_byte_budget(self):
+        """Test entries are evicted once the byte budget is exceeded."""
+        cache = BoundedCache("t", max_entries=100, max_bytes=1000, sizeof=lambda v: 100)
+        for i in range(10):
+            cache.set(f"k{i}", i, ttl=60)
+        assert len(cache) == 5
+        assert cache.nbytes == 1000
+        assert "k0" not in cache and "k9" in cache
+
+    def test_overwrite_updates_size(self):
+        """Test overwriting a key replaces its size accounting."""
+        cache = BoundedCache("t", max_entries=10)
+        cache.set("k", "x" * 1000, ttl=60)
+        big = cache.nbytes
+        cache.set("k", "x", ttl=60)
+        assert cache.nbytes < big
+        assert len(cache) == 1
+
+    def test_ttl_expiry_on_read(self, clock):
+        """Test expired entries read as missing."""
+        cache = BoundedCache("t", max_entries=10)
+        cache.set("k", 1, ttl=5)
+        clock[0] += 6
+        assert cache.get("k") is None
+        assert len(cache) == 0
+
+    def test_sweep_removes_idle_expired(self, clock):
+        """Test the sweeper frees expired keys nobody reads."""
+        cache = BoundedCache("t", max_entries=10)
+        cache.set("short", 1, ttl=5)
+        cache.set("long", 2, ttl=50)
+        cache.set("short", 3, ttl=100)  # overwrite leaves a stale heap node
+        cache.set("gone", 4, ttl=1)
+        clock[0] += 10
+        assert cache.sweep() == 1
+        assert set(cache._data) == {"short", "long"}
+        assert cache.nbytes > 0
+
+    def test_prefix_index(self):
+        """Test prefix invalidation uses the separator index."""
+        cache = BoundedCache("t", max_entries=10, sep=":")
+        cache.set("auth:me:u1:w1", 1, ttl=60)
+        cache.set("auth:me:u1:w2", 2, ttl=60)
+        cache.set("auth:me:u2:w1", 3, ttl=60)
+        assert cache.invalidate_prefix("auth:me:u1:") == 2
+        assert "auth:me:u1:" not in cache._prefixes
+        assert cache.get("auth:me:u2:w1") == 3
+        assert cache.invalidate_prefix("auth:me:u") == 1
+        assert len(cache) == 0 and cache._prefixes == {}
+
+    def test_tuple_keys(self):
+        """Test non-string keys work without a prefix index."""
+        cache = BoundedCache("t", max_entries=10, sep=":")
+        cache.set(("bucket", "a/b.png"), "url", ttl=60)
+        assert cache.get(("bucket", "a/b.png")) == "url"
+        assert cache._prefixes == {}
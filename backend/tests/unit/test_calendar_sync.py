@@ -0,0 +1,90 @@
+"""Unit tests for the Google Calendar sync outbox worker."""
+import re
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.core.config import settings
+from app.services.calendar_sync import _Op, _Run, event_id_for, is_transient, retry_delay
+
+
+def _http_error(status_code, content=b"{}"):
+    return HttpError(SimpleNamespace(status=status_code, reason=""), content)
+
+
+class _FakeSession:
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    def __contains__(self, obj):
+        return obj in self.added
+
+    async def delete(self, obj):
+        self.added.remove(obj)
+
+
+def _op(kind, event_id="abc"):
+    row = SimpleNamespace(booking_id=uuid4())
+    return _Op(row, kind, "cal-1", event_id, {"summary": "Sesión"})
+
+
+class TestCalendarSync:
+    """Tests for event ids, retry policy and batch result handling."""
+
+    def test_event_id_is_deterministic_base32hex(self):
+        """Test the event id depends only on booking and user and is valid for Google."""
+        booking_id, user_id = uuid4(), uuid4()
+        event_id = event_id_for(booking_id, user_id)
+        assert event_id == event_id_for(booking_id, user_id)
+        assert event_id != event_id_for(booking_id, uuid4())
+        assert re.fullmatch(r"[0-9a-v]{5,1024}", event_id)
+
+    def test_retry_delay_is_exponential_and_capped(self):
+        """Test retries back off exponentially up to the configured maximum."""
+        base = settings.CALENDAR_SYNC_RETRY_BASE_SECONDS
+        assert retry_delay(1, rand=0.5) == base
+        assert retry_delay(3, rand=0.5) == base * 4
+        assert retry_delay(50, rand=1.0) == pytest.approx(settings.CALENDAR_SYNC_RETRY_MAX_SECONDS * 1.2)
+
+    def test_transient_errors(self):
+        """Test rate limits and server errors retry, client errors do not."""
+        assert is_transient(TimeoutError())
+        assert is_transient(_http_error(429))
+        assert is_transient(_http_error(503))
+        assert is_transient(_http_error(403, b'{"reason": "userRateLimitExceeded"}'))
+        assert not is_transient(_http_error(403, b'{"reason": "forbidden"}'))
+        assert not is_transient(_http_error(400))
+
+    async def test_handle_follow_ups(self):
+        """Test conflicts become updates and vanished events are recreated."""
+        db = _FakeSession()
+        run = _Run(db, uuid4(), {})
+
+        conflict = _op("insert_fixed")
+        follow_up = await run.handle(conflict, None, _http_error(409))
+        assert (follow_up.kind, follow_up.event_id) == ("update", "abc")
+
+        await run.handle(follow_up, {"id": "abc"}, None)
+        assert run.done == [conflict.row]
+        mapping = run.mappings[conflict.row.booking_id]
+        assert (mapping.google_event_id, mapping.google_calendar_id) == ("abc", "cal-1")
+
+        gone = _Op(conflict.row, "update", "cal-1", "abc", {"summary": "Sesión"})
+        follow_up = await run.handle(gone, None, _http_error(404))
+        assert (follow_up.kind, follow_up.event_id) == ("insert", None)
+        assert conflict.row.booking_id not in run.mappings
+
+        deleted = _op("delete")
+        assert await run.handle(deleted, None, _http_error(410)) is None
+        assert run.done[-1] is deleted.row
+
+        throttled, broken = _op("insert"), _op("insert")
+        await run.handle(throttled, None, _http_error(429))
+        await run.handle(broken, None, _http_error(400))
+        assert [row for row, _ in run.retry] == [throttled.row]
+        assert [row for row, _ in run.failed] == [broken.row]
@@ -0,0 +1,74 @@
+"""Unit tests for the in-memory catalog snapshot."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.models.exercise import Exercise
+from app.services import food_search
+from app.services.catalog_snapshot import Catalog, ExerciseRecord, fold, merge_sorted
+
+T0 = datetime(2026, 10, 1, tzinfo=timezone.utc)
+
+
+def _exercise(name, muscles=(), equipment=(), is_global=True, updated_at=T0, **extra):
+    row = {column.key: None for column in ExerciseRecord.columns}
+    row.update(
+        id=uuid4(), name=name, muscle_groups=list(muscles), equipment=list(equipment),
+        is_global=is_global, updated_at=updated_at, **extra,
+    )
+    return SimpleNamespace(**row)
+
+
+def _catalog(*rows):
+    catalog = Catalog(Exercise, ExerciseRecord)
+    catalog.replace(rows)
+    return catalog
+
+
+def _names(records):
+    return [r.name for r in records]
+
+
+class TestCatalogSnapshot:
+    """Tests for ordering, filtering, deltas and merging."""
+
+    def test_order_ignores_accents_and_case(self):
+        """Test records sort by folded name, like the listing always did."""
+        catalog = _catalog(_exercise("remo"), _exercise("Ábdominales"), _exercise("Curl"))
+        assert _names(catalog.ordered) == ["Ábdominales", "Curl", "remo"]
+        assert fold("Tríceps") == "triceps"
+
+    def test_select_intersects_indexes_and_search(self):
+        """Test filters intersect the value indexes and search folds text."""
+        catalog = _catalog(
+            _exercise("Press banca", ["Pecho", "Tríceps"], ["Barra"]),
+            _exercise("Fondos", ["Pecho", "Tríceps"], []),
+            _exercise("Curl", ["Bíceps"], ["Barra"], alias="curl de bíceps"),
+        )
+        assert _names(catalog.select(muscle_groups=["Pecho", "Tríceps"])) == ["Fondos", "Press banca"]
+        assert _names(catalog.select(muscle_groups=["Pecho"], equipment=["Barra"])) == ["Press banca"]
+        assert _names(catalog.select(search="TRICEPS")) == ["Fondos", "Press banca"]
+        assert _names(catalog.select(search="biceps", name_only=True)) == []
+        assert catalog.select(category=["nope"]) == []
+
+    def test_delta_upserts_and_drops(self):
+        """Test a delta updates rows in place and drops demoted ones."""
+        press, curl = _exercise("Press"), _exercise("Curl")
+        catalog = _catalog(press, curl)
+        later = T0 + timedelta(minutes=5)
+        renamed = SimpleNamespace(**{**vars(press), "name": "Aperturas", "updated_at": later})
+        demoted = SimpleNamespace(**{**vars(curl), "is_global": False, "updated_at": later})
+        assert catalog.apply([renamed, demoted]) == 2
+        assert _names(catalog.ordered) == ["Aperturas"]
+        assert catalog.watermark == later
+        assert catalog.indexes["muscle_groups"] == {}
+
+    def test_merge_and_page_offsets(self):
+        """Test workspace rows merge in order and offsets split across both lists."""
+        globals_ = _catalog(*(_exercise(n) for n in "aceg")).ordered
+        own = _catalog(*(_exercise(n) for n in "bdf")).ordered
+        merged = merge_sorted(globals_, own)
+        assert _names(merged) == list("abcdefg")
+        for offset in range(len(merged) + 2):
+            taken_globals, taken_own = food_search._merged_offset(globals_, own, offset)
+            assert _names(merge_sorted(globals_[:taken_globals], own[:taken_own])) == _names(merged[:offset])
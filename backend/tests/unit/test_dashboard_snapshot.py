@@ -0,0 +1,60 @@
+"""Unit tests for the client dashboard snapshot (Redis tier disabled)."""
+import uuid
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.core import ttl_cache
+from app.models.booking import Booking
+from app.models.exercise import ClientMeasurement
+from app.models.user import User
+from app.services import dashboard_snapshot
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    ttl_cache._CACHE.clear()
+    yield
+    ttl_cache._CACHE.clear()
+
+
+class TestDashboardSnapshot:
+    """Tests for snapshot storage and commit-time invalidation."""
+
+    async def test_store_and_get(self):
+        """Test a stored payload is served for the same day."""
+        client_id = uuid.uuid4()
+        dashboard_snapshot.store(client_id, {"full_name": "Ana"})
+        assert await dashboard_snapshot.get(client_id) == {"full_name": "Ana"}
+
+    async def test_other_day_is_stale(self):
+        """Test a snapshot built on another day is not served."""
+        client_id = uuid.uuid4()
+        yesterday = (date.today() - timedelta(days=1)).isoformat()
+        ttl_cache.set(f"dash:client:{client_id}", {"day": yesterday, "built_at": 0, "data": {}})
+        assert await dashboard_snapshot.get(client_id) is None
+
+    async def test_flush_and_commit_invalidate(self):
+        """Test watched models mark their client and commit invalidates it."""
+        touched, untouched = uuid.uuid4(), uuid.uuid4()
+        dashboard_snapshot.store(touched, {"x": 1})
+        dashboard_snapshot.store(untouched, {"x": 2})
+
+        session = Session()
+        session.add(Booking(client_id=touched))
+        session.add(ClientMeasurement(client_id=touched))
+        session.add(User(email="coach@example.com"))
+        dashboard_snapshot._collect_dirty_clients(session, None)
+        assert session.info[dashboard_snapshot._INFO_KEY] == {touched}
+
+        dashboard_snapshot._invalidate_on_commit(session)
+        assert await dashboard_snapshot.get(touched) is None
+        assert await dashboard_snapshot.get(untouched) == {"x": 2}
+
+    def test_rollback_discards(self):
+        """Test a rollback forgets pending invalidations."""
+        session = Session()
+        session.info[dashboard_snapshot._INFO_KEY] = {uuid.uuid4()}
+        dashboard_snapshot._discard_on_rollback(session)
+        assert dashboard_snapshot._INFO_KEY not in session.info
@@ -0,0 +1,52 @@
+"""Unit tests for per-exercise performance rows."""
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services.exercise_performance import estimated_1rm, rows_for, summarize
+
+
+class TestExercisePerformance:
+    """Tests for set aggregation and row extraction from workout logs."""
+
+    def test_summarize_detailed_sets(self):
+        """Test completed sets add up and the best e1RM is kept."""
+        figures = summarize({"sets": [
+            {"set_number": 1, "weight_kg": 100, "reps_completed": 5},
+            {"set_number": 2, "weight_kg": 110, "reps_completed": 1},
+            {"set_number": 3, "weight_kg": 120, "reps_completed": 2, "completed": False},
+            {"set_number": 4, "weight_kg": None, "reps_completed": 12},
+        ]})
+        assert figures == {
+            "set_count": 3,
+            "total_reps": 18,
+            "total_volume_kg": 610.0,
+            "top_weight_kg": 110.0,
+            "best_e1rm_kg": pytest.approx(116.67),
+            "best_set_weight_kg": 100.0,
+            "best_set_reps": 5,
+        }
+
+    def test_summarize_loose_shape_and_bad_values(self):
+        """Test ``weight`` / ``reps`` keys and junk values are tolerated."""
+        figures = summarize({"sets": [{"weight": "20", "reps": "10"}, {"weight": "abc", "reps": None}, "x"]})
+        assert figures["set_count"] == 2 and figures["total_reps"] == 10
+        assert figures["total_volume_kg"] == 200.0 and figures["best_e1rm_kg"] == pytest.approx(26.67)
+        assert summarize({})["top_weight_kg"] is None
+        assert estimated_1rm(80, 1) == 80
+
+    def test_rows_for_keeps_position_and_skips_unidentified(self):
+        """Test one row per identified exercise with its position in the log."""
+        log_id, client_id = uuid.uuid4(), uuid.uuid4()
+        performed_at = datetime(2026, 10, 17, 12, tzinfo=timezone.utc)
+        log = {"exercises": [
+            {"exercise_name": "Sin id", "sets": []},
+            {"exercise_id": "sq", "exercise_name": "Sentadilla", "sets": [{"weight_kg": 60, "reps_completed": 8}]},
+            {"exercise_id": "sq", "sets": []},
+        ]}
+        rows = rows_for(log_id, client_id, performed_at, log)
+        assert [(r["exercise_id"], r["position"]) for r in rows] == [("sq", 1), ("sq", 2)]
+        assert rows[0]["entry"] is log["exercises"][1] and rows[0]["total_volume_kg"] == 480.0
+        assert rows_for(log_id, client_id, performed_at, {"exercises": []}) == []
+        assert rows_for(log_id, client_id, performed_at, None) == []
@@ -0,0 +1,55 @@
+"""Unit tests for the food search helpers."""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+
+from app.models.nutrition import Food
+from app.services import food_search
+
+
+class _FakeSession:
+    """Returns no rows for the page and ``count`` for a COUNT."""
+
+    def __init__(self, count):
+        self.count = count
+        self.counted = False
+
+    async def execute(self, statement):
+        return type("Result", (), {"all": lambda _self: []})()
+
+    async def scalar(self, statement):
+        self.counted = True
+        return self.count
+
+
+class TestFoodSearch:
+    """Tests for LIKE escaping and keyset cursors."""
+
+    def test_escape_like(self):
+        """Test user input cannot inject LIKE wildcards."""
+        assert food_search._escape_like("100%_pure\\") == "100\\%\\_pure\\\\"
+
+    def test_cursor_roundtrip(self):
+        """Test cursors decode to what was encoded."""
+        values = ["1.2500", "Plátano #12", "6f1c3c9e-1d7b-4f6e-9a59-0c0b8f4f1a11"]
+        cursor = food_search._encode_cursor(values)
+        assert "=" not in cursor
+        assert food_search._decode_cursor(cursor, 3) == values
+
+    def test_bad_cursor_is_a_400(self):
+        """Test a tampered or mismatched cursor is rejected."""
+        with pytest.raises(HTTPException) as exc:
+            food_search._decode_cursor("not-a-cursor", 2)
+        assert exc.value.status_code == 400
+        with pytest.raises(HTTPException):
+            food_search._decode_cursor(food_search._encode_cursor(["a", "b"]), 3)
+
+    async def test_page_past_the_end_counts(self):
+        """Test an empty page past the end reports the real total, not its offset."""
+        db = _FakeSession(count=42)
+        page = await food_search.search_foods(db, select(Food), search=None, page=9, page_size=20)
+        assert (page.items, page.total, page.total_is_estimate) == ([], 42, False)
+
+        db = _FakeSession(count=42)
+        page = await food_search.search_foods(db, select(Food), search=None, page=1, page_size=20)
+        assert (page.total, db.counted) == (0, False)
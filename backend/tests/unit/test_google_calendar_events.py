@@ -0,0 +1,126 @@
+"""Unit tests for incremental Google Calendar event reads."""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+import pytest
+from googleapiclient.errors import HttpError
+
+from app.models.google_calendar import GoogleCalendarSyncState
+from app.services.google_calendar import GoogleCalendarService, _apply_changes, _in_window
+
+NOW = datetime(2026, 10, 17, 12, tzinfo=timezone.utc)
+
+
+def _event(event_id, start, hours=1, **extra):
+    return {
+        "id": event_id,
+        "status": "confirmed",
+        "summary": event_id,
+        "start": {"dateTime": start.isoformat()},
+        "end": {"dateTime": (start + timedelta(hours=hours)).isoformat()},
+        **extra,
+    }
+
+
+class _FakeGoogle:
+    """Stands in for ``_list_all_events``: records params, replays answers."""
+
+    def __init__(self, *answers):
+        self.answers = list(answers)
+        self.calls = []
+
+    def __call__(self, token, params):
+        self.calls.append(params)
+        answer = self.answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+
+def _service(google):
+    service = GoogleCalendarService()
+    service._list_all_events = google
+    return service
+
+
+@pytest.fixture(autouse=True)
+def _no_discovery(monkeypatch):
+    # Ningún test debe construir un cliente real de la API
+    monkeypatch.setattr(GoogleCalendarService, "_get_calendar_service", lambda self, token: None)
+
+
+class TestGoogleCalendarEvents:
+    """Tests for the per-calendar event copy and its syncToken refresh."""
+
+    def test_apply_changes_and_window(self):
+        """Test cancelled items drop events and the window matches events.list."""
+        kept = _event("a", NOW, htmlLink="x")
+        events = _apply_changes({}, [kept, _event("b", NOW)])
+        assert "htmlLink" not in events["a"]
+        events = _apply_changes(events, [{"id": "b", "status": "cancelled"}])
+        assert list(events) == ["a"]
+
+        assert _in_window(kept, NOW - timedelta(minutes=30), NOW + timedelta(minutes=1))
+        assert not _in_window(kept, NOW + timedelta(hours=1), None)
+        all_day = {"start": {"date": "2026-10-17"}, "end": {"date": "2026-10-18"}}
+        assert _in_window(all_day, NOW, NOW + timedelta(hours=1))
+
+    async def test_cached_then_incremental_then_full(self):
+        """Test repeated reads hit the copy, stale ones use the syncToken, 410 resyncs."""
+        google = _FakeGoogle(
+            ([_event("a", NOW), _event("b", NOW + timedelta(days=2))], "sync-1"),
+            ([{"id": "a", "status": "cancelled"}, _event("c", NOW)], "sync-2"),
+            HttpError(SimpleNamespace(status=410, reason="Gone"), b"{}"),
+            ([_event("d", NOW)], "sync-3"),
+        )
+        service = _service(google)
+        state = GoogleCalendarSyncState(token_id=uuid4(), calendar_id="cal", calendar_name="Cal", events={})
+        window = (NOW - timedelta(days=1), NOW + timedelta(days=1))
+
+        first = await service._calendar_events(None, state, *window, NOW)
+        assert [e["id"] for e in first] == ["a"]
+        assert "timeMin" in google.calls[0] and state.sync_token == "sync-1"
+
+        # Fresh copy: no call to Google
+        await service._calendar_events(None, state, *window, NOW + timedelta(seconds=10))
+        assert len(google.calls) == 1
+
+        # Invalidated (webhook): only the changes are requested
+        state.checked_at = None
+        second = await service._calendar_events(None, state, *window, NOW)
+        assert google.calls[1]["syncToken"] == "sync-1"
+        assert sorted(e["id"] for e in second) == ["c"]
+        assert sorted(state.events) == ["b", "c"]
+
+        # Expired syncToken: full resync of the window
+        state.checked_at = None
+        third = await service._calendar_events(None, state, *window, NOW)
+        assert "timeMin" in google.calls[3]
+        assert [e["id"] for e in third] == ["d"] and state.sync_token == "sync-3"
+
+    async def test_get_all_user_events_fetches_calendars_concurrently(self, monkeypatch):
+        """Test every visible calendar is read and failures don't sink the rest."""
+        service = GoogleCalendarService()
+        calendars = {"items": [
+            {"id": "work", "summary": "Trabajo", "accessRole": "owner"},
+            {"id": "broken", "summary": "Roto", "accessRole": "reader"},
+            {"id": "busy", "summary": "Ocupado", "accessRole": "freeBusyReader"},
+        ]}
+        list_call = SimpleNamespace(execute=lambda: calendars)
+        monkeypatch.setattr(service, "_get_calendar_service", lambda token: SimpleNamespace(
+            calendarList=lambda: SimpleNamespace(list=lambda: list_call)
+        ))
+
+        async def calendar_events(token, state, time_min, time_max, now):
+            if state.calendar_id == "broken":
+                raise RuntimeError("boom")
+            return [_event("w", NOW)]
+
+        monkeypatch.setattr(service, "_calendar_events", calendar_events)
+        token = SimpleNamespace(id=uuid4(), calendar_id="work", calendar_name="Trackfiz")
+        events = await service.get_all_user_events(token, NOW - timedelta(days=1), NOW + timedelta(days=1))
+        assert [(e["id"], e["_calendar_name"], e["_is_trackfiz"]) for e in events] == [("w", "Trabajo", True)]
+
+        events = await service.get_all_user_events(token, NOW, NOW + timedelta(days=1), include_trackfiz=False)
+        assert events == []
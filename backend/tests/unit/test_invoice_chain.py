@@ -0,0 +1,77 @@
+"""Unit tests for the VeriFactu chain head and invoice numbering."""
+from datetime import date
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services import invoice_chain
+from app.services.verifactu import VeriFactuService
+from tests.perf.chain import check_chain
+
+
+def _invoice():
+    return SimpleNamespace(
+        workspace_id=uuid4(), invoice_series="F", invoice_number="F2026-00001", invoice_type="F1",
+        issue_date=date(2026, 10, 17), tax_amount=21, total=121,
+    )
+
+
+class _NoRow:
+    def first(self):
+        return None
+
+
+class _Session:
+    async def execute(self, statement):
+        return _NoRow()
+
+
+def _record_chain_calls(monkeypatch):
+    calls = []
+
+    async def lock_head(db, workspace_id, series):
+        calls.append(("lock", series))
+        return "PREV"
+
+    async def peek_head(db, workspace_id, series):
+        calls.append(("peek", series))
+        return "PREV"
+
+    async def advance_head(db, invoice, registered_at):
+        calls.append(("advance", invoice.verifactu_hash))
+
+    monkeypatch.setattr(invoice_chain, "lock_head", lock_head)
+    monkeypatch.setattr(invoice_chain, "peek_head", peek_head)
+    monkeypatch.setattr(invoice_chain, "advance_head", advance_head)
+    return calls
+
+
+class TestInvoiceChain:
+    """Tests for locking, advancing and previewing the series head."""
+
+    async def test_finalize_locks_and_advances_head(self, monkeypatch):
+        """Test the hash chains to the locked head and becomes the new head."""
+        calls = _record_chain_calls(monkeypatch)
+        invoice = _invoice()
+
+        await VeriFactuService.compute_and_set_hash(None, invoice, None)
+
+        assert invoice.verifactu_prev_hash == "PREV" and len(invoice.verifactu_hash) == 64
+        assert calls == [("lock", "F"), ("advance", invoice.verifactu_hash)]
+
+    async def test_preview_leaves_head_untouched(self, monkeypatch):
+        """Test the /verifactu/test preview neither locks nor advances the chain."""
+        calls = _record_chain_calls(monkeypatch)
+
+        await VeriFactuService.compute_and_set_hash(None, _invoice(), None, preview=True)
+
+        assert calls == [("peek", "F")]
+
+    async def test_number_without_settings_starts_at_one(self):
+        """Test a workspace without invoice settings keeps numbering from 1."""
+        assert await invoice_chain.allocate_number(_Session(), uuid4(), "F") == 1
+
+    def test_check_chain_detects_forks(self):
+        """Test the benchmark check flags records sharing a predecessor."""
+        assert check_chain([("A", ""), ("B", "A"), ("C", "B")]) == []
+        problems = check_chain([("A", ""), ("B", "A"), ("C", "A"), ("D", "X")])
+        assert any("fork" in p for p in problems) and any("unknown" in p for p in problems)
@@ -0,0 +1,99 @@
+"""Unit tests for the streamed ZIP invoice export."""
+import asyncio
+import io
+import zipfile
+from datetime import date
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.services import invoice_export, pdf_render
+
+
+def _invoice(number, day):
+    return SimpleNamespace(id=uuid4(), workspace_id="ws", invoice_number=number, issue_date=date(2026, 9, day))
+
+
+class TestInvoiceExport:
+    """Tests for entry order, bounded rendering and the ZIP layout."""
+
+    async def test_zip_streams_entries_in_order(self, monkeypatch):
+        """Test a valid ZIP comes out chunk by chunk with at most `window` renders in flight."""
+        pages = [[_invoice(f"F2026-{i:05d}", 1 + i % 28) for i in range(p * 3, p * 3 + 3)] for p in range(3)]
+        pages[2][2].invoice_number = "F2026-00000"  # repetida
+        in_flight, peak = 0, 0
+
+        async def fake_pages(clauses):
+            for page in pages:
+                yield page
+
+        async def fake_render(invoice, items, settings=None, qr_data=None, *, workspace_id=None):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            # Los primeros tardan más: el orden del ZIP no depende de quién acaba antes
+            await asyncio.sleep(0.01 if invoice["n"] % 2 else 0.001)
+            in_flight -= 1
+            return f"%PDF-{invoice['n']}".encode()
+
+        monkeypatch.setattr(invoice_export, "_pages", fake_pages)
+        monkeypatch.setattr(pdf_render, "render_invoice", fake_render)
+        monkeypatch.setattr(invoice_export.settings, "PDF_RENDER_WORKERS", 2)
+
+        numbers = iter(range(100))
+        chunks = [
+            chunk async for chunk in invoice_export.stream_zip(
+                "ws", None, lambda inv: {"invoice": {"n": next(numbers)}, "items": [], "qr_data": None},
+                from_date=date(2026, 9, 1),
+            )
+        ]
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        names = archive.namelist()
+        assert len(chunks) == 10 and archive.testzip() is None
+        assert names[0] == "Factura_F2026-00000.pdf" and names[-1] == "Factura_F2026-00000_2.pdf"
+        assert [archive.read(n) for n in names] == [f"%PDF-{i}".encode() for i in range(9)]
+        assert archive.getinfo(names[1]).date_time[:3] == (2026, 9, 2)
+        assert peak <= 4
+
+    async def test_failed_render_is_listed_not_fatal(self, monkeypatch):
+        """Test a PDF that fails is left out and named in ERRORES.txt, and the ZIP stays valid."""
+        invoices = [_invoice(f"F2026-{i}", 1 + i) for i in range(4)]
+
+        async def fake_pages(clauses):
+            yield invoices
+
+        async def fake_render(invoice, items, settings=None, qr_data=None, *, workspace_id=None):
+            if invoice["n"] == 1:
+                raise RuntimeError("reportlab")
+            return f"%PDF-{invoice['n']}".encode()
+
+        monkeypatch.setattr(invoice_export, "_pages", fake_pages)
+        monkeypatch.setattr(pdf_render, "render_invoice", fake_render)
+        monkeypatch.setattr(invoice_export.settings, "PDF_RENDER_WORKERS", 1)
+
+        def pdf_args(invoice):
+            if invoice.invoice_number == "F2026-2":
+                raise ValueError("datos")
+            return {"invoice": {"n": int(invoice.invoice_number[-1])}, "items": [], "qr_data": None}
+
+        chunks = [chunk async for chunk in invoice_export.stream_zip("ws", None, pdf_args)]
+
+        archive = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+        assert archive.testzip() is None
+        assert archive.namelist() == ["Factura_F2026-0.pdf", "Factura_F2026-3.pdf", invoice_export.ERRORS_ENTRY]
+        report = archive.read(invoice_export.ERRORS_ENTRY).decode("utf-8").splitlines()
+        assert report[1:] == [
+            "Factura_F2026-1.pdf: no se pudo generar el PDF (RuntimeError)",
+            "Factura_F2026-2.pdf: no se pudo generar el PDF (ValueError)",
+        ]
+
+    def test_filters_skip_drafts_by_default(self):
+        """Test drafts only go in the export when asked for."""
+        assert len(invoice_export.filters("ws", series="F")) == 3
+        assert len(invoice_export.filters("ws", series="F", include_drafts=True)) == 2
+
+    def test_entry_names_are_unique(self):
+        """Test invoice numbers become safe, unique file names."""
+        used = set()
+        assert invoice_export.entry_name("F/2026/1", used) == "Factura_F-2026-1.pdf"
+        assert invoice_export.entry_name("F/2026/1", used) == "Factura_F-2026-1_2.pdf"
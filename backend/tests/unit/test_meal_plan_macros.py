@@ -0,0 +1,68 @@
+"""Unit tests for planned-macro lookups over meal plan templates."""
+from datetime import date
+
+from app.services import meal_plan_macros
+
+
+def _plan():
+    chicken = {"name": "Pollo", "serving_size": 100, "calories": 165, "protein": 31, "carbs": 0, "fat": 3.6}
+    rice = {"name": "Arroz", "serving_size": "100 g", "calories": "130", "protein": 2.7, "carbs": 28, "fat": 0.3}
+    return {
+        "weeks": [
+            {"week": 1, "days": [{"day": 1, "meals": [{"name": "Comida", "items": [
+                {"food": chicken, "quantity_grams": 200},
+                {"food": rice, "quantity_grams": 150},
+            ]}]}]},
+            {"week": 2, "days": [{"day": 1, "meals": [{"name": "Comida", "items": [
+                {"food": rice, "quantity_grams": 100},
+            ]}]}]},
+        ]
+    }
+
+
+class TestMealPlanMacros:
+    """Tests for plan_meal_reference and has_modifications."""
+
+    def test_reference_totals(self):
+        """Test planned macros are scaled by quantity and serving size."""
+        ref = meal_plan_macros.plan_meal_reference(_plan(), "Comida", date(2026, 10, 12))
+        assert ref["calories"] == 330 + 195
+        assert ref["protein"] == round(62.0 + round(2.7 * 1.5, 1), 1)
+        assert [f["name"] for f in ref["foods"]] == ["Pollo", "Arroz"]
+        assert ref["foods"][1]["calories_per_100g"] == 130
+
+    def test_rotating_week(self):
+        """Test multi-week plans rotate from the plan start date."""
+        ref = meal_plan_macros.plan_meal_reference(
+            _plan(), "Comida", date(2026, 10, 19), plan_start=date(2026, 10, 12), duration_weeks=2
+        )
+        assert ref["calories"] == 130
+
+    def test_missing_meal(self):
+        """Test unknown meals and days return None."""
+        assert meal_plan_macros.plan_meal_reference(_plan(), "Cena", date(2026, 10, 12)) is None
+        assert meal_plan_macros.plan_meal_reference(_plan(), "Comida", date(2026, 10, 13)) is None
+        assert meal_plan_macros.plan_meal_reference({}, "Comida", date(2026, 10, 12)) is None
+
+    def test_has_modifications(self):
+        """Test modifications are detected by food names."""
+        ref = meal_plan_macros.plan_meal_reference(_plan(), "Comida", date(2026, 10, 12))
+        assert not meal_plan_macros.has_modifications([{"name": "Arroz"}, {"name": "Pollo"}], ref)
+        assert meal_plan_macros.has_modifications([{"name": "Pollo"}], ref)
+        assert not meal_plan_macros.has_modifications([{"name": "Pollo"}], None)
+
+    def test_compiled_food_ids_and_media(self):
+        """Test the compiled index collects food ids and hydrates images."""
+        plan = _plan()
+        plan["weeks"][0]["days"][0]["meals"][0]["items"][0]["food_id"] = "f1"
+        compiled = meal_plan_macros.compile_plan(plan)
+        assert compiled.food_ids == {"f1"}
+        compiled.apply_food_media(plan, {"f1": "https://img/f1.png"})
+        item = plan["weeks"][0]["days"][0]["meals"][0]["items"][0]
+        assert item["food"]["image_url"] == "https://img/f1.png"
+
+    def test_export_days(self):
+        """Test PDF export lists every week with per-food macros."""
+        days = meal_plan_macros.compile_plan(_plan()).export_days()
+        assert [d["dayName"] for d in days] == ["Semana 1 · Día 1", "Semana 2 · Día 1"]
+        assert days[0]["meals"][0]["foods"][0]["calories"] == 330
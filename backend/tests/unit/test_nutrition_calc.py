@@ -0,0 +1,99 @@
+"""Unit tests for the shared nutrient calculator."""
+import pytest
+
+from app.services import meal_plan_macros, nutrition_calc
+from app.services.nutrition_calc import NUTRIENTS, NutrientTable
+
+OATS_ID = "11111111-1111-1111-1111-111111111111"
+
+
+def _per_gram(**per_100g):
+    return tuple(per_100g[n] / 100 if n in per_100g else None for n in NUTRIENTS)
+
+
+def _plan():
+    oats = {"name": "Avena", "serving_size": 100, "calories": 380, "protein": 13, "carbs": 60, "fat": 7}
+    egg = {"name": "Huevo", "serving_size": "50 g", "calories": 78, "protein": 6.3, "carbs": 0.6, "fat": 5.3}
+    return {
+        "weeks": [
+            {"week": 1, "days": [
+                {"day": 1, "dayName": "Lunes", "meals": [
+                    {"name": "Desayuno", "items": [
+                        {"food_id": OATS_ID, "food": oats, "quantity_grams": 80},
+                        {"food": egg, "quantity_grams": "100 g"},
+                    ]},
+                    {"name": "Cena", "items": [{"food": egg, "quantity_grams": 50}]},
+                ]},
+                {"day": 2, "dayName": "Martes", "meals": [
+                    {"name": "Desayuno", "items": [{"food_id": OATS_ID, "food": oats, "quantity_grams": 40}]},
+                ]},
+            ]},
+        ],
+    }
+
+
+class TestNutritionCalc:
+    """Tests for scaling, catalog fallback and plan/recipe totals."""
+
+    def test_nutrients_cover_food_columns(self):
+        """Test the nutrient axis is every numeric Food column but the serving size."""
+        assert NUTRIENTS[:5] == ("calories", "energy_kj", "protein_g", "carbs_g", "fat_g")
+        assert "fiber_g" in NUTRIENTS and "serving_size" not in NUTRIENTS
+        assert len(NUTRIENTS) > 30
+
+    def test_scale_matches_serving_basis(self):
+        """Test scaling uses the food's serving size and tolerates strings."""
+        egg = {"serving_size": "50 g", "calories": 78, "protein": "6.3"}
+        assert nutrition_calc.scale(egg, 100, ("calories", "protein")) == [156.0, 12.6]
+        assert nutrition_calc.scale({"calories": 200}, 50, ("calories",)) == [100.0]
+
+    def test_meal_reference_unchanged(self):
+        """Test compiled meal references keep their rounding and per-100g values."""
+        ref = meal_plan_macros.compile_plan(_plan()).meals[(1, 1, "Desayuno")]
+        assert ref["calories"] == 304 + 156
+        assert ref["protein"] == pytest.approx(10.4 + 12.6)
+        egg = ref["foods"][1]
+        assert egg["quantity"] == 100.0
+        assert egg["calories_per_100g"] == 156 and egg["fat_per_100g"] == 10.6
+
+    def test_item_values_win_over_catalog(self):
+        """Test nutrients on the item are used and the catalog fills the rest."""
+        table = NutrientTable({OATS_ID: _per_gram(calories=400, protein_g=10, fiber_g=10)})
+        vector = dict(zip(NUTRIENTS, table.vector({"calories": 380, "fiber": None}, 50, OATS_ID)))
+        assert vector["calories"] == 190
+        assert vector["fiber_g"] == 5
+        assert vector["protein_g"] == 5
+        assert vector["sodium_mg"] == 0
+
+    def test_plan_totals_by_segment(self):
+        """Test meal, day and week sums and the daily average in one pass."""
+        table = NutrientTable({OATS_ID: _per_gram(calories=380, fiber_g=10)})
+        totals = meal_plan_macros.compile_plan(_plan()).nutrient_totals(table)
+
+        meals = {(m["day"], m["meal"]): m["totals"] for m in totals["meals"]}
+        assert meals[(1, "Desayuno")]["calories"] == 460
+        assert meals[(1, "Desayuno")]["fiber_g"] == 8
+        assert meals[(1, "Cena")]["calories"] == 78
+
+        days = [d["totals"] for d in totals["days"]]
+        assert [d["calories"] for d in days] == [538, 152]
+        assert totals["weeks"][0]["totals"]["calories"] == 690
+        assert totals["weeks"][0]["days"] == 2
+        assert totals["daily_average"]["calories"] == 345
+        assert totals["daily_average"]["fiber_g"] == 6
+
+    def test_recipe_totals(self):
+        """Test recipe totals use per-100g item values and default to 100 g."""
+        table = NutrientTable({OATS_ID: _per_gram(calories=380, fiber_g=10, sugars_g=1)})
+        items = [
+            {"food_id": OATS_ID, "type": "food", "quantity_grams": 50, "calories": 380, "protein": 13, "carbs": 60, "fat": 7},
+            {"food_id": "whey", "type": "supplement", "calories": 120, "protein": 24, "carbs": 3, "fat": 1.5},
+        ]
+        assert nutrition_calc.recipe_totals(items, table) == {
+            "total_calories": 310,
+            "total_protein": 30.5,
+            "total_carbs": 33.0,
+            "total_fat": 5.0,
+            "total_fiber": 5.0,
+            "total_sugar": 0.5,
+        }
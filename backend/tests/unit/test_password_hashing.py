@@ -0,0 +1,73 @@
+"""Unit tests for the bounded password hashing pool."""
+import asyncio
+
+import bcrypt
+import pytest
+
+from app.core import password_hashing, security
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def _fast_bcrypt(monkeypatch):
+    monkeypatch.setattr(security, "BCRYPT_ROUNDS", 4)
+    yield
+    password_hashing.shutdown()
+
+
+class TestPasswordHashing:
+    """Tests for off-loop hashing, admission control and rehash-on-login."""
+
+    async def test_round_trip_and_stats(self):
+        """Test hashes verify through the pool and latency is recorded."""
+        hashed = await password_hashing.hash_password("Secreta123")
+        assert await password_hashing.verify_password("Secreta123", hashed)
+        assert not await password_hashing.verify_password("otra", hashed)
+        assert not await password_hashing.verify_password("Secreta123", None)
+
+        stats = password_hashing.stats()
+        assert stats["pending"] == 0
+        assert stats["hash"]["count"] >= 1 and stats["verify"]["count"] >= 2
+        assert stats["verify"]["run_ms"]["max"] > 0
+
+    async def test_event_loop_keeps_running(self, monkeypatch):
+        """Test the loop serves other work while a slow hash runs."""
+        monkeypatch.setattr(security, "BCRYPT_ROUNDS", 12)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.005)
+
+        task = asyncio.create_task(ticker())
+        await password_hashing.hash_password("Secreta123")
+        task.cancel()
+        assert ticks > 5
+
+    async def test_admission_control_rejects_when_full(self, monkeypatch):
+        """Test operations beyond the pending limit fail fast with 503."""
+        monkeypatch.setattr(settings, "PASSWORD_HASH_MAX_PENDING", 1)
+        monkeypatch.setattr(security, "BCRYPT_ROUNDS", 10)
+        results = await asyncio.gather(
+            password_hashing.hash_password("Secreta123"),
+            password_hashing.hash_password("Secreta123"),
+            return_exceptions=True,
+        )
+        busy = [r for r in results if isinstance(r, password_hashing.PasswordHashingBusy)]
+        assert len(busy) == 1
+        assert busy[0].status_code == 503 and busy[0].headers["Retry-After"]
+        assert password_hashing.stats()["rejected"] >= 1
+
+    async def test_verify_and_upgrade_rehashes_other_costs(self):
+        """Test a valid login with an outdated cost returns a fresh hash."""
+        old = bcrypt.hashpw(b"Secreta123", bcrypt.gensalt(rounds=5)).decode()
+        assert password_hashing.needs_rehash(old)
+
+        valid, new_hash = await password_hashing.verify_and_upgrade("Secreta123", old)
+        assert valid and new_hash.startswith("$2b$04$")
+        assert not password_hashing.needs_rehash(new_hash)
+
+        assert await password_hashing.verify_and_upgrade("Secreta123", new_hash) == (True, None)
+        assert await password_hashing.verify_and_upgrade("mala", old) == (False, None)
@@ -0,0 +1,71 @@
+"""Unit tests for the off-loop PDF rendering service."""
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.services import pdf_render
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Run renders in the default executor with a counting fake generator."""
+    calls = []
+
+    def fake_render(kind, payload):
+        calls.append(kind)
+        return f"%PDF-{kind}-{len(calls)}".encode()
+
+    monkeypatch.setattr(settings, "PDF_RENDER_WORKERS", 0)
+    monkeypatch.setattr(pdf_render, "_render", fake_render)
+    pdf_render._cache.clear()
+    yield calls
+    pdf_render._cache.clear()
+
+
+def _invoice(status="finalized"):
+    return {"id": "inv-1", "invoice_number": "F2026-00001", "status": status, "total": 121.0}
+
+
+class TestPDFRender:
+    """Tests for the content-hash cache, shared renders and the R2 archive."""
+
+    def test_content_key_ignores_argument_order(self):
+        """Test the cache key depends on the inputs, not on dict ordering."""
+        assert pdf_render.content_key("x", {"a": 1, "b": [1, 2]}) == pdf_render.content_key("x", {"b": [1, 2], "a": 1})
+        assert pdf_render.content_key("x", {"a": 1}) != pdf_render.content_key("x", {"a": 2})
+
+    async def test_identical_requests_share_one_render(self, renders):
+        """Test concurrent and repeated requests for the same PDF render once."""
+        kwargs = {"plan_name": "Plan", "days": [{"day": 1}]}
+        results = await asyncio.gather(*(pdf_render.render_diet_plan(**kwargs) for _ in range(4)))
+        assert await pdf_render.render_diet_plan(**kwargs) == results[0]
+        assert len(set(results)) == 1 and renders == ["diet_plan"]
+
+        await pdf_render.render_diet_plan(plan_name="Otro", days=[])
+        assert renders == ["diet_plan", "diet_plan"]
+
+    async def test_issued_invoice_is_archived_once(self, renders, monkeypatch):
+        """Test issued invoices are read from R2 before rendering and stored after."""
+        archive = {}
+
+        async def download(workspace_id, *parts):
+            return archive.get((workspace_id, *parts))
+
+        async def upload(content, workspace_id, *parts, content_type):
+            archive[(workspace_id, *parts)] = content
+
+        monkeypatch.setattr(settings, "R2_ACCOUNT_ID", "account")
+        monkeypatch.setattr(pdf_render.storage, "download_workspace_file", download)
+        monkeypatch.setattr(pdf_render.storage, "upload_workspace_file", upload)
+
+        first = await pdf_render.render_invoice(_invoice(), [], workspace_id="ws")
+        pdf_render._cache.clear()  # otro worker
+        assert await pdf_render.render_invoice(_invoice(), [], workspace_id="ws") == first
+        assert renders == ["invoice"] and len(archive) == 1
+        (key,) = archive
+        assert key[:3] == ("ws", "invoices", "inv-1") and key[3].endswith(".pdf")
+
+        await pdf_render.render_invoice(_invoice(status="paid"), [], workspace_id="ws")
+        await pdf_render.render_invoice(_invoice(status="draft"), [], workspace_id="ws")
+        assert renders == ["invoice"] * 3 and len(archive) == 2
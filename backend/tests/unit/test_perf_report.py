@@ -0,0 +1,46 @@
+"""Unit tests for the benchmark report helpers."""
+from tests.perf import report
+
+
+def _result(p95, queries=4.0, errors=0):
+    return {"p95_ms": p95, "queries_mean": queries, "errors": errors}
+
+
+class TestPerfReport:
+    """Tests for percentiles, summaries and regression detection."""
+
+    def test_percentile_interpolates(self):
+        """Test percentiles interpolate between ranks."""
+        values = [10.0, 20.0, 30.0, 40.0]
+        assert report.percentile(values, 50) == 25.0
+        assert report.percentile(values, 0) == 10.0
+        assert report.percentile(values, 100) == 40.0
+        assert report.percentile([], 95) == 0.0
+
+    def test_summarize_without_query_counts(self):
+        """Test remote-style runs leave the SQL columns empty."""
+        summary = report.summarize([5.0, 1.0, 3.0], [], [], errors=0, wall_seconds=1.0)
+        assert summary["p50_ms"] == 3.0
+        assert summary["rps"] == 3.0
+        assert summary["queries_mean"] is None
+
+    def test_compare_flags_regressions(self):
+        """Test slower p95, extra queries and new errors are regressions."""
+        base = {"scale": "small", "concurrency": 10, "results": {
+            "a": _result(10.0), "b": _result(10.0), "c": _result(10.0), "d": _result(10.0),
+        }}
+        head = {"scale": "small", "concurrency": 10, "results": {
+            "a": _result(11.0),            # +10%: within budget
+            "b": _result(15.0),            # +50%
+            "c": _result(10.0, queries=5.0),
+            "d": _result(10.0, errors=3),
+            "e": _result(1.0),             # new endpoint
+        }}
+        _, regressions = report.compare(base, head)
+        assert [r.split(":")[0] for r in regressions] == ["b", "c", "d"]
+
+    def test_compare_ignores_sub_millisecond_noise(self):
+        """Test a large relative change under the absolute floor passes."""
+        base = {"results": {"a": _result(1.0)}}
+        head = {"results": {"a": _result(1.8)}}
+        assert report.compare(base, head)[1] == []
@@ -0,0 +1,35 @@
+"""Unit tests for the per-request SQL statistics."""
+from app.core.database import QueryStats, current_query_stats, statement_fingerprint, track_queries
+
+
+class TestQueryStats:
+    """Tests for statement fingerprints and request scopes."""
+
+    def test_fingerprint_ignores_parameters(self):
+        """Test binds, literals and IN-list lengths share one shape."""
+        a = statement_fingerprint("SELECT * FROM foods\n WHERE id = $1 AND name = 'arroz' LIMIT 50")
+        b = statement_fingerprint("SELECT * FROM foods WHERE id = $7 AND name = 'pan''s' LIMIT 20")
+        assert a == b == "SELECT * FROM foods WHERE id = ? AND name = ? LIMIT ?"
+        assert statement_fingerprint("SELECT 1 FROM t WHERE id IN ($1, $2, $3)") == \
+            statement_fingerprint("SELECT 1 FROM t WHERE id IN ($1,$2)")
+
+    def test_repeated_and_server_timing(self):
+        """Test N+1 candidates and the Server-Timing header value."""
+        stats = QueryStats()
+        stats.statements = 12
+        stats.db_seconds = 0.0125
+        stats.shapes.update({"SELECT a": 11, "SELECT b": 1})
+        assert stats.repeated(10) == [("SELECT a", 11)]
+        assert stats.repeated(11) == []
+        assert stats.server_timing(40) == 'db;dur=12.5;desc="12 queries", pool;dur=0.0, app;dur=40.0'
+
+    def test_nested_scopes_roll_up(self):
+        """Test an inner scope is added to the enclosing one."""
+        assert current_query_stats() is None
+        with track_queries() as outer:
+            with track_queries() as inner:
+                inner.statements = 3
+                inner.shapes["SELECT ?"] += 3
+            assert current_query_stats() is outer
+        assert outer.statements == 3 and outer.shapes["SELECT ?"] == 3
+        assert current_query_stats() is None
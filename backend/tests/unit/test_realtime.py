@@ -0,0 +1,35 @@
+"""Unit tests for realtime event fan-out (Redis disabled)."""
+import uuid
+
+from app.core import realtime
+
+
+class TestRealtime:
+    """Tests for local publish/subscribe delivery."""
+
+    async def test_publish_reaches_topic_subscribers(self):
+        """Test an event is delivered only to subscribers of its topic."""
+        user_id, other_id = uuid.uuid4(), uuid.uuid4()
+        async with realtime.subscribe(realtime.user_topic(user_id)) as mine, \
+                realtime.subscribe(realtime.user_topic(other_id)) as theirs:
+            realtime.publish(realtime.user_topic(user_id), "unread", {"scope": "notifications", "unread_count": 3})
+            message = mine.get_nowait()
+            assert message["event"] == "unread"
+            assert message["data"]["unread_count"] == 3
+            assert theirs.empty()
+
+    async def test_unsubscribe_on_exit(self):
+        """Test leaving the context removes the subscriber."""
+        topic = realtime.staff_topic(uuid.uuid4())
+        async with realtime.subscribe(topic):
+            assert topic in realtime._subscribers
+        assert topic not in realtime._subscribers
+
+    async def test_full_queue_drops_oldest(self):
+        """Test a slow subscriber keeps the newest events."""
+        topic = realtime.user_topic(uuid.uuid4())
+        async with realtime.subscribe(topic) as queue:
+            for i in range(realtime._QUEUE_SIZE + 2):
+                realtime.publish(topic, "unread", {"unread_count": i})
+            assert queue.qsize() == realtime._QUEUE_SIZE
+            assert queue.get_nowait()["data"]["unread_count"] == 2
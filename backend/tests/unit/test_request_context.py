@@ -0,0 +1,66 @@
+"""Unit tests for the pure ASGI request middlewares."""
+from unittest.mock import patch
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+from httpx import ASGITransport, AsyncClient
+
+from app.core import security
+from app.core.security import create_access_token
+from app.middleware import request_context
+from app.middleware.permissions import PermissionsMiddleware
+from app.middleware.request_context import RequestContextMiddleware
+
+
+def _app() -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/api/v1/clients/whoami")
+    async def whoami(request: Request):
+        return {"user_id": request.state.user_id, "request_id": request.state.request_id}
+
+    @app.get("/api/v1/stream")
+    async def stream():
+        async def chunks():
+            for i in range(3):
+                yield f"data: {i}\n\n"
+        return StreamingResponse(chunks(), media_type="text/event-stream")
+
+    app.add_middleware(PermissionsMiddleware)
+    app.add_middleware(RequestContextMiddleware)
+    return app
+
+
+def _token(role: str) -> str:
+    return create_access_token(
+        "00000000-0000-0000-0000-000000000001", "a@example.com",
+        "00000000-0000-0000-0000-000000000002", role,
+    )
+
+
+class TestRequestContextMiddleware:
+    """Tests for identity sharing, headers and streaming passthrough."""
+
+    async def test_token_decoded_once_and_shared(self):
+        """Test the middlewares and the handler share one decode."""
+        transport = ASGITransport(app=_app())
+        with patch.object(request_context, "decode_access_token", wraps=security.decode_access_token) as decode:
+            async with AsyncClient(transport=transport, base_url="http://test") as client:
+                response = await client.get(
+                    "/api/v1/clients/whoami",
+                    headers={"Authorization": f"Bearer {_token('owner')}", "X-Request-ID": "abc123"},
+                )
+        assert response.status_code == 200
+        assert decode.call_count == 1
+        assert response.json() == {"user_id": "00000000-0000-0000-0000-000000000001", "request_id": "abc123"}
+        assert response.headers["x-request-id"] == "abc123"
+        assert response.headers["x-content-type-options"] == "nosniff"
+        assert response.headers["server-timing"].startswith("db;dur=")
+
+    async def test_streaming_response_passes_through(self):
+        """Test a streamed body arrives intact with headers added."""
+        transport = ASGITransport(app=_app())
+        async with AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get("/api/v1/stream")
+        assert response.text == "data: 0\n\ndata: 1\n\ndata: 2\n\n"
+        assert len(response.headers["x-request-id"]) == 32
@@ -0,0 +1,73 @@
+"""Unit tests for the two-tier TTL cache (Redis tier disabled)."""
+import time
+
+import pytest
+
+from app.core import ttl_cache
+
+
+@pytest.fixture(autouse=True)
+def _clean_cache():
+    ttl_cache._CACHE.clear()
+    ttl_cache._STATS.clear()
+    yield
+    ttl_cache._CACHE.clear()
+    ttl_cache._STATS.clear()
+
+
+class TestTTLCache:
+    """Tests for the in-process tier and its public API."""
+
+    def test_set_and_get(self):
+        """Test a value round-trips through the local tier."""
+        ttl_cache.set("msg:unread:ws:1", 3, ttl=5)
+        assert ttl_cache.get("msg:unread:ws:1") == 3
+
+    def test_expired_entry_is_dropped(self, monkeypatch):
+        """Test entries past their TTL are treated as misses."""
+        ttl_cache.set("msg:unread:ws:1", 3, ttl=5)
+        now = time.monotonic()
+        monkeypatch.setattr(ttl_cache.time, "monotonic", lambda: now + 10)
+        assert ttl_cache.get("msg:unread:ws:1") is None
+        assert "msg:unread:ws:1" not in ttl_cache._CACHE
+
+    def test_namespace_default_ttl(self):
+        """Test the namespace TTL applies when the caller omits one."""
+        ttl_cache.set("erp:settings:abc", {"a": 1})
+        expires_at, _, _ = ttl_cache._CACHE._data["erp:settings:abc"]
+        assert 55 < expires_at - time.monotonic() <= 60
+
+    def test_lru_bound(self, monkeypatch):
+        """Test the local tier evicts the least recently used key."""
+        monkeypatch.setattr(ttl_cache._CACHE, "max_entries", 2)
+        ttl_cache.set("a:1", 1)
+        ttl_cache.set("a:2", 2)
+        ttl_cache.get("a:1")
+        ttl_cache.set("a:3", 3)
+        assert ttl_cache.get("a:1") == 1
+        assert ttl_cache.get("a:2") is None
+        assert ttl_cache.get("a:3") == 3
+
+    def test_invalidate_prefix(self):
+        """Test prefix invalidation only drops matching keys."""
+        ttl_cache.set("auth:me:u1:w1", {})
+        ttl_cache.set("auth:me:u1:w2", {})
+        ttl_cache.set("auth:me:u2:w1", {})
+        ttl_cache.invalidate_prefix("auth:me:u1:")
+        assert ttl_cache.get("auth:me:u1:w1") is None
+        assert ttl_cache.get("auth:me:u1:w2") is None
+        assert ttl_cache.get("auth:me:u2:w1") == {}
+
+    async def test_aget_without_redis(self):
+        """Test aget falls back to a miss when Redis is not connected."""
+        assert await ttl_cache.aget("msg:unread:ws:x") is None
+        ttl_cache.set("msg:unread:ws:x", 7)
+        assert await ttl_cache.aget("msg:unread:ws:x") == 7
+
+    def test_stats_counters(self):
+        """Test hit/miss counters are tracked per namespace."""
+        ttl_cache.get("notif:unread:u1")
+        ttl_cache.set("notif:unread:u1", 1)
+        ttl_cache.get("notif:unread:u1")
+        counters = ttl_cache.stats()["namespaces"]["notif:unread"]
+        assert counters == {"l1_hits": 1, "l2_hits": 0, "misses": 1}
@@ -0,0 +1,122 @@
+"""Unit tests for the VeriFactu submission queue."""
+from datetime import date, datetime, timedelta, timezone
+from types import SimpleNamespace
+from uuid import uuid4
+
+from app.core.config import settings
+from app.services import verifactu_queue
+from app.services.verifactu import AEATSoapClient, _local_timestamp
+
+_RESPONSE = """<?xml version="1.0" encoding="UTF-8"?>
+<env:Envelope xmlns:env="http://schemas.xmlsoap.org/soap/envelope/">
+<env:Body><tikR:RespuestaRegFactuSistemaFacturacion xmlns:tikR="urn:r" xmlns:tik="urn:t">
+<tikR:CSV>A-CSV123</tikR:CSV>
+<tikR:TiempoEsperaEnvio>80</tikR:TiempoEsperaEnvio>
+<tikR:RespuestaLinea><tikR:IDFactura><tik:NumSerieFactura>F2026-1</tik:NumSerieFactura></tikR:IDFactura>
+<tikR:EstadoRegistro>Correcto</tikR:EstadoRegistro></tikR:RespuestaLinea>
+<tikR:RespuestaLinea><tikR:IDFactura><tik:NumSerieFactura>F2026-2</tik:NumSerieFactura></tikR:IDFactura>
+<tikR:EstadoRegistro>Incorrecto</tikR:EstadoRegistro>
+<tikR:CodigoErrorRegistro>1100</tikR:CodigoErrorRegistro>
+<tikR:DescripcionErrorRegistro>Valor incorrecto</tikR:DescripcionErrorRegistro></tikR:RespuestaLinea>
+</tikR:RespuestaRegFactuSistemaFacturacion></env:Body></env:Envelope>"""
+
+
+def _settings():
+    return SimpleNamespace(
+        business_name="Estudio", tax_id="B12345678", verifactu_mode="direct_aeat_test",
+        software_company_name=None, software_company_nif=None, software_name="E13Fitness",
+        software_id="EF", software_version="1.0", software_install_number="00001",
+        verifactu_next_send_at=None,
+    )
+
+
+def _invoice(number, prev_hash=""):
+    return SimpleNamespace(
+        id=uuid4(), invoice_number=number, invoice_type="F1", tax_rate=21, issue_date=date(2026, 10, 17),
+        related_invoice_id=None, client_tax_id=None, client_name="Cliente",
+        subtotal=100, tax_amount=21, total=121, verifactu_hash=f"H{number}", verifactu_prev_hash=prev_hash,
+        verifactu_response=None, verifactu_status="pending", verifactu_sent_at=None,
+        verifactu_registration_datetime=datetime(2026, 10, 17, 9, 30, tzinfo=timezone.utc),
+    )
+
+
+def _row(invoice, attempts=1):
+    return SimpleNamespace(
+        invoice_id=invoice.id, attempts=attempts, status="processing",
+        last_error=None, processed_at=None, next_attempt_at=None,
+    )
+
+
+class TestVeriFactuQueue:
+    """Tests for batching, per-record write-back, waits and retries."""
+
+    def test_local_timestamp_uses_madrid_offset(self):
+        """Test the registration timestamp is Madrid time of the stored moment."""
+        assert _local_timestamp(datetime(2026, 7, 1, 10, 0, 5, tzinfo=timezone.utc)) == "2026-07-01T12:00:05+02:00"
+        assert _local_timestamp(datetime(2026, 12, 1, 23, 30, tzinfo=timezone.utc)) == "2026-12-02T00:30:00+01:00"
+        # Cambio de hora: 25-10-2026 01:00 UTC
+        assert _local_timestamp(datetime(2026, 10, 25, 0, 59, tzinfo=timezone.utc)).endswith("+02:00")
+        assert _local_timestamp(datetime(2026, 10, 25, 1, 0, tzinfo=timezone.utc)).endswith("+01:00")
+
+    def test_batch_envelope_holds_every_record(self):
+        """Test several RegistroFactura share one RegFactuSistemaFacturacion."""
+        client = AEATSoapClient(_settings())
+        xml = client.build_batch_envelope(["<sum:RegistroFactura>1</sum:RegistroFactura>"] * 3)
+        assert xml.count("<sum:RegFactuSistemaFacturacion>") == 1
+        assert xml.count("<sum:RegistroFactura>") == 3
+
+    def test_wait_and_retry_delays(self):
+        """Test TiempoEsperaEnvio parsing and capped exponential backoff."""
+        assert verifactu_queue.wait_seconds("80") == 80
+        assert verifactu_queue.wait_seconds(None) == settings.VERIFACTU_DEFAULT_WAIT_SECONDS
+        assert verifactu_queue.retry_delay(1, rand=0.5) == settings.VERIFACTU_RETRY_BASE_SECONDS
+        assert verifactu_queue.retry_delay(50, rand=0.5) == settings.VERIFACTU_RETRY_MAX_SECONDS
+
+    async def test_submit_writes_back_each_record(self, monkeypatch):
+        """Test one envelope per batch, per-record status and the next send hold."""
+        sent = []
+
+        async def fake_send(self, xml):
+            sent.append(xml)
+            return {"status": 200, "response": _RESPONSE, "error": None}
+
+        monkeypatch.setattr(AEATSoapClient, "send_xml", fake_send)
+        first, second = _invoice("F2026-1"), _invoice("F2026-2", prev_hash="HF2026-1")
+        rows = [_row(first), _row(second)]
+        inv_settings = _settings()
+
+        await verifactu_queue._submit(
+            None, rows, {first.id: first, second.id: second}, {"HF2026-1": first}, inv_settings,
+        )
+
+        assert len(sent) == 1 and sent[0].count("<RegistroAlta>") == 2
+        assert "<Huella>HF2026-1</Huella></RegistroAnterior>" in sent[0]
+        assert "2026-10-17T11:30:00+02:00" in sent[0]
+        assert first.verifactu_status == "accepted" and first.verifactu_response["csv"] == "A-CSV123"
+        assert second.verifactu_status == "error" and "1100" in second.verifactu_response["message"]
+        assert [r.status for r in rows] == ["done", "failed"]
+        wait = inv_settings.verifactu_next_send_at - datetime.now(timezone.utc)
+        assert timedelta(seconds=75) < wait <= timedelta(seconds=80)
+
+    async def test_transport_errors_are_retried(self, monkeypatch):
+        """Test a send without AEAT answer requeues the batch with backoff."""
+        async def fake_send(self, xml):
+            return {"status": 0, "response": "", "error": "timed out"}
+
+        monkeypatch.setattr(AEATSoapClient, "send_xml", fake_send)
+        invoice = _invoice("F2026-1")
+        retried, exhausted = _row(invoice), _row(invoice, attempts=settings.VERIFACTU_MAX_ATTEMPTS)
+
+        await verifactu_queue._submit(None, [retried], {invoice.id: invoice}, {}, _settings())
+        assert retried.status == "pending" and retried.next_attempt_at > datetime.now(timezone.utc)
+        assert invoice.verifactu_status == "pending"
+
+        await verifactu_queue._submit(None, [exhausted], {invoice.id: invoice}, {}, _settings())
+        assert exhausted.status == "failed" and invoice.verifactu_status == "error"
+
+    def test_duplicate_after_retry_counts_as_accepted(self):
+        """Test a record AEAT already has is accepted when resent after a crash."""
+        duplicate = {"estado": "Incorrecto", "cod_error": "3000", "desc_error": "Duplicado"}
+        assert verifactu_queue._record_result(duplicate, attempts=2)[0] == "accepted"
+        assert verifactu_queue._record_result(duplicate, attempts=1)[0] == "error"
+        assert verifactu_queue._record_result({"estado": "AceptadoConErrores"}, 1)[0] == "accepted"
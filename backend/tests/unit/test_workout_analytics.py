@@ -0,0 +1,39 @@
+"""Unit tests for the weekly exercise aggregates."""
+import uuid
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import workout_analytics
+
+
+class _RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(str(statement.compile(dialect=postgresql.dialect())))
+
+
+class TestWorkoutAnalytics:
+    """Tests for week bucketing and the refresh statements."""
+
+    def test_week_of_is_utc_monday(self):
+        """Test weeks start on Monday in UTC whatever the offset."""
+        assert workout_analytics.week_of(datetime(2026, 10, 18, 23, 30)) == date(2026, 10, 12)
+        madrid = timezone(timedelta(hours=2))
+        # Monday 01:00 in Madrid is still Sunday in UTC
+        assert workout_analytics.week_of(datetime(2026, 10, 19, 1, tzinfo=madrid)) == date(2026, 10, 12)
+
+    async def test_refresh_upserts_then_prunes(self):
+        """Test one upsert aggregates the touched weeks and one delete prunes."""
+        db = _RecordingSession()
+        await workout_analytics.refresh_weeks(db, uuid.uuid4(), ["sq", "sq"], [date(2026, 10, 12)])
+        upsert, prune = db.statements
+        assert "INSERT INTO exercise_weekly_stats" in upsert and "ON CONFLICT ON CONSTRAINT" in upsert
+        assert "array_agg(exercise_performances.best_set_weight_kg ORDER BY" in upsert
+        assert prune.startswith("DELETE FROM exercise_weekly_stats") and "NOT (EXISTS" in prune
+
+        db = _RecordingSession()
+        await workout_analytics.refresh_weeks(db, uuid.uuid4(), [], [date(2026, 10, 12)])
+        assert db.statements == []
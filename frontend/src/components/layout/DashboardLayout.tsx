@@ -68,6 +68,7 @@ import {
 } from "../../hooks/useNotifications";
 import { useMyForms, useMyPendingRequiredCount } from "../../hooks/useForms";
 import { usePWAInstall } from "../../hooks/usePWAInstall";
+import { useRealtimeConnected, useRealtimeStream } from "../../hooks/useRealtime";
 
 // --- TIPOS Y DATOS ---
 
@@ -580,6 +581,7 @@ function SidebarContent({ onNavigate }: { onNavigate?: () => void } = {}) {
   const location = useLocation();
   const isClient = user?.role === 'client';
   const [openGroup, setOpenGroup] = useState<string | null>(null);
+  const realtimeConnected = useRealtimeConnected();
   
   const { data: unreadData } = useQuery({
     queryKey: ["unread-messages-count", isClient ? "client" : "trainer"],
@@ -592,7 +594,8 @@ function SidebarContent({ onNavigate }: { onNavigate?: () => void } = {}) {
         return response.data;
       }
     },
-    refetchInterval: 60_000,
+    // Pushed by the realtime stream; poll only while it is down.
+    refetchInterval: realtimeConnected ? false : 60_000,
     staleTime: 30_000,
   });
   
@@ -741,6 +744,7 @@ export function DashboardLayout() {
   const breadcrumbLabel = useBreadcrumb();
   const { user: layoutUser } = useAuthStore();
   const isClientLayout = layoutUser?.role === "client";
+  useRealtimeStream();
 
   const { data: notifData } = useNotifications(1, 20, notifOpen);
   const { data: unreadData } = useUnreadCount();
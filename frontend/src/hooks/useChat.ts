@@ -1,6 +1,7 @@
 import { notifications } from "@mantine/notifications";
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { api } from "../services/api";
+import { useRealtimeConnected } from "./useRealtime";
 
 // Types
 export type MessageSource = "platform" | "whatsapp";
@@ -66,13 +67,14 @@ export interface SendMessageData {
 // Hooks
 
 export function useConversations(scope?: ChatScope) {
+  const realtimeConnected = useRealtimeConnected();
   const qs = scope ? `?scope=${scope}` : "";
   return useQuery({
     queryKey: ["conversations", scope],
     queryFn: async () => api.get(`/messages/conversations${qs}`),
     select: (response) => response.data as Conversation[],
     staleTime: 15 * 1000,
-    refetchInterval: 15_000,
+    refetchInterval: realtimeConnected ? false : 15_000,
     refetchIntervalInBackground: false,
   });
 }
@@ -90,6 +92,7 @@ export function useConversation(conversationId: string | null) {
 }
 
 export function useMessages(conversationId: string | null) {
+  const realtimeConnected = useRealtimeConnected();
   return useQuery({
     queryKey: ["messages", conversationId],
     queryFn: async () => {
@@ -99,7 +102,7 @@ export function useMessages(conversationId: string | null) {
     select: (response) => response.data as Message[],
     enabled: !!conversationId,
     staleTime: 5 * 1000,
-    refetchInterval: 10_000,
+    refetchInterval: realtimeConnected ? false : 10_000,
     refetchIntervalInBackground: false,
   });
 }
@@ -186,7 +186,7 @@ interface MealPlan {
 }
 
 interface NutritionLog {
-  log_index?: number;
+  id?: string;
   date: string;
   meal_name: string;
   foods: Array<{
@@ -694,8 +694,8 @@ export function useDeleteNutritionLog() {
   const queryClient = useQueryClient();
 
   return useMutation({
-    mutationFn: async (logIndex: number) => {
-      await clientPortalApi.deleteNutritionLog(logIndex);
+    mutationFn: async (logId: string) => {
+      await clientPortalApi.deleteNutritionLog(logId);
     },
     onSuccess: () => {
       queryClient.invalidateQueries({ queryKey: ["my-meal-plan"] });
@@ -1180,6 +1180,17 @@ export function useAvailableSlots(date: string) {
   });
 }
 
+export function useAvailableSlotsRange(start: string, end: string) {
+  return useQuery<Array<{ date: string; slots: Array<{ start: string; end: string }> }>>({
+    queryKey: ["available-slots", "range", start, end],
+    queryFn: async () => {
+      const response = await clientPortalApi.availableSlotsRange(start, end);
+      return response.data;
+    },
+    enabled: !!start && !!end,
+  });
+}
+
 export function useCreateClientBooking() {
   const queryClient = useQueryClient();
 
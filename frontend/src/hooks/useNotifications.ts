@@ -1,5 +1,6 @@
 import { useMutation, useQuery, useQueryClient } from "@tanstack/react-query";
 import { notificationsApi } from "../services/api";
+import { useRealtimeConnected } from "./useRealtime";
 
 export interface AppNotification {
   id: string;
@@ -40,13 +41,15 @@ export function useNotifications(page = 1, size = 20, enabled = true) {
 }
 
 export function useUnreadCount() {
+  const realtimeConnected = useRealtimeConnected();
   return useQuery({
     queryKey: ["notifications-unread-count"],
     queryFn: async () => {
       const response = await notificationsApi.unreadCount();
       return response.data as { unread_count: number };
     },
-    refetchInterval: 45_000,
+    // Pushed by the realtime stream; poll only while it is down.
+    refetchInterval: realtimeConnected ? false : 45_000,
     staleTime: 30_000,
   });
 }
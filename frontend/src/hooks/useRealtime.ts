@@ -0,0 +1,142 @@
+import { useEffect, useSyncExternalStore } from "react";
+import { useQueryClient, type QueryClient } from "@tanstack/react-query";
+import { api } from "../services/api";
+import { useAuthStore } from "../stores/auth";
+
+// Server-sent event stream (GET /realtime/stream) that pushes unread badges,
+// new messages and notifications. EventSource cannot send the Authorization
+// header, so the stream is read with fetch. While it is connected the badge
+// and chat queries stop polling; when it drops they fall back to their poll.
+
+const RETRY_MS = 5_000;
+const MAX_RETRY_MS = 60_000;
+
+let connected = false;
+const listeners = new Set<() => void>();
+
+function setConnected(value: boolean) {
+  if (connected === value) return;
+  connected = value;
+  listeners.forEach((listener) => listener());
+}
+
+function subscribe(listener: () => void) {
+  listeners.add(listener);
+  return () => listeners.delete(listener);
+}
+
+/** True while the realtime stream is open (queries can skip polling). */
+export function useRealtimeConnected(): boolean {
+  return useSyncExternalStore(subscribe, () => connected);
+}
+
+interface UnreadEvent {
+  scope: "messages" | "notifications";
+  unread_count: number;
+}
+
+function handleEvent(queryClient: QueryClient, event: string, data: any, isClient: boolean) {
+  const messagesKey = ["unread-messages-count", isClient ? "client" : "trainer"];
+  switch (event) {
+    case "snapshot":
+      queryClient.setQueryData(messagesKey, { unread_count: data.messages });
+      queryClient.setQueryData(["notifications-unread-count"], { unread_count: data.notifications });
+      break;
+    case "unread": {
+      const { scope, unread_count } = data as UnreadEvent;
+      queryClient.setQueryData(
+        scope === "messages" ? messagesKey : ["notifications-unread-count"],
+        { unread_count },
+      );
+      break;
+    }
+    case "message":
+      if (isClient) {
+        queryClient.invalidateQueries({ queryKey: ["client-messages"] });
+        queryClient.invalidateQueries({ queryKey: ["client-conversation"] });
+      } else {
+        queryClient.invalidateQueries({ queryKey: ["conversations"] });
+        queryClient.invalidateQueries({ queryKey: ["messages", data.conversation_id] });
+      }
+      break;
+    case "message_status":
+      queryClient.invalidateQueries({ queryKey: ["messages", data.conversation_id] });
+      break;
+    case "notification":
+      queryClient.invalidateQueries({ queryKey: ["notifications"] });
+      break;
+  }
+}
+
+/** Opens the realtime stream for the logged-in user. Mount once (layout). */
+export function useRealtimeStream() {
+  const queryClient = useQueryClient();
+  const accessToken = useAuthStore((s) => s.accessToken);
+  const workspaceId = useAuthStore((s) => s.currentWorkspace?.id);
+  const isClient = useAuthStore((s) => s.user?.role === "client");
+
+  useEffect(() => {
+    if (!accessToken) return;
+    const controller = new AbortController();
+    let retryMs = RETRY_MS;
+    let timer: ReturnType<typeof setTimeout> | null = null;
+
+    const connect = async () => {
+      try {
+        const headers: Record<string, string> = {
+          Accept: "text/event-stream",
+          Authorization: `Bearer ${accessToken}`,
+        };
+        if (workspaceId) headers["X-Workspace-ID"] = workspaceId;
+        const response = await fetch(`${api.defaults.baseURL}/realtime/stream`, {
+          headers,
+          credentials: "include",
+          signal: controller.signal,
+        });
+        // 401: the token expired; the axios interceptor refreshes it and the
+        // new accessToken re-runs this effect.
+        if (response.status === 401) return;
+        if (!response.ok || !response.body) throw new Error(`HTTP ${response.status}`);
+
+        const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+        let buffer = "";
+        for (;;) {
+          const { value, done } = await reader.read();
+          if (done) break;
+          buffer += value;
+          let sep: number;
+          while ((sep = buffer.indexOf("\n\n")) !== -1) {
+            const block = buffer.slice(0, sep);
+            buffer = buffer.slice(sep + 2);
+            let event = "message";
+            let data = "";
+            for (const line of block.split("\n")) {
+              if (line.startsWith("event:")) event = line.slice(6).trim();
+              else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            if (!data) continue;
+            if (event === "snapshot") {
+              setConnected(true);
+              retryMs = RETRY_MS;
+            }
+            handleEvent(queryClient, event, JSON.parse(data), isClient);
+          }
+        }
+      } catch {
+        if (controller.signal.aborted) return;
+      } finally {
+        setConnected(false);
+      }
+      if (controller.signal.aborted) return;
+      timer = setTimeout(connect, retryMs);
+      retryMs = Math.min(retryMs * 2, MAX_RETRY_MS);
+    };
+
+    connect();
+    return () => {
+      controller.abort();
+      if (timer) clearTimeout(timer);
+      setConnected(false);
+    };
+  }, [accessToken, workspaceId, isClient, queryClient]);
+}
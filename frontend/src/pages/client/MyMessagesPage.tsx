@@ -24,6 +24,7 @@ import relativeTime from "dayjs/plugin/relativeTime";
 import { useEffect, useRef, useState } from "react";
 import { useQuery, useMutation, useQueryClient } from "@tanstack/react-query";
 import { clientPortalApi } from "../../services/api";
+import { useRealtimeConnected } from "../../hooks/useRealtime";
 import "dayjs/locale/es";
 
 dayjs.extend(relativeTime);
@@ -115,6 +116,7 @@ export function MyMessagesPage() {
   const scrollRef = useRef<HTMLDivElement>(null);
   const inputRef = useRef<HTMLInputElement>(null);
   const queryClient = useQueryClient();
+  const realtimeConnected = useRealtimeConnected();
 
   // Fetch conversation
   const { data: conversation, isLoading: convLoading } = useQuery<Conversation>({
@@ -133,7 +135,7 @@ export function MyMessagesPage() {
       return response.data;
     },
     staleTime: 5 * 1000,
-    refetchInterval: 10_000,
+    refetchInterval: realtimeConnected ? false : 10_000,
     refetchIntervalInBackground: false,
     enabled: !!conversation,
   });
@@ -1939,11 +1939,11 @@ export function MyNutritionPage() {
 
   const handleUnregisterMeal = async (mealName: string) => {
     const logsForMeal = (nutritionLogs || []).filter(
-      (l) => l.meal_name === mealName && l.log_index != null
+      (l) => l.meal_name === mealName && l.id != null
     );
     for (const log of logsForMeal) {
-      if (log.log_index != null) {
-        await deleteNutritionLogMutation.mutateAsync(log.log_index);
+      if (log.id != null) {
+        await deleteNutritionLogMutation.mutateAsync(log.id);
       }
     }
   };
@@ -333,6 +333,7 @@ export const nutritionApi = {
   // Meal Plans - backend uses /meal-plans
   plans: (params?: object) => api.get("/nutrition/meal-plans", { params }),
   getPlan: (id: string) => api.get(`/nutrition/meal-plans/${id}`),
+  planNutrients: (id: string) => api.get(`/nutrition/meal-plans/${id}/nutrients`),
   createPlan: (data: object) => api.post("/nutrition/meal-plans", data),
   updatePlan: (id: string, data: object) =>
     api.put(`/nutrition/meal-plans/${id}`, data),
@@ -485,6 +486,8 @@ export const erpApi = {
   duplicateInvoice: (id: string) => api.post(`/erp/invoices/${id}/duplicate`),
   sendInvoiceEmail: (id: string) => api.post(`/erp/invoices/${id}/send-email`),
   getInvoicePdfUrl: (id: string) => `${API_URL}/erp/invoices/${id}/pdf`,
+  exportInvoicesZip: (params: { from_date?: string; to_date?: string; series?: string; include_drafts?: boolean }) =>
+    api.get("/erp/invoices/export", { params, responseType: "blob" }),
   getInvoiceAuditLog: (id: string) => api.get(`/erp/invoices/${id}/audit-log`),
   getNextNumber: (series?: string) => api.get("/erp/invoices/next-number", { params: { series } }),
 
@@ -669,8 +672,8 @@ export const clientPortalApi = {
     api.get("/my/nutrition/logs", { params: { date, limit } }),
   nutritionHistory: (days?: number) =>
     api.get("/my/nutrition/history", { params: { days } }),
-  deleteNutritionLog: (logIndex: number) =>
-    api.delete(`/my/nutrition/logs/${logIndex}`),
+  deleteNutritionLog: (logId: string) =>
+    api.delete(`/my/nutrition/logs/${logId}`),
   recipes: (params?: { search?: string; category?: string }) =>
     api.get("/my/nutrition/recipes", { params }),
   
@@ -708,6 +711,8 @@ export const clientPortalApi = {
     api.get("/my/calendar/bookings", { params }),
   getBooking: (id: string) => api.get(`/my/calendar/bookings/${id}`),
   availableSlots: (date: string) => api.get("/my/calendar/available-slots", { params: { date } }),
+  availableSlotsRange: (start: string, end: string) =>
+    api.get("/my/calendar/available-slots/range", { params: { start, end } }),
   createBooking: (data: { start_time: string; notes?: string }) =>
     api.post("/my/calendar/bookings", data),
   cancelBooking: (id: string) =>